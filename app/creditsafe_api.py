@@ -2,8 +2,8 @@
 # ==============================================================================
 # CREDITSAFE API - Modulo integrazione
 # ==============================================================================
-# Versione: 1.0.0
-# Data: 2026-02-13
+# Versione: 1.1.2
+# Data: 2026-10-19
 # Descrizione: Classe per interazione con Creditsafe Monitoring API
 #
 # Funzionalita':
@@ -14,13 +14,17 @@
 # - Recupero notification events (alert)
 # - Rate limiting integrato
 # - Retry con backoff su errori temporanei
+# - URL base configurabile (CREDITSAFE_API_BASE_URL) per simulatore locale
+# - Cache persistente risposte in sola lettura (app/creditsafe_cache.py)
 #
 # Credenziali: account_esterni/Credenziali_api_creditsafe.txt
 # ==============================================================================
 
+import os
 import re
 import time
 import logging
+import threading
 import requests
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -29,8 +33,9 @@ from datetime import datetime, timedelta
 # CONFIGURAZIONE
 # ==============================================================================
 
-# Endpoint
-API_BASE_URL = "https://connect.creditsafe.com/v1"
+# Endpoint (sovrascrivibile per puntare al simulatore locale,
+# vedi scripts/creditsafe_simulatore.py)
+API_BASE_URL = os.environ.get('CREDITSAFE_API_BASE_URL') or "https://connect.creditsafe.com/v1"
 
 # Percorso credenziali (relativo a gestione_flotta/)
 CREDENZIALI_FILE = "account_esterni/Credenziali_api_creditsafe.txt"
@@ -72,12 +77,18 @@ class CreditsafeAPI:
         events = api.get_notification_events(portfolio_id)
     """
     
-    def __init__(self, base_dir=None):
+    def __init__(self, base_dir=None, base_url=None, rate_limit_delay=None,
+                 usa_cache=False):
         """
         Inizializza client API.
         
         Args:
             base_dir: Path base gestione_flotta (default: auto-detect)
+            base_url: URL base API (default: API_BASE_URL)
+            rate_limit_delay: Pausa minima tra richieste in secondi
+                (default: RATE_LIMIT_DELAY)
+            usa_cache: Se True usa la cache persistente per ricerche
+                P.IVA e regole disponibili
         """
         if base_dir:
             self.base_dir = Path(base_dir)
@@ -85,11 +96,20 @@ class CreditsafeAPI:
             # Auto-detect: risali dalla posizione del modulo
             self.base_dir = Path(__file__).parent.parent
         
+        self.base_url = (base_url or API_BASE_URL).rstrip('/')
+        self.rate_limit_delay = RATE_LIMIT_DELAY if rate_limit_delay is None else rate_limit_delay
+        
         self._token = None
         self._token_expires = None
         self._username = None
         self._password = None
         self._last_request_time = 0
+        self._rate_lock = threading.Lock()
+        
+        self.cache = None
+        if usa_cache:
+            from app.creditsafe_cache import CreditsafeCache
+            self.cache = CreditsafeCache(base_dir=self.base_dir)
     
     # ==========================================================================
     # CREDENZIALI
@@ -222,7 +242,7 @@ class CreditsafeAPI:
         
         logger.info(f"Autenticazione Creditsafe per {self._username}...")
         
-        url = f"{API_BASE_URL}/authenticate"
+        url = f"{self.base_url}/authenticate"
         payload = {
             "username": self._username,
             "password": self._password
@@ -249,13 +269,14 @@ class CreditsafeAPI:
     # RICERCA AZIENDE
     # ==========================================================================
     
-    def search_company_by_vat(self, vat_number, country="IT"):
+    def search_company_by_vat(self, vat_number, country="IT", bypass_cache=False):
         """
         Cerca azienda per P.IVA.
         
         Args:
             vat_number: P.IVA (11 cifre, senza prefisso IT)
             country: Codice paese (default: IT)
+            bypass_cache: True per ignorare la cache e rinfrescarla
             
         Returns:
             dict|None: Dati azienda o None se non trovata
@@ -267,13 +288,14 @@ class CreditsafeAPI:
             logger.warning(f"P.IVA non valida: {vat_number}")
             return None
         
-        url = f"{API_BASE_URL}/companies"
+        url = f"{self.base_url}/companies"
         params = {
             "countries": country,
             "vatNo": vat_clean
         }
         
-        data = self._do_request('GET', url, params=params)
+        data = self._cached_request('companies_search', url, params, bypass_cache,
+                                    positivo=lambda d: bool(d.get('companies')))
         
         companies = data.get('companies', [])
         if companies:
@@ -295,7 +317,7 @@ class CreditsafeAPI:
         Returns:
             dict: Info accesso (paesi, sottoscrizioni, limiti)
         """
-        url = f"{API_BASE_URL}/access"
+        url = f"{self.base_url}/access"
         return self._do_request('GET', url)
     
     # ==========================================================================
@@ -309,7 +331,7 @@ class CreditsafeAPI:
         Returns:
             list: Lista portfolio
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios"
+        url = f"{self.base_url}/monitoring/portfolios"
         data = self._do_request('GET', url)
         return data.get('portfolios', data) if isinstance(data, dict) else data
     
@@ -324,7 +346,7 @@ class CreditsafeAPI:
         Returns:
             dict: Dati portfolio creato (con portfolioId)
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios"
+        url = f"{self.base_url}/monitoring/portfolios"
         payload = {
             "name": name,
             "isDefault": is_default
@@ -367,7 +389,7 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta API
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios/{portfolio_id}/companies"
+        url = f"{self.base_url}/monitoring/portfolios/{portfolio_id}/companies"
         payload = {
             "id": connect_id,
             "personalReference": str(reference),
@@ -391,7 +413,7 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta con lista aziende
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios/{portfolio_id}/companies"
+        url = f"{self.base_url}/monitoring/portfolios/{portfolio_id}/companies"
         params = {
             "page": page,
             "pageSize": page_size
@@ -410,7 +432,7 @@ class CreditsafeAPI:
         Returns:
             bool: True se rimossa con successo
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios/{portfolio_id}/companies/{connect_id}"
+        url = f"{self.base_url}/monitoring/portfolios/{portfolio_id}/companies/{connect_id}"
         
         try:
             self._do_request('DELETE', url, expect_json=False)
@@ -424,18 +446,20 @@ class CreditsafeAPI:
     # EVENT RULES (REGOLE NOTIFICA)
     # ==========================================================================
     
-    def get_available_rules(self, country_code="IT"):
+    def get_available_rules(self, country_code="IT", bypass_cache=False):
         """
         Ottiene regole disponibili per paese.
         
         Args:
             country_code: Codice paese (IT, XX per globali)
+            bypass_cache: True per ignorare la cache e rinfrescarla
             
         Returns:
             list: Regole disponibili
         """
-        url = f"{API_BASE_URL}/monitoring/eventRules/{country_code}"
-        return self._do_request('GET', url)
+        url = f"{self.base_url}/monitoring/eventRules/{country_code}"
+        return self._cached_request('event_rules', url, None, bypass_cache,
+                                    chiave={'countryCode': country_code})
     
     def get_portfolio_rules(self, portfolio_id):
         """
@@ -447,7 +471,7 @@ class CreditsafeAPI:
         Returns:
             list: Regole attive
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios/{portfolio_id}/eventRules"
+        url = f"{self.base_url}/monitoring/portfolios/{portfolio_id}/eventRules"
         return self._do_request('GET', url)
     
     def set_portfolio_rules(self, portfolio_id, country_code, rules):
@@ -466,7 +490,7 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta API
         """
-        url = f"{API_BASE_URL}/monitoring/portfolios/{portfolio_id}/eventRules/{country_code}"
+        url = f"{self.base_url}/monitoring/portfolios/{portfolio_id}/eventRules/{country_code}"
         data = self._do_request('PUT', url, json=rules)
         logger.info(f"Regole aggiornate per portfolio {portfolio_id}, paese {country_code}: {len(rules)} regole")
         return data
@@ -490,7 +514,7 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta con notificationEvents e totalCount
         """
-        url = f"{API_BASE_URL}/monitoring/notificationEvents"
+        url = f"{self.base_url}/monitoring/notificationEvents"
         params = {
             "page": page,
             "pageSize": page_size,
@@ -551,13 +575,44 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta API
         """
-        url = f"{API_BASE_URL}/monitoring/notificationEvents/{event_id}"
+        url = f"{self.base_url}/monitoring/notificationEvents/{event_id}"
         payload = {"isProcessed": True}
         
         data = self._do_request('PATCH', url, json=payload)
         logger.debug(f"Evento {event_id} marcato come processato")
         return data
     
+    def mark_events_processed(self, event_ids):
+        """
+        Marca piu' notifiche come elaborate, una richiesta per evento.
+        
+        L'API non prevede una marcatura cumulativa: il tempo resta legato
+        a RATE_LIMIT_DELAY (circa un evento al secondo sul servizio reale).
+        Un errore su un evento non interrompe i successivi.
+        
+        Args:
+            event_ids: Lista ID evento
+            
+        Returns:
+            tuple: (lista ID marcati, dict {ID: errore} per i falliti)
+        """
+        event_ids = list(event_ids)
+        marcati = []
+        falliti = {}
+        
+        if not event_ids:
+            return marcati, falliti
+        
+        for event_id in event_ids:
+            try:
+                self.mark_event_processed(event_id)
+                marcati.append(event_id)
+            except Exception as e:
+                falliti[event_id] = e
+        
+        logger.info(f"Eventi marcati come processati: {len(marcati)}/{len(event_ids)}")
+        return marcati, falliti
+    
     def get_company_events(self, connect_id):
         """
         Ottiene storico eventi per azienda specifica.
@@ -568,21 +623,59 @@ class CreditsafeAPI:
         Returns:
             dict: Risposta con eventi
         """
-        url = f"{API_BASE_URL}/monitoring/companies/{connect_id}/events"
+        url = f"{self.base_url}/monitoring/companies/{connect_id}/events"
         return self._do_request('GET', url)
     
     # ==========================================================================
     # HTTP ENGINE (con rate limiting + retry)
     # ==========================================================================
     
+    def _cached_request(self, endpoint, url, params, bypass_cache=False,
+                        chiave=None, positivo=None):
+        """
+        GET con cache persistente (se attiva).
+        
+        Args:
+            endpoint: Nome endpoint in CACHE_TTL
+            url: URL completo
+            params: Query parameters
+            bypass_cache: True per saltare la lettura (la risposta viene
+                comunque salvata)
+            chiave: Parametri chiave cache (default: params)
+            positivo: Funzione risposta -> bool, False per cache negativa
+            
+        Returns:
+            dict|list: Risposta API (o da cache)
+        """
+        chiave = params if chiave is None else chiave
+        
+        if self.cache and not bypass_cache:
+            trovato, data = self.cache.get(endpoint, chiave)
+            if trovato:
+                return data
+        
+        data = self._do_request('GET', url, params=params)
+        
+        if self.cache:
+            esito = positivo(data) if positivo else True
+            self.cache.set(endpoint, chiave, data, positivo=esito)
+        
+        return data
+    
     def _rate_limit(self):
-        """Applica rate limiting tra richieste."""
-        now = time.time()
-        elapsed = now - self._last_request_time
-        if elapsed < RATE_LIMIT_DELAY:
-            sleep_time = RATE_LIMIT_DELAY - elapsed
-            time.sleep(sleep_time)
-        self._last_request_time = time.time()
+        """
+        Applica rate limiting tra richieste.
+        
+        Thread-safe: ogni chiamante prenota il proprio slot sotto lock e
+        attende fuori dal lock, cosi' le richieste concorrenti partono
+        distanziate ma la latenza di rete si sovrappone.
+        """
+        with self._rate_lock:
+            now = time.time()
+            slot = max(now, self._last_request_time + self.rate_limit_delay)
+            self._last_request_time = slot
+        if slot > now:
+            time.sleep(slot - now)
     
     def _do_request(self, method, url, params=None, json=None,
                      auth_required=True, expect_json=True):
@@ -678,17 +771,19 @@ class CreditsafeAPI:
 # FUNZIONE HELPER STANDALONE
 # ==============================================================================
 
-def get_api_client(base_dir=None):
+def get_api_client(base_dir=None, base_url=None, usa_cache=False):
     """
     Crea e autentica un client API.
     Comodo per uso da script.
     
     Args:
         base_dir: Path base gestione_flotta
+        base_url: URL base API (default: API_BASE_URL)
+        usa_cache: Se True attiva la cache persistente
         
     Returns:
         CreditsafeAPI: Client autenticato
     """
-    api = CreditsafeAPI(base_dir=base_dir)
+    api = CreditsafeAPI(base_dir=base_dir, base_url=base_url, usa_cache=usa_cache)
     api.authenticate()
     return api
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# CREDITSAFE CACHE - Cache persistente risposte API
+# ==============================================================================
+# Versione: 1.0.1
+# Data: 2026-10-19
+# Descrizione: Cache SQLite delle risposte Creditsafe in sola lettura
+#              (ricerca P.IVA, regole disponibili)
+#
+# Funzionalita':
+# - Chiave = endpoint + parametri normalizzati
+# - TTL per endpoint (CACHE_TTL)
+# - Cache negativa per P.IVA non trovate (CACHE_TTL_NEGATIVO)
+# - Pulizia automatica voci scadute
+# - Statistiche hit/miss della sessione
+#
+# File: db/creditsafe_cache.db (separato da gestionale.db)
+# ==============================================================================
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+# ==============================================================================
+# CONFIGURAZIONE
+# ==============================================================================
+
+# Percorso cache (relativo a gestione_flotta/)
+CACHE_FILE = "db/creditsafe_cache.db"
+
+GIORNO = 24 * 3600
+
+# TTL risposte positive per endpoint (secondi)
+CACHE_TTL = {
+    'companies_search': 30 * GIORNO,    # P.IVA -> connectId: praticamente stabile
+    'event_rules':      7 * GIORNO,     # regole disponibili per paese
+}
+
+# TTL risposte negative (azienda non trovata)
+CACHE_TTL_NEGATIVO = {
+    'companies_search': 7 * GIORNO,
+}
+
+logger = logging.getLogger('creditsafe_cache')
+
+
+# ==============================================================================
+# CLASSE CACHE
+# ==============================================================================
+
+class CreditsafeCache:
+    """
+    Cache persistente delle risposte API Creditsafe.
+
+    Uso:
+        cache = CreditsafeCache(base_dir='/home/michele/gestione_flotta')
+        trovato, dati = cache.get('companies_search', {'vatNo': '12345678901'})
+        if not trovato:
+            dati = ...  # chiamata API
+            cache.set('companies_search', {'vatNo': '12345678901'}, dati, positivo=True)
+    """
+
+    def __init__(self, base_dir=None, path=None):
+        """
+        Args:
+            base_dir: Path base gestione_flotta (default: auto-detect)
+            path: Percorso file cache esplicito (ha precedenza su base_dir)
+        """
+        if path:
+            self.path = Path(path)
+        else:
+            base = Path(base_dir) if base_dir else Path(__file__).parent.parent
+            self.path = base / CACHE_FILE
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._init_schema()
+
+        self.hit = 0
+        self.miss = 0
+
+    def _init_schema(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS risposte (
+                    chiave      TEXT PRIMARY KEY,
+                    endpoint    TEXT NOT NULL,
+                    parametri   TEXT NOT NULL,
+                    risposta    TEXT NOT NULL,
+                    positivo    INTEGER NOT NULL DEFAULT 1,
+                    creato_at   REAL NOT NULL,
+                    scade_at    REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_risposte_endpoint ON risposte(endpoint);
+                CREATE INDEX IF NOT EXISTS idx_risposte_scade ON risposte(scade_at);
+            """)
+            self._conn.execute("DELETE FROM risposte WHERE scade_at < ?", (time.time(),))
+            self._conn.commit()
+
+    @staticmethod
+    def _chiave(endpoint, params):
+        """Chiave stabile: endpoint + parametri ordinati."""
+        parametri = json.dumps(params or {}, sort_keys=True, default=str)
+        digest = hashlib.sha1(f"{endpoint}|{parametri}".encode('utf-8')).hexdigest()
+        return digest, parametri
+
+    # ==========================================================================
+    # LETTURA / SCRITTURA
+    # ==========================================================================
+
+    def get(self, endpoint, params):
+        """
+        Cerca una risposta valida in cache.
+
+        Returns:
+            tuple: (trovato: bool, risposta: dict|list|None)
+        """
+        chiave, _ = self._chiave(endpoint, params)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT risposta, scade_at FROM risposte WHERE chiave = ?", (chiave,)
+            ).fetchone()
+
+        if row is None or row[1] < time.time():
+            self.miss += 1
+            return False, None
+
+        self.hit += 1
+        logger.debug(f"Cache hit: {endpoint} {params}")
+        return True, json.loads(row[0])
+
+    def set(self, endpoint, params, risposta, positivo=True):
+        """
+        Salva una risposta. Se l'endpoint non ha TTL configurato
+        (o non ha TTL negativo per le risposte negative) non salva nulla.
+        """
+        ttl = (CACHE_TTL if positivo else CACHE_TTL_NEGATIVO).get(endpoint)
+        if not ttl:
+            return
+
+        chiave, parametri = self._chiave(endpoint, params)
+        adesso = time.time()
+
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO risposte
+                (chiave, endpoint, parametri, risposta, positivo, creato_at, scade_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (chiave, endpoint, parametri, json.dumps(risposta),
+                  1 if positivo else 0, adesso, adesso + ttl))
+            self._conn.commit()
+
+    def invalida(self, endpoint=None, params=None):
+        """
+        Rimuove voci dalla cache.
+
+        Args:
+            endpoint: Se None svuota tutta la cache
+            params: Se indicato rimuove solo quella voce
+
+        Returns:
+            int: Voci rimosse
+        """
+        with self._lock:
+            if endpoint is None:
+                cur = self._conn.execute("DELETE FROM risposte")
+            elif params is None:
+                cur = self._conn.execute("DELETE FROM risposte WHERE endpoint = ?", (endpoint,))
+            else:
+                chiave, _ = self._chiave(endpoint, params)
+                cur = self._conn.execute("DELETE FROM risposte WHERE chiave = ?", (chiave,))
+            self._conn.commit()
+            return cur.rowcount
+
+    # ==========================================================================
+    # STATISTICHE
+    # ==========================================================================
+
+    def statistiche(self):
+        """
+        Returns:
+            dict: hit/miss sessione + voci per endpoint
+        """
+        with self._lock:
+            righe = self._conn.execute("""
+                SELECT endpoint, positivo, COUNT(*) FROM risposte
+                WHERE scade_at >= ?
+                GROUP BY endpoint, positivo
+            """, (time.time(),)).fetchall()
+
+        voci = {}
+        for endpoint, positivo, n in righe:
+            voci.setdefault(endpoint, {'positive': 0, 'negative': 0})
+            voci[endpoint]['positive' if positivo else 'negative'] = n
+
+        totale = self.hit + self.miss
+        return {
+            'hit': self.hit,
+            'miss': self.miss,
+            'hit_rate': round(self.hit / totale, 3) if totale else 0.0,
+            'voci': voci,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -263,11 +263,20 @@ def inserisci_cliente(conn, dati, origine='import'):
     return cursor.lastrowid
 
 
-def aggiorna_cliente_da_creditsafe(conn, cliente_id, dati_creditsafe, logger=None):
+def aggiorna_cliente_da_creditsafe(conn, cliente_id, dati_creditsafe, logger=None,
+                                   campi_extra=None, commit=True):
     """
     Aggiorna un cliente esistente con i dati Creditsafe.
     NON sovrascrive: commerciale (viene dalla flotta)
     SOVRASCRIVE: tutti i dati aziendali, rating, bilancio
+    
+    Il diff dei campi e' calcolato in Python: un solo UPDATE sul cliente
+    e un solo executemany per le righe di storico_modifiche.
+    
+    Args:
+        campi_extra: dict campo -> valore scritti nello stesso UPDATE
+            senza storico (es. amministratore_variato = 0)
+        commit: False se il chiamante committa a blocchi (import batch)
     """
     cursor = conn.cursor()
     
@@ -316,39 +325,50 @@ def aggiorna_cliente_da_creditsafe(conn, cliente_id, dati_creditsafe, logger=Non
     if not cliente_attuale['numero_registrazione'] and dati_creditsafe.get('numero_registrazione'):
         campi_aggiornabili.append('numero_registrazione')
     
-    # Costruisci update
+    # Diff in Python: valori da scrivere + righe storico per i campi cambiati
+    colonne_attuali = cliente_attuale.keys()
     set_parts = []
     values = []
+    righe_storico = []
     
     for campo in campi_aggiornabili:
         if campo in dati_creditsafe and dati_creditsafe[campo] is not None:
-            # Registra modifica nello storico se valore cambiato
-            valore_precedente = cliente_attuale[campo] if campo in cliente_attuale.keys() else None
+            valore_precedente = cliente_attuale[campo] if campo in colonne_attuali else None
             valore_nuovo = dati_creditsafe[campo]
             
             if str(valore_precedente) != str(valore_nuovo):
-                cursor.execute('''
-                    INSERT INTO storico_modifiche 
-                    (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', ('clienti', cliente_id, campo, str(valore_precedente), str(valore_nuovo), now, 'creditsafe'))
+                righe_storico.append(('clienti', cliente_id, campo, str(valore_precedente),
+                                      str(valore_nuovo), now, 'creditsafe'))
             
             set_parts.append(f"{campo} = ?")
             values.append(valore_nuovo)
     
+    n_campi = len(set_parts)
+    
     if set_parts:
         set_parts.append("data_import_creditsafe = ?")
         values.append(now)
         set_parts.append("data_ultimo_aggiornamento = ?")
         values.append(now)
+    
+    for campo, valore in (campi_extra or {}).items():
+        set_parts.append(f"{campo} = ?")
+        values.append(valore)
+    
+    if set_parts:
         values.append(cliente_id)
-        
         query = f"UPDATE clienti SET {', '.join(set_parts)} WHERE id = ?"
         cursor.execute(query, values)
-        conn.commit()
-        
-        if logger:
-            logger.info(f"  Aggiornati {len(set_parts)-2} campi per cliente ID {cliente_id}")
+    
+    if righe_storico:
+        cursor.executemany('''
+            INSERT INTO storico_modifiche 
+            (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', righe_storico)
+    
+    if n_campi and logger:
+        logger.info(f"  Aggiornati {n_campi} campi per cliente ID {cliente_id}")
     
     # --- SYNC CAPOGRUPPO verso tabella capogruppo_clienti ---
     cg_nome = dati_creditsafe.get('capogruppo_nome')
@@ -388,12 +408,13 @@ def aggiorna_cliente_da_creditsafe(conn, cliente_id, dati_creditsafe, logger=Non
                 ''', (cliente_id, cg_nome.strip(), (cg_cf or '').strip()))
                 if logger:
                     logger.info(f"  Capogruppo inserito in capogruppo_clienti: {cg_nome}")
-            
-            conn.commit()
         except Exception as e:
             if logger:
                 logger.warning(f"  Errore sync capogruppo_clienti: {e}")
     
+    if commit:
+        conn.commit()
+    
     return True
 
 
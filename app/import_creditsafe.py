@@ -2,8 +2,8 @@
 # ==============================================================================
 # GESTIONE FLOTTA - Import PDF Creditsafe
 # ==============================================================================
-# Versione: 2.3.2
-# Data: 2026-02-10
+# Versione: 2.4.2
+# Data: 2026-10-19
 # Descrizione: Estrazione dati da PDF Creditsafe e inserimento nel database
 # Correzioni v1.0.2: Fix regex ATECO, descrizione attivita, capogruppo
 # Correzioni v1.0.3: Cancellazione vecchio PDF quando importa nuovo report
@@ -16,6 +16,9 @@
 # Correzioni v2.3.0: Estrazione completa ATECO (SAE, RAE, ATECO 2007, desc multilinea)
 # Correzioni v2.3.1: Data report da footer PDF (non piu datetime.now)
 # Correzioni v2.3.2: Data report spostata in estrai_dati_azienda (usata anche da riacquisisci)
+# Correzioni v2.4.0: Un solo UPDATE per cliente, storico in executemany, commit a blocchi
+# Correzioni v2.4.1: SAVEPOINT per PDF, file rimossi da pdf/ solo dopo il commit del blocco
+# Correzioni v2.4.2: Vecchi PDF del cliente cancellati anch'essi dopo il commit del blocco
 # ==============================================================================
 #
 # ╔════════════════════════════════════════════════════════════════════════════╗
@@ -64,6 +67,13 @@ from .config import (
 from .database import get_connection, cerca_cliente_per_piva, inserisci_cliente, aggiorna_cliente_da_creditsafe
 from .utils import setup_logger, pulisci_numero, pulisci_testo
 
+# File PDF elaborati per commit negli import batch.
+# La transazione resta aperta durante l'estrazione dei PDF del blocco:
+# valore basso per non bloccare a lungo le scritture del web server.
+# I PDF del blocco restano in pdf/ fino al commit: se l'import si
+# interrompe vengono rielaborati al giro successivo.
+PDF_PER_COMMIT = 20
+
 # ==============================================================================
 # RICOMPOSIZIONE RIGHE SPEZZATE DA LAYOUT PDF
 # ==============================================================================
@@ -730,13 +740,21 @@ def estrai_nome_da_filename(filename):
 # PROCESSO IMPORT
 # ==============================================================================
 
-def processa_pdf(pdf_path, conn, logger):
+def processa_pdf(pdf_path, conn, logger, commit=True, vecchi_pdf=None):
     """
     Processa un singolo file PDF Creditsafe.
     - Estrae i dati
     - Inserisce o aggiorna nel database
     - Cancella eventuale vecchio PDF dello stesso cliente
     - Sposta il file nello storico
+    
+    Il cliente viene scritto con un solo UPDATE (dati Creditsafe, path PDF
+    archiviato e reset amministratore_variato insieme).
+    
+    Args:
+        commit: False se il chiamante committa a blocchi di file
+        vecchi_pdf: lista in cui raccogliere i vecchi PDF del cliente invece
+            di cancellarli (il chiamante li cancella dopo il commit)
     """
     nome_file = pdf_path.name
     
@@ -783,79 +801,140 @@ def processa_pdf(pdf_path, conn, logger):
         if cliente_esistente:
             logger.info(f"  -> Trovato per CF: {dati['cod_fiscale']}")
     
-    if cliente_esistente:
-        # AGGIORNA cliente esistente - SOLO se il report e' piu' recente o il dato e' vuoto
-        data_report_nuova = dati.get('data_report_creditsafe', '')
-        data_report_attuale = cliente_esistente['data_report_creditsafe'] if 'data_report_creditsafe' in cliente_esistente.keys() else None
-        
-        if not data_report_attuale or not data_report_nuova:
-            # Campo vuoto: aggiorna sempre
-            logger.info(f"  -> Aggiornamento (data report mancante nel DB o nel PDF)")
-            aggiorna_cliente_da_creditsafe(conn, cliente_esistente['id'], dati, logger)
-            # Reset flag amministratore variato (PDF nuovo = fonte aggiornata)
-            conn.cursor().execute("UPDATE clienti SET amministratore_variato = 0 WHERE id = ?", (cliente_esistente["id"],))
-        elif data_report_nuova >= data_report_attuale:
-            # Report nuovo e' piu' recente o uguale: aggiorna
-            logger.info(f"  -> Aggiornamento (report {data_report_nuova} >= DB {data_report_attuale})")
-            aggiorna_cliente_da_creditsafe(conn, cliente_esistente['id'], dati, logger)
-            # Reset flag amministratore variato (PDF nuovo = fonte aggiornata)
-            conn.cursor().execute("UPDATE clienti SET amministratore_variato = 0 WHERE id = ?", (cliente_esistente["id"],))
-        else:
-            # Report vecchio: NON aggiornare, ELIMINA PDF
-            logger.info(f"  -> SCARTATO: report PDF ({data_report_nuova}) piu' vecchio del DB ({data_report_attuale})")
-            logger.info(f"     PDF eliminato, dati non aggiornati")
-            return True
-    else:
+    if not cliente_esistente:
         # NESSUNA CORRISPONDENZA P.IVA/CF: elimina PDF senza creare cliente
         logger.info(f"  -> SCARTATO: nessuna corrispondenza P.IVA/CF in database")
         logger.info(f"     P.IVA: {dati.get('p_iva', 'N/D')} CF: {dati.get('cod_fiscale', 'N/D')}")
         logger.info(f"     PDF eliminato dalla coda di importazione")
         return True
     
+    # AGGIORNA cliente esistente - SOLO se il report e' piu' recente o il dato e' vuoto
+    data_report_nuova = dati.get('data_report_creditsafe', '')
+    data_report_attuale = cliente_esistente['data_report_creditsafe'] if 'data_report_creditsafe' in cliente_esistente.keys() else None
     
-    # NUOVA STRUTTURA: Salva PDF nella cartella creditsafe del cliente
+    if not data_report_attuale or not data_report_nuova:
+        # Campo vuoto: aggiorna sempre
+        logger.info(f"  -> Aggiornamento (data report mancante nel DB o nel PDF)")
+    elif data_report_nuova >= data_report_attuale:
+        # Report nuovo e' piu' recente o uguale: aggiorna
+        logger.info(f"  -> Aggiornamento (report {data_report_nuova} >= DB {data_report_attuale})")
+    else:
+        # Report vecchio: NON aggiornare, ELIMINA PDF
+        logger.info(f"  -> SCARTATO: report PDF ({data_report_nuova}) piu' vecchio del DB ({data_report_attuale})")
+        logger.info(f"     PDF eliminato, dati non aggiornati")
+        return True
+    
+    # NUOVA STRUTTURA: PDF nella cartella creditsafe del cliente.
+    # Il PDF si copia prima dell'UPDATE: file_pdf punta alla cartella cliente
+    # solo se la copia e' riuscita, ed e' scritto una volta sola.
+    creditsafe_dir = None
+    dest_path = None
+    copia_nuova = False
     try:
-        # Costruisci dati cliente per ottenere il path
         cliente_per_path = {
             'p_iva': dati.get('p_iva'),
             'cod_fiscale': dati.get('cod_fiscale')
         }
-        
-        # Ottieni cartella creditsafe del cliente
         creditsafe_dir = get_cliente_creditsafe_path(cliente_per_path)
+    except ValueError as e:
+        # Cliente senza P.IVA e CF, fallback
+        logger.warning(f"  ! {e} - PDF non archiviato nella cartella cliente")
+    
+    if creditsafe_dir is not None:
         creditsafe_dir.mkdir(parents=True, exist_ok=True)
-        
+        dest_path = creditsafe_dir / pdf_path.name
+        copia_nuova = not dest_path.exists()
+        shutil.copy(str(pdf_path), str(dest_path))
+        dati['file_pdf'] = str(dest_path).replace(str(CLIENTI_DIR.parent) + '/', '')
+    
+    # Reset flag amministratore variato (PDF nuovo = fonte aggiornata)
+    try:
+        aggiorna_cliente_da_creditsafe(conn, cliente_esistente['id'], dati, logger,
+                                       campi_extra={'amministratore_variato': 0},
+                                       commit=commit)
+    except Exception:
+        # Il DB punta ancora al vecchio PDF: togli la copia appena fatta
+        if copia_nuova:
+            dest_path.unlink(missing_ok=True)
+        raise
+    
+    if creditsafe_dir is not None:
         # Cancella eventuali vecchi PDF nella cartella del cliente
         for old_pdf in creditsafe_dir.glob('*.pdf'):
+            if old_pdf.name == dest_path.name:
+                continue
+            if vecchi_pdf is not None:
+                # UPDATE non ancora committato: si cancella dopo il commit
+                vecchi_pdf.append(old_pdf)
+                continue
             try:
                 old_pdf.unlink()
                 logger.info(f"  -> Cancellato vecchio PDF: {old_pdf.name}")
             except Exception as e:
                 logger.warning(f"  ! Errore cancellazione {old_pdf.name}: {e}")
         
-        # Copia il nuovo PDF
-        dest_path = creditsafe_dir / pdf_path.name
-        shutil.copy(str(pdf_path), str(dest_path))
-        
-        # Aggiorna path nel DB (path relativo)
-        path_relativo = str(dest_path).replace(str(CLIENTI_DIR.parent) + '/', '')
-        cursor = conn.cursor()
-        if cliente_esistente:
-            cursor.execute('UPDATE clienti SET file_pdf = ? WHERE id = ?', 
-                          (path_relativo, cliente_esistente['id']))
-        else:
-            cursor.execute('UPDATE clienti SET file_pdf = ? WHERE id = ?',
-                          (path_relativo, cliente_id))
-        conn.commit()
-        
         logger.info(f"  -> PDF archiviato in: {creditsafe_dir.name}/{pdf_path.name}")
-        
-    except ValueError as e:
-        # Cliente senza P.IVA e CF, fallback
-        logger.warning(f"  ! {e} - PDF non archiviato nella cartella cliente")
     
     return True
 
+
+def _processa_in_savepoint(pdf_path, conn, logger, completati):
+    """
+    Processa un PDF dentro un SAVEPOINT della transazione del blocco.
+    
+    Se il PDF fallisce le sue scritture vengono annullate senza toccare gli
+    altri PDF del blocco. Se invece SQLite ha gia' annullato l'intera
+    transazione, completati viene svuotata: quei file restano in pdf/.
+    In completati va il PDF con i vecchi PDF del cliente da cancellare.
+    """
+    vecchi_pdf = []
+    if not conn.in_transaction:
+        conn.execute('BEGIN')
+    conn.execute('SAVEPOINT pdf_import')
+    try:
+        esito = processa_pdf(pdf_path, conn, logger, commit=False,
+                             vecchi_pdf=vecchi_pdf)
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK TO pdf_import')
+            conn.execute('RELEASE pdf_import')
+        else:
+            completati.clear()
+        raise
+    if not esito:
+        conn.execute('ROLLBACK TO pdf_import')
+    conn.execute('RELEASE pdf_import')
+    if esito:
+        completati.append((pdf_path, vecchi_pdf))
+    return esito
+
+
+def _chiudi_blocco(conn, completati, logger):
+    """
+    Committa il blocco e solo dopo rimuove da pdf/ i file elaborati e dalle
+    cartelle clienti i vecchi PDF sostituiti.
+    """
+    conn.commit()
+    for pdf_path, vecchi_pdf in completati:
+        try:
+            pdf_path.unlink()
+        except OSError as e:
+            logger.warning(f"  ! Impossibile rimuovere {pdf_path.name}: {e}")
+        for old_pdf in vecchi_pdf:
+            # Stesso cliente due volte nel blocco: il file puo' essere gia'
+            # rimosso, o essere tornato il PDF attuale del cliente
+            file_pdf = str(old_pdf).replace(str(CLIENTI_DIR.parent) + '/', '')
+            in_uso = conn.execute('SELECT 1 FROM clienti WHERE file_pdf = ?',
+                                  (file_pdf,)).fetchone()
+            if in_uso or not old_pdf.exists():
+                continue
+            try:
+                old_pdf.unlink()
+                logger.info(f"  -> Cancellato vecchio PDF: {old_pdf.name}")
+            except OSError as e:
+                logger.warning(f"  ! Errore cancellazione {old_pdf.name}: {e}")
+    completati.clear()
+
 def importa_tutti_pdf():
     """
     Importa tutti i PDF dalla cartella pdf/.
@@ -902,13 +981,13 @@ def importa_tutti_pdf():
     elaborati = 0
     errori = 0
     lista_errori = []
+    completati = []
     
-    for pdf_path in sorted(pdf_files):
+    for n, pdf_path in enumerate(sorted(pdf_files), 1):
         try:
-            if processa_pdf(pdf_path, conn, logger):
+            if _processa_in_savepoint(pdf_path, conn, logger, completati):
+                # Rimosso dalla cartella pdf/ al commit del blocco
                 elaborati += 1
-                # Rimuovi il file dalla cartella pdf/ dopo elaborazione riuscita
-                pdf_path.unlink()
             else:
                 errori += 1
                 motivo = "Impossibile estrarre dati"
@@ -928,7 +1007,11 @@ def importa_tutti_pdf():
                 logger.warning(f"  ->")
             except:
                 pass
+        
+        if n % PDF_PER_COMMIT == 0:
+            _chiudi_blocco(conn, completati, logger)
     
+    _chiudi_blocco(conn, completati, logger)
     conn.close()
     
     # Scrivi log errori se ce ne sono
@@ -1076,12 +1159,12 @@ def importa_tutti_pdf_con_progress(status_dict):
     
     elaborati = 0
     errori = 0
+    completati = []
     
-    for pdf_path in sorted(pdf_files):
+    for n, pdf_path in enumerate(sorted(pdf_files), 1):
         try:
-            if processa_pdf(pdf_path, conn, logger):
+            if _processa_in_savepoint(pdf_path, conn, logger, completati):
                 elaborati += 1
-                pdf_path.unlink()
             else:
                 errori += 1
                 dest_errore = PDF_ERRORI_DIR / pdf_path.name
@@ -1095,10 +1178,14 @@ def importa_tutti_pdf_con_progress(status_dict):
             except:
                 pass
         
+        if n % PDF_PER_COMMIT == 0:
+            _chiudi_blocco(conn, completati, logger)
+        
         # Aggiorna status per il polling
         status_dict['elaborati'] = elaborati
         status_dict['errori'] = errori
     
+    _chiudi_blocco(conn, completati, logger)
     conn.close()
     
     logger.info("-" * 60)
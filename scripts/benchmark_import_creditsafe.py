@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# BENCHMARK IMPORT CREDITSAFE - Statement SQL per PDF importato
+# ==============================================================================
+# Versione: 1.0.0
+# Data: 2026-10-19
+# Descrizione: Misura quanti statement SQL e quanti COMMIT costa l'import
+#              di un PDF Creditsafe (importa_tutti_pdf), su un DB temporaneo
+#              con clienti sintetici.
+#
+# L'estrazione testo/dati dal PDF e' sostituita da dati sintetici: si misura
+# solo il percorso di scrittura DB (UPDATE cliente, storico, capogruppo,
+# commit). Il DB e le cartelle reali non vengono toccati.
+#
+# USO:
+#   cd ~/gestione_flotta
+#   python3 scripts/benchmark_import_creditsafe.py
+#   python3 scripts/benchmark_import_creditsafe.py --pdf 500
+#
+# RISULTATI DI RIFERIMENTO (200 PDF, 20 campi variati per cliente,
+# import_creditsafe v2.3.2 -> v2.4.0):
+#                          prima    dopo
+#   statement inviati/PDF   31.0     6.0   (storico: 25 INSERT -> 1 executemany)
+#   UPDATE clienti/PDF       3.0     1.0
+#   COMMIT/PDF               3.0     0.06  (un commit ogni PDF_PER_COMMIT file)
+#   durata                  0.54s   0.21s
+#
+# ==============================================================================
+
+import sys
+import time
+import logging
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+from collections import Counter
+
+# ==============================================================================
+# CONFIGURAZIONE
+# ==============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+
+if SCRIPT_DIR.name == 'scripts':
+    BASE_DIR = SCRIPT_DIR.parent
+else:
+    BASE_DIR = SCRIPT_DIR
+
+sys.path.insert(0, str(BASE_DIR))
+
+from app import database, import_creditsafe
+
+# Colonne clienti usate dal percorso di import (schema attuale dopo migrazioni)
+COLONNE_CLIENTI = [
+    'nome_cliente', 'p_iva', 'cod_fiscale', 'numero_registrazione', 'commerciale',
+    'ragione_sociale', 'indirizzo', 'via', 'civico', 'cap', 'citta', 'provincia',
+    'telefono', 'pec', 'forma_giuridica', 'data_costituzione', 'desc_attivita',
+    'codice_ateco', 'desc_ateco', 'codice_sae', 'codice_rae', 'codice_ateco_2007',
+    'desc_ateco_2007', 'capogruppo_nome', 'capogruppo_cf', 'capitale_sociale',
+    'dipendenti', 'score', 'punteggio_rischio', 'credito', 'stato', 'protesti',
+    'importo_protesti', 'anno_bilancio', 'valore_produzione', 'patrimonio_netto',
+    'utile', 'debiti', 'anno_bilancio_prec', 'valore_produzione_prec',
+    'patrimonio_netto_prec', 'utile_prec', 'debiti_prec', 'file_pdf',
+    'data_report_creditsafe', 'data_import_creditsafe', 'data_ultimo_aggiornamento',
+]
+COLONNE_FLAG = ['indirizzo_protetto', 'capogruppo_protetto', 'amministratore_variato']
+
+# Campi variati a ogni import (ognuno genera una riga di storico)
+CAMPI_VARIATI = [
+    'ragione_sociale', 'indirizzo', 'via', 'civico', 'cap', 'citta', 'telefono',
+    'pec', 'desc_attivita', 'codice_ateco', 'score', 'punteggio_rischio',
+    'credito', 'stato', 'protesti', 'anno_bilancio', 'valore_produzione',
+    'patrimonio_netto', 'utile', 'debiti',
+]
+
+
+# ==============================================================================
+# SETUP AMBIENTE TEMPORANEO
+# ==============================================================================
+
+def prepara_db(tmp, n_clienti):
+    """Crea gestionale.db temporaneo con le tabelle usate e clienti sintetici."""
+    database.DB_DIR = tmp / 'db'
+    database.DB_FILE = database.DB_DIR / 'gestionale.db'
+    database.DB_DIR.mkdir(parents=True)
+
+    conn = sqlite3.connect(str(database.DB_FILE))
+    cursor = conn.cursor()
+    colonne = ',\n'.join([f'{c} TEXT' for c in COLONNE_CLIENTI] +
+                          [f'{c} INTEGER DEFAULT 0' for c in COLONNE_FLAG])
+    cursor.execute(f"""
+        CREATE TABLE clienti (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {colonne}
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE storico_modifiche (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabella TEXT, record_id INTEGER, campo_modificato TEXT,
+            valore_precedente TEXT, valore_nuovo TEXT, data_modifica TEXT, origine TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE capogruppo_clienti (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            codice_fiscale TEXT,
+            protetto INTEGER DEFAULT 0,
+            data_inserimento TEXT DEFAULT (datetime('now')),
+            data_modifica TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_clienti_piva ON clienti(p_iva)")
+
+    cursor.executemany("""
+        INSERT INTO clienti (nome_cliente, p_iva, ragione_sociale, data_report_creditsafe)
+        VALUES (?, ?, ?, '2025-01-01')
+    """, [(f'CLIENTE {i}', piva_sintetica(i), f'CLIENTE {i} SRL') for i in range(n_clienti)])
+    conn.commit()
+    conn.close()
+
+
+def piva_sintetica(i):
+    return f'{10000000000 + i:011d}'
+
+
+def dati_sintetici(testo):
+    """Sostituisce estrai_dati_azienda(): il 'testo' e' l'indice cliente."""
+    i = int(testo)
+    dati = {campo: f'{campo.upper()} NUOVO {i}' for campo in CAMPI_VARIATI}
+    dati.update({
+        'p_iva': piva_sintetica(i),
+        'capogruppo_nome': f'HOLDING {i % 10} SPA',
+        'capogruppo_cf': f'{90000000000 + i % 10:011d}',
+        'data_report_creditsafe': '2026-10-01',
+    })
+    return dati
+
+
+def logger_silenzioso():
+    logger = logging.getLogger('benchmark_import_creditsafe')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    return logger
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+
+def esegui(n_pdf):
+    with tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        prepara_db(tmp, n_pdf)
+
+        pdf_dir = tmp / 'pdf'
+        clienti_dir = tmp / 'clienti'
+        pdf_dir.mkdir()
+        for i in range(n_pdf):
+            (pdf_dir / f'{i:06d}.pdf').write_bytes(b'%PDF-1.4 sintetico')
+
+        chiamate = Counter()     # execute/executemany dal codice Python
+        esecuzioni = Counter()   # statement eseguiti dal motore SQLite
+
+        def tipo_sql(sql):
+            return sql.strip().split(None, 1)[0].upper()
+
+        class CursoreTracciato(sqlite3.Cursor):
+            def execute(self, sql, *args):
+                chiamate[tipo_sql(sql)] += 1
+                return super().execute(sql, *args)
+
+            def executemany(self, sql, *args):
+                chiamate[tipo_sql(sql)] += 1
+                return super().executemany(sql, *args)
+
+        class ConnessioneTracciata(sqlite3.Connection):
+            def cursor(self, factory=CursoreTracciato):
+                return super().cursor(factory)
+
+        def get_connection_tracciata():
+            conn = sqlite3.connect(str(database.DB_FILE), factory=ConnessioneTracciata)
+            conn.row_factory = sqlite3.Row
+            conn.set_trace_callback(lambda sql: esecuzioni.update([tipo_sql(sql)]))
+            return conn
+
+        # Sostituzioni: nessun file reale toccato, nessun PDF da leggere
+        import_creditsafe.PDF_DIR = pdf_dir
+        import_creditsafe.CLIENTI_DIR = clienti_dir
+        import_creditsafe.get_connection = get_connection_tracciata
+        import_creditsafe.get_cliente_creditsafe_path = \
+            lambda c: clienti_dir / 'PIVA' / c['p_iva'] / 'creditsafe'
+        import_creditsafe.estrai_testo_da_pdf = lambda path: str(int(Path(path).stem))
+        import_creditsafe.estrai_dati_azienda = dati_sintetici
+        import_creditsafe.setup_logger = lambda nome: logger_silenzioso()
+
+        inizio = time.perf_counter()
+        risultato = import_creditsafe.importa_tutti_pdf()
+        durata = time.perf_counter() - inizio
+
+        conn = sqlite3.connect(str(database.DB_FILE))
+        righe_storico = conn.execute("SELECT COUNT(*) FROM storico_modifiche").fetchone()[0]
+        conn.close()
+
+    return risultato, chiamate, esecuzioni, durata, righe_storico
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark statement SQL import PDF Creditsafe')
+    parser.add_argument('--pdf', type=int, default=200, help='Numero PDF sintetici (default: 200)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  BENCHMARK IMPORT CREDITSAFE")
+    print(f"  PDF sintetici: {args.pdf} | Campi variati per cliente: {len(CAMPI_VARIATI)}")
+    print("=" * 60)
+
+    risultato, chiamate, esecuzioni, durata, righe_storico = esegui(args.pdf)
+    n = max(risultato['elaborati'], 1)
+
+    print(f"\n  Elaborati: {risultato['elaborati']} | Errori: {risultato['errori']}")
+    print(f"  Righe storico_modifiche: {righe_storico}")
+    print(f"  Durata: {durata:.2f}s ({n / durata:.0f} PDF/s)")
+
+    totale = sum(chiamate.values())
+    print(f"\n  Statement inviati (execute/executemany): {totale} ({totale / n:.1f} per PDF)")
+    for tipo, conteggio in chiamate.most_common():
+        print(f"    {tipo:<10} {conteggio:>7}  ({conteggio / n:.2f} per PDF)")
+
+    totale = sum(esecuzioni.values())
+    print(f"\n  Esecuzioni motore SQLite: {totale} ({totale / n:.1f} per PDF)")
+    print(f"    COMMIT     {esecuzioni['COMMIT']:>7}  ({esecuzioni['COMMIT'] / n:.2f} per PDF)")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@
 # USO:
 #   cd ~/gestione_flotta
 #   python3 scripts/creditsafe_esplora.py
+#   python3 scripts/creditsafe_esplora.py --no-cache   (ignora cache risposte)
 #
 # OPERAZIONI:
 # 1. Test autenticazione
@@ -44,6 +45,9 @@ from app.creditsafe_api import CreditsafeAPI
 # Lasciare vuoto per saltare il test ricerca
 PIVA_TEST = ""
 
+# Ignora la cache persistente (le risposte vengono comunque aggiornate)
+BYPASS_CACHE = '--no-cache' in sys.argv
+
 # File output per salvare risultati
 OUTPUT_DIR = BASE_DIR / 'logs'
 OUTPUT_FILE = OUTPUT_DIR / f"creditsafe_esplora_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -72,7 +76,7 @@ def main():
     # --- 1. AUTENTICAZIONE ---
     print("\n[1/5] Test autenticazione...")
     
-    api = CreditsafeAPI(base_dir=BASE_DIR)
+    api = CreditsafeAPI(base_dir=BASE_DIR, usa_cache=True)
     
     try:
         token = api.authenticate()
@@ -128,7 +132,7 @@ def main():
     for country in ['IT', 'XX']:
         print(f"\n  Regole {country}:")
         try:
-            rules = api.get_available_rules(country)
+            rules = api.get_available_rules(country, bypass_cache=BYPASS_CACHE)
             risultati[f'regole_{country}'] = rules
             
             if isinstance(rules, list):
@@ -208,7 +212,7 @@ def main():
         print(f"\n[5/5] Test ricerca azienda (P.IVA: {PIVA_TEST})...")
         
         try:
-            company = api.search_company_by_vat(PIVA_TEST)
+            company = api.search_company_by_vat(PIVA_TEST, bypass_cache=BYPASS_CACHE)
             risultati['test_ricerca'] = company
             
             if company:
@@ -2,18 +2,19 @@
 # ==============================================================================
 # CREDITSAFE POLLING ALERT - Aggiornamento automatico dati clienti
 # ==============================================================================
-# Versione: 1.0.0
-# Data: 2026-02-13
+# Versione: 1.1.2
+# Data: 2026-10-19
 # Descrizione: Legge alert da Creditsafe API e aggiorna dati nel DB
 #
 # OPERAZIONI:
 # 1. Autentica API
 # 2. Scarica eventi non processati dal portfolio
-# 3. Per ogni evento:
-#    a. Salva in clienti_creditsafe_alert
-#    b. Aggiorna dati cliente in base al rule_code
+# 3. Risolve in blocco connect_id -> cliente (una query)
+# 4. In un'unica transazione:
+#    a. Salva alert in clienti_creditsafe_alert
+#    b. Aggiorna dati cliente in base al rule_code (un UPDATE per cliente)
 #    c. Registra in storico_modifiche
-#    d. Marca evento come processato su API
+# 5. Marca gli eventi come processati su API (limitato da RATE_LIMIT_DELAY)
 #
 # REGOLE GESTITE:
 # 102  = Credit Limit    -> aggiorna clienti.credito
@@ -81,96 +82,60 @@ logger = logging.getLogger(__name__)
 
 
 # ==============================================================================
-# MAPPING REGOLE -> AZIONI DB
+# MAPPING REGOLE -> EFFETTI DB
 # ==============================================================================
+# Ogni regola restituisce la lista di effetti sul cliente:
+#   (campo, nuovo_valore, registra_in_storico)
+# Gli effetti vengono accumulati in memoria e scritti in blocco
+# (vedi applica_effetti_db), non eseguiti evento per evento.
 
-def applica_regola_102(conn, cliente_id, old_value, new_value):
+def effetti_regola_102(old_value, new_value):
     """Credit Limit: aggiorna clienti.credito"""
-    registra_e_aggiorna(conn, cliente_id, 'credito', old_value, new_value)
+    return [('credito', new_value, True)]
 
 
-def applica_regola_101(conn, cliente_id, old_value, new_value):
+def effetti_regola_101(old_value, new_value):
     """International Score: aggiorna clienti.score"""
-    registra_e_aggiorna(conn, cliente_id, 'score', old_value, new_value)
+    return [('score', new_value, True)]
 
 
-def applica_regola_1404(conn, cliente_id, old_value, new_value):
+def effetti_regola_1404(old_value, new_value):
     """Protesti: aggiorna clienti.protesti"""
-    registra_e_aggiorna(conn, cliente_id, 'protesti', old_value, new_value)
+    return [('protesti', new_value, True)]
 
 
-def applica_regola_1406(conn, cliente_id, old_value, new_value):
+def effetti_regola_1406(old_value, new_value):
     """Company Status: aggiorna clienti.stato"""
-    registra_e_aggiorna(conn, cliente_id, 'stato', old_value, new_value)
+    return [('stato', new_value, True)]
 
 
-def applica_regola_105(conn, cliente_id, old_value, new_value):
+def effetti_regola_105(old_value, new_value):
     """
     Address: aggiorna indirizzo e imposta indirizzo_protetto = 1.
     Creditsafe e' la fonte di verita' per l'indirizzo.
     Il new_value contiene l'indirizzo completo come stringa.
     """
-    cursor = conn.cursor()
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Recupera indirizzo attuale
-    cursor.execute('SELECT indirizzo FROM clienti WHERE id = ?', (cliente_id,))
-    row = cursor.fetchone()
-    valore_precedente = row[0] if row else ''
-    
-    # Aggiorna indirizzo + flag protetto
-    cursor.execute("""
-        UPDATE clienti 
-        SET indirizzo = ?,
-            indirizzo_protetto = 1,
-            creditsafe_api_sync_at = ?
-        WHERE id = ?
-    """, (new_value, now, cliente_id))
-    
-    # Storico
-    cursor.execute("""
-        INSERT INTO storico_modifiche 
-        (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, ('clienti', cliente_id, 'indirizzo', str(valore_precedente), str(new_value), now, ORIGINE_STORICO))
-    
-    logger.info(f"  Indirizzo aggiornato + indirizzo_protetto=1")
+    return [('indirizzo', new_value, True),
+            ('indirizzo_protetto', 1, False)]
 
 
-def applica_regola_107(conn, cliente_id, old_value, new_value):
+def effetti_regola_107(old_value, new_value):
     """
     Directors: imposta flag amministratore_variato = 1.
     L'alert non contiene i nuovi dati, solo il segnale di cambiamento.
     Il flag si resetta quando si importa un nuovo PDF Creditsafe.
     """
-    cursor = conn.cursor()
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    cursor.execute("""
-        UPDATE clienti 
-        SET amministratore_variato = 1,
-            creditsafe_api_sync_at = ?
-        WHERE id = ?
-    """, (now, cliente_id))
-    
-    # Storico
-    cursor.execute("""
-        INSERT INTO storico_modifiche 
-        (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, ('clienti', cliente_id, 'amministratore_variato', '0', '1', now, ORIGINE_STORICO))
-    
-    logger.info(f"  Flag amministratore_variato = 1")
+    return [('amministratore_variato', 1, True)]
 
 
 # Mapping rule_code -> funzione
 REGOLE_HANDLER = {
-    102:  applica_regola_102,
-    101:  applica_regola_101,
-    1404: applica_regola_1404,
-    1406: applica_regola_1406,
-    105:  applica_regola_105,
-    107:  applica_regola_107,
+    102:  effetti_regola_102,
+    101:  effetti_regola_101,
+    1404: effetti_regola_1404,
+    1406: effetti_regola_1406,
+    105:  effetti_regola_105,
+    107:  effetti_regola_107,
 }
 
 REGOLE_NOMI = {
@@ -182,70 +147,83 @@ REGOLE_NOMI = {
     107:  'Directors',
 }
 
+# Campi clienti toccati dalle regole (letti in blocco prima di applicarle)
+CAMPI_REGOLE = ('credito', 'score', 'protesti', 'stato',
+                'indirizzo', 'indirizzo_protetto', 'amministratore_variato')
+
+# Limite parametri per singola query IN (SQLite: 999)
+DIMENSIONE_BLOCCO_IN = 500
+
 
 # ==============================================================================
 # FUNZIONI DB
 # ==============================================================================
 
-def registra_e_aggiorna(conn, cliente_id, campo, old_value, new_value):
+def _blocchi(valori, dimensione=DIMENSIONE_BLOCCO_IN):
+    """Divide una lista in blocchi per le query IN (...)."""
+    valori = list(valori)
+    for i in range(0, len(valori), dimensione):
+        yield valori[i:i + dimensione]
+
+
+def trova_clienti_per_connect_id(conn, connect_ids):
     """
-    Aggiorna un singolo campo del cliente e registra nello storico.
-    Usata per regole semplici (102, 101, 1404, 1406).
+    Risolve in blocco connect_id -> cliente con i valori attuali dei
+    campi toccati dalle regole.
+    
+    Returns:
+        dict: {connect_id: {'id', 'nome_cliente', <campi CAMPI_REGOLE>}}
     """
     cursor = conn.cursor()
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Recupera valore attuale dal DB (potrebbe differire da old_value dell'alert)
-    cursor.execute(f'SELECT {campo} FROM clienti WHERE id = ?', (cliente_id,))
-    row = cursor.fetchone()
-    valore_db_attuale = row[0] if row else ''
+    colonne = ', '.join(CAMPI_REGOLE)
+    risultato = {}
+    
+    for blocco in _blocchi(set(connect_ids)):
+        placeholders = ','.join('?' for _ in blocco)
+        cursor.execute(f"""
+            SELECT connect_id, id, nome_cliente, {colonne}
+            FROM clienti
+            WHERE connect_id IN ({placeholders})
+        """, blocco)
+        for row in cursor.fetchall():
+            connect_id, cliente_id, nome = row[0], row[1], row[2]
+            dati = dict(zip(CAMPI_REGOLE, row[3:]))
+            dati['id'] = cliente_id
+            dati['nome_cliente'] = nome
+            risultato[connect_id] = dati
+    
+    return risultato
+
+
+def trova_eventi_gia_salvati(conn, event_ids):
+    """
+    Eventi gia' presenti in clienti_creditsafe_alert.
+    Succede se un run precedente ha scritto il DB ma non e' riuscito
+    a marcare gli eventi su API: vanno solo marcati, non riapplicati.
     
-    # Aggiorna
-    cursor.execute(f"""
-        UPDATE clienti 
-        SET {campo} = ?,
-            creditsafe_api_sync_at = ?
-        WHERE id = ?
-    """, (new_value, now, cliente_id))
+    Returns:
+        set: event_id gia' salvati
+    """
+    cursor = conn.cursor()
+    salvati = set()
     
-    # Storico (usa il valore reale dal DB, non dall'alert)
-    cursor.execute("""
-        INSERT INTO storico_modifiche 
-        (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, ('clienti', cliente_id, campo, str(valore_db_attuale), str(new_value), now, ORIGINE_STORICO))
+    for blocco in _blocchi(set(event_ids)):
+        placeholders = ','.join('?' for _ in blocco)
+        cursor.execute(f"""
+            SELECT event_id FROM clienti_creditsafe_alert
+            WHERE event_id IN ({placeholders})
+        """, blocco)
+        salvati.update(str(r[0]) for r in cursor.fetchall())
     
-    logger.info(f"  {campo}: {valore_db_attuale} -> {new_value}")
-
-
-def trova_cliente_per_connect_id(conn, connect_id):
-    """Trova cliente_id dal connect_id."""
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, nome_cliente FROM clienti WHERE connect_id = ?', (connect_id,))
-    return cursor.fetchone()
+    return salvati
 
 
-def salva_alert_db(conn, cliente_id, evento, dry_run=False):
-    """
-    Salva evento nella tabella clienti_creditsafe_alert.
-    """
-    if dry_run:
-        return
-    
-    cursor = conn.cursor()
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Tipo alert leggibile
+def riga_alert(cliente_id, evento, now):
+    """Tupla parametri per INSERT in clienti_creditsafe_alert."""
     rule_code = evento.get('ruleCode', 0)
     tipo_alert = REGOLE_NOMI.get(rule_code, f'Regola {rule_code}')
     
-    cursor.execute("""
-        INSERT INTO clienti_creditsafe_alert 
-        (cliente_id, tipo_alert, valore, data_rilevazione, fonte,
-         connect_id, event_id, event_date, rule_code, rule_description,
-         old_value, new_value, is_processed, processed_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-    """, (
+    return (
         cliente_id,
         tipo_alert,
         evento.get('newValue', ''),
@@ -259,16 +237,85 @@ def salva_alert_db(conn, cliente_id, evento, dry_run=False):
         evento.get('oldValue', ''),
         evento.get('newValue', ''),
         now
-    ))
+    )
+
+
+def applica_effetti_db(conn, righe_alert, modifiche, righe_storico, now):
+    """
+    Scrive tutti gli effetti del polling in un'unica transazione.
+    
+    Args:
+        righe_alert: tuple per clienti_creditsafe_alert
+        modifiche: {cliente_id: {campo: valore}} (valore finale per campo)
+        righe_storico: tuple per storico_modifiche
+        now: timestamp sync
+    
+    In caso di errore la transazione viene annullata per intero.
+    """
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany("""
+            INSERT INTO clienti_creditsafe_alert 
+            (cliente_id, tipo_alert, valore, data_rilevazione, fonte,
+             connect_id, event_id, event_date, rule_code, rule_description,
+             old_value, new_value, is_processed, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+        """, righe_alert)
+        
+        # Un solo UPDATE per cliente, raggruppati per insieme di campi
+        # cosi' ogni gruppo diventa un executemany con lo stesso SQL
+        gruppi = {}
+        for cliente_id, campi in modifiche.items():
+            chiave = tuple(sorted(campi))
+            valori = tuple(campi[c] for c in chiave)
+            gruppi.setdefault(chiave, []).append(valori + (now, cliente_id))
+        
+        for campi, parametri in gruppi.items():
+            set_sql = ', '.join(f'{c} = ?' for c in campi)
+            cursor.executemany(f"""
+                UPDATE clienti 
+                SET {set_sql},
+                    creditsafe_api_sync_at = ?
+                WHERE id = ?
+            """, parametri)
+        
+        cursor.executemany("""
+            INSERT INTO storico_modifiche 
+            (tabella, record_id, campo_modificato, valore_precedente, valore_nuovo, data_modifica, origine)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, righe_storico)
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 # ==============================================================================
 # POLLING PRINCIPALE
 # ==============================================================================
 
+def _ordine_cronologico(evento):
+    """Chiave ordinamento: data evento, poi ID numerico se possibile."""
+    event_id = str(evento.get('eventId', evento.get('id', '')))
+    # eventDate puo' arrivare null: None non si confronta con le stringhe
+    return (evento.get('eventDate') or '', int(event_id) if event_id.isdigit() else 0, event_id)
+
+
 def esegui_polling(api, conn, dry_run=False):
     """
-    Scarica e processa tutti gli eventi non processati.
+    Scarica e processa tutti gli eventi non processati, per fasi:
+    
+    1. Scarica eventi non processati
+    2. Risolve in blocco connect_id -> cliente (una query)
+    3. Calcola in memoria gli effetti delle regole, in ordine cronologico
+    4. Scrive alert, UPDATE clienti e storico in un'unica transazione
+    5. Marca gli eventi come processati su API (uno alla volta, rate limit)
+    
+    Se la fase 4 fallisce nessun evento viene marcato. Se la fase 5
+    fallisce a meta' il DB resta coerente: al run successivo gli eventi
+    gia' salvati vengono solo marcati, non riapplicati.
     
     Returns:
         tuple: (processati, errori, sconosciuti)
@@ -278,7 +325,7 @@ def esegui_polling(api, conn, dry_run=False):
     print("[POLLING] Scaricamento eventi non processati")
     print("=" * 60)
     
-    # Scarica tutti gli eventi non processati
+    # ---- FASE 1: Scarica tutti gli eventi non processati ----
     try:
         eventi = api.get_all_notification_events(
             portfolio_id=PORTFOLIO_ID,
@@ -294,15 +341,30 @@ def esegui_polling(api, conn, dry_run=False):
     
     logger.info(f"Trovati {len(eventi)} eventi da processare")
     
+    # L'API restituisce gli eventi dal piu' recente: applicandoli in ordine
+    # cronologico l'ultimo valore scritto e' quello dell'evento piu' recente
+    eventi = sorted(eventi, key=_ordine_cronologico)
+    
+    # ---- FASE 2: Risoluzione clienti in blocco ----
+    clienti = trova_clienti_per_connect_id(conn, (e.get('companyId', '') for e in eventi))
+    gia_salvati = trova_eventi_gia_salvati(
+        conn, (str(e.get('eventId', e.get('id', ''))) for e in eventi)
+    )
+    
+    # ---- FASE 3: Calcolo effetti in memoria ----
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    righe_alert = []
+    righe_storico = []
+    modifiche = {}
+    da_marcare = []
+    
     processati = 0
-    errori = 0
     sconosciuti = 0
     
     for i, evento in enumerate(eventi, 1):
-        # Estrai dati evento
         connect_id = evento.get('companyId', '')
         rule_code = evento.get('ruleCode', 0)
-        event_id = evento.get('eventId', str(evento.get('id', '')))
+        event_id = str(evento.get('eventId', evento.get('id', '')))
         old_value = evento.get('oldValue', '')
         new_value = evento.get('newValue', '')
         rule_name = REGOLE_NOMI.get(rule_code, f'Regola {rule_code}')
@@ -311,57 +373,68 @@ def esegui_polling(api, conn, dry_run=False):
         logger.info(f"{prefix} Evento: {rule_name} (code={rule_code}) per {connect_id}")
         logger.info(f"  old={old_value} -> new={new_value}")
         
-        # Trova cliente nel DB
-        cliente = trova_cliente_per_connect_id(conn, connect_id)
+        # Marca come processato su API anche se non trovato (evita loop)
+        da_marcare.append(event_id)
         
+        if event_id in gia_salvati:
+            logger.info(f"{prefix} [SKIP] Gia' salvato in un run precedente, solo marcatura API")
+            continue
+        
+        cliente = clienti.get(connect_id)
         if not cliente:
             logger.warning(f"{prefix} [SKIP] Cliente non trovato per connect_id: {connect_id}")
             sconosciuti += 1
-            # Marca come processato su API anche se non trovato (evita loop)
-            if not dry_run:
-                try:
-                    api.mark_event_processed(event_id)
-                except Exception:
-                    pass
             continue
         
-        cliente_id, nome_cliente = cliente
-        logger.info(f"  Cliente: {nome_cliente} (id={cliente_id})")
+        cliente_id = cliente['id']
+        logger.info(f"  Cliente: {cliente['nome_cliente']} (id={cliente_id})")
         
-        if dry_run:
-            logger.info(f"{prefix} [DRY] Aggiornerei {rule_name} per {nome_cliente}")
+        righe_alert.append(riga_alert(cliente_id, evento, now))
+        
+        handler = REGOLE_HANDLER.get(rule_code)
+        if not handler:
+            logger.warning(f"  Regola {rule_code} non gestita, solo salvato alert")
             processati += 1
             continue
         
-        try:
-            # A) Salva alert nel DB
-            salva_alert_db(conn, cliente_id, evento)
-            
-            # B) Applica modifica al DB
-            handler = REGOLE_HANDLER.get(rule_code)
-            if handler:
-                handler(conn, cliente_id, old_value, new_value)
-            else:
-                logger.warning(f"  Regola {rule_code} non gestita, solo salvato alert")
-            
-            # C) Commit modifiche
-            conn.commit()
-            
-            # D) Marca come processato su API
-            try:
-                api.mark_event_processed(event_id)
-            except Exception as e:
-                logger.warning(f"  Errore mark_processed su API (dati DB gia' aggiornati): {e}")
-            
-            processati += 1
-            logger.info(f"{prefix} [OK] Processato")
-            
-        except Exception as e:
-            logger.error(f"{prefix} [ERR] Errore processamento: {e}")
-            conn.rollback()
-            errori += 1
-    
-    return processati, errori, sconosciuti
+        for campo, valore, registra in handler(old_value, new_value):
+            # Valore reale dal DB (o dall'evento precedente dello stesso run),
+            # non old_value dell'alert
+            precedente = cliente.get(campo)
+            cliente[campo] = valore
+            modifiche.setdefault(cliente_id, {})[campo] = valore
+            if registra:
+                righe_storico.append((
+                    'clienti', cliente_id, campo,
+                    str(precedente if precedente is not None else ''),
+                    str(valore), now, ORIGINE_STORICO
+                ))
+                logger.info(f"  {campo}: {precedente} -> {valore}")
+        
+        processati += 1
+    
+    if dry_run:
+        logger.info(f"[DRY] Scriverei {len(righe_alert)} alert, "
+                    f"{len(modifiche)} clienti aggiornati, {len(righe_storico)} righe storico")
+        logger.info(f"[DRY] Marcherei {len(da_marcare)} eventi su API")
+        return processati, 0, sconosciuti
+    
+    # ---- FASE 4: Scrittura in un'unica transazione ----
+    try:
+        applica_effetti_db(conn, righe_alert, modifiche, righe_storico, now)
+        logger.info(f"[OK] DB aggiornato: {len(righe_alert)} alert, "
+                    f"{len(modifiche)} clienti, {len(righe_storico)} righe storico")
+    except Exception as e:
+        logger.error(f"[ERR] Scrittura DB annullata, nessun evento marcato: {e}")
+        return 0, processati, sconosciuti
+    
+    # ---- FASE 5: Marcatura eventi su API ----
+    marcati, falliti = api.mark_events_processed(da_marcare)
+    for event_id, errore in falliti.items():
+        logger.warning(f"  Errore mark_processed evento {event_id} "
+                       f"(dati DB gia' aggiornati, verra' marcato al prossimo run): {errore}")
+    
+    return processati, 0, sconosciuti
 
 
 # ==============================================================================
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# CREDITSAFE SIMULATORE - Server locale che imita Creditsafe Connect API
+# ==============================================================================
+# Versione: 1.0.1
+# Data: 2026-10-19
+# Descrizione: Stand-in locale dell'API Creditsafe per test di carico e
+#              regressione di creditsafe_api.py, creditsafe_sync_clienti.py
+#              e creditsafe_polling_alert.py senza consumare quota reale.
+#
+# ENDPOINT IMPLEMENTATI (prefisso /v1):
+#   POST   /authenticate
+#   GET    /access
+#   GET    /companies?countries=IT&vatNo=...
+#   GET    /monitoring/portfolios
+#   POST   /monitoring/portfolios
+#   GET    /monitoring/portfolios/{id}/companies
+#   POST   /monitoring/portfolios/{id}/companies
+#   DELETE /monitoring/portfolios/{id}/companies/{connect_id}
+#   GET    /monitoring/eventRules/{paese}
+#   GET    /monitoring/portfolios/{id}/eventRules
+#   PUT    /monitoring/portfolios/{id}/eventRules/{paese}
+#   GET    /monitoring/notificationEvents
+#   PATCH  /monitoring/notificationEvents/{event_id}
+#   GET    /monitoring/companies/{connect_id}/events
+#
+# ENDPOINT DI CONTROLLO (non esistono sull'API reale):
+#   GET    /_sim/stats          -> contatori richieste, errori iniettati
+#   POST   /_sim/eventi?n=100   -> genera n eventi sintetici
+#   POST   /_sim/reset          -> azzera contatori
+#
+# CARATTERISTICHE:
+# - Latenza configurabile (fissa + jitter casuale)
+# - Iniezione errori 429 / 5xx con probabilita' configurabile
+# - Rate limit lato server (429 se richieste troppo ravvicinate)
+# - Scadenza token configurabile (per testare il rinnovo su 401)
+# - Aziende sintetiche deterministiche per P.IVA (quota "non trovate")
+# - Eventi sintetici sulle aziende del portfolio
+# - Portfolio precaricabile da copia di gestionale.db (connect_id)
+#
+# USO:
+#   cd ~/gestione_flotta
+#   python3 scripts/creditsafe_simulatore.py --porta 8765 --latenza-ms 80 \
+#       --errori-429 0.02 --errori-5xx 0.01 --eventi 2000
+#
+#   # In un altro terminale, puntare gli script al simulatore:
+#   export CREDITSAFE_API_BASE_URL=http://127.0.0.1:8765/v1
+#   python3 scripts/creditsafe_sync_clienti.py
+#   python3 scripts/creditsafe_polling_alert.py
+#
+# Le credenziali non vengono verificate: basta un file
+# account_esterni/Credenziali_api_creditsafe.txt con formato valido.
+#
+# ==============================================================================
+
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# ==============================================================================
+# CONFIGURAZIONE
+# ==============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+
+if SCRIPT_DIR.name == 'scripts':
+    BASE_DIR = SCRIPT_DIR.parent
+else:
+    BASE_DIR = SCRIPT_DIR
+
+PREFISSO = '/v1'
+
+# Portfolio reale usato dagli script (creato all'avvio)
+PORTFOLIO_DEFAULT = '1762584'
+
+# Regole monitorate (stessi codici di creditsafe_polling_alert.py)
+REGOLE_SIMULATE = {
+    101:  'International Score',
+    102:  'Credit Limit',
+    1404: 'Protesti',
+    1406: 'Company Status',
+    105:  'Address',
+    107:  'Directors',
+}
+
+STATI_AZIENDA = ['Active', 'Active - Insolvency', 'Dissolved', 'Liquidation']
+BANDE_SCORE = ['A', 'B', 'C', 'D', 'E']
+
+
+# ==============================================================================
+# STATO SIMULATO
+# ==============================================================================
+
+class StatoSimulatore:
+    """
+    Stato in memoria condiviso da tutti i thread del server.
+    Ogni accesso passa da self.lock.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.rng = random.Random(args.seed)
+
+        self.tokens = {}                # token -> scadenza (epoch)
+        self.portfolios = {}            # id -> {'name', 'isDefault'}
+        self.aziende_portfolio = {}     # id -> {connect_id: dati}
+        self.regole = {}                # id -> {paese: [regole]}
+        self.eventi = {}                # event_id -> evento
+        self.prossimo_evento = 1
+        self.prossimo_portfolio = 9000001
+        self.ultima_richiesta = 0.0
+
+        self.contatori = {}
+        self.errori_iniettati = {'429': 0, '5xx': 0, 'rate_limit': 0}
+        self.avvio = time.time()
+
+        self.portfolios[PORTFOLIO_DEFAULT] = {'name': 'Gestione Flotta', 'isDefault': True}
+        self.aziende_portfolio[PORTFOLIO_DEFAULT] = {}
+
+    # ------------------------------------------------------------------
+    # Aziende sintetiche
+    # ------------------------------------------------------------------
+
+    def azienda_da_piva(self, piva):
+        """
+        Azienda sintetica deterministica per P.IVA.
+        La stessa P.IVA restituisce sempre lo stesso esito tra riavvii.
+        """
+        h = int(hashlib.sha1(piva.encode('utf-8')).hexdigest(), 16)
+        if (h % 1000) / 1000.0 < self.args.non_trovate:
+            return None
+        return {
+            'id': f'IT001-X-{piva}',
+            'country': 'IT',
+            'regNo': piva,
+            'vatNo': [piva],
+            'name': f'AZIENDA SIMULATA {piva[-5:]} SRL',
+            'address': {'simpleValue': f'VIA SIMULATA {h % 200 + 1}, MILANO'},
+            'status': 'Active',
+            'type': 'Ltd',
+        }
+
+    # ------------------------------------------------------------------
+    # Eventi sintetici
+    # ------------------------------------------------------------------
+
+    def _valori_regola(self, rule_code):
+        """Coppia (old, new) plausibile per la regola."""
+        r = self.rng
+        if rule_code == 101:
+            a, b = r.sample(BANDE_SCORE, 2)
+            return a, b
+        if rule_code == 102:
+            old = r.randrange(1000, 500000, 500)
+            return str(old), str(max(0, old + r.randrange(-old // 2, old // 2 + 1, 500)))
+        if rule_code == 1404:
+            return '0', str(r.randint(1, 5))
+        if rule_code == 1406:
+            a, b = r.sample(STATI_AZIENDA, 2)
+            return a, b
+        if rule_code == 105:
+            return (f'VIA VECCHIA {r.randint(1, 200)}, MILANO',
+                    f'VIA NUOVA {r.randint(1, 200)}, BRESCIA')
+        return '', ''
+
+    def genera_eventi(self, n, portfolio_id=PORTFOLIO_DEFAULT):
+        """
+        Genera n eventi non processati sulle aziende del portfolio.
+        Se il portfolio e' vuoto crea aziende sintetiche al volo.
+        """
+        with self.lock:
+            aziende = self.aziende_portfolio.setdefault(portfolio_id, {})
+            if not aziende:
+                for _ in range(max(1, min(n, 500))):
+                    piva = f'{self.rng.randrange(10**10, 10**11):011d}'
+                    cid = f'IT001-X-{piva}'
+                    aziende[cid] = {'id': cid, 'personalReference': ''}
+            connect_ids = list(aziende.keys())
+            codici = list(REGOLE_SIMULATE.keys())
+            oggi = datetime.now()
+
+            for _ in range(n):
+                rule_code = self.rng.choice(codici)
+                old_value, new_value = self._valori_regola(rule_code)
+                event_id = str(self.prossimo_evento)
+                self.prossimo_evento += 1
+                data_evento = oggi - timedelta(minutes=self.rng.randint(0, 7 * 24 * 60))
+                self.eventi[event_id] = {
+                    'eventId': event_id,
+                    'companyId': self.rng.choice(connect_ids),
+                    'portfolioId': portfolio_id,
+                    'ruleCode': rule_code,
+                    'ruleName': REGOLE_SIMULATE[rule_code],
+                    'eventDate': data_evento.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'oldValue': old_value,
+                    'newValue': new_value,
+                    'isProcessed': False,
+                }
+            return n
+
+    def carica_da_db(self, db_path):
+        """Precarica il portfolio con i connect_id presenti in gestionale.db."""
+        conn = sqlite3.connect(str(db_path))
+        try:
+            righe = conn.execute(
+                "SELECT id, connect_id FROM clienti "
+                "WHERE connect_id IS NOT NULL AND connect_id != ''"
+            ).fetchall()
+        finally:
+            conn.close()
+        aziende = self.aziende_portfolio[PORTFOLIO_DEFAULT]
+        for cliente_id, connect_id in righe:
+            aziende[connect_id] = {'id': connect_id, 'personalReference': str(cliente_id)}
+        return len(righe)
+
+    # ------------------------------------------------------------------
+    # Statistiche
+    # ------------------------------------------------------------------
+
+    def conta(self, chiave):
+        with self.lock:
+            self.contatori[chiave] = self.contatori.get(chiave, 0) + 1
+
+    def statistiche(self):
+        with self.lock:
+            totale = sum(self.contatori.values())
+            durata = max(time.time() - self.avvio, 1e-9)
+            return {
+                'richieste_totali': totale,
+                'richieste_al_secondo': round(totale / durata, 2),
+                'per_endpoint': dict(sorted(self.contatori.items())),
+                'errori_iniettati': dict(self.errori_iniettati),
+                'eventi_totali': len(self.eventi),
+                'eventi_non_processati': sum(1 for e in self.eventi.values() if not e['isProcessed']),
+                'aziende_per_portfolio': {k: len(v) for k, v in self.aziende_portfolio.items()},
+            }
+
+    def reset_statistiche(self):
+        with self.lock:
+            self.contatori = {}
+            self.errori_iniettati = {'429': 0, '5xx': 0, 'rate_limit': 0}
+            self.avvio = time.time()
+
+
+# ==============================================================================
+# HANDLER HTTP
+# ==============================================================================
+
+# (metodo, regex path senza prefisso) -> nome metodo handler
+ROTTE = [
+    ('POST',   r'/authenticate$',                                       'h_authenticate'),
+    ('GET',    r'/access$',                                             'h_access'),
+    ('GET',    r'/companies$',                                          'h_search_company'),
+    ('GET',    r'/monitoring/portfolios$',                              'h_list_portfolios'),
+    ('POST',   r'/monitoring/portfolios$',                              'h_create_portfolio'),
+    ('GET',    r'/monitoring/portfolios/(?P<pid>[^/]+)/companies$',     'h_list_companies'),
+    ('POST',   r'/monitoring/portfolios/(?P<pid>[^/]+)/companies$',     'h_add_company'),
+    ('DELETE', r'/monitoring/portfolios/(?P<pid>[^/]+)/companies/(?P<cid>[^/]+)$', 'h_remove_company'),
+    ('GET',    r'/monitoring/eventRules/(?P<paese>[^/]+)$',             'h_available_rules'),
+    ('GET',    r'/monitoring/portfolios/(?P<pid>[^/]+)/eventRules$',    'h_portfolio_rules'),
+    ('PUT',    r'/monitoring/portfolios/(?P<pid>[^/]+)/eventRules/(?P<paese>[^/]+)$', 'h_set_rules'),
+    ('GET',    r'/monitoring/notificationEvents$',                      'h_list_events'),
+    ('PATCH',  r'/monitoring/notificationEvents/(?P<eid>[^/]+)$',       'h_mark_processed'),
+    ('GET',    r'/monitoring/companies/(?P<cid>[^/]+)/events$',         'h_company_events'),
+]
+ROTTE = [(m, re.compile(p), h) for m, p, h in ROTTE]
+
+
+class SimulatoreHandler(BaseHTTPRequestHandler):
+    """Handler unico: instrada su ROTTE dopo latenza e iniezione errori."""
+
+    stato = None        # impostato da avvia_server()
+    protocol_version = 'HTTP/1.1'
+
+    # Silenzia il log standard per riga (troppo rumoroso sotto carico)
+    def log_message(self, fmt, *args):
+        if self.stato.args.verbose:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        self._gestisci('GET')
+
+    def do_POST(self):
+        self._gestisci('POST')
+
+    def do_PUT(self):
+        self._gestisci('PUT')
+
+    def do_PATCH(self):
+        self._gestisci('PATCH')
+
+    def do_DELETE(self):
+        self._gestisci('DELETE')
+
+    # ------------------------------------------------------------------
+    # Infrastruttura
+    # ------------------------------------------------------------------
+
+    def _rispondi(self, status, body=None, headers=None):
+        dati = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dati)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if dati:
+            self.wfile.write(dati)
+
+    def _leggi_json(self):
+        lunghezza = int(self.headers.get('Content-Length') or 0)
+        if not lunghezza:
+            return None
+        try:
+            return json.loads(self.rfile.read(lunghezza).decode('utf-8'))
+        except ValueError:
+            return None
+
+    def _token_valido(self):
+        auth = self.headers.get('Authorization', '')
+        if not auth.startswith('Bearer '):
+            return False
+        token = auth[len('Bearer '):]
+        with self.stato.lock:
+            scadenza = self.stato.tokens.get(token)
+        return scadenza is not None and time.time() < scadenza
+
+    def _inietta_errore(self):
+        """
+        Ritorna True se ha gia' risposto con un errore simulato.
+        Ordine: rate limit server -> 429 casuale -> 5xx casuale.
+        """
+        args = self.stato.args
+        with self.stato.lock:
+            adesso = time.time()
+            troppo_presto = (args.intervallo_minimo > 0 and
+                             adesso - self.stato.ultima_richiesta < args.intervallo_minimo)
+            self.stato.ultima_richiesta = adesso
+            estrazione = self.stato.rng.random()
+
+            if troppo_presto:
+                self.stato.errori_iniettati['rate_limit'] += 1
+                tipo = 'rate_limit'
+            elif estrazione < args.errori_429:
+                self.stato.errori_iniettati['429'] += 1
+                tipo = '429'
+            elif estrazione < args.errori_429 + args.errori_5xx:
+                self.stato.errori_iniettati['5xx'] += 1
+                tipo = '5xx'
+            else:
+                return False
+
+        if tipo in ('rate_limit', '429'):
+            self._rispondi(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+        else:
+            status = self.stato.rng.choice((500, 502, 503))
+            self._rispondi(status, {'message': 'Simulated server error'})
+        return True
+
+    def _gestisci(self, metodo):
+        url = urlparse(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path
+
+        # Endpoint di controllo: mai ritardati ne' in errore
+        if path.startswith('/_sim/'):
+            return self._controllo(metodo, path)
+
+        if not path.startswith(PREFISSO):
+            return self._rispondi(404, {'message': 'Not found'})
+        path = path[len(PREFISSO):]
+
+        for m, regex, nome in ROTTE:
+            match = regex.match(path)
+            if m == metodo and match:
+                break
+        else:
+            self.stato.conta('non_simulato')
+            return self._rispondi(404, {'message': f'Endpoint non simulato: {metodo} {path}'})
+
+        self.stato.conta(nome[2:])
+
+        # Latenza
+        args = self.stato.args
+        if args.latenza_ms or args.jitter_ms:
+            with self.stato.lock:
+                jitter = self.stato.rng.uniform(0, args.jitter_ms)
+            time.sleep((args.latenza_ms + jitter) / 1000.0)
+
+        if self._inietta_errore():
+            return
+
+        if nome != 'h_authenticate' and not self._token_valido():
+            return self._rispondi(401, {'message': 'Unauthorized'})
+
+        try:
+            getattr(self, nome)(**match.groupdict())
+        except Exception as e:
+            self._rispondi(500, {'message': f'Errore simulatore: {e}'})
+
+    def _controllo(self, metodo, path):
+        if metodo == 'GET' and path == '/_sim/stats':
+            return self._rispondi(200, self.stato.statistiche())
+        if metodo == 'POST' and path == '/_sim/eventi':
+            n = int(self.query.get('n', 100))
+            pid = self.query.get('portfolioId', PORTFOLIO_DEFAULT)
+            return self._rispondi(200, {'generati': self.stato.genera_eventi(n, pid)})
+        if metodo == 'POST' and path == '/_sim/reset':
+            self.stato.reset_statistiche()
+            return self._rispondi(200, {'reset': True})
+        return self._rispondi(404, {'message': 'Not found'})
+
+    # ------------------------------------------------------------------
+    # Endpoint API
+    # ------------------------------------------------------------------
+
+    def h_authenticate(self):
+        body = self._leggi_json() or {}
+        if not body.get('username') or not body.get('password'):
+            return self._rispondi(401, {'message': 'Invalid credentials'})
+        token = hashlib.sha256(f'{body["username"]}{time.time()}'.encode()).hexdigest()
+        with self.stato.lock:
+            self.stato.tokens[token] = time.time() + self.stato.args.durata_token
+        self._rispondi(200, {'token': token})
+
+    def h_access(self):
+        self._rispondi(200, {
+            'countryAccess': {'creditsafeConnectOnlineReports': [{'countryCode': 'IT'}]},
+            'monitoring': {'limit': 2000, 'used': sum(len(v) for v in self.stato.aziende_portfolio.values())},
+            'simulatore': True,
+        })
+
+    def h_search_company(self):
+        piva = self.query.get('vatNo', '')
+        azienda = self.stato.azienda_da_piva(piva) if piva else None
+        self._rispondi(200, {'totalSize': 1 if azienda else 0,
+                             'companies': [azienda] if azienda else []})
+
+    def h_list_portfolios(self):
+        with self.stato.lock:
+            lista = [{'portfolioId': pid, 'id': pid, **dati}
+                     for pid, dati in self.stato.portfolios.items()]
+        self._rispondi(200, {'portfolios': lista, 'totalCount': len(lista)})
+
+    def h_create_portfolio(self):
+        body = self._leggi_json() or {}
+        with self.stato.lock:
+            pid = str(self.stato.prossimo_portfolio)
+            self.stato.prossimo_portfolio += 1
+            self.stato.portfolios[pid] = {'name': body.get('name', ''),
+                                          'isDefault': bool(body.get('isDefault'))}
+            self.stato.aziende_portfolio[pid] = {}
+        self._rispondi(201, {'portfolioId': pid, 'id': pid, 'name': body.get('name', '')})
+
+    def h_list_companies(self, pid):
+        page = max(1, int(self.query.get('page', 1)))
+        page_size = max(1, int(self.query.get('pageSize', 50)))
+        with self.stato.lock:
+            if pid not in self.stato.portfolios:
+                return self._rispondi(404, {'message': 'Portfolio not found'})
+            aziende = list(self.stato.aziende_portfolio[pid].values())
+        inizio = (page - 1) * page_size
+        self._rispondi(200, {'companies': aziende[inizio:inizio + page_size],
+                             'totalCount': len(aziende)})
+
+    def h_add_company(self, pid):
+        body = self._leggi_json() or {}
+        cid = body.get('id', '')
+        with self.stato.lock:
+            if pid not in self.stato.portfolios:
+                return self._rispondi(404, {'message': 'Portfolio not found'})
+            aziende = self.stato.aziende_portfolio[pid]
+            if cid in aziende:
+                return self._rispondi(409, {'message': 'Company already exists in portfolio'})
+            aziende[cid] = {'id': cid, 'personalReference': body.get('personalReference', '')}
+        self._rispondi(201, {'id': cid})
+
+    def h_remove_company(self, pid, cid):
+        with self.stato.lock:
+            aziende = self.stato.aziende_portfolio.get(pid, {})
+            if cid not in aziende:
+                return self._rispondi(404, {'message': 'Company not found in portfolio'})
+            del aziende[cid]
+        self._rispondi(204)
+
+    def h_available_rules(self, paese):
+        regole = [{'ruleCode': code, 'name': nome, 'countryCode': paese}
+                  for code, nome in REGOLE_SIMULATE.items()]
+        self._rispondi(200, regole)
+
+    def h_portfolio_rules(self, pid):
+        with self.stato.lock:
+            regole = self.stato.regole.get(pid, {})
+            lista = [dict(r, countryCode=paese) for paese, rr in regole.items() for r in rr]
+        self._rispondi(200, lista)
+
+    def h_set_rules(self, pid, paese):
+        body = self._leggi_json() or []
+        with self.stato.lock:
+            self.stato.regole.setdefault(pid, {})[paese] = list(body)
+        self._rispondi(204)
+
+    def h_list_events(self):
+        page = max(1, int(self.query.get('page', 1)))
+        page_size = max(1, int(self.query.get('pageSize', 50)))
+        pid = self.query.get('portfolioId')
+        filtro = self.query.get('isProcessed')
+        decrescente = self.query.get('sortOrder', 'desc') == 'desc'
+
+        with self.stato.lock:
+            eventi = [e for e in self.stato.eventi.values()
+                      if (not pid or e['portfolioId'] == pid)
+                      and (filtro is None or e['isProcessed'] == (filtro == 'true'))]
+            eventi = [dict(e) for e in eventi]
+        eventi.sort(key=lambda e: (e['eventDate'], int(e['eventId'])), reverse=decrescente)
+
+        inizio = (page - 1) * page_size
+        self._rispondi(200, {'notificationEvents': eventi[inizio:inizio + page_size],
+                             'totalCount': len(eventi)})
+
+    def h_mark_processed(self, eid):
+        body = self._leggi_json() or {}
+        with self.stato.lock:
+            evento = self.stato.eventi.get(eid)
+            if evento is None:
+                return self._rispondi(404, {'message': 'Event not found'})
+            evento['isProcessed'] = bool(body.get('isProcessed', True))
+        self._rispondi(204)
+
+    def h_company_events(self, cid):
+        with self.stato.lock:
+            eventi = [dict(e) for e in self.stato.eventi.values() if e['companyId'] == cid]
+        self._rispondi(200, {'data': eventi, 'totalCount': len(eventi)})
+
+
+# ==============================================================================
+# AVVIO
+# ==============================================================================
+
+def avvia_server(args):
+    """Crea stato e server. Ritorna (server, stato) senza avviare il loop."""
+    stato = StatoSimulatore(args)
+
+    if args.db:
+        n = stato.carica_da_db(args.db)
+        print(f"  Portfolio precaricato da DB: {n} aziende")
+    if args.eventi:
+        stato.genera_eventi(args.eventi)
+        print(f"  Eventi sintetici generati: {args.eventi}")
+
+    handler = type('Handler', (SimulatoreHandler,), {'stato': stato})
+    server = ThreadingHTTPServer((args.host, args.porta), handler)
+    server.daemon_threads = True
+    return server, stato
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Simulatore locale Creditsafe Connect API')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--porta', type=int, default=8765)
+    p.add_argument('--latenza-ms', type=float, default=0.0,
+                   help='Latenza fissa per richiesta (ms)')
+    p.add_argument('--jitter-ms', type=float, default=0.0,
+                   help='Latenza casuale aggiuntiva 0..N ms')
+    p.add_argument('--errori-429', type=float, default=0.0,
+                   help='Probabilita\' risposta 429 (0..1)')
+    p.add_argument('--errori-5xx', type=float, default=0.0,
+                   help='Probabilita\' risposta 500/502/503 (0..1)')
+    p.add_argument('--intervallo-minimo', type=float, default=0.0,
+                   help='Secondi minimi tra richieste, altrimenti 429 (0 = disattivo)')
+    p.add_argument('--durata-token', type=float, default=3600.0,
+                   help='Validita\' token JWT in secondi')
+    p.add_argument('--non-trovate', type=float, default=0.2,
+                   help='Quota di P.IVA senza azienda (0..1)')
+    p.add_argument('--eventi', type=int, default=0,
+                   help='Eventi sintetici da generare all\'avvio')
+    p.add_argument('--db', type=Path, default=None,
+                   help='Copia di gestionale.db da cui precaricare i connect_id')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--verbose', action='store_true')
+    return p.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("  CREDITSAFE SIMULATORE")
+    print(f"  Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  URL base: http://{args.host}:{args.porta}{PREFISSO}")
+    print(f"  Latenza: {args.latenza_ms}ms + jitter {args.jitter_ms}ms")
+    print(f"  Errori: 429={args.errori_429:.1%} 5xx={args.errori_5xx:.1%}")
+    print("=" * 60)
+
+    server, _ = avvia_server(args)
+
+    print(f"\n  export CREDITSAFE_API_BASE_URL=http://{args.host}:{args.porta}{PREFISSO}")
+    print(f"  Statistiche: http://{args.host}:{args.porta}/_sim/stats")
+    print("  CTRL+C per terminare\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n  Arresto simulatore")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
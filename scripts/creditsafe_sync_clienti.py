@@ -2,8 +2,8 @@
 # ==============================================================================
 # CREDITSAFE SYNC CLIENTI - Popola portfolio monitoring
 # ==============================================================================
-# Versione: 1.0.0
-# Data: 2026-02-13
+# Versione: 1.1.2
+# Data: 2026-10-19
 # Descrizione: Sincronizza clienti con Creditsafe API monitoring
 #
 # OPERAZIONI:
@@ -14,17 +14,31 @@
 #    - Salva connect_id e portfolio_ref nel DB locale
 # 3. Attiva regole di notifica sul portfolio
 #
+# MODALITA' DELTA (--delta), per il run notturno:
+# - Confronta con operazioni su insiemi i clienti da monitorare con lo
+#   stato dell'ultima sync salvato in clienti (creditsafe_portfolio_ref,
+#   creditsafe_sync_piva, creditsafe_sync_esito)
+# - Aggiunge solo i nuovi, rimuove quelli usciti da STATI_MONITORATI,
+#   ricerca di nuovo solo le P.IVA cambiate
+# - Salta pulizia portfolio e attivazione regole (gia' fatte dal run completo)
+# - Richiede scripts/migrazione_creditsafe_delta.py (il run completo funziona
+#   anche senza, ma non salva lo stato usato dal delta)
+#
 # CARATTERISTICHE:
 # - Modalita' --dry-run (nessuna modifica a DB e API)
 # - Salvataggio progresso (riprende da dove interrotto)
 # - Rate limiting (1s tra richieste API)
 # - Gestione errori singolo cliente (non blocca tutto)
 # - Log dettagliato in logs/
+# - Cache persistente ricerche P.IVA, anche negative (--no-cache per ignorarla)
 #
 # USO:
 #   cd ~/gestione_flotta
 #   python3 scripts/creditsafe_sync_clienti.py --dry-run
 #   python3 scripts/creditsafe_sync_clienti.py
+#   python3 scripts/creditsafe_sync_clienti.py --no-cache
+#   python3 scripts/creditsafe_sync_clienti.py --delta
+#   python3 scripts/creditsafe_sync_clienti.py --delta --riprova-non-trovati
 #
 # ==============================================================================
 
@@ -153,22 +167,90 @@ def get_clienti_da_monitorare(conn):
     return cursor.fetchall()
 
 
-def aggiorna_connect_id(conn, cliente_id, connect_id, portfolio_ref, dry_run=False):
+# Colonne stato sync richieste (scripts/migrazione_creditsafe_delta.py)
+CAMPI_STATO_SYNC = ('creditsafe_sync_piva', 'creditsafe_sync_esito')
+
+
+def verifica_stato_sync(conn):
+    """True se il DB ha le colonne di stato sync (migrazione eseguita)."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(clienti)")
+    colonne = {row[1] for row in cursor.fetchall()}
+    return all(c in colonne for c in CAMPI_STATO_SYNC)
+
+
+def aggiorna_connect_id(conn, cliente_id, connect_id, portfolio_ref, p_iva, dry_run=False,
+                       stato_sync=True):
     """
-    Aggiorna connect_id e portfolio_ref nel DB.
+    Aggiorna connect_id, portfolio_ref e stato sync nel DB.
+    Con stato_sync=False (migrazione non eseguita) aggiorna solo i campi storici.
     """
     if dry_run:
         return
     
     cursor = conn.cursor()
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if not stato_sync:
+        cursor.execute("""
+            UPDATE clienti 
+            SET connect_id = ?,
+                creditsafe_portfolio_ref = ?,
+                creditsafe_api_sync_at = ?
+            WHERE id = ?
+        """, (connect_id, portfolio_ref, now, cliente_id))
+        conn.commit()
+        return
+    
     cursor.execute("""
         UPDATE clienti 
         SET connect_id = ?,
             creditsafe_portfolio_ref = ?,
-            creditsafe_api_sync_at = ?
+            creditsafe_api_sync_at = ?,
+            creditsafe_sync_piva = ?,
+            creditsafe_sync_esito = 'monitorato'
         WHERE id = ?
-    """, (connect_id, portfolio_ref, now, cliente_id))
+    """, (connect_id, portfolio_ref, now, p_iva, cliente_id))
+    conn.commit()
+
+
+def segna_non_trovato(conn, cliente_id, p_iva, dry_run=False, stato_sync=True):
+    """
+    Registra che la P.IVA non ha azienda su Creditsafe: il delta non la
+    ricerchera' finche' la P.IVA del cliente non cambia.
+    Senza colonne stato sync (stato_sync=False) non c'e' nulla da salvare.
+    """
+    if dry_run or not stato_sync:
+        return
+    
+    cursor = conn.cursor()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("""
+        UPDATE clienti 
+        SET creditsafe_api_sync_at = ?,
+            creditsafe_sync_piva = ?,
+            creditsafe_sync_esito = 'non_trovato'
+        WHERE id = ?
+    """, (now, p_iva, cliente_id))
+    conn.commit()
+
+
+def segna_rimossi(conn, cliente_ids, dry_run=False):
+    """
+    Toglie il riferimento portfolio ai clienti rimossi (un solo executemany).
+    Il connect_id resta: se il cliente torna monitorato non serve ricercarlo.
+    """
+    if dry_run or not cliente_ids:
+        return
+    
+    cursor = conn.cursor()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor.executemany("""
+        UPDATE clienti 
+        SET creditsafe_portfolio_ref = NULL,
+            creditsafe_api_sync_at = ?,
+            creditsafe_sync_esito = 'rimosso'
+        WHERE id = ?
+    """, [(now, cid) for cid in cliente_ids])
     conn.commit()
 
 
@@ -218,11 +300,15 @@ def step1_pulizia_portfolio(api, dry_run=False):
 # STEP 2: SYNC CLIENTI
 # ==============================================================================
 
-def step2_sync_clienti(api, conn, clienti, dry_run=False):
+def step2_sync_clienti(api, conn, clienti, dry_run=False, bypass_cache=False,
+                       stato_sync=True):
     """
     Per ogni cliente: cerca per P.IVA, ottieni connect_id, aggiungi a portfolio.
     
     Salva progresso ogni 10 clienti per poter riprendere.
+    Le ricerche P.IVA passano dalla cache persistente (anche le non trovate),
+    salvo bypass_cache=True. stato_sync=False se il DB non ha ancora le
+    colonne della migrazione delta.
     """
     
     print("\n" + "=" * 60)
@@ -262,11 +348,12 @@ def step2_sync_clienti(api, conn, clienti, dry_run=False):
                 ok += 1
                 continue
             
-            company = api.search_company_by_vat(p_iva)
+            company = api.search_company_by_vat(p_iva, bypass_cache=bypass_cache)
             
             if company is None:
                 logger.warning(f"{prefix} [SKIP] Non trovata su Creditsafe: {nome} (P.IVA: {p_iva})")
                 skip_non_trovato += 1
+                segna_non_trovato(conn, cliente_id, p_iva, stato_sync=stato_sync)
                 
                 # Salva progresso anche per i non trovati (non riprovare)
                 progresso.setdefault('clienti_non_trovati', []).append(cliente_id)
@@ -312,7 +399,8 @@ def step2_sync_clienti(api, conn, clienti, dry_run=False):
         
         # ---- C) Aggiorna DB locale ----
         try:
-            aggiorna_connect_id(conn, cliente_id, connect_id, PORTFOLIO_ID)
+            aggiorna_connect_id(conn, cliente_id, connect_id, PORTFOLIO_ID, p_iva,
+                                stato_sync=stato_sync)
             ok += 1
             clienti_sincronizzati.add(cliente_id)
             
@@ -341,6 +429,157 @@ def step2_sync_clienti(api, conn, clienti, dry_run=False):
     return ok, skip_non_trovato, errori
 
 
+# ==============================================================================
+# STEP 2 (DELTA): SYNC INCREMENTALE
+# ==============================================================================
+
+def calcola_delta(conn, riprova_non_trovati=False):
+    """
+    Confronta i clienti da monitorare con lo stato dell'ultima sync.
+    
+    Insiemi (per cliente_id):
+        desiderati  = stato_crm in STATI_MONITORATI con P.IVA
+        monitorati  = creditsafe_portfolio_ref = PORTFOLIO_ID
+        non_trovati = esito 'non_trovato' con la stessa P.IVA di oggi
+        piva_cambiate = monitorati con P.IVA diversa da quella sincronizzata
+    
+    Returns:
+        dict: {
+            'da_aggiungere': [(id, nome, p_iva, connect_id_noto), ...],
+            'da_rimuovere':  [(id, nome, connect_id), ...],
+            'invariati': int, 'non_trovati': int
+        }
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, nome_cliente, p_iva, stato_crm, connect_id,
+               creditsafe_portfolio_ref, creditsafe_sync_piva, creditsafe_sync_esito
+        FROM clienti
+        WHERE stato_crm IN ({stati})
+           OR creditsafe_portfolio_ref = ?
+        ORDER BY id
+    """.format(stati=','.join('?' for _ in STATI_MONITORATI)),
+        STATI_MONITORATI + (PORTFOLIO_ID,))
+    righe = {r[0]: r for r in cursor.fetchall()}
+    
+    desiderati = {cid for cid, r in righe.items()
+                  if r[3] in STATI_MONITORATI and r[2]}
+    monitorati = {cid for cid, r in righe.items()
+                  if r[5] == PORTFOLIO_ID and r[4]}
+    non_trovati = set() if riprova_non_trovati else {
+        cid for cid, r in righe.items()
+        if r[7] == 'non_trovato' and r[6] == r[2]
+    }
+    piva_cambiate = {cid for cid in monitorati & desiderati
+                     if righe[cid][6] and righe[cid][6] != righe[cid][2]}
+    
+    aggiungere = (desiderati - monitorati - non_trovati) | piva_cambiate
+    rimuovere = (monitorati - desiderati) | piva_cambiate
+    
+    def connect_id_noto(r):
+        # Riutilizzabile solo se ottenuto con la stessa P.IVA di oggi
+        return r[4] if r[4] and r[6] == r[2] else None
+    
+    return {
+        'da_aggiungere': [(cid, righe[cid][1], righe[cid][2], connect_id_noto(righe[cid]))
+                          for cid in sorted(aggiungere)],
+        'da_rimuovere': [(cid, righe[cid][1], righe[cid][4]) for cid in sorted(rimuovere)],
+        'invariati': len((desiderati & monitorati) - piva_cambiate),
+        'non_trovati': len(desiderati & non_trovati),
+    }
+
+
+def step2_sync_delta(api, conn, delta, dry_run=False, bypass_cache=False):
+    """
+    Applica solo le differenze calcolate da calcola_delta().
+    Rimozioni prima delle aggiunte (libera slot monitoring).
+    
+    Returns:
+        tuple: (aggiunti, rimossi, non_trovati, errori)
+    """
+    da_aggiungere = delta['da_aggiungere']
+    da_rimuovere = delta['da_rimuovere']
+    
+    print("\n" + "=" * 60)
+    print(f"[STEP 2 DELTA] +{len(da_aggiungere)} da aggiungere, "
+          f"-{len(da_rimuovere)} da rimuovere, {delta['invariati']} invariati")
+    print("=" * 60)
+    
+    aggiunti = 0
+    rimossi = 0
+    non_trovati = 0
+    errori = 0
+    
+    # ---- A) Rimozioni ----
+    rimossi_ok = []
+    for cliente_id, nome, connect_id in da_rimuovere:
+        if dry_run:
+            logger.info(f"[DRY] Rimuoverei {nome} ({connect_id})")
+            rimossi += 1
+            continue
+        if api.remove_company_from_portfolio(PORTFOLIO_ID, connect_id):
+            logger.info(f"[OK] Rimossa {nome} ({connect_id})")
+        else:
+            # remove_company_from_portfolio non distingue il 404: lo stato
+            # locale va comunque allineato, al massimo resta uno slot occupato
+            logger.warning(f"[WARN] Rimozione API non confermata per {nome} ({connect_id})")
+        rimossi_ok.append(cliente_id)
+        rimossi += 1
+    segna_rimossi(conn, rimossi_ok, dry_run)
+    
+    # ---- B) Aggiunte ----
+    totale = len(da_aggiungere)
+    for i, (cliente_id, nome, p_iva, connect_id) in enumerate(da_aggiungere, 1):
+        prefix = f"[{i}/{totale}]"
+        
+        if dry_run:
+            azione = f"riuserei {connect_id}" if connect_id else f"cercherei P.IVA {p_iva}"
+            logger.info(f"{prefix} [DRY] {nome}: {azione}")
+            aggiunti += 1
+            continue
+        
+        # Ricerca solo se il connect_id non e' gia' noto per questa P.IVA
+        if not connect_id:
+            try:
+                company = api.search_company_by_vat(p_iva, bypass_cache=bypass_cache)
+            except Exception as e:
+                logger.error(f"{prefix} [ERR] Errore ricerca {nome} (P.IVA: {p_iva}): {e}")
+                errori += 1
+                continue
+            
+            connect_id = company.get('id', '') if company else ''
+            if not connect_id:
+                logger.warning(f"{prefix} [SKIP] Non trovata su Creditsafe: {nome} (P.IVA: {p_iva})")
+                segna_non_trovato(conn, cliente_id, p_iva)
+                non_trovati += 1
+                continue
+        
+        try:
+            api.add_company_to_portfolio(PORTFOLIO_ID, connect_id, reference=str(cliente_id))
+            logger.info(f"{prefix} [OK] {nome} -> {connect_id}")
+        except Exception as e:
+            err_str = str(e).lower()
+            if 'already' in err_str or 'duplicate' in err_str or 'exists' in err_str or '409' in err_str or 'conflict' in err_str:
+                logger.info(f"{prefix} [OK] {nome} -> {connect_id} (gia' nel portfolio)")
+            else:
+                logger.error(f"{prefix} [ERR] Errore aggiunta portfolio {nome}: {e}")
+                errori += 1
+                continue
+        
+        try:
+            aggiorna_connect_id(conn, cliente_id, connect_id, PORTFOLIO_ID, p_iva)
+            aggiunti += 1
+        except Exception as e:
+            logger.error(f"{prefix} [ERR] Errore aggiornamento DB per {nome}: {e}")
+            errori += 1
+    
+    print(f"\n  Aggiunti: {aggiunti} | Rimossi: {rimossi} | Non trovati: {non_trovati} | Errori: {errori}")
+    if delta['non_trovati']:
+        print(f"  Saltati (non trovati in sync precedenti): {delta['non_trovati']}")
+    
+    return aggiunti, rimossi, non_trovati, errori
+
+
 # ==============================================================================
 # STEP 3: ATTIVAZIONE REGOLE
 # ==============================================================================
@@ -393,13 +632,68 @@ def step3_attiva_regole(api, dry_run=False):
 # MAIN
 # ==============================================================================
 
+def stampa_cache(api, bypass_cache):
+    """Riga riepilogo cache ricerche (con --no-cache le letture sono saltate)."""
+    if not api.cache:
+        return
+    if bypass_cache:
+        print("  Cache ricerche: disattivata (--no-cache)")
+        return
+    stat_cache = api.cache.statistiche()
+    print(f"  Cache ricerche: {stat_cache['hit']} hit, {stat_cache['miss']} miss")
+
+
+def esegui_delta(conn, dry_run=False, bypass_cache=False, riprova_non_trovati=False):
+    """Run notturno: solo differenze rispetto all'ultima sync."""
+    delta = calcola_delta(conn, riprova_non_trovati)
+    
+    print(f"\n  Da aggiungere: {len(delta['da_aggiungere'])}")
+    print(f"  Da rimuovere:  {len(delta['da_rimuovere'])}")
+    print(f"  Invariati:     {delta['invariati']}")
+    
+    if not delta['da_aggiungere'] and not delta['da_rimuovere']:
+        logger.info("Portfolio gia' allineato, nessuna chiamata API necessaria")
+        conn.close()
+        return
+    
+    # ---- Inizializza API ----
+    print("\n  Inizializzazione API Creditsafe...")
+    sys.path.insert(0, str(BASE_DIR))
+    
+    try:
+        from app.creditsafe_api import get_api_client
+        api = get_api_client(str(BASE_DIR), usa_cache=True)
+        print("  [OK] Autenticazione riuscita")
+    except Exception as e:
+        logger.error(f"Errore autenticazione: {e}")
+        conn.close()
+        sys.exit(1)
+    
+    aggiunti, rimossi, non_trovati, errori = step2_sync_delta(api, conn, delta, dry_run, bypass_cache)
+    conn.close()
+    
+    print("\n" + "=" * 60)
+    print("  RIEPILOGO SYNC DELTA")
+    print("=" * 60)
+    print(f"  Aggiunti: {aggiunti} | Rimossi: {rimossi} | Non trovati: {non_trovati} | Errori: {errori}")
+    stampa_cache(api, bypass_cache)
+    print(f"  Log completo: {log_file}")
+    if dry_run:
+        print(f"\n  DRY-RUN: nessuna modifica effettuata")
+    print("=" * 60)
+
+
+
 def main():
     dry_run = '--dry-run' in sys.argv
+    bypass_cache = '--no-cache' in sys.argv
+    modalita_delta = '--delta' in sys.argv
     
     print("=" * 60)
     print("  CREDITSAFE SYNC CLIENTI")
     print(f"  Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"  Modalita': {'DRY-RUN (nessuna modifica)' if dry_run else 'ESECUZIONE REALE'}")
+    print(f"  Modalita': {'DRY-RUN (nessuna modifica)' if dry_run else 'ESECUZIONE REALE'}"
+          f"{' - DELTA' if modalita_delta else ''}")
     print(f"  Portfolio ID: {PORTFOLIO_ID}")
     print(f"  Log: {log_file}")
     print("=" * 60)
@@ -412,6 +706,20 @@ def main():
     # ---- Connessione DB ----
     conn = sqlite3.connect(str(DB_FILE))
     
+    stato_sync = verifica_stato_sync(conn)
+    
+    if modalita_delta:
+        if not stato_sync:
+            logger.error("Colonne stato sync mancanti: eseguire scripts/migrazione_creditsafe_delta.py")
+            conn.close()
+            sys.exit(1)
+        esegui_delta(conn, dry_run, bypass_cache, '--riprova-non-trovati' in sys.argv)
+        return
+    
+    if not stato_sync:
+        logger.warning("Colonne stato sync mancanti: sync completa senza stato per --delta "
+                       "(eseguire scripts/migrazione_creditsafe_delta.py)")
+    
     # ---- Conta clienti ----
     clienti = get_clienti_da_monitorare(conn)
     print(f"\n  Clienti da monitorare: {len(clienti)}")
@@ -428,7 +736,7 @@ def main():
     
     try:
         from app.creditsafe_api import get_api_client
-        api = get_api_client(str(BASE_DIR))
+        api = get_api_client(str(BASE_DIR), usa_cache=True)
         api.authenticate()
         print("  [OK] Autenticazione riuscita")
     except Exception as e:
@@ -440,7 +748,8 @@ def main():
     step1_rimossi, step1_errori = step1_pulizia_portfolio(api, dry_run)
     
     # ---- STEP 2: Sync clienti ----
-    step2_ok, step2_non_trovati, step2_errori = step2_sync_clienti(api, conn, clienti, dry_run)
+    step2_ok, step2_non_trovati, step2_errori = step2_sync_clienti(api, conn, clienti, dry_run, bypass_cache,
+                                                                   stato_sync)
     
     # ---- STEP 3: Attiva regole ----
     step3_ok = step3_attiva_regole(api, dry_run)
@@ -455,6 +764,7 @@ def main():
     print(f"  Pulizia portfolio: {step1_rimossi} rimossi, {step1_errori} errori")
     print(f"  Sync clienti: {step2_ok} OK, {step2_non_trovati} non trovati, {step2_errori} errori")
     print(f"  Regole attivate: {'SI' if step3_ok else 'NO'}")
+    stampa_cache(api, bypass_cache)
     print(f"  Log completo: {log_file}")
     
     if not dry_run and step2_errori == 0:
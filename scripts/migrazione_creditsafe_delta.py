@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# MIGRAZIONE DATABASE - Stato sync Creditsafe per delta
+# ==============================================================================
+# Versione: 1.0.0
+# Data: 2026-10-19
+# Descrizione: Aggiunge alla tabella clienti lo stato dell'ultima sync
+#              Creditsafe, usato da creditsafe_sync_clienti.py --delta
+#
+# OPERAZIONI:
+# 1. Backup database
+# 2. ALTER TABLE clienti: creditsafe_sync_piva, creditsafe_sync_esito
+# 3. Indice su creditsafe_portfolio_ref
+# 4. Popola lo stato per i clienti gia' nel portfolio
+# 5. Verifica finale
+#
+# VALORI creditsafe_sync_esito:
+#   monitorato  = nel portfolio (connect_id + creditsafe_portfolio_ref)
+#   non_trovato = P.IVA senza azienda su Creditsafe
+#   rimosso     = tolto dal portfolio (stato CRM non piu' monitorato)
+#
+# USO:
+#   cd ~/gestione_flotta
+#   python3 scripts/migrazione_creditsafe_delta.py --dry-run
+#   python3 scripts/migrazione_creditsafe_delta.py
+#
+# ==============================================================================
+
+import sys
+import shutil
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+# ==============================================================================
+# CONFIGURAZIONE
+# ==============================================================================
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+
+if SCRIPT_DIR.name == 'scripts':
+    BASE_DIR = SCRIPT_DIR.parent
+else:
+    BASE_DIR = SCRIPT_DIR
+
+DB_FILE = BASE_DIR / 'db' / 'gestionale.db'
+BACKUP_DIR = BASE_DIR / 'backup'
+
+# Nuovi campi tabella clienti
+CAMPI_CLIENTI = [
+    ('creditsafe_sync_piva',  'TEXT'),      # P.IVA usata all'ultima sync
+    ('creditsafe_sync_esito', 'TEXT'),      # monitorato / non_trovato / rimosso
+]
+
+# Indici da creare
+INDICI = [
+    ('idx_clienti_cs_portfolio_ref', 'clienti', 'creditsafe_portfolio_ref'),
+]
+
+
+# ==============================================================================
+# UTILITY
+# ==============================================================================
+
+def log(msg, livello='INFO'):
+    """Stampa messaggio con livello."""
+    print(f"  [{livello}] {msg}")
+
+
+def colonna_esiste(conn, tabella, colonna):
+    """Verifica se una colonna esiste in una tabella."""
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info({tabella})")
+    colonne = [row[1] for row in cursor.fetchall()]
+    return colonna in colonne
+
+
+def indice_esiste(conn, nome_indice):
+    """Verifica se un indice esiste."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type='index' AND name=?
+    """, (nome_indice,))
+    return cursor.fetchone() is not None
+
+
+# ==============================================================================
+# MIGRAZIONE
+# ==============================================================================
+
+def main():
+    dry_run = '--dry-run' in sys.argv
+
+    print("=" * 60)
+    print("  MIGRAZIONE: Stato sync Creditsafe (delta)")
+    print(f"  Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  Modalita': {'DRY-RUN (nessuna modifica)' if dry_run else 'ESECUZIONE REALE'}")
+    print("=" * 60)
+
+    # Verifica database
+    if not DB_FILE.exists():
+        print(f"\n  ERRORE: Database non trovato: {DB_FILE}")
+        sys.exit(1)
+
+    print(f"\n  Database: {DB_FILE}")
+    print(f"  Dimensione: {DB_FILE.stat().st_size / 1024 / 1024:.1f} MB")
+
+    # ---- STEP 1: Backup ----
+    print("\n" + "-" * 60)
+    print("[STEP 1] Backup database")
+    print("-" * 60)
+
+    if dry_run:
+        log("Backup saltato (dry-run)", 'DRY')
+    else:
+        BACKUP_DIR.mkdir(exist_ok=True)
+        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_file = BACKUP_DIR / f"db__gestionale.db.bak_{ts}"
+        shutil.copy2(DB_FILE, backup_file)
+        log(f"Backup creato: {backup_file}", 'OK')
+
+    conn = sqlite3.connect(str(DB_FILE))
+    cursor = conn.cursor()
+
+    # ---- STEP 2: ALTER TABLE ----
+    print("\n" + "-" * 60)
+    print("[STEP 2] ALTER TABLE clienti - stato sync Creditsafe")
+    print("-" * 60)
+
+    aggiunti = 0
+    for campo, tipo in CAMPI_CLIENTI:
+        if colonna_esiste(conn, 'clienti', campo):
+            log(f"{campo} - gia' presente", 'SKIP')
+        elif dry_run:
+            log(f"{campo} {tipo} - DA AGGIUNGERE", 'DRY')
+            aggiunti += 1
+        else:
+            cursor.execute(f"ALTER TABLE clienti ADD COLUMN {campo} {tipo}")
+            log(f"{campo} {tipo} - aggiunto", 'OK')
+            aggiunti += 1
+
+    # ---- STEP 3: Indici ----
+    print("\n" + "-" * 60)
+    print("[STEP 3] Indici")
+    print("-" * 60)
+
+    for nome_indice, tabella, colonna in INDICI:
+        if indice_esiste(conn, nome_indice):
+            log(f"{nome_indice} su {tabella}.{colonna} - gia' presente", 'SKIP')
+        elif dry_run:
+            log(f"{nome_indice} su {tabella}.{colonna} - DA CREARE", 'DRY')
+        else:
+            cursor.execute(f"CREATE INDEX {nome_indice} ON {tabella}({colonna})")
+            log(f"{nome_indice} su {tabella}.{colonna} - creato", 'OK')
+
+    # ---- STEP 4: Popola stato esistente ----
+    print("\n" + "-" * 60)
+    print("[STEP 4] Stato iniziale clienti gia' nel portfolio")
+    print("-" * 60)
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM clienti
+        WHERE connect_id IS NOT NULL AND connect_id != ''
+        AND creditsafe_portfolio_ref IS NOT NULL AND creditsafe_portfolio_ref != ''
+    """)
+    da_popolare = cursor.fetchone()[0]
+
+    if dry_run:
+        log(f"{da_popolare} clienti da marcare come 'monitorato'", 'DRY')
+    else:
+        cursor.execute("""
+            UPDATE clienti
+            SET creditsafe_sync_esito = 'monitorato',
+                creditsafe_sync_piva = p_iva
+            WHERE connect_id IS NOT NULL AND connect_id != ''
+            AND creditsafe_portfolio_ref IS NOT NULL AND creditsafe_portfolio_ref != ''
+            AND creditsafe_sync_esito IS NULL
+        """)
+        log(f"{cursor.rowcount} clienti marcati come 'monitorato'", 'OK')
+        conn.commit()
+
+    # ---- STEP 5: Verifica ----
+    print("\n" + "-" * 60)
+    print("[STEP 5] Verifica")
+    print("-" * 60)
+
+    errori = 0
+    if not dry_run:
+        for campo, _ in CAMPI_CLIENTI:
+            if colonna_esiste(conn, 'clienti', campo):
+                log(f"clienti.{campo} - OK", 'OK')
+            else:
+                log(f"clienti.{campo} - MANCANTE!", 'ERR')
+                errori += 1
+    else:
+        log("Verifica saltata (dry-run)", 'DRY')
+
+    conn.close()
+
+    # ---- Riepilogo ----
+    print("\n" + "=" * 60)
+    if dry_run:
+        print("  DRY-RUN COMPLETATO")
+        print(f"  Colonne da aggiungere: {aggiunti}")
+        print("  Riesegui senza --dry-run per applicare")
+    else:
+        print("  MIGRAZIONE COMPLETATA" if not errori else "  MIGRAZIONE CON ERRORI")
+        print(f"  Colonne aggiunte: {aggiunti}")
+        print(f"  Errori verifica:  {errori}")
+    print("=" * 60)
+
+    if errori:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
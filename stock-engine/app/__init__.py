@@ -1,10 +1,13 @@
 # =============================================================================
 # STOCK ENGINE - Flask Application Factory
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
+#
+# v1.1.0: flask elabora --completo
 # =============================================================================
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -129,13 +132,14 @@ def _register_commands(app):
         print("✔ Configurazioni importate")
     
     @app.cli.command('elabora')
-    @app.cli.argument('noleggiatore')
-    def elabora(noleggiatore):
+    @click.argument('noleggiatore')
+    @click.option('--completo', is_flag=True, help='Rielabora anche i veicoli invariati')
+    def elabora(noleggiatore, completo):
         """Esegue elaborazione per un noleggiatore"""
         from .services.pipeline import StockPipeline
         
         pipeline = StockPipeline()
-        result = pipeline.elabora(noleggiatore.upper())
+        result = pipeline.elabora(noleggiatore.upper(), differenziale=False if completo else None)
         
         print(f"\n{'='*60}")
         print(f"ELABORAZIONE {noleggiatore.upper()} COMPLETATA")
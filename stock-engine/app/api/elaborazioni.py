@@ -1,16 +1,21 @@
 # =============================================================================
 # STOCK ENGINE - API Elaborazioni
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.3.0
+# Data: 19 ottobre 2026
 #
 # Endpoint API per gestione elaborazioni.
 # Permette di lanciare e monitorare elaborazioni.
+#
+# v1.1.0: POST /elabora/<noleggiatore>?completo=true (senza differenziale)
+# v1.2.0: /health legge il numero veicoli dal riepilogo stock
+# v1.3.0: /elaborazioni con paginazione keyset su (data_elaborazione, id)
 # =============================================================================
 
 from flask import request, jsonify
 
 from . import api_bp
+from .paginazione import info_pagina, pagina_keyset
 from app.models.elaborazione import Elaborazione
 from app.services.pipeline import StockPipeline
 
@@ -25,22 +30,34 @@ def get_elaborazioni():
     Query params:
     - noleggiatore: Filtro noleggiatore
     - limit: Limite risultati (default 20)
+    - cursor: Cursore pagina successiva (pagination.next_cursor)
+    - count: Se true, include il totale
     """
     noleggiatore = request.args.get('noleggiatore')
     limit = min(request.args.get('limit', 20, type=int), 100)
+    cursore = request.args.get('cursor')
+    con_totale = request.args.get('count', 'false').lower() == 'true'
     
     query = Elaborazione.query
     
     if noleggiatore:
         query = query.filter_by(noleggiatore=noleggiatore.upper())
     
-    elaborazioni = query.order_by(
-        Elaborazione.data_elaborazione.desc()
-    ).limit(limit).all()
+    totale = query.count() if con_totale else None
+    
+    # Più recenti prima
+    try:
+        elaborazioni, successivo = pagina_keyset(
+            query, [Elaborazione.data_elaborazione, Elaborazione.id],
+            cursore, limit, discendente=True
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'count': len(elaborazioni),
-        'elaborazioni': [e.to_dict() for e in elaborazioni]
+        'elaborazioni': [e.to_dict() for e in elaborazioni],
+        'pagination': info_pagina(limit, successivo, totale)
     })
 
 
@@ -80,12 +97,17 @@ def elabora(noleggiatore):
     ATTENZIONE: Operazione sincrona, può richiedere 30-60 secondi.
     Per elaborazioni asincrone, usare il task scheduler.
     
+    Query params:
+    - completo: Se true, rielabora anche i veicoli invariati
+    
     Returns:
         dict: Risultato elaborazione
     """
+    completo = request.args.get('completo', 'false').lower() == 'true'
+    
     try:
         pipeline = StockPipeline()
-        result = pipeline.elabora(noleggiatore.upper())
+        result = pipeline.elabora(noleggiatore.upper(), differenziale=False if completo else None)
         return jsonify(result)
         
     except ValueError as e:
@@ -119,13 +141,14 @@ def health_check():
     
     Health check endpoint.
     """
-    from app.models.veicolo import Veicolo
+    from app.models.riepilogo import RiepilogoStock
     from app.models.jato import JatoModel
+    from app import db
     
     try:
-        # Verifica connessione DB
-        veicoli_count = Veicolo.query.count()
-        jato_count = JatoModel.query.count()
+        # Verifica connessione DB (veicoli dal riepilogo, senza contare la tabella)
+        veicoli_count = RiepilogoStock.get_statistics()['totale']
+        jato_count = db.session.query(db.func.count(JatoModel.id)).scalar()
         
         return jsonify({
             'status': 'healthy',
@@ -1,14 +1,17 @@
 # =============================================================================
 # STOCK ENGINE - API Export
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Endpoint API per export/download file Excel.
+#
+# v1.1.0: /export/excel rigenera il file solo se i dati sono cambiati e
+#         risponde con ETag/Last-Modified (304 se il client è aggiornato)
 # =============================================================================
 
 from pathlib import Path
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from flask import request, jsonify, send_file, current_app
 
 from . import api_bp
@@ -24,7 +27,11 @@ def download_excel(noleggiatore):
     
     Query params:
     - data: Data specifica (YYYY-MM-DD, default oggi)
-    - regenerate: Se true, rigenera file anche se esiste
+    - regenerate: Se true, rigenera file anche se aggiornato
+    
+    Il file viene rigenerato solo se i veicoli sono cambiati dall'ultima
+    generazione. ETag = versione dei dati, Last-Modified = generazione:
+    con If-None-Match / If-Modified-Since la risposta è 304 senza corpo.
     
     Returns:
         File Excel in download
@@ -40,35 +47,37 @@ def download_excel(noleggiatore):
     else:
         data = date.today()
     
-    # Percorso file atteso
-    output_dir = Path(current_app.config['DIR_OUTPUT'])
-    filename = f"{noleggiatore.lower()}_stock_{data.strftime('%d-%m-%Y')}.xlsx"
-    filepath = output_dir / filename
-    
-    # Se file esiste e non richiesta rigenerazione, servi file esistente
-    if filepath.exists() and not regenerate:
-        return send_file(
-            filepath,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+    exporter = ExcelExporter()
+    filepath = exporter.percorso_file(noleggiatore, data)
     
-    # Genera file
     try:
-        exporter = ExcelExporter()
-        filepath = exporter.genera_excel(noleggiatore.upper(), data)
-        
-        return send_file(
-            filepath,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filepath.name
-        )
+        esportazione = exporter.esporta_aggiornato(noleggiatore.upper(), data, forza=regenerate)
     except ValueError as e:
+        # Veicoli non più nel database: file storico servito così com'è
+        if filepath.exists():
+            return send_file(
+                filepath,
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                as_attachment=True,
+                download_name=filepath.name
+            )
         return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': f'Errore generazione Excel: {str(e)}'}), 500
+    
+    response = send_file(
+        esportazione.file,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=filepath.name,
+        etag=esportazione.versione_dati,
+        last_modified=esportazione.generato_il.replace(tzinfo=timezone.utc),
+        conditional=True
+    )
+    if esportazione.elaborazione_id:
+        response.headers['X-Elaborazione-Id'] = str(esportazione.elaborazione_id)
+    
+    return response
 
 
 @api_bp.route('/export/list', methods=['GET'])
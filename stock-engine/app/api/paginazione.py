@@ -0,0 +1,106 @@
+# =============================================================================
+# STOCK ENGINE - Paginazione keyset
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Paginazione per chiave (keyset) invece di OFFSET: ogni pagina riparte
+# dall'ultima riga della precedente, quindi costa uguale alla prima pagina
+# e alla millesima. Il cursore è opaco per il client (base64 di JSON con i
+# valori delle colonne di ordinamento dell'ultima riga).
+# =============================================================================
+
+import json
+import base64
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+
+def codifica_cursore(valori: List) -> str:
+    """Cursore opaco dai valori delle colonne di ordinamento"""
+    dati = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in valori])
+    return base64.urlsafe_b64encode(dati.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodifica_cursore(cursore: str, colonne: List) -> List:
+    """
+    Valori delle colonne di ordinamento da un cursore
+    
+    Raises:
+        ValueError: Cursore non valido
+    """
+    try:
+        dati = base64.urlsafe_b64decode(cursore + '=' * (-len(cursore) % 4))
+        valori = json.loads(dati.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursore non valido: {e}")
+    
+    if not isinstance(valori, list) or len(valori) != len(colonne):
+        raise ValueError("Cursore non valido")
+    
+    risultato = []
+    for colonna, valore in zip(colonne, valori):
+        tipo = colonna.type.python_type
+        if valore is None:
+            raise ValueError("Cursore non valido")
+        if tipo is datetime:
+            valore = datetime.fromisoformat(valore)
+        elif tipo is date:
+            valore = date.fromisoformat(valore)
+        else:
+            valore = tipo(valore)
+        risultato.append(valore)
+    
+    return risultato
+
+
+def pagina_keyset(query, colonne: List, cursore: Optional[str], limite: int,
+                  discendente: bool = False) -> Tuple[List, Optional[str]]:
+    """
+    Una pagina di risultati ordinati per 'colonne' (l'ultima deve essere
+    univoca, es. id)
+    
+    Args:
+        query: Query SQLAlchemy già filtrata
+        colonne: Colonne di ordinamento (es. [Veicolo.data_import, Veicolo.id])
+        cursore: Cursore della pagina precedente (None = prima pagina)
+        limite: Righe per pagina
+        discendente: Ordine decrescente
+    
+    Returns:
+        tuple: (righe, cursore pagina successiva o None se ultima pagina)
+    
+    Raises:
+        ValueError: Cursore non valido
+    """
+    if cursore:
+        valori = decodifica_cursore(cursore, colonne)
+        chiave = tuple_(*colonne)
+        query = query.filter(chiave < tuple_(*valori) if discendente else chiave > tuple_(*valori))
+    
+    query = query.order_by(*[c.desc() if discendente else c.asc() for c in colonne])
+    
+    # Una riga in più per sapere se esiste la pagina successiva
+    righe = query.limit(limite + 1).all()
+    
+    successivo = None
+    if len(righe) > limite:
+        righe = righe[:limite]
+        ultima = righe[-1]
+        successivo = codifica_cursore([getattr(ultima, c.key) for c in colonne])
+    
+    return righe, successivo
+
+
+def info_pagina(per_page: int, successivo: Optional[str], totale: Optional[int] = None) -> Dict:
+    """Blocco 'pagination' delle risposte keyset"""
+    info = {
+        'per_page': per_page,
+        'next_cursor': successivo,
+        'has_next': successivo is not None,
+    }
+    if totale is not None:
+        info['total'] = totale
+    return info
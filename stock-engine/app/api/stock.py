@@ -1,19 +1,33 @@
 # =============================================================================
 # STOCK ENGINE - API Stock
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.4.1
+# Data: 19 ottobre 2026
 #
 # Endpoint API per accesso ai dati stock veicoli.
 # Usato dal programma principale per attingere ai dati elaborati.
+#
+# v1.1.0: /stock/<noleggiatore>/variazioni (nuovi, modificati, usciti)
+# v1.2.0: /stock/statistics dal riepilogo stock
+# v1.3.0: ricerche testuali con indici trigrammi e ordinamento per
+#         similarità su PostgreSQL (models/ricerca.py)
+# v1.4.0: /stock con paginazione keyset (cursor) su (data_import, id),
+#         totale solo con count=true; page resta per i client esistenti
+# v1.4.1: keyset solo con cursor o keyset=true: senza, /stock risponde come
+#         prima (OFFSET, page/total/pages)
 # =============================================================================
 
 from datetime import date, datetime
 from flask import request, jsonify, current_app
 
+from app import db
+
 from . import api_bp
 from app.models.veicolo import Veicolo
+from app.models.riepilogo import RiepilogoStock
 from app.models.jato import JatoModel
+from app.models.ricerca import filtra_testo
+from .paginazione import decodifica_cursore, info_pagina, pagina_keyset
 
 
 @api_bp.route('/stock', methods=['GET'])
@@ -26,16 +40,27 @@ def get_all_stock():
     Query params:
     - noleggiatore: Filtro noleggiatore
     - data: Data specifica (YYYY-MM-DD)
-    - page: Pagina (default 1)
+    - page: Pagina con OFFSET (default 1, lenta su pagine profonde)
     - per_page: Elementi per pagina (default 100)
+    - keyset: Se true, paginazione per chiave (prima pagina)
+    - cursor: Cursore pagina successiva (pagination.next_cursor, implica keyset)
+    - count: Con keyset, se true include il totale (una COUNT in più)
+    
+    Senza keyset e cursor la risposta è quella storica (page, total, pages).
+    Senza 'data' il cursore resta sulla data della prima pagina, anche se
+    nel frattempo arriva un import più recente.
     """
     noleggiatore = request.args.get('noleggiatore')
     data_str = request.args.get('data')
+    cursore = request.args.get('cursor')
+    keyset = bool(cursore) or request.args.get('keyset', 'false').lower() == 'true'
     page = request.args.get('page', 1, type=int)
+    con_totale = request.args.get('count', 'false').lower() == 'true'
     per_page = min(request.args.get('per_page', 100, type=int), 
                    current_app.config.get('API_MAX_PAGE_SIZE', 1000))
     
     query = Veicolo.query
+    colonne = [Veicolo.data_import, Veicolo.id]
     
     if noleggiatore:
         query = query.filter_by(noleggiatore=noleggiatore.upper())
@@ -43,26 +68,46 @@ def get_all_stock():
     if data_str:
         try:
             data = datetime.strptime(data_str, '%Y-%m-%d').date()
-            query = query.filter_by(data_import=data)
         except ValueError:
             return jsonify({'error': 'Formato data non valido. Usa YYYY-MM-DD'}), 400
+    elif cursore:
+        # Data della pagina precedente
+        try:
+            data = decodifica_cursore(cursore, colonne)[0]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     else:
-        # Ultima data disponibile
-        ultima = Veicolo.query.order_by(Veicolo.data_import.desc()).first()
-        if ultima:
-            query = query.filter_by(data_import=ultima.data_import)
-    
-    # Paginazione
-    pagination = query.paginate(page=page, per_page=per_page)
+        # Ultima data disponibile (dal riepilogo, senza scandire i veicoli)
+        data = db.session.query(db.func.max(RiepilogoStock.data_import)).scalar()
+    
+    if data:
+        query = query.filter_by(data_import=data)
+    
+    # Paginazione con OFFSET (default, risposta dei client esistenti)
+    if not keyset:
+        pagination = query.order_by(*colonne).paginate(page=page, per_page=per_page)
+        
+        return jsonify({
+            'data': [v.to_dict() for v in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages,
+            }
+        })
+    
+    # Paginazione keyset
+    totale = query.order_by(None).count() if con_totale else None
+    
+    try:
+        veicoli, successivo = pagina_keyset(query, colonne, cursore, per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'data': [v.to_dict() for v in pagination.items],
-        'pagination': {
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-        }
+        'data': [v.to_dict() for v in veicoli],
+        'pagination': info_pagina(per_page, successivo, totale)
     })
 
 
@@ -98,6 +143,30 @@ def get_stock_noleggiatore(noleggiatore):
     })
 
 
+@api_bp.route('/stock/<noleggiatore>/variazioni', methods=['GET'])
+def get_variazioni_noleggiatore(noleggiatore):
+    """
+    GET /api/stock/ayvens/variazioni
+    
+    Restituisce le variazioni di stock rispetto all'import precedente:
+    veicoli nuovi, modificati e usciti (per VIN).
+    
+    Query params:
+    - data: Data import (YYYY-MM-DD, default oggi)
+    """
+    data_str = request.args.get('data')
+    
+    if data_str:
+        try:
+            data = datetime.strptime(data_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Formato data non valido'}), 400
+    else:
+        data = date.today()
+    
+    return jsonify(Veicolo.get_variazioni(noleggiatore, data))
+
+
 @api_bp.route('/stock/search', methods=['GET'])
 def search_stock():
     """
@@ -127,15 +196,15 @@ def search_stock():
     prezzo_max = request.args.get('prezzo_max', type=float)
     limit = min(request.args.get('limit', 100, type=int), 1000)
     
-    query = Veicolo.query
+    # Filtri LIKE (indici trigrammi su PostgreSQL, risultati per similarità)
+    query = filtra_testo(Veicolo.query, [
+        (Veicolo.marca, filters.pop('marca')),
+        (Veicolo.modello, filters.pop('modello')),
+    ], ordina_per=Veicolo.id)
     
-    # Applica filtri LIKE
     for field, value in filters.items():
         if value:
-            if field in ['marca', 'modello']:
-                query = query.filter(getattr(Veicolo, field).ilike(f'%{value}%'))
-            else:
-                query = query.filter(getattr(Veicolo, field) == value.upper())
+            query = query.filter(getattr(Veicolo, field) == value.upper())
     
     # Filtri prezzo
     if prezzo_min:
@@ -183,7 +252,7 @@ def get_statistics():
         except ValueError:
             pass
     
-    stats = Veicolo.get_statistics(noleggiatore, data)
+    stats = RiepilogoStock.get_statistics(noleggiatore, data)
     
     return jsonify(stats)
 
@@ -202,14 +271,10 @@ def search_jato():
     if not marca:
         return jsonify({'error': 'Parametro marca obbligatorio'}), 400
     
-    query = JatoModel.query.filter(
-        JatoModel.brand_normalized.ilike(f'%{marca.upper()}%')
-    )
-    
-    if modello:
-        query = query.filter(
-            JatoModel.jato_product_description.ilike(f'%{modello}%')
-        )
+    query = filtra_testo(JatoModel.query, [
+        (JatoModel.brand_normalized, marca.upper()),
+        (JatoModel.jato_product_description, modello),
+    ], ordina_per=JatoModel.id)
     
     risultati = query.limit(limit).all()
     
@@ -1,8 +1,15 @@
 # =============================================================================
 # STOCK ENGINE - Configurazione
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.4.2
+# Data: 19 ottobre 2026
+#
+# v1.1.0: MATCH_CACHE_ENABLED
+# v1.2.0: MATCH_WORKERS
+# v1.3.0: ELABORAZIONI_PARALLELE
+# v1.4.0: IMPORT_DIFFERENZIALE
+# v1.4.1: IMPORT_DIFFERENZIALE disattivato di default (si abilita con '1')
+# v1.4.2: ELABORAZIONI_PARALLELE a 1 di default (in sequenza)
 # =============================================================================
 
 import os
@@ -62,6 +69,16 @@ class Config:
     HP_TOLERANCE = 5
     CO2_TOLERANCE = 5
     
+    # Elabora solo i veicoli nuovi/modificati rispetto all'import precedente
+    # (opzionale: di default ogni elaborazione rielabora tutti i veicoli)
+    IMPORT_DIFFERENZIALE = os.environ.get('IMPORT_DIFFERENZIALE', '0') == '1'
+    
+    # Cache esiti match tra elaborazioni (tabella match_cache)
+    MATCH_CACHE_ENABLED = os.environ.get('MATCH_CACHE_ENABLED', '1') != '0'
+    
+    # Processi per il match JATO (1 = nessun parallelismo, 0 = tutti i core)
+    MATCH_WORKERS = int(os.environ.get('MATCH_WORKERS', 1))
+    
     # ==========================================================================
     # SCHEDULER
     # ==========================================================================
@@ -71,6 +88,11 @@ class Config:
     # Noleggiatori attivi
     NOLEGGIATORI_ATTIVI = ['AYVENS', 'ARVAL', 'LEASYS']
     
+    # Noleggiatori elaborati contemporaneamente (1 = in sequenza).
+    # Con SQLite resta comunque 1 (un solo scrittore alla volta); con più di
+    # un'elaborazione insieme MATCH_WORKERS è ignorato
+    ELABORAZIONI_PARALLELE = int(os.environ.get('ELABORAZIONI_PARALLELE', 1))
+    
     # ==========================================================================
     # API
     # ==========================================================================
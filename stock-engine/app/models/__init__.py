@@ -1,8 +1,17 @@
 # =============================================================================
 # STOCK ENGINE - Modelli Database
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.7.0
+# Data: 19 ottobre 2026
+#
+# v1.1.0: MatchCache; aggiorna_schema() aggiunge a tabelle esistenti le
+#         colonne introdotte dopo la loro creazione
+# v1.2.0: colonne import differenziale
+# v1.3.0: elaborazioni.tempi_fasi
+# v1.4.0: EsportazioneExcel
+# v1.5.0: RiepilogoStock (ricostruito da init_database se vuoto)
+# v1.6.0: indici trigrammi per la ricerca (PostgreSQL)
+# v1.7.0: aggiorna_schema() crea anche gli indici aggiunti (INDICI_AGGIUNTI)
 # =============================================================================
 
 from .veicolo import Veicolo
@@ -10,15 +19,76 @@ from .jato import JatoModel
 from .glossario import Glossario
 from .pattern import PatternCarburante
 from .elaborazione import Elaborazione
+from .match_cache import MatchCache
+from .esportazione import EsportazioneExcel
+from .riepilogo import RiepilogoStock
 
 __all__ = [
     'Veicolo',
     'JatoModel', 
     'Glossario',
     'PatternCarburante',
-    'Elaborazione'
+    'Elaborazione',
+    'MatchCache',
+    'EsportazioneExcel',
+    'RiepilogoStock'
 ]
 
+# Colonne aggiunte dopo la prima versione: (tabella, colonna, tipo SQL)
+# create_all() crea solo tabelle mancanti, non aggiunge colonne
+COLONNE_AGGIUNTE = [
+    ('elaborazioni', 'match_cache_hit', 'INTEGER DEFAULT 0'),
+    ('elaborazioni', 'match_cache_hit_rate', 'FLOAT'),
+    ('elaborazioni', 'veicoli_nuovi', 'INTEGER'),
+    ('elaborazioni', 'veicoli_modificati', 'INTEGER'),
+    ('elaborazioni', 'veicoli_invariati', 'INTEGER'),
+    ('elaborazioni', 'veicoli_usciti', 'INTEGER'),
+    ('elaborazioni', 'tempi_fasi', 'JSON'),
+    ('veicoli', 'hash_riga', 'VARCHAR(40)'),
+    ('veicoli', 'variazione', 'VARCHAR(12)'),
+]
+
+# Indici aggiunti dopo la prima versione: (tabella, nome indice del modello)
+INDICI_AGGIUNTI = [
+    ('veicoli', 'idx_veicoli_data_id'),
+]
+
+
+def aggiorna_schema(db):
+    """
+    Aggiunge le colonne e gli indici mancanti alle tabelle esistenti
+    
+    Args:
+        db: Istanza SQLAlchemy
+        
+    Returns:
+        list: Colonne aggiunte ("tabella.colonna") e indici ("indice nome")
+    """
+    inspector = db.inspect(db.engine)
+    tabelle = set(inspector.get_table_names())
+    aggiunte = []
+    
+    for tabella, colonna, tipo in COLONNE_AGGIUNTE:
+        if tabella not in tabelle:
+            continue
+        esistenti = {c['name'] for c in inspector.get_columns(tabella)}
+        if colonna not in esistenti:
+            db.session.execute(db.text(f"ALTER TABLE {tabella} ADD COLUMN {colonna} {tipo}"))
+            aggiunte.append(f"{tabella}.{colonna}")
+    
+    db.session.commit()
+    
+    for tabella, nome in INDICI_AGGIUNTI:
+        if tabella not in tabelle:
+            continue
+        esistenti = {i['name'] for i in inspector.get_indexes(tabella)}
+        if nome not in esistenti:
+            indice = next(i for i in db.metadata.tables[tabella].indexes if i.name == nome)
+            indice.create(db.engine)
+            aggiunte.append(f"indice {nome}")
+    
+    return aggiunte
+
 
 def init_database(app):
     """
@@ -33,6 +103,22 @@ def init_database(app):
         # Crea tutte le tabelle
         db.create_all()
         
+        # Colonne nuove su tabelle già esistenti
+        for colonna in aggiorna_schema(db):
+            print(f"  ✔ Schema aggiornato: {colonna}")
+        
+        # Indici GIN pg_trgm per la ricerca (solo PostgreSQL)
+        from .ricerca import crea_indici_ricerca
+        indici = crea_indici_ricerca()
+        if indici:
+            print(f"  ✔ Indici ricerca: {len(indici)}")
+        
+        # Riepilogo stock (tabella nuova su database con veicoli)
+        if RiepilogoStock.query.first() is None:
+            righe = RiepilogoStock.ricalcola()
+            if righe:
+                print(f"  ✔ Riepilogo stock: {righe} righe")
+        
         # Ottimizzazioni SQLite aggiuntive
         if 'sqlite' in app.config.get('SQLALCHEMY_DATABASE_URI', ''):
             db.session.execute(db.text("PRAGMA journal_mode=WAL"))
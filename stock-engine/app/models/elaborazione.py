@@ -1,11 +1,17 @@
 # =============================================================================
 # STOCK ENGINE - Modello Elaborazione
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.3.0
+# Data: 19 ottobre 2026
 #
 # Tabella che contiene il log di tutte le elaborazioni eseguite,
 # con statistiche e riferimento al file Excel generato.
+#
+# v1.1.0: statistiche cache match (match_cache_hit, match_cache_hit_rate)
+# v1.2.0: variazioni rispetto all'import precedente (nuovi, modificati,
+#         invariati, usciti)
+# v1.3.0: tempi_fasi (JSON con tempi, righe/s, memoria e query per fase);
+#         segna_errore() al posto di errore(), che nascondeva la colonna
 # =============================================================================
 
 from datetime import datetime
@@ -44,8 +50,19 @@ class Elaborazione(db.Model):
     veicoli_no_match = db.Column(db.Integer, default=0)
     match_rate = db.Column(db.Float)
     
+    # Cache match: veicoli serviti senza rifare il match
+    match_cache_hit = db.Column(db.Integer, default=0)
+    match_cache_hit_rate = db.Column(db.Float)
+    
+    # Variazioni rispetto all'import precedente (per VIN)
+    veicoli_nuovi = db.Column(db.Integer)
+    veicoli_modificati = db.Column(db.Integer)
+    veicoli_invariati = db.Column(db.Integer)
+    veicoli_usciti = db.Column(db.Integer)
+    
     # Performance
     durata_secondi = db.Column(db.Integer)
+    tempi_fasi = db.Column(db.JSON)  # MisureFasi.riepilogo()
     
     # Stato
     stato = db.Column(db.String(20), default='in_corso')  # in_corso, completata, errore
@@ -65,7 +82,9 @@ class Elaborazione(db.Model):
     
     def completa(self, veicoli_importati: int, veicoli_matched: int, 
                  veicoli_partial: int = 0, veicoli_no_match: int = 0,
-                 file_excel: str = None, durata: int = None):
+                 file_excel: str = None, durata: int = None,
+                 match_cache_hit: int = None, veicoli_match: int = None,
+                 variazioni: dict = None):
         """
         Marca elaborazione come completata
         
@@ -76,6 +95,9 @@ class Elaborazione(db.Model):
             veicoli_no_match: Numero veicoli senza match
             file_excel: Path file Excel generato
             durata: Durata in secondi
+            match_cache_hit: Veicoli con esito match dalla cache
+            veicoli_match: Veicoli passati al matcher (default: importati)
+            variazioni: Conteggi {nuovi, modificati, invariati, usciti}
         """
         self.stato = 'completata'
         self.veicoli_importati = veicoli_importati
@@ -86,9 +108,21 @@ class Elaborazione(db.Model):
         self.file_excel_output = file_excel
         self.durata_secondi = durata
         
+        if match_cache_hit is not None:
+            if veicoli_match is None:
+                veicoli_match = veicoli_importati
+            self.match_cache_hit = match_cache_hit
+            self.match_cache_hit_rate = round((match_cache_hit / veicoli_match) * 100, 1) if veicoli_match > 0 else 0
+        
+        if variazioni:
+            self.veicoli_nuovi = variazioni.get('nuovi')
+            self.veicoli_modificati = variazioni.get('modificati')
+            self.veicoli_invariati = variazioni.get('invariati')
+            self.veicoli_usciti = variazioni.get('usciti')
+        
         db.session.commit()
     
-    def errore(self, messaggio: str):
+    def segna_errore(self, messaggio: str):
         """
         Marca elaborazione come fallita
         
@@ -111,7 +145,14 @@ class Elaborazione(db.Model):
             'veicoli_partial': self.veicoli_partial,
             'veicoli_no_match': self.veicoli_no_match,
             'match_rate': self.match_rate,
+            'match_cache_hit': self.match_cache_hit,
+            'match_cache_hit_rate': self.match_cache_hit_rate,
+            'veicoli_nuovi': self.veicoli_nuovi,
+            'veicoli_modificati': self.veicoli_modificati,
+            'veicoli_invariati': self.veicoli_invariati,
+            'veicoli_usciti': self.veicoli_usciti,
             'durata_secondi': self.durata_secondi,
+            'tempi_fasi': self.tempi_fasi,
             'stato': self.stato,
             'errore': self.errore,
             'file_excel': self.file_excel_output,
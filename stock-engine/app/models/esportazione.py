@@ -0,0 +1,130 @@
+# =============================================================================
+# STOCK ENGINE - Modello Esportazione Excel
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Tabella che lega ogni file Excel generato (noleggiatore, data) ai dati da
+# cui è stato costruito: elaborazione e versione delle righe veicolo.
+# Il file va rigenerato solo quando la versione corrente è diversa.
+# =============================================================================
+
+import hashlib
+import json
+from pathlib import Path
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+from app import db
+
+from .upsert import insert_upsert
+from .veicolo import Veicolo
+
+
+class EsportazioneExcel(db.Model):
+    """
+    File Excel generato per noleggiatore e data
+    
+    - versione_dati: SHA1 di numero righe, id massimo, ultimo aggiornamento
+      ed elaborazione dei veicoli al momento della generazione (usato anche
+      come ETag)
+    """
+    
+    __tablename__ = 'esportazioni_excel'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    noleggiatore = db.Column(db.String(20), nullable=False)
+    data_import = db.Column(db.Date, nullable=False)
+    
+    file = db.Column(db.String(255), nullable=False)
+    elaborazione_id = db.Column(db.Integer, db.ForeignKey('elaborazioni.id'))
+    versione_dati = db.Column(db.String(40), nullable=False)
+    veicoli = db.Column(db.Integer)
+    generato_il = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('noleggiatore', 'data_import', name='uq_esportazione_noleggiatore_data'),
+    )
+    
+    # ==========================================================================
+    # METODI
+    # ==========================================================================
+    
+    @staticmethod
+    def versione_corrente(noleggiatore: str, data: date) -> Tuple[Optional[int], str, int]:
+        """
+        Versione delle righe veicolo di un noleggiatore/data (una query)
+        
+        Cambia con ogni INSERT, DELETE o UPDATE delle righe (aggiornato_il).
+        
+        Returns:
+            tuple: (elaborazione_id, versione_dati, numero veicoli)
+        """
+        veicoli, id_max, aggiornato, elaborazione_id = db.session.query(
+            db.func.count(Veicolo.id),
+            db.func.max(Veicolo.id),
+            db.func.max(Veicolo.aggiornato_il),
+            db.func.max(Veicolo.elaborazione_id),
+        ).filter(
+            Veicolo.noleggiatore == noleggiatore.upper(),
+            Veicolo.data_import == data
+        ).one()
+        
+        dati = json.dumps([veicoli, id_max, aggiornato, elaborazione_id], default=str)
+        return elaborazione_id, hashlib.sha1(dati.encode('utf-8')).hexdigest(), veicoli
+    
+    @classmethod
+    def cerca(cls, noleggiatore: str, data: date) -> Optional['EsportazioneExcel']:
+        """Esportazione registrata per noleggiatore e data"""
+        return cls.query.filter_by(noleggiatore=noleggiatore.upper(), data_import=data).first()
+    
+    @classmethod
+    def registra(cls, noleggiatore: str, data: date, file: str, versione: Tuple) -> 'EsportazioneExcel':
+        """
+        Registra (o aggiorna) il file generato
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data: Data import
+            file: Percorso file
+            versione: Risultato di versione_corrente() letto prima della generazione
+        """
+        elaborazione_id, versione_dati, veicoli = versione
+        valori = {
+            'noleggiatore': noleggiatore.upper(),
+            'data_import': data,
+            'file': str(file),
+            'elaborazione_id': elaborazione_id,
+            'versione_dati': versione_dati,
+            'veicoli': veicoli,
+            'generato_il': datetime.utcnow(),
+        }
+        
+        stmt = insert_upsert(cls).values(**valori)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['noleggiatore', 'data_import'],
+            set_={k: v for k, v in valori.items() if k not in ('noleggiatore', 'data_import')}
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+        
+        return cls.cerca(noleggiatore, data)
+    
+    def aggiornata(self, versione: Tuple) -> bool:
+        """True se il file esiste ed è stato generato dalla versione indicata"""
+        return self.versione_dati == versione[1] and Path(self.file).exists()
+    
+    def to_dict(self):
+        """Converte in dizionario"""
+        return {
+            'noleggiatore': self.noleggiatore,
+            'data_import': self.data_import.isoformat() if self.data_import else None,
+            'file': self.file,
+            'elaborazione_id': self.elaborazione_id,
+            'versione_dati': self.versione_dati,
+            'veicoli': self.veicoli,
+            'generato_il': self.generato_il.isoformat() if self.generato_il else None,
+        }
+    
+    def __repr__(self):
+        return f'<EsportazioneExcel {self.noleggiatore} {self.data_import}>'
@@ -1,11 +1,15 @@
 # =============================================================================
 # STOCK ENGINE - Modello JATO
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.2.0
+# Data: 19 ottobre 2026
 #
 # Tabella che contiene i dati del database JATO, usata per il matching
 # e l'arricchimento dei veicoli stock.
+#
+# v1.1.0: get_statistics() con una sola query (GROUP BY marca, alimentazione)
+# v1.2.0: search_by_brand() con indice trigrammi e ordinamento per similarità
+#         su PostgreSQL
 # =============================================================================
 
 from app import db
@@ -110,8 +114,10 @@ class JatoModel(db.Model):
         Returns:
             list: Lista modelli trovati
         """
-        return cls.query.filter(
-            cls.brand_description.ilike(f'%{brand}%')
+        from .ricerca import filtra_testo
+        
+        return filtra_testo(
+            cls.query, [(cls.brand_description, brand)], ordina_per=cls.id
         ).limit(limit).all()
     
     @classmethod
@@ -156,23 +162,24 @@ class JatoModel(db.Model):
         """Statistiche database JATO"""
         from sqlalchemy import func
         
-        total = cls.query.count()
-        
-        brands = db.session.query(
+        # Un solo GROUP BY: totali per marca e alimentazione sommati qui
+        gruppi = db.session.query(
             cls.brand_description,
-            func.count(cls.id)
-        ).group_by(cls.brand_description).all()
-        
-        fuels = db.session.query(
             cls.alimentazione,
             func.count(cls.id)
-        ).group_by(cls.alimentazione).all()
+        ).group_by(cls.brand_description, cls.alimentazione).all()
+        
+        brands = {}
+        fuels = {}
+        for brand, alimentazione, conteggio in gruppi:
+            brands[brand] = brands.get(brand, 0) + conteggio
+            fuels[alimentazione] = fuels.get(alimentazione, 0) + conteggio
         
         return {
-            'totale_modelli': total,
+            'totale_modelli': sum(brands.values()),
             'marche_uniche': len(brands),
-            'per_marca': {b[0]: b[1] for b in brands if b[0]},
-            'per_alimentazione': {f[0]: f[1] for f in fuels if f[0]},
+            'per_marca': {b: n for b, n in brands.items() if b},
+            'per_alimentazione': {f: n for f, n in fuels.items() if f},
         }
     
     def __repr__(self):
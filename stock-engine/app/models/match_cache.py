@@ -0,0 +1,174 @@
+# =============================================================================
+# STOCK ENGINE - Modello Match Cache
+# =============================================================================
+# Versione: 1.0.2
+# Data: 19 ottobre 2026
+#
+# Tabella che memorizza l'esito del match JATO per ogni veicolo "impronta"
+# (noleggiatore, marca, description, co2 normalizzati), così che le
+# description che si ripetono giorno dopo giorno non vengano rimatchate.
+#
+# Ogni riga ha la versione dei dati di match (JATO, pattern carburante,
+# glossario): quando cambia la versione le righe vecchie vengono scartate.
+#
+# v1.0.1: salva() con INSERT sulla tabella (un solo executemany)
+# v1.0.2: salva() e pulisci() con commit=False (commit nel chiamante)
+# =============================================================================
+
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from app import db
+
+from .upsert import insert_upsert
+
+
+class MatchCache(db.Model):
+    """
+    Esito match JATO memorizzato
+    
+    - chiave: SHA1 dell'impronta veicolo
+    - versione: SHA1 di JATO + pattern carburante + glossario
+    - esito: campi impostati dal matcher (JSON)
+    """
+    
+    __tablename__ = 'match_cache'
+    
+    chiave = db.Column(db.String(40), primary_key=True)
+    versione = db.Column(db.String(40), nullable=False, index=True)
+    esito = db.Column(db.Text, nullable=False)
+    creato_il = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Chiavi per IN (...) (limite parametri SQLite)
+    BLOCCO_QUERY = 500
+    
+    # ==========================================================================
+    # CHIAVI E VERSIONE
+    # ==========================================================================
+    
+    @staticmethod
+    def impronta(veicolo: Dict) -> str:
+        """
+        Chiave di un veicolo
+        
+        Maiuscolo e spazi compattati: il matcher ignora maiuscole e
+        spaziature, quindi description che differiscono solo per quello
+        condividono l'esito.
+        """
+        def testo(valore):
+            return ' '.join(str(valore).upper().split()) if valore else ''
+        
+        parti = [
+            testo(veicolo.get('noleggiatore')),
+            testo(veicolo.get('marca')),
+            testo(veicolo.get('description')),
+            veicolo.get('co2'),
+        ]
+        return hashlib.sha1(json.dumps(parti, default=str).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def calcola_versione(versione_jato, patterns: List) -> str:
+        """
+        Versione dei dati da cui dipende il match
+        
+        Cambia quando cambiano i modelli JATO, i pattern carburante attivi o
+        le regole glossario attive.
+        
+        Args:
+            versione_jato: JatoIndex.versione
+            patterns: FuelMatcher.patterns
+        """
+        from .glossario import Glossario
+        
+        glossario = db.session.query(
+            Glossario.id, Glossario.noleggiatore, Glossario.cerca,
+            Glossario.sostituisci, Glossario.colonna
+        ).filter(Glossario.attivo == True).order_by(Glossario.id).all()  # noqa: E712
+        
+        dati = json.dumps([versione_jato, patterns, [list(r) for r in glossario]], default=str)
+        return hashlib.sha1(dati.encode('utf-8')).hexdigest()
+    
+    # ==========================================================================
+    # LETTURA / SCRITTURA
+    # ==========================================================================
+    
+    @classmethod
+    def cerca(cls, chiavi: Iterable[str], versione: str) -> Dict[str, Dict]:
+        """
+        Esiti memorizzati per le chiavi indicate
+        
+        Returns:
+            dict: {chiave: esito}
+        """
+        chiavi = list(set(chiavi))
+        trovati = {}
+        
+        for i in range(0, len(chiavi), cls.BLOCCO_QUERY):
+            righe = db.session.query(cls.chiave, cls.esito).filter(
+                cls.versione == versione,
+                cls.chiave.in_(chiavi[i:i + cls.BLOCCO_QUERY])
+            ).all()
+            for chiave, esito in righe:
+                trovati[chiave] = json.loads(esito)
+        
+        return trovati
+    
+    @classmethod
+    def salva(cls, esiti: Dict[str, Dict], versione: str, commit: bool = True):
+        """
+        Memorizza nuovi esiti (INSERT multiplo, chiavi già presenti ignorate)
+        
+        Args:
+            esiti: {chiave: esito}
+            versione: Versione corrente
+            commit: False se il chiamante committa (es. nella transazione
+                    di salvataggio dell'elaborazione)
+        """
+        if not esiti:
+            return
+        
+        adesso = datetime.utcnow()
+        righe = [
+            {'chiave': chiave, 'versione': versione, 'esito': json.dumps(esito), 'creato_il': adesso}
+            for chiave, esito in esiti.items()
+        ]
+        
+        stmt = insert_upsert(cls.__table__).on_conflict_do_nothing(index_elements=['chiave'])
+        
+        db.session.execute(stmt, righe)
+        if commit:
+            db.session.commit()
+    
+    @classmethod
+    def pulisci(cls, versione: str, commit: bool = True) -> int:
+        """
+        Elimina gli esiti di versioni precedenti
+        
+        Args:
+            versione: Versione corrente (le altre sono eliminate)
+            commit: False se il chiamante committa
+        
+        Returns:
+            int: Righe eliminate
+        """
+        eliminati = cls.query.filter(cls.versione != versione).delete(synchronize_session=False)
+        if commit:
+            db.session.commit()
+        return eliminati
+    
+    @classmethod
+    def get_statistics(cls):
+        """Statistiche cache match"""
+        from sqlalchemy import func
+        
+        versioni = db.session.query(cls.versione, func.count(cls.chiave)).group_by(cls.versione).all()
+        
+        return {
+            'totale_esiti': sum(n for _, n in versioni),
+            'versioni': len(versioni),
+        }
+    
+    def __repr__(self):
+        return f'<MatchCache {self.chiave[:8]} v{self.versione[:8]}>'
@@ -1,11 +1,13 @@
 # =============================================================================
 # STOCK ENGINE - Modello Pattern Carburante
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Tabella che contiene i pattern per identificare il tipo di alimentazione
 # dalla descrizione del veicolo (es. "180D" → DIESEL, "TSI" → PETROL).
+#
+# v1.1.0: identifica_fuel usa i pattern compilati (services/fuel_matcher)
 # =============================================================================
 
 from app import db
@@ -54,7 +56,7 @@ class PatternCarburante(db.Model):
             list: Pattern ordinati per priorità decrescente
         """
         return cls.query.filter_by(attivo=True).order_by(
-            cls.priorita.desc()
+            cls.priorita.desc(), cls.id
         ).all()
     
     @classmethod
@@ -68,25 +70,13 @@ class PatternCarburante(db.Model):
         Returns:
             str: Tipo alimentazione o None
         """
-        import re
+        from app.services.fuel_matcher import get_fuel_matcher
         
         if not description:
             return None
         
-        description_upper = description.upper()
-        
-        # Carica pattern ordinati per priorità
-        patterns = cls.get_all_patterns()
-        
-        for p in patterns:
-            # Cerca pattern come parola intera o parte di parola
-            if re.search(r'\b' + re.escape(p.pattern.upper()) + r'\b', description_upper):
-                return p.fuel_type
-            # Cerca anche senza word boundary per pattern come "180D"
-            if p.pattern.upper() in description_upper:
-                return p.fuel_type
-        
-        return None
+        # Pattern attivi compilati una volta (ricompilati se modificati)
+        return get_fuel_matcher(verifica=False).identifica(description)
     
     @classmethod
     def normalizza_fuel(cls, fuel_raw: str) -> str:
@@ -0,0 +1,83 @@
+# =============================================================================
+# STOCK ENGINE - Ricerca testuale
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Ricerche per sottostringa (ILIKE '%...%') su veicoli e modelli JATO.
+# Su PostgreSQL le colonne cercate hanno indici GIN pg_trgm, che servono
+# anche gli ILIKE con jolly iniziale, e i risultati sono ordinati per
+# similarità. Su SQLite la ricerca resta un ILIKE senza ordinamento.
+# =============================================================================
+
+from typing import List, Optional, Tuple
+
+from app import db
+
+# Indici trigrammi: (nome, tabella, colonna)
+INDICI_TRIGRAMMI = [
+    ('idx_veicoli_marca_trgm', 'veicoli', 'marca'),
+    ('idx_veicoli_modello_trgm', 'veicoli', 'modello'),
+    ('idx_veicoli_description_gin', 'veicoli', 'description'),
+    ('idx_jato_brand_trgm', 'jato_models', 'brand_description'),
+    ('idx_jato_brand_normalized_trgm', 'jato_models', 'brand_normalized'),
+    ('idx_jato_description_trgm', 'jato_models', 'jato_product_description'),
+]
+
+
+def usa_trigrammi() -> bool:
+    """True se il database supporta pg_trgm (PostgreSQL)"""
+    return db.engine.dialect.name == 'postgresql'
+
+
+def crea_indici_ricerca() -> List[str]:
+    """
+    Crea estensione pg_trgm e indici GIN (solo PostgreSQL)
+    
+    Returns:
+        list: Indici verificati/creati (vuota su altri database)
+    """
+    if not usa_trigrammi():
+        return []
+    
+    db.session.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for nome, tabella, colonna in INDICI_TRIGRAMMI:
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS {nome} ON {tabella} USING gin ({colonna} gin_trgm_ops)"
+        ))
+    db.session.commit()
+    
+    return [nome for nome, _, _ in INDICI_TRIGRAMMI]
+
+
+def filtra_testo(query, filtri: List[Tuple], ordina_per: Optional[object] = None):
+    """
+    Applica filtri per sottostringa (case insensitive) a una query
+    
+    Su PostgreSQL ordina per similarità complessiva (pg_trgm) e poi per
+    'ordina_per'; altrove la query resta senza ordinamento aggiunto.
+    
+    Args:
+        query: Query SQLAlchemy
+        filtri: Coppie (colonna, testo); testi vuoti ignorati
+        ordina_per: Colonna di spareggio (es. id) per ordine stabile
+    
+    Returns:
+        Query filtrata
+    """
+    filtri = [(colonna, testo) for colonna, testo in filtri if testo]
+    
+    for colonna, testo in filtri:
+        query = query.filter(colonna.ilike(f'%{testo}%'))
+    
+    if filtri and usa_trigrammi():
+        similarita = [db.func.similarity(colonna, testo) for colonna, testo in filtri]
+        punteggio = similarita[0]
+        for valore in similarita[1:]:
+            punteggio = punteggio + valore
+        
+        query = query.order_by(punteggio.desc())
+        if ordina_per is not None:
+            query = query.order_by(ordina_per)
+    
+    return query
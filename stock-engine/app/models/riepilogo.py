@@ -0,0 +1,149 @@
+# =============================================================================
+# STOCK ENGINE - Modello Riepilogo Stock
+# =============================================================================
+# Versione: 1.0.1
+# Data: 19 ottobre 2026
+#
+# Tabella riassuntiva dei veicoli per noleggiatore e data (totale, matched,
+# partial, no match), aggiornata dalla pipeline dopo ogni salvataggio.
+# Dashboard, health check e statistiche API leggono da qui senza contare
+# la tabella veicoli.
+#
+# v1.0.1: aggiorna(commit=False) per scriverlo nella transazione dei veicoli
+# =============================================================================
+
+from datetime import date, datetime
+from typing import Dict
+
+from app import db
+
+from .upsert import insert_upsert
+from .veicolo import Veicolo
+
+
+class RiepilogoStock(db.Model):
+    """
+    Conteggi veicoli per noleggiatore e data import
+    """
+    
+    __tablename__ = 'riepilogo_stock'
+    
+    noleggiatore = db.Column(db.String(20), primary_key=True)
+    data_import = db.Column(db.Date, primary_key=True)
+    
+    totale = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Integer, nullable=False, default=0)
+    partial = db.Column(db.Integer, nullable=False, default=0)
+    no_match = db.Column(db.Integer, nullable=False, default=0)
+    
+    aggiornato_il = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # ==========================================================================
+    # AGGIORNAMENTO
+    # ==========================================================================
+    
+    @classmethod
+    def aggiorna(cls, noleggiatore: str, data: date, commit: bool = True):
+        """
+        Ricalcola il riepilogo di un noleggiatore/data (una query sui veicoli
+        di quel giorno) e lo salva
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data: Data import
+            commit: False se il chiamante committa insieme ai veicoli
+        """
+        noleggiatore = noleggiatore.upper()
+        
+        totale, matched, partial, no_match = db.session.query(
+            *Veicolo.colonne_conteggio()
+        ).filter(
+            Veicolo.noleggiatore == noleggiatore,
+            Veicolo.data_import == data
+        ).one()
+        
+        if not totale:
+            cls.query.filter_by(noleggiatore=noleggiatore, data_import=data).delete()
+            if commit:
+                db.session.commit()
+            return
+        
+        valori = {
+            'totale': totale,
+            'matched': matched,
+            'partial': partial,
+            'no_match': no_match,
+            'aggiornato_il': datetime.utcnow(),
+        }
+        
+        stmt = insert_upsert(cls).values(noleggiatore=noleggiatore, data_import=data, **valori)
+        stmt = stmt.on_conflict_do_update(index_elements=['noleggiatore', 'data_import'], set_=valori)
+        db.session.execute(stmt)
+        if commit:
+            db.session.commit()
+    
+    @classmethod
+    def ricalcola(cls) -> int:
+        """
+        Ricostruisce tutto il riepilogo dalla tabella veicoli (GROUP BY)
+        
+        Returns:
+            int: Righe riepilogo scritte
+        """
+        righe = db.session.query(
+            Veicolo.noleggiatore, Veicolo.data_import, *Veicolo.colonne_conteggio()
+        ).group_by(Veicolo.noleggiatore, Veicolo.data_import).all()
+        
+        adesso = datetime.utcnow()
+        cls.query.delete()
+        
+        if righe:
+            db.session.execute(cls.__table__.insert(), [
+                {
+                    'noleggiatore': noleggiatore,
+                    'data_import': data,
+                    'totale': totale,
+                    'matched': matched,
+                    'partial': partial,
+                    'no_match': no_match,
+                    'aggiornato_il': adesso,
+                }
+                for noleggiatore, data, totale, matched, partial, no_match in righe
+            ])
+        
+        db.session.commit()
+        
+        return len(righe)
+    
+    # ==========================================================================
+    # LETTURA
+    # ==========================================================================
+    
+    @classmethod
+    def get_statistics(cls, noleggiatore: str = None, data: date = None) -> Dict:
+        """
+        Statistiche veicoli (stesso formato di Veicolo.get_statistics)
+        
+        Args:
+            noleggiatore: Filtro noleggiatore (opzionale)
+            data: Filtro data (opzionale)
+            
+        Returns:
+            dict: Statistiche
+        """
+        query = db.session.query(
+            db.func.sum(cls.totale),
+            db.func.sum(cls.matched),
+            db.func.sum(cls.partial),
+            db.func.sum(cls.no_match),
+        )
+        
+        if noleggiatore:
+            query = query.filter(cls.noleggiatore == noleggiatore.upper())
+        if data:
+            query = query.filter(cls.data_import == data)
+        
+        return Veicolo.statistiche_da_conteggi(*(int(v or 0) for v in query.one()))
+    
+    def __repr__(self):
+        return f'<RiepilogoStock {self.noleggiatore} {self.data_import}: {self.totale}>'
@@ -0,0 +1,43 @@
+# =============================================================================
+# STOCK ENGINE - INSERT con gestione conflitti
+# =============================================================================
+# Versione: 1.0.1
+# Data: 19 ottobre 2026
+#
+# INSERT ... ON CONFLICT per i database supportati (PostgreSQL, SQLite),
+# usato dalle scritture massive (veicoli, cache match).
+#
+# v1.0.1: accetta anche la Table. Le scritture massive passano la tabella:
+#         con il modello ORM l'INSERT con lista di righe segue il percorso
+#         bulk dell'ORM, che toglie i None e divide il lotto per colonne
+#         presenti (fino a uno statement per riga)
+# =============================================================================
+
+from app import db
+
+
+def insert_upsert(modello):
+    """
+    Costrutto INSERT del dialetto corrente, con on_conflict_do_nothing()
+    e on_conflict_do_update() disponibili
+    
+    Args:
+        modello: Modello SQLAlchemy o Table (per INSERT a lotti
+            passare modello.__table__)
+    
+    Returns:
+        Insert del dialetto PostgreSQL o SQLite
+    
+    Raises:
+        ValueError: Database non supportato
+    """
+    dialetto = db.engine.dialect.name
+    
+    if dialetto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialetto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"INSERT ... ON CONFLICT non supportato per {dialetto}")
+    
+    return insert(modello)
@@ -1,16 +1,33 @@
 # =============================================================================
 # STOCK ENGINE - Modello Veicolo
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.4.1
+# Data: 19 ottobre 2026
 #
 # Tabella principale che contiene tutti i veicoli stock importati
 # dai vari noleggiatori, con dati originali e arricchiti JATO.
+#
+# v1.1.0: upsert() - scrittura massiva con INSERT ... ON CONFLICT
+#         sul vincolo uq_veicolo_giornaliero
+# v1.2.0: import differenziale - hash_riga, variazione, copia dei veicoli
+#         invariati, stato 'uscito', get_variazioni()
+# v1.3.0: get_statistics() con una sola query (aggregati condizionali)
+# v1.4.0: indice (data_import, id) per la paginazione keyset
+# v1.4.1: upsert() sulla tabella: un executemany per blocco anche con
+#         colonne None (None → default della colonna, come prima)
 # =============================================================================
 
+import json
+import hashlib
 from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, literal, or_, select
+
 from app import db
 
+from .upsert import insert_upsert
+
 
 class Veicolo(db.Model):
     """
@@ -113,7 +130,7 @@ class Veicolo(db.Model):
     # CAMPI BUSINESS
     # ==========================================================================
     neopatentati = db.Column(db.String(5), default='ND')  # SI, NO, ND
-    stato = db.Column(db.String(20), default='disponibile')  # disponibile, venduto, riservato
+    stato = db.Column(db.String(20), default='disponibile')  # disponibile, venduto, riservato, uscito
     
     # Promo/Note
     is_promo = db.Column(db.Boolean, default=False)
@@ -128,6 +145,15 @@ class Veicolo(db.Model):
     # Riferimento elaborazione
     elaborazione_id = db.Column(db.Integer, db.ForeignKey('elaborazioni.id'))
     
+    # ==========================================================================
+    # IMPORT DIFFERENZIALE
+    # ==========================================================================
+    # Hash della riga importata (contenuto file + versione dati match)
+    hash_riga = db.Column(db.String(40))
+    
+    # Rispetto all'import precedente: NUOVO, MODIFICATO, INVARIATO
+    variazione = db.Column(db.String(12))
+    
     # ==========================================================================
     # VINCOLI
     # ==========================================================================
@@ -137,6 +163,8 @@ class Veicolo(db.Model):
         # Indice composto per query frequenti
         db.Index('idx_noleggiatore_data', 'noleggiatore', 'data_import'),
         db.Index('idx_marca_modello', 'marca', 'modello'),
+        # Paginazione keyset API (data_import, id)
+        db.Index('idx_veicoli_data_id', 'data_import', 'id'),
     )
     
     # ==========================================================================
@@ -189,6 +217,7 @@ class Veicolo(db.Model):
             'neopatentati': self.neopatentati,
             'stato': self.stato,
             'is_promo': self.is_promo,
+            'variazione': self.variazione,
         }
         
         if include_originali:
@@ -260,25 +289,317 @@ class Veicolo(db.Model):
         Returns:
             dict: Statistiche
         """
-        query = cls.query
+        query = db.session.query(*cls.colonne_conteggio())
         
         if noleggiatore:
-            query = query.filter_by(noleggiatore=noleggiatore.upper())
+            query = query.filter(cls.noleggiatore == noleggiatore.upper())
         if data:
-            query = query.filter_by(data_import=data)
-        
-        total = query.count()
-        matched = query.filter_by(match_status='MATCHED').count()
-        partial = query.filter_by(match_status='PARTIAL').count()
-        no_match = query.filter_by(match_status='NO_MATCH').count()
+            query = query.filter(cls.data_import == data)
         
+        return cls.statistiche_da_conteggi(*query.one())
+    
+    @classmethod
+    def colonne_conteggio(cls) -> list:
+        """
+        Conteggi totale / MATCHED / PARTIAL / NO_MATCH come aggregati
+        condizionali (una sola scansione)
+        """
+        return [
+            func.count(cls.id),
+            func.count(db.case((cls.match_status == 'MATCHED', 1))),
+            func.count(db.case((cls.match_status == 'PARTIAL', 1))),
+            func.count(db.case((cls.match_status == 'NO_MATCH', 1))),
+        ]
+    
+    @staticmethod
+    def statistiche_da_conteggi(total, matched, partial, no_match) -> Dict:
+        """Dizionario statistiche dai conteggi di colonne_conteggio()"""
+        total, matched = total or 0, matched or 0
         return {
             'totale': total,
             'matched': matched,
-            'partial': partial,
-            'no_match': no_match,
+            'partial': partial or 0,
+            'no_match': no_match or 0,
             'match_rate': round((matched / total) * 100, 1) if total > 0 else 0
         }
     
+    # ==========================================================================
+    # IMPORT DIFFERENZIALE
+    # ==========================================================================
+    
+    # Stato dei veicoli non più presenti nell'import successivo
+    STATO_USCITO = 'uscito'
+    
+    # Campi della riga importata esclusi dall'hash (cambiano ogni giorno)
+    CAMPI_ESCLUSI_HASH = ('noleggiatore', 'data_import', 'riga_excel', 'hash_riga', 'variazione')
+    
+    # VIN per IN (...) (limite parametri SQLite)
+    BLOCCO_VIN = 500
+    
+    @classmethod
+    def calcola_hash_riga(cls, riga: Dict, versione: str = '') -> str:
+        """
+        Hash del contenuto di una riga importata
+        
+        Args:
+            riga: Riga come restituita dall'importer
+            versione: Versione dati match (MatchCache.calcola_versione): se
+                      glossario, pattern o JATO cambiano cambia anche l'hash
+        """
+        contenuto = {k: v for k, v in riga.items() if k not in cls.CAMPI_ESCLUSI_HASH}
+        dati = json.dumps([contenuto, versione], sort_keys=True, default=str)
+        return hashlib.sha1(dati.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def import_precedente(cls, noleggiatore: str, data: date) -> Optional[date]:
+        """Data dell'ultimo import del noleggiatore prima di data"""
+        return db.session.query(func.max(cls.data_import)).filter(
+            cls.noleggiatore == noleggiatore.upper(),
+            cls.data_import < data
+        ).scalar()
+    
+    @classmethod
+    def righe_import(cls, noleggiatore: str, data: date) -> Dict[str, tuple]:
+        """
+        VIN di un import con hash e stato match
+        
+        Returns:
+            dict: {vin: (hash_riga, match_status)}
+        """
+        righe = db.session.query(cls.vin, cls.hash_riga, cls.match_status).filter(
+            cls.noleggiatore == noleggiatore.upper(),
+            cls.data_import == data,
+            cls.vin.isnot(None)
+        )
+        return {vin: (hash_riga, match_status) for vin, hash_riga, match_status in righe}
+    
+    @classmethod
+    def copia_invariati(cls, noleggiatore: str, data_da: date, data_a: date,
+                        vins: Iterable[str], elaborazione_id: int = None) -> int:
+        """
+        Copia i veicoli invariati da un import al successivo (INSERT ... SELECT)
+        
+        Nessun dato passa da Python: normalizzazione, match e arricchimento
+        restano quelli dell'import precedente.
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data_da: Data import precedente
+            data_a: Data nuovo import
+            vins: VIN da copiare
+            elaborazione_id: Elaborazione corrente
+            
+        Returns:
+            int: Veicoli copiati
+        """
+        noleggiatore = noleggiatore.upper()
+        vins = list(vins)
+        adesso = datetime.utcnow()
+        
+        sostituiti = {
+            'data_import': literal(data_a, cls.data_import.type),
+            'elaborazione_id': literal(elaborazione_id, cls.elaborazione_id.type),
+            'variazione': literal('INVARIATO'),
+            'elaborato_il': literal(adesso, cls.elaborato_il.type),
+            'aggiornato_il': literal(adesso, cls.aggiornato_il.type),
+        }
+        colonne = [c for c in cls.__table__.columns if c.name != 'id']
+        valori = [sostituiti.get(c.name, c) for c in colonne]
+        
+        copiati = 0
+        for i in range(0, len(vins), cls.BLOCCO_VIN):
+            blocco = vins[i:i + cls.BLOCCO_VIN]
+            
+            # Rielaborazione nello stesso giorno: le righe già presenti sono sostituite
+            cls.query.filter(
+                cls.noleggiatore == noleggiatore,
+                cls.data_import == data_a,
+                cls.vin.in_(blocco)
+            ).delete(synchronize_session=False)
+            
+            sorgente = select(*valori).where(
+                cls.noleggiatore == noleggiatore,
+                cls.data_import == data_da,
+                cls.vin.in_(blocco)
+            )
+            risultato = db.session.execute(
+                cls.__table__.insert().from_select([c.name for c in colonne], sorgente)
+            )
+            copiati += risultato.rowcount
+        
+        return copiati
+    
+    @classmethod
+    def segna_usciti(cls, noleggiatore: str, data: date, vins: Iterable[str]) -> int:
+        """
+        Marca come usciti dallo stock i veicoli di un import
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data: Data import in cui erano presenti l'ultima volta
+            vins: VIN non più presenti
+            
+        Returns:
+            int: Veicoli aggiornati
+        """
+        vins = list(vins)
+        aggiornati = 0
+        
+        for i in range(0, len(vins), cls.BLOCCO_VIN):
+            aggiornati += cls.query.filter(
+                cls.noleggiatore == noleggiatore.upper(),
+                cls.data_import == data,
+                cls.vin.in_(vins[i:i + cls.BLOCCO_VIN])
+            ).update({'stato': cls.STATO_USCITO}, synchronize_session=False)
+        
+        return aggiornati
+    
+    @classmethod
+    def get_variazioni(cls, noleggiatore: str, data: date) -> Dict:
+        """
+        Variazioni di stock di un import rispetto al precedente
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data: Data import
+            
+        Returns:
+            dict: Veicoli nuovi, modificati e usciti (to_dict) e conteggi
+        """
+        noleggiatore = noleggiatore.upper()
+        precedente = cls.import_precedente(noleggiatore, data)
+        
+        entrati = cls.query.filter(
+            cls.noleggiatore == noleggiatore,
+            cls.data_import == data,
+            cls.variazione.in_(['NUOVO', 'MODIFICATO'])
+        ).order_by(cls.id).all()
+        
+        usciti = []
+        if precedente:
+            presenti = select(cls.vin).where(
+                cls.noleggiatore == noleggiatore,
+                cls.data_import == data,
+                cls.vin.isnot(None)
+            )
+            usciti = cls.query.filter(
+                cls.noleggiatore == noleggiatore,
+                cls.data_import == precedente,
+                cls.vin.isnot(None),
+                cls.vin.notin_(presenti)
+            ).order_by(cls.id).all()
+        
+        nuovi = [v.to_dict() for v in entrati if v.variazione == 'NUOVO']
+        modificati = [v.to_dict() for v in entrati if v.variazione == 'MODIFICATO']
+        
+        return {
+            'noleggiatore': noleggiatore,
+            'data': data.isoformat(),
+            'data_precedente': precedente.isoformat() if precedente else None,
+            'conteggi': {
+                'nuovi': len(nuovi),
+                'modificati': len(modificati),
+                'usciti': len(usciti),
+            },
+            'nuovi': nuovi,
+            'modificati': modificati,
+            'usciti': [v.to_dict() for v in usciti],
+        }
+    
+    # ==========================================================================
+    # SCRITTURA MASSIVA
+    # ==========================================================================
+    
+    # Chiave del vincolo uq_veicolo_giornaliero
+    CHIAVE_GIORNALIERA = ('noleggiatore', 'vin', 'data_import')
+    
+    # Righe per statement
+    BLOCCO_UPSERT = 1000
+    
+    @classmethod
+    def upsert(cls, righe: List[Dict], elaborazione_id: int = None) -> int:
+        """
+        Inserisce o aggiorna veicoli (INSERT ... ON CONFLICT DO UPDATE)
+        
+        Chiave: (noleggiatore, vin, data_import). Vengono scritte le colonne
+        presenti nei dizionari; in aggiornamento le altre restano invariate.
+        Stessa chiave più volte nel lotto: vale l'ultima riga.
+        
+        I veicoli senza VIN non hanno una chiave (NULL è sempre distinto nel
+        vincolo): quelli già presenti per lo stesso noleggiatore e giorno
+        vengono sostituiti.
+        
+        Args:
+            righe: Dizionari veicolo (chiavi extra ignorate)
+            elaborazione_id: ID elaborazione da assegnare (opzionale)
+            
+        Returns:
+            int: Righe scritte
+        """
+        if not righe:
+            return 0
+        
+        oggi = date.today()
+        colonne_tabella = {c.name for c in cls.__table__.columns} - {'id'}
+        colonne = {k for riga in righe for k in riga if k in colonne_tabella}
+        colonne.update(cls.CHIAVE_GIORNALIERA)
+        colonne.add('neopatentati')
+        if elaborazione_id is not None:
+            colonne.add('elaborazione_id')
+        colonne = sorted(colonne)
+        
+        # None vale il default della colonna (stato, is_promo, ...), come
+        # quando l'INSERT passava dall'ORM che ometteva le chiavi None
+        predefiniti = {
+            c.name: c.default.arg(None) if c.default.is_callable else c.default.arg
+            for c in cls.__table__.columns
+            if c.name in colonne and c.default is not None
+            and (c.default.is_scalar or c.default.is_callable)
+        }
+        
+        con_vin = {}
+        senza_vin = []
+        for riga in righe:
+            valori = {c: riga.get(c) for c in colonne}
+            valori['data_import'] = riga.get('data_import', oggi)
+            valori['neopatentati'] = riga.get('neopatentati', 'ND')
+            if elaborazione_id is not None:
+                valori['elaborazione_id'] = elaborazione_id
+            for c, predefinito in predefiniti.items():
+                if valori[c] is None:
+                    valori[c] = predefinito
+            
+            if valori['vin'] is None:
+                senza_vin.append(valori)
+            else:
+                con_vin[tuple(valori[c] for c in cls.CHIAVE_GIORNALIERA)] = valori
+        
+        if senza_vin:
+            giorni = {(v['noleggiatore'], v['data_import']) for v in senza_vin}
+            cls.query.filter(
+                cls.vin.is_(None),
+                or_(*[and_(cls.noleggiatore == n, cls.data_import == d) for n, d in giorni])
+            ).delete(synchronize_session=False)
+        
+        # Sulla tabella, non sul modello: un executemany per blocco
+        stmt = insert_upsert(cls.__table__)
+        aggiorna = {
+            c: stmt.excluded[c] for c in colonne if c not in cls.CHIAVE_GIORNALIERA
+        }
+        aggiorna['aggiornato_il'] = datetime.utcnow()  # onupdate non si applica a ON CONFLICT
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(cls.CHIAVE_GIORNALIERA),
+            set_=aggiorna
+        )
+        
+        valori = list(con_vin.values())
+        for i in range(0, len(valori), cls.BLOCCO_UPSERT):
+            db.session.execute(stmt, valori[i:i + cls.BLOCCO_UPSERT])
+        
+        for i in range(0, len(senza_vin), cls.BLOCCO_UPSERT):
+            db.session.execute(insert_upsert(cls.__table__), senza_vin[i:i + cls.BLOCCO_UPSERT])
+        
+        return len(valori) + len(senza_vin)
+    
     def __repr__(self):
         return f'<Veicolo {self.noleggiatore} {self.marca} {self.modello}>'
@@ -1,11 +1,12 @@
 # =============================================================================
 # STOCK ENGINE - Services
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 # =============================================================================
 
 from .normalizer import Normalizer
+from .jato_index import JatoIndex
 from .matcher import JatoMatcher
 from .enricher import Enricher
 from .exporter import ExcelExporter
@@ -13,6 +14,7 @@ from .pipeline import StockPipeline
 
 __all__ = [
     'Normalizer',
+    'JatoIndex',
     'JatoMatcher',
     'Enricher',
     'ExcelExporter',
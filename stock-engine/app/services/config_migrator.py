@@ -1,22 +1,67 @@
 # =============================================================================
 # STOCK ENGINE - Config Migrator
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Servizio per migrazione configurazioni esistenti (glossario, pattern)
 # dai file Excel nel database.
+#
+# v1.1.0: pulizia e deduplica vettoriali con pandas, regole già presenti
+#         lette con una query e nuove righe inserite in blocco in un'unica
+#         transazione; report righe/s
 # =============================================================================
 
 from pathlib import Path
+from typing import List
 
 import pandas as pd
 from flask import current_app
+from sqlalchemy import insert, select
 
 from app import db
 from app.models.glossario import Glossario
 from app.models.pattern import PatternCarburante
 
+from .fuel_matcher import invalida_fuel_matcher
+from .misure import MisureFasi
+
+
+def _prima_valorizzata(df: pd.DataFrame, nomi: List[str]) -> pd.Series:
+    """Prima colonna valorizzata tra nomi alternativi, come testo senza spazi ai bordi"""
+    valori = pd.Series(pd.NA, index=df.index, dtype='string')
+    
+    for nome in nomi:
+        if nome in df.columns:
+            valori = valori.fillna(df[nome].astype('string').str.strip().replace('', pd.NA))
+    
+    return valori
+
+
+def _opzionale(df: pd.DataFrame, nome: str) -> pd.Series:
+    """Colonna opzionale (None se assente o NaN)"""
+    if nome not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[nome].astype(object).where(df[nome].notna(), None)
+
+
+def _inserisci(modello, righe: pd.DataFrame, misure: MisureFasi):
+    """INSERT massivo (executemany) delle righe nuove e commit unico"""
+    with misure.fase('inserimento', righe=len(righe)):
+        if len(righe):
+            db.session.execute(insert(modello), righe.to_dict('records'))
+        db.session.commit()
+
+
+def _stampa_report(misure: MisureFasi, righe: int):
+    """Fasi e velocità complessiva"""
+    for riga in misure.righe_report():
+        print(riga)
+    
+    secondi = misure.riepilogo()['totale']['secondi']
+    velocita = round(righe / secondi) if secondi > 0 else 0
+    print(f"  {righe} righe in {secondi:.2f}s ({velocita} righe/s)")
+
 
 def migrate_config_files(app=None):
     """
@@ -65,53 +110,43 @@ def migrate_glossario(xlsx_path: Path):
     """
     print(f"\nMigrazione glossario: {xlsx_path.name}")
     
-    try:
-        df = pd.read_excel(xlsx_path, sheet_name='Glossario')
-    except Exception as e:
-        # Prova senza specificare foglio
-        df = pd.read_excel(xlsx_path)
-    
-    # Normalizza nomi colonne
-    df.columns = [c.lower().strip() for c in df.columns]
-    
-    added = 0
-    
-    for _, row in df.iterrows():
-        cerca = row.get('cerca') or row.get('search') or row.get('find')
-        sostituisci = row.get('sostituisci') or row.get('replace') or row.get('substitute')
-        
-        if not cerca or not sostituisci:
-            continue
-        
-        # Skip se pandas NaN
-        if pd.isna(cerca) or pd.isna(sostituisci):
-            continue
-        
-        # Verifica se esiste già
-        existing = Glossario.query.filter_by(
-            cerca=str(cerca).strip(),
-            sostituisci=str(sostituisci).strip()
-        ).first()
-        
-        if existing:
-            continue
-        
-        glossario = Glossario(
-            cerca=str(cerca).strip(),
-            sostituisci=str(sostituisci).strip(),
-            colonna=row.get('colonna') if not pd.isna(row.get('colonna', None)) else None,
-            noleggiatore=row.get('noleggiatore') if not pd.isna(row.get('noleggiatore', None)) else None,
-            note=row.get('note') if not pd.isna(row.get('note', None)) else None,
-            attivo=True
-        )
-        
-        db.session.add(glossario)
-        added += 1
-    
-    db.session.commit()
-    
-    print(f"  ✔ Aggiunte {added} regole glossario")
+    with MisureFasi(db.engine) as misure:
+        with misure.fase('lettura') as fase:
+            try:
+                df = pd.read_excel(xlsx_path, sheet_name='Glossario')
+            except Exception as e:
+                # Prova senza specificare foglio
+                df = pd.read_excel(xlsx_path)
+            fase['righe'] = len(df)
+        
+        with misure.fase('pulizia', righe=len(df)):
+            # Normalizza nomi colonne
+            df.columns = [str(c).lower().strip() for c in df.columns]
+            
+            regole = pd.DataFrame({
+                'cerca': _prima_valorizzata(df, ['cerca', 'search', 'find']),
+                'sostituisci': _prima_valorizzata(df, ['sostituisci', 'replace', 'substitute']),
+                'colonna': _opzionale(df, 'colonna'),
+                'noleggiatore': _opzionale(df, 'noleggiatore'),
+                'note': _opzionale(df, 'note'),
+            })
+            regole = regole.dropna(subset=['cerca', 'sostituisci'])
+            regole = regole.drop_duplicates(['cerca', 'sostituisci'])
+            
+            # Scarta le regole già presenti
+            esistenti = db.session.execute(select(Glossario.cerca, Glossario.sostituisci)).all()
+            if esistenti:
+                chiavi = pd.MultiIndex.from_frame(regole[['cerca', 'sostituisci']])
+                regole = regole[~chiavi.isin([tuple(r) for r in esistenti])]
+            
+            regole = regole.astype(object).where(regole.notna(), None)
+            regole['attivo'] = True
+        
+        _inserisci(Glossario, regole, misure)
+    
+    print(f"  ✔ Aggiunte {len(regole)} regole glossario")
     print(f"  Totale regole: {Glossario.query.count()}")
+    _stampa_report(misure, len(df))
 
 
 def migrate_pattern_carburante(xlsx_path: Path):
@@ -126,54 +161,43 @@ def migrate_pattern_carburante(xlsx_path: Path):
     """
     print(f"\nMigrazione pattern carburante: {xlsx_path.name}")
     
-    try:
-        df = pd.read_excel(xlsx_path, sheet_name='Pattern Carburante')
-    except Exception as e:
-        # Prova senza specificare foglio
-        df = pd.read_excel(xlsx_path)
-    
-    # Normalizza nomi colonne
-    df.columns = [c.lower().strip().replace(' ', '_') for c in df.columns]
-    
-    added = 0
-    
-    for _, row in df.iterrows():
-        pattern = row.get('pattern')
-        fuel_type = row.get('fuel_type') or row.get('tipo') or row.get('alimentazione')
-        
-        if not pattern or not fuel_type:
-            continue
-        
-        if pd.isna(pattern) or pd.isna(fuel_type):
-            continue
-        
-        # Verifica se esiste già
-        existing = PatternCarburante.query.filter_by(
-            pattern=str(pattern).strip().upper()
-        ).first()
-        
-        if existing:
-            continue
-        
-        priorita = row.get('priorita', 10)
-        if pd.isna(priorita):
-            priorita = 10
-        
-        pc = PatternCarburante(
-            pattern=str(pattern).strip().upper(),
-            fuel_type=str(fuel_type).strip().upper(),
-            priorita=int(priorita),
-            note=row.get('note') if not pd.isna(row.get('note', None)) else None,
-            attivo=True
-        )
-        
-        db.session.add(pc)
-        added += 1
-    
-    db.session.commit()
-    
-    print(f"  ✔ Aggiunti {added} pattern carburante")
+    with MisureFasi(db.engine) as misure:
+        with misure.fase('lettura') as fase:
+            try:
+                df = pd.read_excel(xlsx_path, sheet_name='Pattern Carburante')
+            except Exception as e:
+                # Prova senza specificare foglio
+                df = pd.read_excel(xlsx_path)
+            fase['righe'] = len(df)
+        
+        with misure.fase('pulizia', righe=len(df)):
+            # Normalizza nomi colonne
+            df.columns = [str(c).lower().strip().replace(' ', '_') for c in df.columns]
+            
+            patterns = pd.DataFrame({
+                'pattern': _prima_valorizzata(df, ['pattern']).str.upper(),
+                'fuel_type': _prima_valorizzata(df, ['fuel_type', 'tipo', 'alimentazione']).str.upper(),
+                'priorita': pd.to_numeric(_opzionale(df, 'priorita'), errors='coerce').fillna(10).astype(int),
+                'note': _opzionale(df, 'note'),
+            })
+            patterns = patterns.dropna(subset=['pattern', 'fuel_type'])
+            patterns = patterns.drop_duplicates('pattern')
+            
+            # Scarta i pattern già presenti
+            esistenti = db.session.execute(select(PatternCarburante.pattern)).scalars().all()
+            patterns = patterns[~patterns['pattern'].isin(esistenti)]
+            
+            patterns = patterns.astype(object).where(patterns.notna(), None)
+            patterns['attivo'] = True
+        
+        _inserisci(PatternCarburante, patterns, misure)
+    
+    # L'INSERT massivo non passa dagli eventi ORM del modello
+    invalida_fuel_matcher()
+    
+    print(f"  ✔ Aggiunti {len(patterns)} pattern carburante")
     print(f"  Totale pattern: {PatternCarburante.query.count()}")
+    _stampa_report(misure, len(df))
 
 
 def export_glossario_to_excel(output_path: Path):
@@ -1,14 +1,17 @@
 # =============================================================================
 # STOCK ENGINE - Enricher Service
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Servizio per arricchimento dati veicoli con informazioni aggiuntive.
 # Sostituisce il modulo 03_arricchimento.py
+#
+# v1.1.0: Dati JATO letti una volta per lotto (IN sui jato_code distinti)
+#         invece di una query per veicolo
 # =============================================================================
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable
 
 from app import db
 from app.models.jato import JatoModel
@@ -28,31 +31,41 @@ class Enricher:
     # Neopatentati: max 55 kW/t (95 cv/t) per veicoli fino a 5 anni
     KW_T_SOGLIA = 55
     
+    # jato_code per query IN
+    BLOCCO_QUERY = 500
+    
     def arricchisci(self, veicoli: List[Dict]) -> List[Dict]:
         """
         Arricchisce lista veicoli
         
         Args:
             veicoli: Lista dizionari veicoli
-            
+        
         Returns:
             list: Veicoli arricchiti
         """
+        # Dati JATO dei veicoli matchati a cui mancano (una query per lotto)
+        dati_jato = self._recupera_dati_jato({
+            veicolo['jato_code'] for veicolo in veicoli
+            if veicolo.get('jato_code') and not veicolo.get('omologazione')
+        })
+        
         risultati = []
         
         for veicolo in veicoli:
-            veicolo_arricchito = self._arricchisci_veicolo(veicolo)
+            veicolo_arricchito = self._arricchisci_veicolo(veicolo, dati_jato)
             risultati.append(veicolo_arricchito)
         
         return risultati
     
-    def _arricchisci_veicolo(self, veicolo: Dict) -> Dict:
+    def _arricchisci_veicolo(self, veicolo: Dict, dati_jato: Dict[str, Dict]) -> Dict:
         """
         Arricchisce singolo veicolo
         
         Args:
             veicolo: Dizionario veicolo
-            
+            dati_jato: Dati JATO per jato_code (da _recupera_dati_jato)
+        
         Returns:
             dict: Veicolo arricchito
         """
@@ -63,9 +76,9 @@ class Enricher:
         
         # Se abbiamo jato_code ma mancano dati, recuperali
         if veicolo.get('jato_code') and not veicolo.get('omologazione'):
-            dati_jato = self._recupera_dati_jato(veicolo['jato_code'])
-            if dati_jato:
-                result.update(dati_jato)
+            dati = dati_jato.get(veicolo['jato_code'])
+            if dati:
+                result.update(dati)
         
         # Calcola prezzo totale se mancante
         if not result.get('prezzo_totale'):
@@ -89,7 +102,7 @@ class Enricher:
         
         Args:
             veicolo: Dati veicolo
-            
+        
         Returns:
             str: 'SI', 'NO', o 'ND'
         """
@@ -117,28 +130,48 @@ class Enricher:
         
         return 'ND'
     
-    def _recupera_dati_jato(self, jato_code: str) -> Optional[Dict]:
+    def _recupera_dati_jato(self, jato_codes: Iterable[str]) -> Dict[str, Dict]:
         """
-        Recupera dati JATO da codice
+        Recupera dati JATO per un insieme di codici
+        
+        Con più modelli per lo stesso jato_code vale il primo per id.
         
         Args:
-            jato_code: Codice JATO
-            
+            jato_codes: Codici JATO
+        
         Returns:
-            dict: Dati JATO o None
+            dict: {jato_code: dati JATO} (codici non trovati assenti)
         """
-        jato = JatoModel.query.filter_by(jato_code=jato_code).first()
-        
-        if not jato:
-            return None
-        
-        return {
-            'product_id': jato.product_id,
-            'omologazione': jato.homologation,
-            'kw': jato.kw,
-            'hp': jato.horsepower,
-            'alimentazione': jato.alimentazione,
-            'jato_product_description': jato.jato_product_description,
-            'vehicle_set_description': jato.vehicle_set_description,
-            'transmission': jato.transmission_description,
-        }
+        jato_codes = list(jato_codes)
+        risultati = {}
+        
+        for i in range(0, len(jato_codes), self.BLOCCO_QUERY):
+            righe = db.session.query(
+                JatoModel.jato_code,
+                JatoModel.product_id,
+                JatoModel.homologation,
+                JatoModel.kw,
+                JatoModel.horsepower,
+                JatoModel.alimentazione,
+                JatoModel.jato_product_description,
+                JatoModel.vehicle_set_description,
+                JatoModel.transmission_description,
+            ).filter(
+                JatoModel.jato_code.in_(jato_codes[i:i + self.BLOCCO_QUERY])
+            ).order_by(JatoModel.id)
+            
+            for riga in righe:
+                if riga.jato_code in risultati:
+                    continue
+                risultati[riga.jato_code] = {
+                    'product_id': riga.product_id,
+                    'omologazione': riga.homologation,
+                    'kw': riga.kw,
+                    'hp': riga.horsepower,
+                    'alimentazione': riga.alimentazione,
+                    'jato_product_description': riga.jato_product_description,
+                    'vehicle_set_description': riga.vehicle_set_description,
+                    'transmission': riga.transmission_description,
+                }
+        
+        return risultati
@@ -1,25 +1,49 @@
 # =============================================================================
 # STOCK ENGINE - Excel Exporter Service
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.2.0
+# Data: 19 ottobre 2026
 #
 # Servizio per generazione file Excel output.
 # Genera file simili a quelli prodotti dal sistema bash attuale.
+#
+# v1.1.0: Scrittura in streaming (workbook write-only): veicoli letti a
+#         blocchi dal database, stili con nome, larghezze colonne stimate
+#         sulle prime righe. Layout del file invariato
+# v1.2.0: Ogni file generato è registrato con la versione dei dati
+#         (EsportazioneExcel); esporta_aggiornato() rigenera solo se i dati
+#         sono cambiati, una generazione per file alla volta (lock su file)
 # =============================================================================
 
+import os
+import threading
+from copy import copy
 from pathlib import Path
 from datetime import date
-from typing import List, Optional
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List
 
-import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
 
 from flask import current_app
 
+from app import db
 from app.models.veicolo import Veicolo
+from app.models.esportazione import EsportazioneExcel
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Lock per file quando fcntl non è disponibile (solo stesso processo)
+_lock_thread = {}
+_lock_thread_guardia = threading.Lock()
 
 
 class ExcelExporter:
@@ -29,6 +53,9 @@ class ExcelExporter:
     Genera:
     - File stock giornaliero per noleggiatore
     - Fogli: Estrazione, Riepilogo, Selezioni
+    
+    I fogli sono scritti riga per riga (workbook write-only): la memoria non
+    cresce con il numero di veicoli, tranne l'aggregato del Riepilogo.
     """
     
     # Stili
@@ -37,6 +64,106 @@ class ExcelExporter:
     MATCHED_FILL = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
     NO_MATCH_FILL = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
     
+    # Stili con nome registrati nel workbook
+    STILI = [
+        NamedStyle(name='stock_intestazione', fill=HEADER_FILL, font=HEADER_FONT),
+        NamedStyle(name='stock_intestazione_centrata', fill=HEADER_FILL, font=HEADER_FONT,
+                   alignment=Alignment(horizontal='center')),
+        NamedStyle(name='stock_matched', fill=MATCHED_FILL, font=copy(DEFAULT_FONT)),
+        NamedStyle(name='stock_no_match', fill=NO_MATCH_FILL, font=copy(DEFAULT_FONT)),
+    ]
+    STILE_MATCH = {'MATCHED': 'stock_matched', 'NO_MATCH': 'stock_no_match'}
+    
+    # Colonne fogli
+    COLONNE_ESTRAZIONE = [
+        'VIN', 'Marca', 'Modello', 'Description', 'Alimentazione',
+        'KW', 'HP', 'CO2', 'Prezzo Listino', 'Prezzo Totale',
+        'Location', 'Data Arrivo', 'Colore', 'Neopatentati',
+        'Jato Code', 'Product ID', 'Omologazione',
+        'Match Status', 'Match Score', 'Stato'
+    ]
+    COLONNE_RIEPILOGO = ['Marca', 'Modello', 'Alimentazione', 'KW', 'Neopatentati',
+                         'Quantità', 'Prezzo Min', 'Prezzo Max']
+    COLONNE_SELEZIONI = ['Marca', 'Modello', 'Alimentazione', 'KW', 'Neopatentati',
+                         'Prezzo', 'Location', 'Jato Code']
+    
+    # Righe lette per blocco dal database (cursore lato server su PostgreSQL)
+    BLOCCO_LETTURA = 1000
+    
+    # Righe usate per stimare la larghezza delle colonne
+    CAMPIONE_LARGHEZZE = 1000
+    
+    @staticmethod
+    def percorso_file(noleggiatore: str, data: date) -> Path:
+        """Percorso del file Excel di un noleggiatore/data"""
+        output_dir = Path(current_app.config['DIR_OUTPUT'])
+        return output_dir / f"{noleggiatore.lower()}_stock_{data.strftime('%d-%m-%Y')}.xlsx"
+    
+    @contextmanager
+    def _lock(self, filepath: Path):
+        """
+        Una sola generazione alla volta per file
+        
+        Lock su file (fcntl) valido anche tra processi (più worker
+        gunicorn, scheduler); senza fcntl lock tra thread.
+        """
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        
+        if fcntl is None:
+            with _lock_thread_guardia:
+                lock = _lock_thread.setdefault(str(filepath), threading.Lock())
+            with lock:
+                yield
+            return
+        
+        with open(filepath.parent / f".{filepath.name}.lock", 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def esporta_aggiornato(self, noleggiatore: str, data: date = None,
+                           forza: bool = False) -> EsportazioneExcel:
+        """
+        File Excel aggiornato ai dati correnti, rigenerato solo se serve
+        
+        Il file viene rigenerato se manca o se le righe veicolo sono
+        cambiate dalla generazione (nuova elaborazione, modifiche, righe
+        aggiunte o rimosse). Richieste contemporanee per lo stesso file
+        attendono la generazione in corso invece di ripeterla.
+        
+        Args:
+            noleggiatore: Nome noleggiatore
+            data: Data (default oggi)
+            forza: Rigenera comunque
+        
+        Returns:
+            EsportazioneExcel: File registrato
+        
+        Raises:
+            ValueError: Nessun veicolo per noleggiatore/data
+        """
+        if data is None:
+            data = date.today()
+        
+        if not forza:
+            esportazione = EsportazioneExcel.cerca(noleggiatore, data)
+            if esportazione and esportazione.aggiornata(EsportazioneExcel.versione_corrente(noleggiatore, data)):
+                return esportazione
+        
+        with self._lock(self.percorso_file(noleggiatore, data)):
+            # Nuova transazione: vede il file registrato da chi aveva il lock
+            db.session.commit()
+            versione = EsportazioneExcel.versione_corrente(noleggiatore, data)
+            
+            esportazione = EsportazioneExcel.cerca(noleggiatore, data)
+            if esportazione and esportazione.aggiornata(versione) and not forza:
+                return esportazione
+            
+            filepath = self._genera(noleggiatore, data, versione)
+            return EsportazioneExcel.registra(noleggiatore, data, filepath, versione)
+    
     def genera_excel(self, noleggiatore: str, data: date = None) -> Path:
         """
         Genera file Excel per noleggiatore
@@ -44,170 +171,195 @@ class ExcelExporter:
         Args:
             noleggiatore: Nome noleggiatore
             data: Data (default oggi)
-            
+        
         Returns:
             Path: Percorso file generato
         """
         if data is None:
             data = date.today()
         
-        # Query veicoli
-        veicoli = Veicolo.get_by_noleggiatore_data(noleggiatore, data).all()
+        with self._lock(self.percorso_file(noleggiatore, data)):
+            versione = EsportazioneExcel.versione_corrente(noleggiatore, data)
+            filepath = self._genera(noleggiatore, data, versione)
+            EsportazioneExcel.registra(noleggiatore, data, filepath, versione)
+        
+        return filepath
+    
+    def _genera(self, noleggiatore: str, data: date, versione) -> Path:
+        """
+        Scrive il file Excel (la versione va letta prima di leggere i veicoli)
         
-        if not veicoli:
+        Il file viene scritto con un nome temporaneo e poi rinominato: chi lo
+        scarica durante la generazione riceve la versione precedente intera.
+        """
+        if not versione[2]:
             raise ValueError(f"Nessun veicolo trovato per {noleggiatore} data {data}")
         
+        # Query veicoli (letti a blocchi, nello stesso ordine per ogni foglio)
+        query = Veicolo.get_by_noleggiatore_data(noleggiatore, data).order_by(Veicolo.id)
+        
         # Crea workbook
-        wb = Workbook()
+        wb = Workbook(write_only=True)
+        for stile in self.STILI:
+            wb.add_named_style(stile)
         
-        # Foglio Estrazione (tutti i dati)
-        self._crea_foglio_estrazione(wb, veicoli)
+        # Foglio Estrazione (tutti i dati), raccoglie l'aggregato per il Riepilogo
+        aggregato = self._crea_foglio_estrazione(wb, query.yield_per(self.BLOCCO_LETTURA))
         
         # Foglio Riepilogo (aggregato per modello)
-        self._crea_foglio_riepilogo(wb, veicoli)
+        self._crea_foglio_riepilogo(wb, aggregato)
         
         # Foglio Selezioni (solo matched)
-        self._crea_foglio_selezioni(wb, veicoli)
+        matched = query.filter(Veicolo.match_status == 'MATCHED').yield_per(self.BLOCCO_LETTURA)
+        self._crea_foglio_selezioni(wb, matched)
         
         # Salva file
-        output_dir = Path(current_app.config['DIR_OUTPUT'])
-        output_dir.mkdir(parents=True, exist_ok=True)
+        filepath = self.percorso_file(noleggiatore, data)
+        temporaneo = filepath.parent / f".{filepath.name}.tmp"
         
-        filename = f"{noleggiatore.lower()}_stock_{data.strftime('%d-%m-%Y')}.xlsx"
-        filepath = output_dir / filename
-        
-        wb.save(filepath)
+        wb.save(temporaneo)
+        os.replace(temporaneo, filepath)
         
         return filepath
     
-    def _crea_foglio_estrazione(self, wb: Workbook, veicoli: List[Veicolo]):
-        """Crea foglio Estrazione con tutti i dati"""
-        ws = wb.active
-        ws.title = "Estrazione"
+    def _crea_foglio_estrazione(self, wb: Workbook, veicoli: Iterable[Veicolo]) -> Dict:
+        """
+        Crea foglio Estrazione con tutti i dati
         
-        # Colonne
-        columns = [
-            'VIN', 'Marca', 'Modello', 'Description', 'Alimentazione',
-            'KW', 'HP', 'CO2', 'Prezzo Listino', 'Prezzo Totale',
-            'Location', 'Data Arrivo', 'Colore', 'Neopatentati',
-            'Jato Code', 'Product ID', 'Omologazione',
-            'Match Status', 'Match Score', 'Stato'
-        ]
+        Returns:
+            dict: Aggregato per marca + modello (per il foglio Riepilogo)
+        """
+        ws = wb.create_sheet("Estrazione")
+        columns = self.COLONNE_ESTRAZIONE
+        indice_status = columns.index('Match Status')
+        aggregato = {}
+        
+        def righe():
+            for veicolo in veicoli:
+                self._aggrega(aggregato, veicolo)
+                data = veicolo.to_excel_row()
+                yield [data.get(col_name) for col_name in columns]
+        
+        righe = self._imposta_larghezze(ws, columns, righe())
         
         # Header
-        for col, header in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = self.HEADER_FILL
-            cell.font = self.HEADER_FONT
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Dati
-        for row_idx, veicolo in enumerate(veicoli, 2):
-            data = veicolo.to_excel_row()
-            
-            for col_idx, col_name in enumerate(columns, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=data.get(col_name))
-                
-                # Colorazione per match status
-                if col_name == 'Match Status':
-                    if data.get(col_name) == 'MATCHED':
-                        cell.fill = self.MATCHED_FILL
-                    elif data.get(col_name) == 'NO_MATCH':
-                        cell.fill = self.NO_MATCH_FILL
-        
-        # Auto-width colonne
-        self._auto_width(ws)
-    
-    def _crea_foglio_riepilogo(self, wb: Workbook, veicoli: List[Veicolo]):
+        ws.append(self._intestazione(ws, columns, 'stock_intestazione_centrata'))
+        
+        # Dati (colorazione per match status)
+        for riga in righe:
+            stile = self.STILE_MATCH.get(riga[indice_status])
+            if stile:
+                cell = WriteOnlyCell(ws, value=riga[indice_status])
+                cell.style = stile
+                riga[indice_status] = cell
+            ws.append(riga)
+        
+        return aggregato
+    
+    def _aggrega(self, aggregato: Dict, v: Veicolo):
+        """Aggiunge un veicolo all'aggregato per marca + modello"""
+        key = (v.marca, v.jato_product_description or v.description)
+        if key not in aggregato:
+            aggregato[key] = {
+                'marca': v.marca,
+                'modello': v.jato_product_description or v.description,
+                'alimentazione': v.alimentazione,
+                'kw': v.kw,
+                'neopatentati': v.neopatentati,
+                'count': 0,
+                'prezzo_min': float('inf'),
+                'prezzo_max': 0,
+            }
+        
+        aggregato[key]['count'] += 1
+        if v.prezzo_totale:
+            aggregato[key]['prezzo_min'] = min(aggregato[key]['prezzo_min'], v.prezzo_totale)
+            aggregato[key]['prezzo_max'] = max(aggregato[key]['prezzo_max'], v.prezzo_totale)
+    
+    def _crea_foglio_riepilogo(self, wb: Workbook, aggregato: Dict):
         """Crea foglio Riepilogo aggregato per modello"""
         ws = wb.create_sheet("Riepilogo")
+        columns = self.COLONNE_RIEPILOGO
         
-        # Aggrega per marca + modello
-        aggregato = {}
+        righe = (
+            [
+                data['marca'],
+                data['modello'],
+                data['alimentazione'],
+                data['kw'],
+                data['neopatentati'],
+                data['count'],
+                data['prezzo_min'] if data['prezzo_min'] != float('inf') else None,
+                data['prezzo_max'] if data['prezzo_max'] > 0 else None,
+            ]
+            for data in aggregato.values()
+        )
         
-        for v in veicoli:
-            key = (v.marca, v.jato_product_description or v.description)
-            if key not in aggregato:
-                aggregato[key] = {
-                    'marca': v.marca,
-                    'modello': v.jato_product_description or v.description,
-                    'alimentazione': v.alimentazione,
-                    'kw': v.kw,
-                    'neopatentati': v.neopatentati,
-                    'count': 0,
-                    'prezzo_min': float('inf'),
-                    'prezzo_max': 0,
-                }
-            
-            aggregato[key]['count'] += 1
-            if v.prezzo_totale:
-                aggregato[key]['prezzo_min'] = min(aggregato[key]['prezzo_min'], v.prezzo_totale)
-                aggregato[key]['prezzo_max'] = max(aggregato[key]['prezzo_max'], v.prezzo_totale)
-        
-        # Colonne
-        columns = ['Marca', 'Modello', 'Alimentazione', 'KW', 'Neopatentati', 
-                   'Quantità', 'Prezzo Min', 'Prezzo Max']
+        righe = self._imposta_larghezze(ws, columns, righe, campione=len(aggregato))
         
-        # Header
-        for col, header in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = self.HEADER_FILL
-            cell.font = self.HEADER_FONT
-        
-        # Dati
-        for row_idx, data in enumerate(aggregato.values(), 2):
-            ws.cell(row=row_idx, column=1, value=data['marca'])
-            ws.cell(row=row_idx, column=2, value=data['modello'])
-            ws.cell(row=row_idx, column=3, value=data['alimentazione'])
-            ws.cell(row=row_idx, column=4, value=data['kw'])
-            ws.cell(row=row_idx, column=5, value=data['neopatentati'])
-            ws.cell(row=row_idx, column=6, value=data['count'])
-            ws.cell(row=row_idx, column=7, value=data['prezzo_min'] if data['prezzo_min'] != float('inf') else None)
-            ws.cell(row=row_idx, column=8, value=data['prezzo_max'] if data['prezzo_max'] > 0 else None)
-        
-        self._auto_width(ws)
-    
-    def _crea_foglio_selezioni(self, wb: Workbook, veicoli: List[Veicolo]):
+        ws.append(self._intestazione(ws, columns, 'stock_intestazione'))
+        for riga in righe:
+            ws.append(riga)
+    
+    def _crea_foglio_selezioni(self, wb: Workbook, matched: Iterable[Veicolo]):
         """Crea foglio Selezioni (solo veicoli matched)"""
         ws = wb.create_sheet("Selezioni")
+        columns = self.COLONNE_SELEZIONI
         
-        # Solo matched
-        matched = [v for v in veicoli if v.match_status == 'MATCHED']
+        righe = (
+            [
+                v.marca,
+                v.jato_product_description or v.description,
+                v.alimentazione,
+                v.kw,
+                v.neopatentati,
+                v.prezzo_totale,
+                v.location,
+                v.jato_code,
+            ]
+            for v in matched
+        )
         
-        columns = ['Marca', 'Modello', 'Alimentazione', 'KW', 'Neopatentati',
-                   'Prezzo', 'Location', 'Jato Code']
+        righe = self._imposta_larghezze(ws, columns, righe)
         
-        # Header
-        for col, header in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = self.HEADER_FILL
-            cell.font = self.HEADER_FONT
-        
-        # Dati
-        for row_idx, v in enumerate(matched, 2):
-            ws.cell(row=row_idx, column=1, value=v.marca)
-            ws.cell(row=row_idx, column=2, value=v.jato_product_description or v.description)
-            ws.cell(row=row_idx, column=3, value=v.alimentazione)
-            ws.cell(row=row_idx, column=4, value=v.kw)
-            ws.cell(row=row_idx, column=5, value=v.neopatentati)
-            ws.cell(row=row_idx, column=6, value=v.prezzo_totale)
-            ws.cell(row=row_idx, column=7, value=v.location)
-            ws.cell(row=row_idx, column=8, value=v.jato_code)
-        
-        self._auto_width(ws)
-    
-    def _auto_width(self, ws):
-        """Adatta larghezza colonne al contenuto"""
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
+        ws.append(self._intestazione(ws, columns, 'stock_intestazione'))
+        for riga in righe:
+            ws.append(riga)
+    
+    @staticmethod
+    def _intestazione(ws, columns: List[str], stile: str) -> List[WriteOnlyCell]:
+        """Celle di intestazione con stile"""
+        celle = []
+        for header in columns:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = stile
+            celle.append(cell)
+        return celle
+    
+    def _imposta_larghezze(self, ws, columns: List[str], righe: Iterator[list],
+                           campione: int = None) -> Iterator[list]:
+        """
+        Adatta larghezza colonne al contenuto delle prime righe
+        
+        In un foglio write-only le larghezze vanno impostate prima di
+        scrivere: le righe del campione vengono lette, misurate e
+        restituite insieme alle successive.
+        
+        Args:
+            ws: Foglio write-only
+            columns: Intestazioni
+            righe: Righe dati (liste di valori)
+            campione: Righe misurate (default CAMPIONE_LARGHEZZE)
+        
+        Returns:
+            Iterator: Tutte le righe, campione compreso
+        """
+        righe = iter(righe)
+        prime = list(islice(righe, campione if campione is not None else self.CAMPIONE_LARGHEZZE))
+        
+        for col_idx, header in enumerate(columns):
+            max_length = max([len(str(header))] + [len(str(riga[col_idx])) for riga in prime])
             adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            ws.column_dimensions[get_column_letter(col_idx + 1)].width = adjusted_width
+        
+        return chain(prime, righe)
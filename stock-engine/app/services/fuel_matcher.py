@@ -0,0 +1,163 @@
+# =============================================================================
+# STOCK ENGINE - Fuel Matcher (pattern carburante compilati)
+# =============================================================================
+# Versione: 1.0.1
+# Data: 19 ottobre 2026
+#
+# Pattern carburante compilati in un'unica regex, al posto di una query
+# e di una regex per pattern a ogni PatternCarburante.identifica_fuel().
+#
+# SEMANTICA (identica a identifica_fuel):
+#   Vince il primo pattern attivo, in ordine di priorità decrescente, che
+#   compare nella description (maiuscolo, anche dentro una parola: "180D").
+#
+# COME FUNZIONA:
+#   Regex (?=(?:(P1)|(P2)|...)) con le alternative in ordine di priorità:
+#   in ogni posizione l'alternanza restituisce il pattern di priorità più
+#   alta che inizia lì; si tiene il migliore tra tutte le posizioni.
+#
+# AGGIORNAMENTO:
+#   get_fuel_matcher() rilegge i pattern attivi (tabella piccola) e
+#   ricompila solo se sono cambiati; le modifiche via ORM invalidano
+#   subito il matcher condiviso.
+#
+# v1.0.1: memo leggibile da più thread (elaborazioni in parallelo)
+# =============================================================================
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app import db
+from app.models.pattern import PatternCarburante
+
+
+class FuelMatcher:
+    """
+    Identificazione alimentazione con pattern precompilati
+    
+    Uso:
+        fuel_matcher = get_fuel_matcher()
+        fuel_matcher.identifica('GOLF 2.0 TDI 150CV')  # → 'DIESEL'
+    """
+    
+    # Description memorizzate (le description stock si ripetono molto)
+    MAX_MEMO = 50000
+    
+    _ASSENTE = object()
+    
+    def __init__(self, patterns: List[Tuple[str, str]]):
+        """
+        Args:
+            patterns: Lista (pattern, fuel_type) in ordine di priorità
+        """
+        self.patterns = list(patterns)
+        self._fuel = [fuel_type for _, fuel_type in self.patterns]
+        self._memo: Dict[str, Optional[str]] = {}
+        
+        if self.patterns:
+            alternative = '|'.join(f'({re.escape(p.upper())})' for p, _ in self.patterns)
+            self._regex = re.compile(f'(?=(?:{alternative}))')
+        else:
+            self._regex = None
+    
+    @classmethod
+    def da_database(cls) -> 'FuelMatcher':
+        """Compila i pattern attivi dal database"""
+        return cls(_leggi_patterns())
+    
+    def identifica(self, description: str) -> Optional[str]:
+        """
+        Identifica tipo alimentazione da descrizione
+        
+        Args:
+            description: Descrizione veicolo
+        
+        Returns:
+            str: Tipo alimentazione o None
+        """
+        if not description or self._regex is None:
+            return None
+        
+        # get() singolo: un altro thread può svuotare il memo in qualsiasi momento
+        fuel = self._memo.get(description, self._ASSENTE)
+        if fuel is not self._ASSENTE:
+            return fuel
+        
+        migliore = None
+        for match in self._regex.finditer(description.upper()):
+            rango = match.lastindex - 1
+            if migliore is None or rango < migliore:
+                migliore = rango
+                if rango == 0:
+                    break
+        
+        fuel = self._fuel[migliore] if migliore is not None else None
+        
+        if len(self._memo) >= self.MAX_MEMO:
+            self._memo.clear()
+        self._memo[description] = fuel
+        
+        return fuel
+
+
+def _leggi_patterns() -> List[Tuple[str, str]]:
+    """Pattern attivi in ordine di priorità (stesso ordine di get_all_patterns)"""
+    righe = db.session.query(
+        PatternCarburante.pattern, PatternCarburante.fuel_type
+    ).filter(
+        PatternCarburante.attivo == True  # noqa: E712
+    ).order_by(
+        PatternCarburante.priorita.desc(), PatternCarburante.id
+    ).all()
+    
+    return [(pattern, fuel_type) for pattern, fuel_type in righe]
+
+
+# =============================================================================
+# ISTANZA CONDIVISA
+# =============================================================================
+
+_fuel_matcher: Optional[FuelMatcher] = None
+_lock = threading.RLock()  # rientrante: la query può fare autoflush → invalida
+
+
+def get_fuel_matcher(verifica: bool = True) -> FuelMatcher:
+    """
+    Fuel matcher condiviso del processo (JatoMatcher e PatternCarburante)
+    
+    Args:
+        verifica: Rilegge i pattern dal database e ricompila se cambiati
+                  (una query su una tabella di poche decine di righe)
+    
+    Returns:
+        FuelMatcher compilato
+    """
+    global _fuel_matcher
+    
+    with _lock:
+        if _fuel_matcher is None:
+            _fuel_matcher = FuelMatcher.da_database()
+        elif verifica:
+            patterns = _leggi_patterns()
+            if patterns != _fuel_matcher.patterns:
+                _fuel_matcher = FuelMatcher(patterns)
+        return _fuel_matcher
+
+
+def invalida_fuel_matcher():
+    """Scarta il fuel matcher condiviso (ricompilato alla prossima richiesta)"""
+    global _fuel_matcher
+    
+    with _lock:
+        _fuel_matcher = None
+
+
+@event.listens_for(PatternCarburante, 'after_insert')
+@event.listens_for(PatternCarburante, 'after_update')
+@event.listens_for(PatternCarburante, 'after_delete')
+def _pattern_modificato(mapper, connection, target):
+    """Pattern aggiunto/modificato/eliminato via ORM"""
+    invalida_fuel_matcher()
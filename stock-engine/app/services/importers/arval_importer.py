@@ -1,16 +1,20 @@
 # =============================================================================
 # STOCK ENGINE - ARVAL Importer
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Importer specifico per file stock ARVAL.
 # NOTA: ARVAL ha una struttura diversa da AYVENS (colonne D, E, F).
+#
+# v1.1.0: post_process_frame vettoriale (stesso risultato di post_process_row)
 # =============================================================================
 
 from typing import List, Dict
 from datetime import datetime
 
+import pandas as pd
+
 from .base_importer import BaseImporter
 
 
@@ -127,6 +131,34 @@ class ArvalImporter(BaseImporter):
         
         return row
     
+    def post_process_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Post-processing ARVAL vettoriale (equivalente a post_process_row)
+        """
+        df = self._converti_date_frame(df, ['data_arrivo', 'data_immatricolazione'])
+        
+        # ARVAL: Costruisci description da MODELLO + VERSIONE
+        vuoto = pd.Series('', index=df.index, dtype=object)
+        modelli = df['modello_originale'] if 'modello_originale' in df.columns else vuoto
+        versioni = df['versione_originale'] if 'versione_originale' in df.columns else vuoto
+        
+        df['description_originale'] = [
+            f"{modello} {versione}".strip() if versione and versione not in modello else modello
+            for modello, versione in zip(modelli.map(lambda v: v or ''), versioni.map(lambda v: v or ''))
+        ]
+        df['description'] = df['description_originale']
+        
+        # Marca uppercase
+        if 'marca' in df.columns:
+            marca = self._stringhe_valorizzate(df['marca'])
+            if marca.any():
+                df.loc[marca, 'marca'] = df.loc[marca, 'marca'].str.upper().str.strip()
+        
+        # Preserva originali
+        self._preserva_originale(df, 'marca', 'marca_originale')
+        
+        return df
+    
     def _converti_date(self, row: Dict) -> Dict:
         """Converte stringhe date in oggetti date"""
         date_fields = ['data_arrivo', 'data_immatricolazione']
@@ -135,7 +167,7 @@ class ArvalImporter(BaseImporter):
             value = row.get(field)
             if value and isinstance(value, str):
                 # Prova vari formati
-                for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d']:
+                for fmt in self.FORMATI_DATA:
                     try:
                         row[field] = datetime.strptime(value, fmt).date()
                         break
@@ -1,16 +1,20 @@
 # =============================================================================
 # STOCK ENGINE - AYVENS Importer
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Importer specifico per file stock AYVENS.
 # Gestisce la struttura specifica dei file CSV/XLSX AYVENS.
+#
+# v1.1.0: post_process_frame vettoriale (stesso risultato di post_process_row)
 # =============================================================================
 
 from typing import List, Dict
 from datetime import datetime
 
+import pandas as pd
+
 from .base_importer import BaseImporter
 
 
@@ -37,6 +41,16 @@ class AyvensImporter(BaseImporter):
     # AYVENS preferisce CSV (XLSX può avere problemi di shift)
     EXTENSIONS_PRIORITY = ['.csv', '.xlsx']
     
+    # Caratteri da rimuovere/sostituire nelle description (in ordine)
+    DESCRIPTION_REPLACEMENTS = {
+        '§': ' ',
+        '•': ' ',
+        '–': '-',
+        '—': '-',
+        '_': ' ',
+        '  ': ' ',  # Doppi spazi
+    }
+    
     def get_column_mapping(self) -> Dict[str, str]:
         """
         Mapping colonne AYVENS → campi database
@@ -126,6 +140,33 @@ class AyvensImporter(BaseImporter):
         
         return row
     
+    def post_process_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Post-processing AYVENS vettoriale (equivalente a post_process_row)
+        """
+        df = self._converti_date_frame(df, ['data_arrivo', 'data_catalogo'])
+        
+        # Pulisci description
+        if 'description' in df.columns:
+            desc = self._stringhe_valorizzate(df['description'])
+            if desc.any():
+                pulite = df.loc[desc, 'description']
+                for old, new in self.DESCRIPTION_REPLACEMENTS.items():
+                    pulite = pulite.str.replace(old, new, regex=False)
+                df.loc[desc, 'description'] = pulite.str.strip()
+        
+        # Marca uppercase
+        if 'marca' in df.columns:
+            marca = self._stringhe_valorizzate(df['marca'])
+            if marca.any():
+                df.loc[marca, 'marca'] = df.loc[marca, 'marca'].str.upper().str.strip()
+        
+        # Preserva originali
+        for campo in ('marca', 'modello', 'description'):
+            self._preserva_originale(df, campo, f'{campo}_originale')
+        
+        return df
+    
     def _converti_date(self, row: Dict) -> Dict:
         """Converte stringhe date in oggetti date"""
         date_fields = ['data_arrivo', 'data_catalogo']
@@ -134,7 +175,7 @@ class AyvensImporter(BaseImporter):
             value = row.get(field)
             if value and isinstance(value, str):
                 # Prova vari formati
-                for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d']:
+                for fmt in self.FORMATI_DATA:
                     try:
                         row[field] = datetime.strptime(value, fmt).date()
                         break
@@ -152,18 +193,8 @@ class AyvensImporter(BaseImporter):
         if not desc:
             return desc
         
-        # Caratteri da rimuovere/sostituire
-        replacements = {
-            '§': ' ',
-            '•': ' ',
-            '–': '-',
-            '—': '-',
-            '_': ' ',
-            '  ': ' ',  # Doppi spazi
-        }
-        
         result = desc
-        for old, new in replacements.items():
+        for old, new in self.DESCRIPTION_REPLACEMENTS.items():
             result = result.replace(old, new)
         
         return result.strip()
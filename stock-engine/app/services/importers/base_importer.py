@@ -1,23 +1,44 @@
 # =============================================================================
 # STOCK ENGINE - Base Importer
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.3.1
+# Data: 19 ottobre 2026
 #
 # Classe base astratta per gli importers dei vari noleggiatori.
 # Contiene logica comune: ricerca file, validazione, conversione.
+#
+# v1.1.0: mappatura colonne vettoriale (risolta una volta per file,
+#         niente iterrows) e hook post_process_frame per le sottoclassi
+# v1.2.0: converti() separato dalla lettura (fasi misurate dalla pipeline)
+# v1.3.0: encoding e separatore CSV rilevati una volta sui primi KB del file,
+#         lettura CSV a blocchi (leggi_blocchi) per non tenere in memoria
+#         l'intero DataFrame; float interi mappati come int (valori e hash
+#         riga uguali qualunque sia il blocco)
+# v1.3.1: CSV letti come testo (dtype=str) e CAMPI_NUMERICI convertiti valore
+#         per valore: il tipo non dipende più da cosa c'è nel resto del
+#         blocco (VIN '00000000000000000' o modello '500' restano testo)
 # =============================================================================
 
 import os
+import codecs
 from abc import ABC, abstractmethod
 from pathlib import Path
 from datetime import date
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 
 from flask import current_app
 
 
+def _decodifica_latin1(errore: UnicodeDecodeError):
+    """Byte non validi nell'encoding rilevato (oltre il campione): letti come latin-1"""
+    return errore.object[errore.start:errore.end].decode('latin-1'), errore.end
+
+
+codecs.register_error('stock_latin1', _decodifica_latin1)
+
+
 class BaseImporter(ABC):
     """
     Classe base astratta per importazione dati noleggiatori
@@ -44,10 +65,30 @@ class BaseImporter(ABC):
     # Encoding da provare
     ENCODINGS: List[str] = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
     
+    # Separatori CSV riconosciuti (CSV_SEPARATOR ha la precedenza)
+    CSV_SEPARATORI: List[str] = [';', ',', '\t', '|']
+    
+    # Byte letti per rilevare encoding e separatore
+    CSV_BYTE_CAMPIONE: int = 64 * 1024
+    
+    # Righe per blocco nella lettura CSV
+    CSV_RIGHE_BLOCCO: int = 20000
+    
+    # Campi database numerici: nei CSV (letti come testo) convertiti in numero
+    # valore per valore, gli altri campi restano testo
+    CAMPI_NUMERICI: List[str] = [
+        'co2', 'kw', 'hp', 'km', 'doors',
+        'prezzo_listino', 'prezzo_accessori', 'prezzo_totale',
+    ]
+    
+    # Formati data provati (in ordine) per i campi data testuali
+    FORMATI_DATA: List[str] = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d']
+    
     def __init__(self):
         """Inizializza importer"""
         self.errors = []
         self.warnings = []
+        self.formato_csv = None
     
     # ==========================================================================
     # METODI ASTRATTI (da implementare nelle sottoclassi)
@@ -94,6 +135,22 @@ class BaseImporter(ABC):
         """
         pass
     
+    def post_process_frame(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Post-processing vettoriale dell'intero DataFrame dopo mappatura
+        
+        Alternativa a post_process_row: se la sottoclasse la implementa
+        (restituendo un DataFrame) post_process_row non viene chiamato.
+        
+        Args:
+            df: DataFrame con colonne già rinominate nei campi database,
+                NaN già convertiti in None e stringhe già pulite
+            
+        Returns:
+            DataFrame processato, oppure None per usare post_process_row
+        """
+        return None
+    
     # ==========================================================================
     # METODI COMUNI
     # ==========================================================================
@@ -167,38 +224,157 @@ class BaseImporter(ABC):
         else:
             raise ValueError(f"Estensione non supportata: {ext}")
     
-    def _leggi_csv(self, file_path: Path) -> pd.DataFrame:
+    def leggi_blocchi(self, file_path: Path) -> Iterator[pd.DataFrame]:
         """
-        Legge file CSV con gestione encoding e decimali
+        Legge il file a blocchi di CSV_RIGHE_BLOCCO righe
         
-        NOTA IMPORTANTE: Gestisce formato italiano (decimale = virgola)
-        per evitare shift colonne.
+        I CSV sono letti un blocco alla volta (l'indice prosegue tra i
+        blocchi, quindi riga_excel resta quella del file); gli Excel in un
+        unico blocco. I valori sono gli stessi di leggi_file qualunque sia
+        CSV_RIGHE_BLOCCO.
+        
+        Args:
+            file_path: Percorso file
+            
+        Yields:
+            DataFrame: Blocco di righe
+            
+        Raises:
+            ValueError: Se file non leggibile
+        """
+        if file_path.suffix.lower() != '.csv':
+            yield self.leggi_file(file_path)
+            return
+        
+        righe = 0
+        with pd.read_csv(file_path, chunksize=self.CSV_RIGHE_BLOCCO,
+                         **self._opzioni_csv(file_path)) as lettore:
+            for blocco in lettore:
+                if righe == 0:
+                    self._valida_colonne(blocco)
+                righe += len(blocco)
+                if len(blocco):
+                    yield self._converti_numeri(blocco)
+        
+        if righe == 0:
+            raise ValueError("File vuoto (0 righe)")
+    
+    def rileva_formato_csv(self, file_path: Path) -> Dict[str, str]:
         """
-        df = None
-        encoding_usato = None
+        Rileva encoding e separatore dai primi CSV_BYTE_CAMPIONE byte
         
+        Encoding: il primo di ENCODINGS che decodifica il campione (una
+        sequenza multibyte troncata a fine campione non conta come errore).
+        Separatore: il primo di CSV_SEPARATORI presente lo stesso numero
+        di volte in tutte le righe complete del campione, altrimenti il più
+        frequente nell'intestazione, altrimenti CSV_SEPARATOR.
+        
+        Args:
+            file_path: Percorso file
+            
+        Returns:
+            dict: encoding, sep, decimal
+            
+        Raises:
+            ValueError: Nessun encoding valido
+        """
+        with open(file_path, 'rb') as f:
+            campione = f.read(self.CSV_BYTE_CAMPIONE)
+        
+        testo = None
         for enc in self.ENCODINGS:
             try:
-                df = pd.read_csv(
-                    file_path,
-                    encoding=enc,
-                    sep=self.CSV_SEPARATOR,
-                    decimal=self.CSV_DECIMAL,
-                    on_bad_lines='skip',
-                    low_memory=False
-                )
-                encoding_usato = enc
+                testo = codecs.getincrementaldecoder(enc)().decode(campione, final=False)
                 break
-            except Exception:
+            except (UnicodeDecodeError, LookupError):
                 continue
         
-        if df is None:
+        if testo is None:
             raise ValueError(f"Impossibile leggere CSV con encoding: {self.ENCODINGS}")
         
+        righe = testo.splitlines()
+        if len(campione) == self.CSV_BYTE_CAMPIONE:
+            righe = righe[:-1]  # ultima riga troncata dal campione
+        righe = [r for r in righe if r.strip()] or testo.splitlines()[:1]
+        
+        candidati = [self.CSV_SEPARATOR] + [s for s in self.CSV_SEPARATORI if s != self.CSV_SEPARATOR]
+        intestazione = righe[0] if righe else ''
+        
+        sep = next(
+            (s for s in candidati if intestazione.count(s) and len({r.count(s) for r in righe}) == 1),
+            None
+        )
+        if sep is None:
+            # A parità (anche nessuna occorrenza) vince CSV_SEPARATOR
+            sep = max(candidati, key=intestazione.count)
+        
+        return {
+            'encoding': enc,
+            'sep': sep,
+            'decimal': self.CSV_DECIMAL if self.CSV_DECIMAL != sep else '.',
+        }
+    
+    def _opzioni_csv(self, file_path: Path) -> Dict:
+        """Parametri read_csv con formato rilevato una volta per file"""
+        self.formato_csv = self.rileva_formato_csv(file_path)
+        
+        return dict(
+            self.formato_csv,
+            # Byte non validi oltre il campione: latin-1 invece di rileggere il file
+            encoding_errors='stock_latin1',
+            on_bad_lines='skip',
+            low_memory=False,
+            # Tipi non dedotti dal parser: a blocchi una colonna di testo
+            # tutta numerica in un blocco diventerebbe numero solo lì
+            dtype=str,
+        )
+    
+    def _converti_numeri(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converte in numero le colonne CSV mappate su CAMPI_NUMERICI
+        
+        Valore per valore, con le regole del parser (decimale rilevato, con
+        la virgola decimale '1.5' non è un numero): interi → int, decimali →
+        float, i valori non numerici restano testo.
+        """
+        decimale = self.formato_csv['decimal']
+        
+        for colonna, campo in self._risolvi_mapping(df).items():
+            if campo not in self.CAMPI_NUMERICI:
+                continue
+            
+            testo = df[colonna].astype(object)
+            valorizzati = testo.notna()
+            if not valorizzati.any():
+                continue
+            
+            numerico = testo[valorizzati].str.strip()
+            if decimale != '.':
+                numerico = numerico.where(~numerico.str.contains('.', regex=False))
+                numerico = numerico.str.replace(decimale, '.', regex=False)
+            numeri = pd.to_numeric(numerico, errors='coerce')
+            numeri = numeri[numeri.notna()]
+            
+            interi = np.isfinite(numeri) & (numeri == numeri.round())
+            testo[numeri.index] = numeri.astype(object)
+            testo[numeri[interi].index] = numeri[interi].astype('int64').astype(object)
+            df[colonna] = testo
+        
+        return df
+    
+    def _leggi_csv(self, file_path: Path) -> pd.DataFrame:
+        """
+        Legge file CSV con gestione encoding e decimali
+        
+        NOTA IMPORTANTE: Gestisce formato italiano (decimale = virgola)
+        per evitare shift colonne.
+        """
+        df = pd.read_csv(file_path, **self._opzioni_csv(file_path))
+        
         # Valida struttura
         self._valida_struttura(df)
         
-        return df
+        return self._converti_numeri(df)
     
     def _leggi_excel(self, file_path: Path) -> pd.DataFrame:
         """Legge file Excel"""
@@ -219,7 +395,19 @@ class BaseImporter(ABC):
         Raises:
             ValueError: Se struttura non valida
         """
-        # Verifica colonne obbligatorie
+        self._valida_colonne(df)
+        
+        # Verifica almeno 1 riga dati
+        if len(df) == 0:
+            raise ValueError("File vuoto (0 righe)")
+    
+    def _valida_colonne(self, df: pd.DataFrame):
+        """
+        Verifica le colonne obbligatorie
+        
+        Raises:
+            ValueError: Colonne mancanti
+        """
         required = self.get_required_columns()
         missing = []
         
@@ -231,10 +419,113 @@ class BaseImporter(ABC):
         
         if missing:
             raise ValueError(f"Colonne mancanti: {missing}")
+    
+    def _risolvi_mapping(self, df: pd.DataFrame) -> Dict[str, str]:
+        """
+        Risolve il mapping sulle colonne reali del file (una volta per file)
         
-        # Verifica almeno 1 riga dati
-        if len(df) == 0:
-            raise ValueError("File vuoto (0 righe)")
+        Args:
+            df: DataFrame letto
+            
+        Returns:
+            dict: {colonna_df: campo_db} solo per le colonne presenti
+        """
+        # Prima colonna del file per ogni nome uppercase (case insensitive)
+        colonne_upper = {}
+        for c in df.columns:
+            colonne_upper.setdefault(str(c).upper(), c)
+        
+        risolto = {}
+        for col_file, campo_db in self.get_column_mapping().items():
+            col_found = colonne_upper.get(col_file.upper())
+            if col_found is not None:
+                risolto[col_found] = campo_db
+        
+        return risolto
+    
+    def mappa_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Seleziona, rinomina e pulisce le colonne mappate in blocco
+        
+        - NaN → None
+        - float interi → int (110.0 e 110 sono lo stesso valore anche se
+          i blocchi del file hanno dtype diversi)
+        - stringhe con strip()
+        - aggiunge noleggiatore, data_import, riga_excel
+        
+        Args:
+            df: DataFrame letto dal file
+            
+        Returns:
+            DataFrame con colonne = campi database
+        """
+        mapping = self._risolvi_mapping(df)
+        
+        origine = df[list(mapping.keys())]
+        mappato = origine.astype(object)
+        mappato.columns = list(mapping.values())
+        mappato = mappato.where(mappato.notna(), None)
+        
+        for i in range(origine.shape[1]):
+            serie = origine.iloc[:, i]
+            if pd.api.types.is_float_dtype(serie):
+                interi = np.isfinite(serie) & (serie == serie.round())
+                if interi.any():
+                    mappato.iloc[interi.to_numpy(), i] = serie[interi].to_numpy().astype('int64').astype(object)
+        
+        for campo in mappato.columns:
+            serie = mappato[campo]
+            is_str = serie.map(lambda v: isinstance(v, str))
+            if is_str.any():
+                mappato.loc[is_str, campo] = serie[is_str].str.strip()
+        
+        mappato.insert(0, 'riga_excel', df.index + 2)  # +2 perché Excel parte da 1 e ha header
+        mappato.insert(0, 'data_import', date.today())
+        mappato.insert(0, 'noleggiatore', self.NOLEGGIATORE)
+        
+        return mappato
+    
+    def _converti_date_frame(self, df: pd.DataFrame, campi: List[str]) -> pd.DataFrame:
+        """
+        Converte in date i valori testuali dei campi indicati
+        
+        Stessa semantica di _converti_date per riga: prova FORMATI_DATA
+        in ordine, i valori non riconosciuti restano invariati.
+        """
+        for campo in campi:
+            if campo not in df.columns:
+                continue
+            
+            serie = df[campo]
+            restanti = serie[serie.map(lambda v: isinstance(v, str) and v != '')]
+            
+            for fmt in self.FORMATI_DATA:
+                if restanti.empty:
+                    break
+                convertite = pd.to_datetime(restanti, format=fmt, errors='coerce')
+                ok = convertite.notna()
+                if ok.any():
+                    df.loc[ok[ok].index, campo] = convertite[ok].dt.date
+                restanti = restanti[~ok]
+        
+        return df
+    
+    @staticmethod
+    def _stringhe_valorizzate(serie: pd.Series) -> pd.Series:
+        """Maschera dei valori stringa non vuoti (equivale a `if value` per riga)"""
+        return serie.map(lambda v: isinstance(v, str) and v != '')
+    
+    @staticmethod
+    def _preserva_originale(df: pd.DataFrame, campo: str, campo_originale: str):
+        """Copia campo in campo_originale dove l'originale è vuoto"""
+        if campo not in df.columns:
+            return
+        if campo_originale not in df.columns:
+            df[campo_originale] = None
+        
+        vuoti = ~df[campo_originale].map(bool)
+        valorizzati = df[campo].map(bool)
+        df.loc[vuoti & valorizzati, campo_originale] = df.loc[vuoti & valorizzati, campo]
     
     def importa(self, file_path: Path = None) -> List[Dict]:
         """
@@ -252,46 +543,32 @@ class BaseImporter(ABC):
             if file_path is None:
                 raise ValueError("Nessun file trovato da importare")
         
-        # Leggi file
-        df = self.leggi_file(file_path)
-        
-        # Mappa colonne
-        mapping = self.get_column_mapping()
-        
-        # Converti in lista dizionari
+        # Leggi e converti a blocchi
         veicoli = []
+        for blocco in self.leggi_blocchi(file_path):
+            veicoli.extend(self.converti(blocco))
         
-        for idx, row in df.iterrows():
-            veicolo = {
-                'noleggiatore': self.NOLEGGIATORE,
-                'data_import': date.today(),
-                'riga_excel': idx + 2,  # +2 perché Excel parte da 1 e ha header
-            }
-            
-            # Applica mapping
-            for col_file, campo_db in mapping.items():
-                # Trova colonna (case insensitive)
-                col_found = None
-                for c in df.columns:
-                    if c.upper() == col_file.upper():
-                        col_found = c
-                        break
-                
-                if col_found:
-                    value = row[col_found]
-                    # Gestisci NaN
-                    if pd.isna(value):
-                        value = None
-                    elif isinstance(value, str):
-                        value = value.strip()
-                    veicolo[campo_db] = value
-            
-            # Post-processing specifico noleggiatore
-            veicolo = self.post_process_row(veicolo)
+        return veicoli
+    
+    def converti(self, df: pd.DataFrame) -> List[Dict]:
+        """
+        Converte il DataFrame letto in dizionari veicolo
+        
+        Args:
+            df: DataFrame (o blocco) restituito da leggi_file / leggi_blocchi
             
-            veicoli.append(veicolo)
+        Returns:
+            list: Lista dizionari con dati veicoli
+        """
+        # Mappa colonne (vettoriale)
+        mappato = self.mappa_frame(df)
         
-        return veicoli
+        # Post-processing specifico noleggiatore: vettoriale se disponibile
+        processato = self.post_process_frame(mappato)
+        if processato is not None:
+            return processato.to_dict('records')
+        
+        return [self.post_process_row(veicolo) for veicolo in mappato.to_dict('records')]
     
     def get_file_info(self, file_path: Path) -> Dict:
         """
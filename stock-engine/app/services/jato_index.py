@@ -0,0 +1,335 @@
+# =============================================================================
+# STOCK ENGINE - Indice candidati JATO in memoria
+# =============================================================================
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
+#
+# Indice dei modelli JATO caricato una volta per elaborazione e usato dal
+# matcher al posto di una query per veicolo.
+#
+# STRUTTURA:
+#   marca normalizzata → alimentazione → bucket ordinato per kW (e per HP)
+#
+# Ogni modello è una VoceJato con le parole chiave di vehicle set e product
+# description già estratte (una volta al caricamento, stringhe internate,
+# set condivisi tra descrizioni uguali) e l'alimentazione già normalizzata.
+#
+# Risponde alle stesse interrogazioni di JatoMatcher._query_candidati:
+#   - marca:         brand_normalized ILIKE '%MARCA%'  (sottostringa)
+#   - alimentazione: alimentazione ILIKE '%FUEL%'      (sottostringa)
+#   - potenza:       kw BETWEEN a AND b, altrimenti horsepower BETWEEN a AND b
+#   - LIMIT 200      (in ordine di id)
+#
+# AGGIORNAMENTO:
+#   L'indice ha una "versione" (numero record, id massimo, ultimo import).
+#   get_jato_index() la ricontrolla a ogni elaborazione e ricarica se il
+#   database JATO è cambiato; jato_migrator chiama invalida_jato_index()
+#   dopo ogni import.
+# =============================================================================
+
+import re
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func
+
+from app import db
+from app.models.jato import JatoModel
+from app.models.pattern import PatternCarburante
+
+
+# =============================================================================
+# PAROLE CHIAVE
+# =============================================================================
+
+# Stop words da ignorare (condivise con JatoMatcher)
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
+    'door', 'doors', 'euro', 'cv', 'kw', 'hp', 'ps',
+    '1', '2', '3', '4', '5', '6', '7', '8', '9',
+    'i', 'ii', 'iii', 'iv', 'v'
+})
+
+_RE_NON_PAROLA = re.compile(r'[^\w\s\-]')
+
+
+def estrai_keywords(text: str, stop_words=STOP_WORDS) -> set:
+    """
+    Estrae parole chiave da testo
+    
+    UPPERCASE, punteggiatura → spazio, esclusi stop words, parole di un
+    carattere e numeri puri. Le parole sono internate.
+    """
+    if not text:
+        return set()
+    
+    text = _RE_NON_PAROLA.sub(' ', text.upper())
+    
+    keywords = set()
+    for word in text.split():
+        if word.lower() in stop_words:
+            continue
+        if len(word) < 2:
+            continue
+        if word.isdigit():
+            continue
+        keywords.add(sys.intern(word))
+    
+    return keywords
+
+
+class VoceJato(NamedTuple):
+    """Modello JATO indicizzato"""
+    id: int
+    dati: Dict             # forma di JatoModel.to_dict() (da non modificare)
+    kw_vehicle_set: set    # parole chiave vehicle set (da non modificare)
+    kw_product: set        # parole chiave product description (da non modificare)
+    fuel_norm: Optional[str]  # PatternCarburante.normalizza_fuel(alimentazione)
+
+
+# Colonne lette dal database → chiavi di JatoModel.to_dict()
+COLONNE_INDICE = [
+    (JatoModel.product_id, 'product_id'),
+    (JatoModel.jato_code, 'jato_code'),
+    (JatoModel.brand_description, 'brand'),
+    (JatoModel.jato_model, 'model'),
+    (JatoModel.jato_product_description, 'description'),
+    (JatoModel.vehicle_set_description, 'vehicle_set'),
+    (JatoModel.alimentazione, 'alimentazione'),
+    (JatoModel.kw, 'kw'),
+    (JatoModel.horsepower, 'hp'),
+    (JatoModel.homologation, 'homologation'),
+    (JatoModel.transmission_description, 'transmission'),
+    (JatoModel.co2_wltp, 'co2'),
+]
+
+
+class _Bucket:
+    """
+    Modelli di una coppia (marca, alimentazione)
+    
+    Le voci (VoceJato) sono condivise tra tutte le interrogazioni.
+    """
+    
+    __slots__ = ('tutti', 'kw_valori', 'per_kw', 'hp_valori', 'per_hp')
+    
+    def __init__(self):
+        self.tutti = []
+        self.kw_valori = []
+        self.per_kw = []
+        self.hp_valori = []
+        self.per_hp = []
+    
+    def chiudi(self):
+        """Ordina le voci per kW e HP (chiamato a fine caricamento)"""
+        con_kw = sorted((v for v in self.tutti if v.dati['kw'] is not None),
+                        key=lambda v: v.dati['kw'])
+        self.kw_valori = [v.dati['kw'] for v in con_kw]
+        self.per_kw = con_kw
+        
+        con_hp = sorted((v for v in self.tutti if v.dati['hp'] is not None),
+                        key=lambda v: v.dati['hp'])
+        self.hp_valori = [v.dati['hp'] for v in con_hp]
+        self.per_hp = con_hp
+    
+    def cerca(self, kw_range: Optional[Tuple[int, int]],
+              hp_range: Optional[Tuple[int, int]]) -> List[VoceJato]:
+        """Voci nel range di potenza (estremi inclusi, come BETWEEN)"""
+        if kw_range:
+            valori, voci, (minimo, massimo) = self.kw_valori, self.per_kw, kw_range
+        elif hp_range:
+            valori, voci, (minimo, massimo) = self.hp_valori, self.per_hp, hp_range
+        else:
+            return self.tutti
+        
+        return voci[bisect_left(valori, minimo):bisect_right(valori, massimo)]
+
+
+class JatoIndex:
+    """
+    Indice candidati JATO in memoria
+    
+    Uso:
+        indice = get_jato_index()
+        candidati = indice.candidati('FIAT', fuel='Petrol', kw_range=(48, 54))
+    """
+    
+    # Come il LIMIT della query originale
+    LIMITE_CANDIDATI = 200
+    
+    def __init__(self):
+        self.versione = None
+        self.totale = 0
+        self._marche: Dict[str, Dict[Optional[str], _Bucket]] = {}
+        self._alimentazioni = set()
+        
+        # Memo delle ricerche per sottostringa (poche marche/fuel distinti)
+        self._memo_marche: Dict[str, List[str]] = {}
+        self._memo_fuel: Dict[str, set] = {}
+    
+    @staticmethod
+    def versione_db() -> Tuple:
+        """Versione corrente del database JATO (query leggera)"""
+        return tuple(db.session.query(
+            func.count(JatoModel.id),
+            func.max(JatoModel.id),
+            func.max(JatoModel.importato_il),
+        ).one())
+    
+    def carica(self) -> 'JatoIndex':
+        """
+        Carica tutti i modelli JATO (una query, nessun oggetto ORM)
+        
+        Returns:
+            self
+        """
+        versione = self.versione_db()
+        chiavi = [chiave for _, chiave in COLONNE_INDICE]
+        
+        query = db.session.query(
+            JatoModel.id, JatoModel.brand_normalized,
+            *[colonna for colonna, _ in COLONNE_INDICE]
+        ).order_by(JatoModel.id)
+        
+        marche = {}
+        alimentazioni = set()
+        totale = 0
+        
+        # Descrizioni e alimentazioni si ripetono molto: una sola estrazione
+        keywords_memo = {}
+        fuel_memo = {}
+        
+        def keywords(testo):
+            if testo not in keywords_memo:
+                keywords_memo[testo] = estrai_keywords(testo or '')
+            return keywords_memo[testo]
+        
+        for riga in query.yield_per(5000):
+            jato_id, brand = riga[0], riga[1]
+            if brand is None:
+                continue  # ILIKE su NULL non trova mai nulla
+            
+            dati = dict(zip(chiavi, riga[2:]))
+            alimentazione = dati['alimentazione'].upper() if dati['alimentazione'] else None
+            
+            if dati['alimentazione'] not in fuel_memo:
+                fuel_memo[dati['alimentazione']] = PatternCarburante.normalizza_fuel(dati['alimentazione'])
+            
+            voce = VoceJato(
+                id=jato_id,
+                dati=dati,
+                kw_vehicle_set=keywords(dati['vehicle_set']),
+                kw_product=keywords(dati['description']),
+                fuel_norm=fuel_memo[dati['alimentazione']],
+            )
+            
+            per_fuel = marche.setdefault(brand.upper(), {})
+            if alimentazione not in per_fuel:
+                per_fuel[alimentazione] = _Bucket()
+                if alimentazione:
+                    alimentazioni.add(alimentazione)
+            per_fuel[alimentazione].tutti.append(voce)
+            totale += 1
+        
+        for per_fuel in marche.values():
+            for bucket in per_fuel.values():
+                bucket.chiudi()
+        
+        self._marche = marche
+        self._alimentazioni = alimentazioni
+        self._memo_marche = {}
+        self._memo_fuel = {}
+        self.totale = totale
+        self.versione = versione
+        
+        return self
+    
+    def _marche_per(self, marca: str) -> List[str]:
+        """Marche indicizzate che contengono marca (ILIKE '%MARCA%')"""
+        marca = marca.upper()
+        if marca not in self._memo_marche:
+            self._memo_marche[marca] = [m for m in self._marche if marca in m]
+        return self._memo_marche[marca]
+    
+    def _alimentazioni_per(self, fuel: str) -> set:
+        """Alimentazioni indicizzate che contengono fuel (ILIKE '%FUEL%')"""
+        fuel = fuel.upper()
+        if fuel not in self._memo_fuel:
+            self._memo_fuel[fuel] = {a for a in self._alimentazioni if fuel in a}
+        return self._memo_fuel[fuel]
+    
+    def voci(self, marca: str, fuel: str = None,
+             kw_range: Tuple[int, int] = None,
+             hp_range: Tuple[int, int] = None) -> List[VoceJato]:
+        """
+        Voci candidate per marca/alimentazione/potenza
+        
+        Args:
+            marca: Marca veicolo
+            fuel: Tipo alimentazione (opzionale)
+            kw_range: (min, max) kW inclusi (ha precedenza su hp_range)
+            hp_range: (min, max) HP inclusi
+        
+        Returns:
+            list: VoceJato in ordine di id, al massimo LIMITE_CANDIDATI
+        """
+        trovati = []
+        alimentazioni = self._alimentazioni_per(fuel) if fuel else None
+        
+        for brand in self._marche_per(marca or ''):
+            for alimentazione, bucket in self._marche[brand].items():
+                if alimentazioni is not None and alimentazione not in alimentazioni:
+                    continue
+                trovati.extend(bucket.cerca(kw_range, hp_range))
+        
+        if len(trovati) > 1:
+            trovati.sort(key=lambda v: v.id)
+        
+        return trovati[:self.LIMITE_CANDIDATI]
+    
+    def candidati(self, marca: str, fuel: str = None,
+                  kw_range: Tuple[int, int] = None,
+                  hp_range: Tuple[int, int] = None) -> List[Dict]:
+        """
+        Come voci(), ma restituisce i dizionari in formato JatoModel.to_dict()
+        (condivisi, da non modificare)
+        """
+        return [v.dati for v in self.voci(marca, fuel, kw_range, hp_range)]
+
+
+# =============================================================================
+# ISTANZA CONDIVISA
+# =============================================================================
+
+_indice: Optional[JatoIndex] = None
+_lock = threading.Lock()
+
+
+def get_jato_index(verifica_versione: bool = True) -> JatoIndex:
+    """
+    Indice JATO condiviso del processo
+    
+    Args:
+        verifica_versione: Ricontrolla la versione del database e ricarica
+                           se JATO è stato aggiornato (una query leggera)
+    
+    Returns:
+        JatoIndex caricato
+    """
+    global _indice
+    
+    with _lock:
+        if _indice is None or (verifica_versione and _indice.versione != JatoIndex.versione_db()):
+            _indice = JatoIndex().carica()
+        return _indice
+
+
+def invalida_jato_index():
+    """Scarta l'indice condiviso (ricaricato alla prossima richiesta)"""
+    global _indice
+    
+    with _lock:
+        _indice = None
@@ -1,20 +1,213 @@
 # =============================================================================
 # STOCK ENGINE - JATO Migrator
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.2.0
+# Data: 19 ottobre 2026
 #
 # Servizio per migrazione database JATO esistente (SQLite) nel nuovo sistema.
+#
+# v1.1.0: invalida l'indice JATO in memoria dopo ogni import
+# v1.2.0: caricamento massivo: pulizia vettoriale con pandas, tabella di
+#         staging temporanea (COPY su PostgreSQL, executemany a blocchi
+#         altrove) e merge su jato_models in un'unica transazione; il
+#         matcher non vede mai una tabella caricata a metà. Report righe/s
 # =============================================================================
 
+import io
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from typing import Dict
 
+import pandas as pd
 from flask import current_app
+from sqlalchemy import Column, MetaData, Table, func, select, true
 
 from app import db
 from app.models.jato import JatoModel
+from app.models.upsert import insert_upsert
+
+from .jato_index import invalida_jato_index
+from .misure import MisureFasi
+
+
+# Righe per executemany sulla tabella di staging (senza COPY)
+BLOCCO_STAGING = 5000
+
+# Colonne caricabili (id è assegnato dal database)
+COLONNE_JATO = [c.name for c in JatoModel.__table__.columns if c.name != 'id']
+
+
+def _testo(serie: pd.Series) -> pd.Series:
+    """Colonna come testo (NA conservati, 123.0 letto da Excel -> '123')"""
+    if pd.api.types.is_float_dtype(serie):
+        valori = serie.dropna()
+        if (valori == valori.round()).all():
+            serie = serie.astype('Int64')
+    return serie.astype('string')
+
+
+def pulisci_jato(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pulizia vettoriale di un estratto JATO
+    
+    Nomi colonna normalizzati ('Product ID' -> product_id), solo le colonne
+    di jato_models, righe senza product_id scartate, per product_id
+    duplicati vale l'ultima riga, tipi allineati al modello.
+    
+    Args:
+        df: DataFrame letto da Excel o dal vecchio database
+    
+    Returns:
+        DataFrame pronto per lo staging
+    
+    Raises:
+        ValueError: Colonna product_id mancante
+    """
+    df = df.rename(columns=lambda c: str(c).strip().lower().replace(' ', '_'))
+    df = df.loc[:, ~df.columns.duplicated()]
+    
+    if 'product_id' not in df.columns:
+        raise ValueError("Colonna 'Product ID' mancante")
+    
+    df = df[[c for c in COLONNE_JATO if c in df.columns]].copy()
+    
+    for colonna in df.columns:
+        tipo = JatoModel.__table__.c[colonna].type.python_type
+        if tipo is str:
+            df[colonna] = _testo(df[colonna])
+        elif tipo is int:
+            df[colonna] = pd.to_numeric(df[colonna], errors='coerce').round().astype('Int64')
+        elif tipo is float:
+            df[colonna] = pd.to_numeric(df[colonna], errors='coerce')
+    
+    df['product_id'] = df['product_id'].str.strip()
+    df = df[df['product_id'].notna() & (df['product_id'] != '')]
+    df = df.drop_duplicates('product_id', keep='last')
+    
+    if 'brand_description' in df.columns:
+        df['brand_normalized'] = df['brand_description'].str.upper()
+    df['importato_il'] = datetime.utcnow()
+    
+    return df
+
+
+def _tabella_staging(colonne) -> Table:
+    """Tabella temporanea con le colonne di jato_models da caricare"""
+    return Table(
+        'jato_models_staging', MetaData(),
+        *[Column(c, JatoModel.__table__.c[c].type) for c in colonne],
+        prefixes=['TEMPORARY'],
+    )
+
+
+def _righe(df: pd.DataFrame) -> list:
+    """Righe del DataFrame come dict, con None al posto di NaN/NA"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _riempi_staging(conn, staging: Table, df: pd.DataFrame):
+    """
+    Carica il DataFrame nella tabella di staging
+    
+    PostgreSQL: COPY FROM STDIN (CSV) sulla connessione della sessione.
+    Altri database: executemany a blocchi di BLOCCO_STAGING righe.
+    """
+    if conn.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        
+        colonne = ', '.join(staging.c.keys())
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {staging.name} ({colonne}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        return
+    
+    righe = _righe(df)
+    for i in range(0, len(righe), BLOCCO_STAGING):
+        conn.execute(staging.insert(), righe[i:i + BLOCCO_STAGING])
+
+
+def carica_jato(df: pd.DataFrame, misure: MisureFasi = None) -> Dict:
+    """
+    Carica un estratto JATO in jato_models (inserisce i nuovi product_id,
+    aggiorna gli esistenti nelle colonne presenti)
+    
+    Le righe passano da una tabella di staging temporanea e vengono unite
+    con un solo INSERT ... SELECT ... ON CONFLICT: staging e merge sono
+    nella stessa transazione, quindi chi legge jato_models vede il rilascio
+    precedente o quello nuovo, mai uno stato intermedio.
+    
+    Args:
+        df: DataFrame grezzo (colonne come nel file JATO)
+        misure: MisureFasi per il report (opzionale)
+    
+    Returns:
+        Dict con righe, aggiunti, aggiornati
+    """
+    misure = misure or MisureFasi()
+    
+    with misure.fase('pulizia', righe=len(df)):
+        df = pulisci_jato(df)
+    
+    colonne = list(df.columns)
+    staging = _tabella_staging(colonne)
+    jato = JatoModel.__table__
+    
+    try:
+        conn = db.session.connection()
+        staging.create(conn)
+        
+        with misure.fase('staging', righe=len(df)):
+            _riempi_staging(conn, staging, df)
+        
+        with misure.fase('merge', righe=len(df)):
+            aggiornati = conn.execute(
+                select(func.count())
+                .select_from(staging.join(jato, staging.c.product_id == jato.c.product_id))
+            ).scalar()
+            
+            # WHERE true: su SQLite evita l'ambiguità tra SELECT e ON CONFLICT
+            stmt = insert_upsert(JatoModel).from_select(
+                colonne, select(*[staging.c[c] for c in colonne]).where(true())
+            )
+            da_aggiornare = {c: stmt.excluded[c] for c in colonne if c != 'product_id'}
+            if da_aggiornare:
+                stmt = stmt.on_conflict_do_update(index_elements=['product_id'], set_=da_aggiornare)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=['product_id'])
+            conn.execute(stmt)
+            
+            staging.drop(conn)
+        
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    # Nuovo rilascio JATO: l'indice del matcher va ricaricato
+    invalida_jato_index()
+    
+    return {
+        'righe': len(df),
+        'aggiunti': len(df) - aggiornati,
+        'aggiornati': aggiornati,
+    }
+
+
+def _stampa_report(misure: MisureFasi, esito: Dict):
+    """Report fasi e velocità complessiva del caricamento"""
+    for riga in misure.righe_report():
+        print(riga)
+    
+    secondi = misure.riepilogo()['totale']['secondi']
+    velocita = round(esito['righe'] / secondi) if secondi > 0 else 0
+    print(f"  Aggiunti: {esito['aggiunti']}")
+    print(f"  Aggiornati: {esito['aggiornati']}")
+    print(f"  Totale: {esito['righe']} righe in {secondi:.2f}s ({velocita} righe/s)")
 
 
 def migrate_jato_db(app=None):
@@ -40,62 +233,21 @@ def migrate_jato_db(app=None):
         print(f"{'='*60}")
         print(f"Sorgente: {jato_db_path}")
         
-        # Connessione al vecchio database
-        conn = sqlite3.connect(str(jato_db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Conta record
-        cursor.execute("SELECT COUNT(*) FROM jato_models")
-        total = cursor.fetchone()[0]
-        print(f"Record da migrare: {total}")
-        
-        # Leggi tutti i record
-        cursor.execute("SELECT * FROM jato_models")
-        rows = cursor.fetchall()
-        
-        # Migra in batch
-        batch_size = 1000
-        migrated = 0
-        
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i:i+batch_size]
-            
-            for row in batch:
-                # Crea record nel nuovo database
-                jato = JatoModel(
-                    product_id=row['product_id'],
-                    jato_code=row['jato_code'],
-                    brand_description=row['brand_description'],
-                    jato_model=row['jato_model'],
-                    jato_product_description=row['jato_product_description'],
-                    vehicle_set_description=row['vehicle_set_description'],
-                    alimentazione=row['alimentazione'],
-                    kw=row['kw'],
-                    horsepower=row['horsepower'],
-                    homologation=row['homologation'],
-                    transmission_description=row['transmission_description'],
-                    powertrain_type=row['powertrain_type'],
-                    co2_wltp=row.get('co2_wltp'),
-                    source_sheet=row['source_sheet'],
-                    # Campi normalizzati
-                    brand_normalized=row['brand_description'].upper() if row['brand_description'] else None,
-                    importato_il=datetime.utcnow()
-                )
-                
-                # Usa merge per evitare duplicati
-                db.session.merge(jato)
+        with MisureFasi(db.engine) as misure:
+            # Lettura dal vecchio database
+            with misure.fase('lettura') as fase:
+                conn = sqlite3.connect(str(jato_db_path))
+                try:
+                    df = pd.read_sql_query("SELECT * FROM jato_models", conn)
+                finally:
+                    conn.close()
+                fase['righe'] = len(df)
             
-            db.session.commit()
-            migrated += len(batch)
-            
-            # Progress
-            progress = (migrated / total) * 100
-            print(f"  Migrati: {migrated}/{total} ({progress:.1f}%)", end='\r')
-        
-        print(f"\n\n✔ Migrazione completata: {migrated} record")
+            print(f"Record da migrare: {len(df)}")
+            esito = carica_jato(df, misure)
         
-        conn.close()
+        print("\n✔ Migrazione completata")
+        _stampa_report(misure, esito)
         
         # Statistiche
         stats = JatoModel.get_statistics()
@@ -105,7 +257,7 @@ def migrate_jato_db(app=None):
         print(f"{'='*60}\n")
 
 
-def update_jato_from_file(xlsx_path: Path):
+def update_jato_from_file(xlsx_path: Path) -> Dict:
     """
     Aggiorna database JATO da file Excel
     
@@ -113,53 +265,18 @@ def update_jato_from_file(xlsx_path: Path):
     
     Args:
         xlsx_path: Path file Excel JATO
-    """
-    import pandas as pd
     
+    Returns:
+        Dict con righe, aggiunti, aggiornati
+    """
     print(f"Aggiornamento JATO da: {xlsx_path}")
     
-    # Leggi Excel
-    df = pd.read_excel(xlsx_path)
-    
-    added = 0
-    updated = 0
-    
-    for _, row in df.iterrows():
-        product_id = row.get('Product ID') or row.get('product_id')
+    with MisureFasi(db.engine) as misure:
+        with misure.fase('lettura') as fase:
+            df = pd.read_excel(xlsx_path)
+            fase['righe'] = len(df)
         
-        if not product_id:
-            continue
-        
-        existing = JatoModel.query.filter_by(product_id=product_id).first()
-        
-        if existing:
-            # Aggiorna
-            for col in df.columns:
-                field = col.lower().replace(' ', '_')
-                if hasattr(existing, field):
-                    setattr(existing, field, row[col])
-            updated += 1
-        else:
-            # Inserisci nuovo
-            jato = JatoModel(
-                product_id=product_id,
-                jato_code=row.get('Jato Code') or row.get('jato_code'),
-                brand_description=row.get('Brand Description') or row.get('brand_description'),
-                jato_model=row.get('Jato Model') or row.get('jato_model'),
-                jato_product_description=row.get('Jato Product Description') or row.get('jato_product_description'),
-                vehicle_set_description=row.get('Vehicle Set Description') or row.get('vehicle_set_description'),
-                alimentazione=row.get('Alimentazione') or row.get('alimentazione'),
-                kw=row.get('KW') or row.get('kw'),
-                horsepower=row.get('Horsepower') or row.get('horsepower'),
-                homologation=row.get('Homologation') or row.get('homologation'),
-                transmission_description=row.get('Transmission Description') or row.get('transmission_description'),
-                importato_il=datetime.utcnow()
-            )
-            jato.brand_normalized = jato.brand_description.upper() if jato.brand_description else None
-            db.session.add(jato)
-            added += 1
-    
-    db.session.commit()
+        esito = carica_jato(df, misure)
     
-    print(f"  Aggiunti: {added}")
-    print(f"  Aggiornati: {updated}")
+    _stampa_report(misure, esito)
+    return esito
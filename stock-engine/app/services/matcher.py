@@ -1,21 +1,49 @@
 # =============================================================================
 # STOCK ENGINE - JATO Matcher Service
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.6.0
+# Data: 19 ottobre 2026
 #
 # Servizio per matching veicoli con database JATO.
 # Implementa l'algoritmo di scoring multi-campo.
 # Sostituisce il modulo 02_match_jato.py
+#
+# v1.1.0: candidati da indice JATO in memoria (jato_index) invece di una
+#         query per veicolo
+# v1.2.0: parole chiave JATO estratte una volta nell'indice, dati veicolo
+#         calcolati una volta per veicolo, scoring con uscita anticipata
+#         (risultati identici: scripts/regressione_match.py)
+# v1.3.0: pattern carburante compilati una volta per elaborazione (fuel_matcher)
+# v1.4.0: esiti memorizzati tra elaborazioni (match_cache): description già
+#         viste con gli stessi dati JATO/pattern/glossario non vengono rimatchate
+# v1.5.0: match in parallelo su più processi (workers), con indice JATO e
+#         pattern carburante condivisi via fork
+# v1.5.1: lavoro passato ai figli con l'initializer del pool (nessuno stato
+#         globale nel processo padre: più batch in thread diversi non si
+#         sovrascrivono)
+# v1.6.0: esiti nuovi raccolti in memoria (in_attesa) e scritti da
+#         salva_cache() nella transazione del chiamante, invece di un
+#         commit su match_cache per ogni batch
 # =============================================================================
 
 import re
-from typing import List, Dict, Optional, Tuple
+import multiprocessing
+from typing import List, Dict, NamedTuple, Optional
 
-from app import db
-from app.models.jato import JatoModel
+from app.models.match_cache import MatchCache
 from app.models.pattern import PatternCarburante
 
+from .fuel_matcher import FuelMatcher, get_fuel_matcher
+from .jato_index import JatoIndex, VoceJato, STOP_WORDS, estrai_keywords, get_jato_index
+
+
+class ProfiloVeicolo(NamedTuple):
+    """Dati del veicolo usati nello scoring (calcolati una volta per veicolo)"""
+    keywords: set
+    fuel_norm: Optional[str]    # alimentazione identificata e normalizzata
+    parole_ripetute: int
+    bonus_ripetute: int         # bonus parole ripetute già limitato
+
 
 class JatoMatcher:
     """
@@ -44,36 +72,135 @@ class JatoMatcher:
     BONUS_PAROLE_RIPETUTE = 10
     PENALITA_PAROLA_EXTRA = -2
     
-    # Stop words da ignorare
-    STOP_WORDS = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
-        'door', 'doors', 'euro', 'cv', 'kw', 'hp', 'ps',
-        '1', '2', '3', '4', '5', '6', '7', '8', '9',
-        'i', 'ii', 'iii', 'iv', 'v'
-    }
+    # Stop words da ignorare (le stesse usate dall'indice JATO)
+    STOP_WORDS = STOP_WORDS
+    
+    # Sotto questo numero di veicoli da matchare non conviene avviare processi
+    MIN_VEICOLI_PARALLELO = 500
     
-    def __init__(self):
-        """Inizializza matcher"""
-        self._cache_patterns = None
+    # Blocchi per worker (bilancia description più o meno costose)
+    BLOCCHI_PER_WORKER = 4
+    
+    def __init__(self, indice: JatoIndex = None, fuel_matcher: FuelMatcher = None):
+        """
+        Inizializza matcher
+        
+        Args:
+            indice: Indice JATO da usare (default: indice condiviso)
+            fuel_matcher: Pattern carburante compilati (default: condivisi)
+        """
+        self.indice = indice
+        self.fuel_matcher = fuel_matcher
+        self.statistiche_cache = {'hit': 0, 'miss': 0}
     
-    def match_batch(self, veicoli: List[Dict]) -> List[Dict]:
+    def match_batch(self, veicoli: List[Dict], usa_cache: bool = True,
+                    workers: int = 1, in_attesa: Dict = None) -> List[Dict]:
         """
         Match batch di veicoli
         
+        Con la cache attiva ogni impronta (noleggiatore, marca, description,
+        co2) viene matchata una sola volta: gli esiti già in match_cache per
+        la versione corrente dei dati, o già calcolati in questo batch, sono
+        riusati. Statistiche in self.statistiche_cache.
+        
         Args:
             veicoli: Lista dizionari veicoli
+            usa_cache: Usa la cache esiti (match_cache)
+            workers: Processi per il match (1 = nel processo corrente)
+            in_attesa: {versione: {chiave: esito}}. Se indicato gli esiti
+                nuovi sono raccolti qui invece di essere scritti (e
+                committati) subito, e quelli già raccolti valgono per i
+                batch successivi; li scrive salva_cache()
             
         Returns:
-            list: Veicoli con dati match
+            list: Veicoli con dati match (stesso ordine dell'input)
+        """
+        # Indice JATO e pattern carburante: ricaricati solo se cambiati
+        self.indice = get_jato_index()
+        self.fuel_matcher = get_fuel_matcher()
+        self.statistiche_cache = {'hit': 0, 'miss': 0}
+        
+        if not usa_cache:
+            esiti = self._calcola_esiti(veicoli, workers)
+            return [self._applica_esito(v, e) for v, e in zip(veicoli, esiti)]
+        
+        versione = MatchCache.calcola_versione(self.indice.versione, self.fuel_matcher.patterns)
+        chiavi = [MatchCache.impronta(veicolo) for veicolo in veicoli]
+        raccolti = in_attesa.setdefault(versione, {}) if in_attesa is not None else {}
+        esiti = {chiave: raccolti[chiave] for chiave in chiavi if chiave in raccolti}
+        esiti.update(MatchCache.cerca([c for c in chiavi if c not in esiti], versione))
+        
+        # Un veicolo per ogni impronta da matchare
+        da_calcolare = {}
+        for veicolo, chiave in zip(veicoli, chiavi):
+            if chiave in esiti or chiave in da_calcolare:
+                self.statistiche_cache['hit'] += 1
+            else:
+                da_calcolare[chiave] = veicolo
+                self.statistiche_cache['miss'] += 1
+        
+        nuovi = dict(zip(da_calcolare, self._calcola_esiti(list(da_calcolare.values()), workers)))
+        esiti.update(nuovi)
+        
+        if in_attesa is not None:
+            raccolti.update(nuovi)
+        elif nuovi:
+            # Dati cambiati → gli esiti delle versioni precedenti non servono più
+            MatchCache.pulisci(versione)
+            MatchCache.salva(nuovi, versione)
+        
+        return [self._applica_esito(v, esiti[c]) for v, c in zip(veicoli, chiavi)]
+    
+    @staticmethod
+    def salva_cache(in_attesa: Dict) -> int:
+        """
+        Scrive in match_cache gli esiti raccolti da match_batch (commit nel
+        chiamante) e scarta quelli delle versioni precedenti
+        
+        Args:
+            in_attesa: {versione: {chiave: esito}} (svuotato)
+            
+        Returns:
+            int: Esiti scritti
+        """
+        salvati = 0
+        for versione, esiti in in_attesa.items():
+            if esiti:
+                MatchCache.pulisci(versione, commit=False)
+                MatchCache.salva(esiti, versione, commit=False)
+                salvati += len(esiti)
+        in_attesa.clear()
+        return salvati
+    
+    def _calcola_esiti(self, veicoli: List[Dict], workers: int = 1) -> List[Dict]:
         """
-        risultati = []
+        Esiti match (_esito_match) nello stesso ordine dei veicoli
         
-        for veicolo in veicoli:
-            veicolo_matched = self.match_singolo(veicolo)
-            risultati.append(veicolo_matched)
+        Con workers > 1 i veicoli sono divisi in blocchi tra processi figli
+        creati con fork: ogni figlio eredita indice JATO e pattern carburante
+        già caricati (nessuna copia, nessun accesso al database). Dove fork
+        non è disponibile il match resta nel processo corrente.
         
-        return risultati
+        Args:
+            veicoli: Veicoli da matchare
+            workers: Numero processi
+        """
+        if (workers <= 1 or len(veicoli) < self.MIN_VEICOLI_PARALLELO
+                or 'fork' not in multiprocessing.get_all_start_methods()):
+            return [self._esito_match(veicolo) for veicolo in veicoli]
+        
+        n_blocchi = workers * self.BLOCCHI_PER_WORKER
+        dimensione = -(-len(veicoli) // n_blocchi)
+        blocchi = [(i, min(i + dimensione, len(veicoli))) for i in range(0, len(veicoli), dimensione)]
+        
+        # Matcher e veicoli arrivano ai figli di questo pool con fork (initargs
+        # non serializzati): ai worker passano solo gli intervalli
+        contesto = multiprocessing.get_context('fork')
+        with contesto.Pool(workers, initializer=_imposta_lavoro,
+                           initargs=(self, veicoli)) as pool:
+            parti = pool.map(_esiti_blocco, blocchi)
+        
+        return [esito for parte in parti for esito in parte]
     
     def match_singolo(self, veicolo: Dict) -> Dict:
         """
@@ -85,8 +212,29 @@ class JatoMatcher:
         Returns:
             dict: Veicolo con dati match aggiunti
         """
+        return self._applica_esito(veicolo, self._esito_match(veicolo))
+    
+    def _applica_esito(self, veicolo: Dict, esito: Dict) -> Dict:
+        """Copia del veicolo con i campi dell'esito match"""
         result = veicolo.copy()
+        result.update(esito)
+        
+        # match_details è un dict: ogni veicolo ha la sua copia
+        if esito.get('match_details') is not None:
+            result['match_details'] = dict(esito['match_details'])
         
+        return result
+    
+    def _esito_match(self, veicolo: Dict) -> Dict:
+        """
+        Calcola l'esito del match (solo i campi impostati dal matcher)
+        
+        Args:
+            veicolo: Dizionario veicolo
+            
+        Returns:
+            dict: Campi match da aggiungere al veicolo
+        """
         marca = veicolo.get('marca', '')
         description = veicolo.get('description', '')
         co2 = veicolo.get('co2')
@@ -102,18 +250,18 @@ class JatoMatcher:
         candidati = self._query_candidati(marca, kw, hp, fuel, co2)
         
         if not candidati:
-            result.update({
+            return {
                 'match_status': 'NO_MATCH',
                 'match_score': 0,
                 'match_note': 'Nessun candidato trovato',
-            })
-            return result
+            }
         
         # STEP 2-4: Trova best match
-        best = self._trova_best_match(veicolo, candidati)
+        profilo = self._profilo_veicolo(description, fuel)
+        best = self._trova_best_match(profilo, candidati)
         
         if best:
-            result.update({
+            return {
                 'jato_code': best.get('jato_code'),
                 'product_id': best.get('product_id'),
                 'omologazione': best.get('homologation'),
@@ -127,20 +275,18 @@ class JatoMatcher:
                 'match_score': best.get('match_score'),
                 'match_note': best.get('match_note'),
                 'match_details': best.get('match_details'),
-            })
-        else:
-            result.update({
-                'match_status': 'NO_MATCH',
-                'match_score': 0,
-                'match_note': 'Nessun match sopra soglia minima',
-            })
+            }
         
-        return result
+        return {
+            'match_status': 'NO_MATCH',
+            'match_score': 0,
+            'match_note': 'Nessun match sopra soglia minima',
+        }
     
     def _query_candidati(self, marca: str, kw: int = None, hp: int = None,
-                         fuel: str = None, co2: float = None) -> List[Dict]:
+                         fuel: str = None, co2: float = None) -> List[VoceJato]:
         """
-        Query candidati JATO
+        Candidati JATO dall'indice in memoria
         
         Args:
             marca: Marca veicolo
@@ -150,131 +296,177 @@ class JatoMatcher:
             co2: Emissioni CO2
             
         Returns:
-            list: Lista candidati
+            list: Lista candidati (VoceJato, parole chiave già estratte)
         """
-        query = JatoModel.query.filter(
-            JatoModel.brand_normalized.ilike(f'%{marca.upper()}%')
-        )
+        if self.indice is None:
+            self.indice = get_jato_index(verifica_versione=False)
         
-        # Filtro alimentazione
-        if fuel:
-            query = query.filter(JatoModel.alimentazione.ilike(f'%{fuel}%'))
-        
-        # Filtro potenza
+        # Filtro potenza (kW ha precedenza su HP)
+        kw_range = hp_range = None
         if kw:
-            query = query.filter(
-                JatoModel.kw.between(kw - self.KW_TOLERANCE, kw + self.KW_TOLERANCE)
-            )
+            kw_range = (kw - self.KW_TOLERANCE, kw + self.KW_TOLERANCE)
         elif hp:
-            query = query.filter(
-                JatoModel.horsepower.between(hp - self.HP_TOLERANCE, hp + self.HP_TOLERANCE)
-            )
+            hp_range = (hp - self.HP_TOLERANCE, hp + self.HP_TOLERANCE)
         
-        candidati = query.limit(200).all()
+        return self.indice.voci(marca, fuel=fuel, kw_range=kw_range, hp_range=hp_range)
+    
+    def _profilo_veicolo(self, description: str, fuel: Optional[str]) -> ProfiloVeicolo:
+        """
+        Calcola una volta i dati del veicolo usati per ogni candidato
+        
+        Args:
+            description: Description veicolo
+            fuel: Alimentazione identificata dalla description
+        """
+        parole_ripetute = self._conta_parole_ripetute(description)
         
-        return [c.to_dict() for c in candidati]
+        return ProfiloVeicolo(
+            keywords=self._extract_keywords(description),
+            fuel_norm=self._normalize_fuel(fuel) if fuel else None,
+            parole_ripetute=parole_ripetute,
+            bonus_ripetute=min(parole_ripetute * 5, self.BONUS_PAROLE_RIPETUTE) if parole_ripetute > 0 else 0,
+        )
     
-    def _trova_best_match(self, veicolo: Dict, candidati: List[Dict]) -> Optional[Dict]:
+    def _trova_best_match(self, profilo: ProfiloVeicolo, candidati: List[VoceJato]) -> Optional[Dict]:
         """
         Trova miglior match tra candidati
         
+        I candidati sono valutati in ordine di punteggio massimo raggiungibile:
+        appena il massimo scende sotto il best corrente ci si ferma. Il
+        risultato è lo stesso dell'ordinamento completo: primo candidato (in
+        ordine di lista) con lo score più alto, PARTIAL se un altro ha lo
+        stesso score.
+        
         Args:
-            veicolo: Veicolo da matchare
+            profilo: Dati veicolo (_profilo_veicolo)
             candidati: Lista candidati JATO
             
         Returns:
             dict: Best match o None
         """
-        description = veicolo.get('description', '')
-        keywords_veicolo = self._extract_keywords(description)
+        massimi = [self._score_massimo(profilo, c) for c in candidati]
+        ordine = sorted(range(len(candidati)), key=lambda i: -massimi[i])
         
-        scored = []
+        soglia = self.MIN_MATCH_SCORE
+        best_score = None
+        migliori = []  # posizioni dei candidati con best_score
         
-        for candidato in candidati:
-            score, details = self._calcola_score(keywords_veicolo, candidato, veicolo)
+        for i in ordine:
+            if massimi[i] < soglia:
+                break  # nessun candidato rimasto può raggiungere il best
+            
+            score = self._calcola_score(profilo, candidati[i])
             
-            if score >= self.MIN_MATCH_SCORE:
-                scored.append({
-                    'candidato': candidato,
-                    'score': score,
-                    'details': details,
-                })
-        
-        if not scored:
+            if score < soglia:
+                continue
+            if best_score is None or score > best_score:
+                best_score = score
+                migliori = [i]
+                soglia = score
+            else:
+                migliori.append(i)
+        
+        if not migliori:
             return None
         
-        # Ordina per score decrescente
-        scored.sort(key=lambda x: x['score'], reverse=True)
+        migliori.sort()
+        primo = self._valuta(profilo, candidati[migliori[0]], best_score)
         
         # Gestione duplicati (stesso score)
-        if len(scored) >= 2 and scored[0]['score'] == scored[1]['score']:
-            return self._gestisci_duplicato(scored[0], scored[1])
+        if len(migliori) >= 2:
+            secondo = self._valuta(profilo, candidati[migliori[1]], best_score)
+            return self._gestisci_duplicato(primo, secondo)
         
         # Best match unico
-        best = scored[0]
-        result = best['candidato'].copy()
-        result['match_score'] = best['score']
-        result['match_details'] = best['details']
+        result = primo['candidato'].copy()
+        result['match_score'] = primo['score']
+        result['match_details'] = primo['details']
         result['match_status'] = 'MATCHED'
         
         return result
     
-    def _calcola_score(self, keywords_veicolo: set, candidato: Dict, 
-                       veicolo: Dict) -> Tuple[int, Dict]:
+    def _valuta(self, profilo: ProfiloVeicolo, candidato: VoceJato, score: int) -> Dict:
+        """Candidato selezionato con i dettagli dello score"""
+        details = {}
+        self._calcola_score(profilo, candidato, details)
+        
+        return {
+            'candidato': candidato.dati,
+            'score': score,
+            'details': details,
+        }
+    
+    def _score_massimo(self, profilo: ProfiloVeicolo, candidato: VoceJato) -> int:
+        """
+        Limite superiore dello score di un candidato (solo dimensioni dei set)
+        
+        Ogni parola in comune aggiunge punti e toglie una parola extra, quindi
+        il massimo si ha con tutte le parole possibili in comune.
+        """
+        n_keywords = len(profilo.keywords)
+        comuni_vs = min(n_keywords, len(candidato.kw_vehicle_set))
+        comuni_prod = min(n_keywords, len(candidato.kw_product))
+        
+        score = profilo.bonus_ripetute
+        score += min(comuni_vs * 10, self.SCORE_VEHICLE_SET)
+        score += min(comuni_prod * 8, self.SCORE_PRODUCT_DESC)
+        if profilo.fuel_norm is not None and profilo.fuel_norm == candidato.fuel_norm:
+            score += self.SCORE_FUEL
+        
+        penalita = (len(candidato.kw_product) - comuni_prod) * abs(self.PENALITA_PAROLA_EXTRA)
+        return max(0, score - penalita)
+    
+    def _calcola_score(self, profilo: ProfiloVeicolo, candidato: VoceJato,
+                       details: Dict = None) -> int:
         """
         Calcola score per un candidato
         
         Args:
-            keywords_veicolo: Set parole chiave veicolo
+            profilo: Dati veicolo (_profilo_veicolo)
             candidato: Candidato JATO
-            veicolo: Veicolo originale
+            details: Se indicato viene riempito con i dettagli dello score
             
         Returns:
-            tuple: (score, details)
+            int: Score
         """
+        keywords_veicolo = profilo.keywords
         score = 0
-        details = {}
-        
-        # Keywords candidato
-        kw_vehicle_set = self._extract_keywords(candidato.get('vehicle_set', ''))
-        kw_product = self._extract_keywords(candidato.get('description', ''))
         
         # SCORE: Vehicle Set match
-        match_vs = keywords_veicolo & kw_vehicle_set
+        match_vs = keywords_veicolo & candidato.kw_vehicle_set
         if match_vs:
-            bonus_vs = min(len(match_vs) * 10, self.SCORE_VEHICLE_SET)
-            score += bonus_vs
-            details['vehicle_set'] = list(match_vs)
+            score += min(len(match_vs) * 10, self.SCORE_VEHICLE_SET)
+            if details is not None:
+                details['vehicle_set'] = list(match_vs)
         
         # SCORE: Product description match
-        match_prod = keywords_veicolo & kw_product
+        match_prod = keywords_veicolo & candidato.kw_product
         if match_prod:
-            bonus_prod = min(len(match_prod) * 8, self.SCORE_PRODUCT_DESC)
-            score += bonus_prod
-            details['product'] = list(match_prod)
+            score += min(len(match_prod) * 8, self.SCORE_PRODUCT_DESC)
+            if details is not None:
+                details['product'] = list(match_prod)
         
         # SCORE: Fuel match
-        fuel_veicolo = self._identifica_fuel(veicolo.get('description', ''))
-        fuel_candidato = candidato.get('alimentazione', '')
-        if fuel_veicolo and fuel_candidato:
-            if self._normalize_fuel(fuel_veicolo) == self._normalize_fuel(fuel_candidato):
-                score += self.SCORE_FUEL
+        if profilo.fuel_norm is not None and profilo.fuel_norm == candidato.fuel_norm:
+            score += self.SCORE_FUEL
+            if details is not None:
                 details['fuel'] = True
         
         # BONUS: Parole ripetute (segnale forte)
-        parole_ripetute = self._conta_parole_ripetute(veicolo.get('description', ''))
-        if parole_ripetute > 0:
-            score += min(parole_ripetute * 5, self.BONUS_PAROLE_RIPETUTE)
-            details['ripetute'] = parole_ripetute
+        if profilo.parole_ripetute > 0:
+            score += profilo.bonus_ripetute
+            if details is not None:
+                details['ripetute'] = profilo.parole_ripetute
         
         # PENALITÀ: Parole extra nel candidato
-        parole_extra = kw_product - keywords_veicolo
+        parole_extra = len(candidato.kw_product) - len(match_prod)
         if parole_extra:
-            penalita = len(parole_extra) * abs(self.PENALITA_PAROLA_EXTRA)
+            penalita = parole_extra * abs(self.PENALITA_PAROLA_EXTRA)
             score = max(0, score - penalita)
-            details['extra'] = list(parole_extra)[:5]
+            if details is not None:
+                details['extra'] = list(candidato.kw_product - keywords_veicolo)[:5]
         
-        return score, details
+        return score
     
     def _gestisci_duplicato(self, primo: Dict, secondo: Dict) -> Dict:
         """
@@ -308,24 +500,7 @@ class JatoMatcher:
     
     def _extract_keywords(self, text: str) -> set:
         """Estrae parole chiave da testo"""
-        if not text:
-            return set()
-        
-        text = text.upper()
-        text = re.sub(r'[^\w\s\-]', ' ', text)
-        words = text.split()
-        
-        keywords = set()
-        for word in words:
-            if word.lower() in self.STOP_WORDS:
-                continue
-            if len(word) < 2:
-                continue
-            if word.isdigit():
-                continue
-            keywords.add(word)
-        
-        return keywords
+        return estrai_keywords(text, self.STOP_WORDS)
     
     def _extract_kw(self, description: str) -> Optional[int]:
         """Estrae kW da description (esclude KWH batteria)"""
@@ -353,7 +528,10 @@ class JatoMatcher:
         if not description:
             return None
         
-        return PatternCarburante.identifica_fuel(description)
+        if self.fuel_matcher is None:
+            self.fuel_matcher = get_fuel_matcher(verifica=False)
+        
+        return self.fuel_matcher.identifica(description)
     
     def _normalize_fuel(self, fuel: str) -> str:
         """Normalizza nome alimentazione per confronto"""
@@ -371,3 +549,24 @@ class JatoMatcher:
                 counts[word] = counts.get(word, 0) + 1
         
         return sum(1 for c in counts.values() if c > 1)
+
+
+# =============================================================================
+# WORKER MATCH PARALLELO
+# =============================================================================
+
+# (matcher, veicoli) del batch del pool, impostato in ogni processo figlio
+_lavoro_worker = None
+
+
+def _imposta_lavoro(matcher, veicoli):
+    """Initializer del pool: batch assegnato al processo figlio"""
+    global _lavoro_worker
+    _lavoro_worker = (matcher, veicoli)
+
+
+def _esiti_blocco(intervallo) -> List[Dict]:
+    """Esiti match dei veicoli [inizio, fine) del batch (eseguito nei figli)"""
+    matcher, veicoli = _lavoro_worker
+    inizio, fine = intervallo
+    return [matcher._esito_match(veicolo) for veicolo in veicoli[inizio:fine]]
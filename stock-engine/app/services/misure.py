@@ -0,0 +1,150 @@
+# =============================================================================
+# STOCK ENGINE - Misure fasi elaborazione
+# =============================================================================
+# Versione: 1.1.1
+# Data: 19 ottobre 2026
+#
+# Tempi, velocità (righe/s) e statement SQL per ogni fase della pipeline,
+# più la memoria di picco del processo nel totale. Il riepilogo viene salvato
+# come JSON sull'elaborazione (Elaborazione.tempi_fasi) per confrontare le
+# elaborazioni tra loro.
+#
+# La memoria di picco (ru_maxrss) è del processo, non scende mai e comprende
+# gli altri thread: per questo compare solo nel totale e non per fase.
+#
+# Gli statement SQL contati sono solo quelli del thread che misura: con più
+# noleggiatori in parallelo ognuno conta i propri.
+#
+# v1.1.0: una fase misurata più volte (lettura a blocchi) si somma alla
+#         prima occorrenza
+# v1.1.1: memoria di picco solo nel totale (per fase ripeteva il picco del
+#         processo raggiunto fino a quel momento)
+# =============================================================================
+
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def memoria_picco_mb() -> Optional[float]:
+    """Memoria di picco del processo (MB, None se non disponibile)"""
+    if resource is None:
+        return None
+    
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    if sys.platform == 'darwin':
+        picco /= 1024
+    return round(picco / 1024, 1)
+
+
+class MisureFasi:
+    """
+    Misure per fase di una elaborazione
+    
+    Uso:
+        with MisureFasi(db.engine) as misure:
+            with misure.fase('lettura') as fase:
+                df = leggi()
+                fase['righe'] = len(df)
+        misure.riepilogo()
+    """
+    
+    def __init__(self, engine=None):
+        """
+        Args:
+            engine: Engine SQLAlchemy di cui contare gli statement (opzionale)
+        """
+        self.engine = engine
+        self.fasi = []
+        self.query = 0
+        self._secondi = {}
+        self._thread = threading.get_ident()
+        self._inizio = time.perf_counter()
+    
+    def __enter__(self):
+        if self.engine is not None:
+            event.listen(self.engine, 'before_cursor_execute', self._conta_statement)
+        return self
+    
+    def __exit__(self, *exc):
+        if self.engine is not None:
+            event.remove(self.engine, 'before_cursor_execute', self._conta_statement)
+        return False
+    
+    def _conta_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.query += 1
+    
+    @contextmanager
+    def fase(self, nome: str, righe: int = None):
+        """
+        Misura una fase
+        
+        Se la fase è già stata misurata (es. lettura e mappatura ripetute
+        per ogni blocco del file) secondi, righe e query si sommano.
+        
+        Args:
+            nome: Nome fase
+            righe: Righe elaborate (impostabile anche dopo: fase['righe'] = n)
+        """
+        voce = {'fase': nome, 'righe': righe}
+        query_inizio = self.query
+        inizio = time.perf_counter()
+        
+        try:
+            yield voce
+        finally:
+            secondi = time.perf_counter() - inizio
+            query = self.query - query_inizio
+            
+            precedente = next((v for v in self.fasi if v['fase'] == nome), None)
+            if precedente is None:
+                self.fasi.append(voce)
+                self._secondi[nome] = 0.0
+            else:
+                query += precedente['query']
+                if precedente['righe'] is not None:
+                    precedente['righe'] += voce['righe'] or 0
+                else:
+                    precedente['righe'] = voce['righe']
+                voce = precedente
+            
+            self._secondi[nome] += secondi
+            secondi = self._secondi[nome]
+            voce['secondi'] = round(secondi, 3)
+            voce['righe_al_secondo'] = round(voce['righe'] / secondi) if voce['righe'] and secondi > 0 else None
+            voce['query'] = query
+    
+    def riepilogo(self) -> Dict:
+        """Riepilogo JSON-serializzabile (fasi nell'ordine di esecuzione)"""
+        return {
+            'fasi': list(self.fasi),
+            'totale': {
+                'secondi': round(time.perf_counter() - self._inizio, 3),
+                'query': self.query,
+                'memoria_picco_mb': memoria_picco_mb(),
+            },
+        }
+    
+    def righe_report(self) -> list:
+        """Riepilogo fasi come righe di testo"""
+        righe = [f"  {'Fase':<16}{'Secondi':>9}{'Righe':>9}{'Righe/s':>10}{'Query':>8}"]
+        for voce in self.fasi:
+            righe.append(
+                f"  {voce['fase']:<16}{voce['secondi']:>9.2f}{voce['righe'] or 0:>9}"
+                f"{voce['righe_al_secondo'] or 0:>10}{voce['query']:>8}"
+            )
+        picco = memoria_picco_mb()
+        if picco is not None:
+            righe.append(f"  Memoria di picco del processo: {picco} MB")
+        return righe
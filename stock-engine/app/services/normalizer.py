@@ -1,11 +1,16 @@
 # =============================================================================
 # STOCK ENGINE - Normalizer Service
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.0
+# Data: 19 ottobre 2026
 #
 # Servizio per normalizzazione dati con applicazione glossario.
 # Sostituisce il modulo 00_applica_glossario.py
+#
+# v1.1.0: Regole compilate per (noleggiatore, campo) con indice per parola:
+#         per ogni testo si provano solo le regole che possono trovare
+#         corrispondenza, nello stesso ordine. Risultato identico
+#         all'applicazione sequenziale (scripts/regressione_glossario.py)
 # =============================================================================
 
 import re
@@ -14,6 +19,145 @@ from typing import List, Dict
 from app.models.glossario import Glossario
 
 
+# Campi a cui si applica il glossario
+CAMPI_NORMALIZZATI = ['marca', 'modello', 'description']
+
+# Caratteri sostituiti dalla normalizzazione base
+SOSTITUZIONI_CARATTERI = str.maketrans({
+    '§': ' ',
+    '•': ' ',
+    '–': '-',
+    '—': '-',
+    '_': ' ',
+    '°': ' ',
+    '\t': ' ',
+    '\n': ' ',
+})
+
+_RE_PAROLA = re.compile(r'\w+')
+_RE_SPAZI = re.compile(r'\s+')
+
+# Testi già normalizzati memorizzati per campo (le description si ripetono)
+MAX_MEMO_TESTI = 100000
+
+
+class RegoleCampo:
+    """
+    Regole glossario di un campo, nell'ordine di applicazione
+    
+    Una regola con 'cerca' ASCII che inizia con una lettera/cifra può
+    trovare corrispondenza (\\b...\\b, IGNORECASE) solo se il testo contiene
+    come parola intera la prima parola di 'cerca': le regole sono quindi
+    indicizzate per prima parola minuscola. Le altre (iniziano con
+    punteggiatura, caratteri non ASCII) si provano sempre.
+    
+    Se una sostituzione cambia il testo le regole successive vengono
+    ricalcolate sul testo nuovo, come nell'applicazione sequenziale.
+    Per testi non ASCII (equivalenze maiuscole/minuscole Unicode) si
+    provano tutte le regole.
+    """
+    
+    def __init__(self, regole: List[Dict]):
+        """
+        Args:
+            regole: Regole {'cerca', 'sostituisci', 'pattern'} in ordine
+        """
+        self.regole = regole
+        self.sempre = []
+        self.per_parola = {}
+        self._memo = {}
+        
+        for indice, regola in enumerate(regole):
+            parola = self._parola_iniziale(regola['cerca'])
+            if parola is None:
+                self.sempre.append(indice)
+            else:
+                self.per_parola.setdefault(parola, []).append(indice)
+    
+    @staticmethod
+    def _parola_iniziale(cerca: str):
+        """Prima parola minuscola di 'cerca' (None se la regola va provata sempre)"""
+        if not cerca.isascii():
+            return None
+        trovata = _RE_PAROLA.match(cerca)
+        return trovata.group().lower() if trovata else None
+    
+    def _candidate(self, testo: str, da: int) -> List[int]:
+        """Indici (ordinati) delle regole da provare a partire da 'da'"""
+        if not testo.isascii():
+            return list(range(da, len(self.regole)))
+        
+        indici = [i for i in self.sempre if i >= da]
+        parole = set(_RE_PAROLA.findall(testo.lower()))
+        for parola in parole.intersection(self.per_parola):
+            indici.extend(i for i in self.per_parola[parola] if i >= da)
+        indici.sort()
+        return indici
+    
+    def applica(self, testo: str) -> str:
+        """
+        Applica le regole a un testo
+        
+        Args:
+            testo: Testo da normalizzare
+        
+        Returns:
+            str: Testo con sostituzioni glossario
+        """
+        risultato = self._memo.get(testo)
+        if risultato is not None:
+            return risultato
+        
+        risultato = testo
+        candidate = self._candidate(risultato, 0)
+        posizione = 0
+        
+        while posizione < len(candidate):
+            indice = candidate[posizione]
+            regola = self.regole[indice]
+            nuovo = regola['pattern'].sub(regola['sostituisci'], risultato)
+            
+            if nuovo != risultato:
+                risultato = nuovo
+                candidate = self._candidate(risultato, indice + 1)
+                posizione = 0
+            else:
+                posizione += 1
+        
+        if len(self._memo) < MAX_MEMO_TESTI:
+            self._memo[testo] = risultato
+        return risultato
+
+
+def compila_regole(regole: list) -> Dict[str, RegoleCampo]:
+    """
+    Compila le regole glossario per campo
+    
+    Args:
+        regole: Regole glossario (cerca, sostituisci, colonna) in ordine
+        
+    Returns:
+        dict: campo → RegoleCampo (regole del campo + regole senza colonna)
+    """
+    compilate = [
+        {
+            'cerca': r.cerca,
+            'sostituisci': r.sostituisci,
+            'colonna': r.colonna,
+            'pattern': re.compile(r'\b' + re.escape(r.cerca) + r'\b', re.IGNORECASE)
+        }
+        for r in regole
+    ]
+    
+    return {
+        campo: RegoleCampo([
+            r for r in compilate
+            if not r['colonna'] or r['colonna'] == campo
+        ])
+        for campo in CAMPI_NORMALIZZATI
+    }
+
+
 class Normalizer:
     """
     Servizio normalizzazione dati veicoli
@@ -35,7 +179,7 @@ class Normalizer:
         Args:
             veicoli: Lista dizionari veicoli
             noleggiatore: Nome noleggiatore
-            
+        
         Returns:
             list: Veicoli normalizzati
         """
@@ -50,52 +194,40 @@ class Normalizer:
         
         return risultati
     
-    def _get_regole(self, noleggiatore: str) -> List[Dict]:
+    def _get_regole(self, noleggiatore: str) -> Dict[str, RegoleCampo]:
         """
-        Recupera regole glossario (con cache)
+        Recupera regole glossario compilate per campo (con cache)
         
         Args:
             noleggiatore: Nome noleggiatore
-            
+        
         Returns:
-            list: Regole glossario
+            dict: campo → RegoleCampo
         """
         if noleggiatore not in self._cache_glossario:
-            regole = Glossario.get_regole(noleggiatore)
-            self._cache_glossario[noleggiatore] = [
-                {
-                    'cerca': r.cerca,
-                    'sostituisci': r.sostituisci,
-                    'colonna': r.colonna,
-                    'pattern': re.compile(r'\b' + re.escape(r.cerca) + r'\b', re.IGNORECASE)
-                }
-                for r in regole
-            ]
+            self._cache_glossario[noleggiatore] = compila_regole(Glossario.get_regole(noleggiatore))
         
         return self._cache_glossario[noleggiatore]
     
-    def _normalizza_veicolo(self, veicolo: Dict, regole: List[Dict]) -> Dict:
+    def _normalizza_veicolo(self, veicolo: Dict, regole: Dict[str, RegoleCampo]) -> Dict:
         """
         Normalizza singolo veicolo
         
         Args:
             veicolo: Dizionario veicolo
-            regole: Regole glossario
-            
+            regole: Regole glossario per campo
+        
         Returns:
             dict: Veicolo normalizzato
         """
         # Copia per non modificare originale
         result = veicolo.copy()
         
-        # Campi da normalizzare
-        campi = ['marca', 'modello', 'description']
-        
-        for campo in campi:
+        for campo in CAMPI_NORMALIZZATI:
             valore = result.get(campo)
             if valore and isinstance(valore, str):
                 # Applica regole glossario
-                valore_norm = self._applica_regole(valore, regole, campo)
+                valore_norm = regole[campo].applica(valore)
                 
                 # Normalizzazione aggiuntiva
                 valore_norm = self._normalizza_testo(valore_norm)
@@ -104,33 +236,6 @@ class Normalizer:
         
         return result
     
-    def _applica_regole(self, testo: str, regole: List[Dict], campo: str) -> str:
-        """
-        Applica regole glossario a un testo
-        
-        IMPORTANTE: Match su parola intera per evitare sostituzioni parziali
-        come "ALFA" → "ALFA ROMEO" → "ALFA ROMEO ROMEO"
-        
-        Args:
-            testo: Testo da normalizzare
-            regole: Lista regole
-            campo: Nome campo (per filtrare regole)
-            
-        Returns:
-            str: Testo normalizzato
-        """
-        risultato = testo
-        
-        for regola in regole:
-            # Applica solo se regola è per questo campo o per tutti
-            if regola['colonna'] and regola['colonna'] != campo:
-                continue
-            
-            # Applica sostituzione con pattern precompilato
-            risultato = regola['pattern'].sub(regola['sostituisci'], risultato)
-        
-        return risultato
-    
     def _normalizza_testo(self, testo: str) -> str:
         """
         Normalizzazione base del testo
@@ -141,31 +246,17 @@ class Normalizer:
         
         Args:
             testo: Testo da normalizzare
-            
+        
         Returns:
             str: Testo normalizzato
         """
         if not testo:
             return testo
         
-        # Caratteri da sostituire
-        replacements = {
-            '§': ' ',
-            '•': ' ',
-            '–': '-',
-            '—': '-',
-            '_': ' ',
-            '°': ' ',
-            '\t': ' ',
-            '\n': ' ',
-        }
-        
-        result = testo
-        for old, new in replacements.items():
-            result = result.replace(old, new)
+        result = testo.translate(SOSTITUZIONI_CARATTERI)
         
         # Rimuovi spazi multipli
-        result = re.sub(r'\s+', ' ', result)
+        result = _RE_SPAZI.sub(' ', result)
         
         return result.strip()
     
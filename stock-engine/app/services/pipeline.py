@@ -1,31 +1,66 @@
 # =============================================================================
 # STOCK ENGINE - Pipeline Service
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.10.0
+# Data: 19 ottobre 2026
 #
 # Orchestratore elaborazione stock.
 # Sostituisce gli script bash (ayvens.sh, arval.sh, etc.)
 #
+# v1.1.0: match con cache esiti (MATCH_CACHE_ENABLED), hit rate registrato
+#         nell'elaborazione
+# v1.2.0: salvataggio veicoli con upsert massivo (Veicolo.upsert) invece di
+#         una SELECT e un oggetto ORM per veicolo
+# v1.3.0: match JATO su più processi (workers / MATCH_WORKERS)
+# v1.4.0: elabora_tutti() con noleggiatori in parallelo (ELABORAZIONI_PARALLELE),
+#         indice JATO condiviso e report tempi consolidato
+# v1.5.0: import differenziale per VIN (IMPORT_DIFFERENZIALE): solo veicoli
+#         nuovi/modificati passano da normalizzazione, match e arricchimento,
+#         gli invariati sono copiati dall'import precedente, gli usciti marcati
+# v1.6.0: tempi, righe/s, memoria di picco e query SQL per fase (MisureFasi),
+#         salvati in Elaborazione.tempi_fasi
+# v1.7.0: riepilogo stock (RiepilogoStock) aggiornato dopo il salvataggio
+# v1.8.0: file letto e mappato a blocchi (importer.leggi_blocchi): il
+#         DataFrame dell'intero file non è mai in memoria
+# v1.8.1: con più noleggiatori in parallelo il match resta nel processo
+#         (niente fork da un processo con più thread attivi)
+# v1.8.2: upsert, copia invariati, usciti e riepilogo in un'unica transazione
+# v1.9.0: ogni blocco del file passa da confronto, normalizzazione, match e
+#         arricchimento prima del successivo; restano in memoria solo i
+#         veicoli arricchiti da salvare e lo stato per VIN del confronto
+# v1.9.1: elabora_tutti() in sequenza su SQLite (un solo scrittore: le
+#         transazioni di salvataggio si bloccavano a vicenda)
+# v1.9.2: veicoli usciti marcati nell'import precedente solo in modalità
+#         differenziale (senza, il giorno prima resta com'era)
+# v1.10.0: esiti match nuovi scritti in match_cache nella transazione di
+#          salvataggio (nessun commit durante il match dei blocchi)
+#
 # FLUSSO:
 # 1. Trova file → 2. Importa → 3. Normalizza → 4. Match → 5. Arricchisci → 
 # 6. Salva DB → 7. Genera Excel
 # =============================================================================
 
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from flask import current_app
 
 from app import db
 from app.models.veicolo import Veicolo
 from app.models.elaborazione import Elaborazione
+from app.models.match_cache import MatchCache
+from app.models.riepilogo import RiepilogoStock
 
+from .fuel_matcher import get_fuel_matcher
 from .importers import get_importer
+from .jato_index import get_jato_index
 from .normalizer import Normalizer
 from .matcher import JatoMatcher
+from .misure import MisureFasi
 from .enricher import Enricher
 from .exporter import ExcelExporter
 
@@ -40,122 +75,91 @@ class StockPipeline:
     DOPO (Python): pipeline unificata → 30-60 secondi
     """
     
-    def __init__(self):
-        """Inizializza pipeline con tutti i servizi"""
+    def __init__(self, workers: int = None):
+        """
+        Inizializza pipeline con tutti i servizi
+        
+        Args:
+            workers: Processi per il match JATO (default: MATCH_WORKERS,
+                     0 = tutti i core)
+        """
+        self.workers = workers
         self.normalizer = Normalizer()
         self.matcher = JatoMatcher()
         self.enricher = Enricher()
         self.exporter = ExcelExporter()
     
-    def elabora(self, noleggiatore: str, file_path: Path = None) -> Dict:
+    def elabora(self, noleggiatore: str, file_path: Path = None,
+                differenziale: bool = None) -> Dict:
         """
         Esegue elaborazione completa per un noleggiatore
         
         Args:
             noleggiatore: Nome noleggiatore (AYVENS, ARVAL, etc.)
             file_path: Path file input (opzionale, cerca automaticamente)
+            differenziale: Elabora solo i veicoli nuovi o modificati rispetto
+                           all'import precedente (default: IMPORT_DIFFERENZIALE)
             
         Returns:
             dict: Statistiche elaborazione
         """
         noleggiatore = noleggiatore.upper()
         start_time = time.time()
+        data_import = date.today()
+        
+        if differenziale is None:
+            differenziale = current_app.config.get('IMPORT_DIFFERENZIALE', False)
         
         # Crea record elaborazione
         elaborazione = Elaborazione(noleggiatore=noleggiatore)
         db.session.add(elaborazione)
         db.session.commit()
         
+        misure = MisureFasi(db.engine)
+        
         try:
-            print(f"\n{'='*60}")
-            print(f"ELABORAZIONE {noleggiatore}")
-            print(f"{'='*60}")
-            
-            # STEP 1: Importa dati
-            print(f"\n[1/6] Importazione dati...")
-            importer = get_importer(noleggiatore)
-            
-            if file_path:
-                veicoli_raw = importer.importa(file_path)
-                elaborazione.file_origine = str(file_path)
-            else:
-                file_trovato = importer.trova_file_recente()
-                if not file_trovato:
-                    raise ValueError("Nessun file trovato da importare")
-                veicoli_raw = importer.importa(file_trovato)
-                elaborazione.file_origine = str(file_trovato)
-            
-            print(f"      ✔ {len(veicoli_raw)} veicoli importati")
-            
-            # STEP 2: Normalizza con glossario
-            print(f"\n[2/6] Normalizzazione (glossario)...")
-            veicoli_norm = self.normalizer.applica(veicoli_raw, noleggiatore)
-            print(f"      ✔ Glossario applicato")
-            
-            # STEP 3: Match JATO
-            print(f"\n[3/6] Match JATO...")
-            veicoli_matched = self.matcher.match_batch(veicoli_norm)
-            
-            matched_count = sum(1 for v in veicoli_matched if v.get('match_status') == 'MATCHED')
-            partial_count = sum(1 for v in veicoli_matched if v.get('match_status') == 'PARTIAL')
-            no_match_count = sum(1 for v in veicoli_matched if v.get('match_status') == 'NO_MATCH')
-            
-            print(f"      ✔ Matched: {matched_count}")
-            print(f"      ⚠ Partial: {partial_count}")
-            print(f"      ✗ No match: {no_match_count}")
-            
-            # STEP 4: Arricchisci
-            print(f"\n[4/6] Arricchimento dati...")
-            veicoli_enriched = self.enricher.arricchisci(veicoli_matched)
-            print(f"      ✔ Dati arricchiti")
-            
-            # STEP 5: Salva in database
-            print(f"\n[5/6] Salvataggio database...")
-            self._salva_veicoli(veicoli_enriched, elaborazione.id)
-            print(f"      ✔ {len(veicoli_enriched)} veicoli salvati")
-            
-            # STEP 6: Genera Excel
-            print(f"\n[6/6] Generazione Excel...")
-            excel_path = self.exporter.genera_excel(noleggiatore, date.today())
-            print(f"      ✔ File: {excel_path}")
+            with misure:
+                result = self._esegui_fasi(noleggiatore, file_path, differenziale,
+                                           data_import, elaborazione, misure)
             
             # Calcola durata
             durata = int(time.time() - start_time)
             
             # Completa elaborazione
+            elaborazione.tempi_fasi = misure.riepilogo()
             elaborazione.completa(
-                veicoli_importati=len(veicoli_raw),
-                veicoli_matched=matched_count,
-                veicoli_partial=partial_count,
-                veicoli_no_match=no_match_count,
-                file_excel=str(excel_path),
-                durata=durata
+                veicoli_importati=result['veicoli_importati'],
+                veicoli_matched=result['veicoli_matched'],
+                veicoli_partial=result['veicoli_partial'],
+                veicoli_no_match=result['veicoli_no_match'],
+                file_excel=result['file_excel'],
+                durata=durata,
+                match_cache_hit=result['match_cache_hit'],
+                veicoli_match=result.pop('veicoli_match'),
+                variazioni=result['variazioni']
             )
             
-            # Risultato
-            result = {
-                'noleggiatore': noleggiatore,
-                'data': date.today().isoformat(),
-                'veicoli_importati': len(veicoli_raw),
-                'veicoli_matched': matched_count,
-                'veicoli_partial': partial_count,
-                'veicoli_no_match': no_match_count,
-                'match_rate': round((matched_count / len(veicoli_raw)) * 100, 1) if veicoli_raw else 0,
+            result.update({
+                'match_cache_hit_rate': elaborazione.match_cache_hit_rate,
                 'durata_secondi': durata,
-                'file_excel': str(excel_path),
+                'tempi_fasi': elaborazione.tempi_fasi,
                 'stato': 'completata',
-            }
+            })
             
             print(f"\n{'='*60}")
             print(f"✔ ELABORAZIONE COMPLETATA in {durata} secondi")
             print(f"  Match rate: {result['match_rate']}%")
+            for riga in misure.righe_report():
+                print(riga)
             print(f"{'='*60}\n")
             
             return result
             
         except Exception as e:
-            # Registra errore
-            elaborazione.errore(str(e))
+            # Registra errore (con i tempi delle fasi completate)
+            db.session.rollback()
+            elaborazione.tempi_fasi = misure.riepilogo()
+            elaborazione.segna_errore(str(e))
             
             print(f"\n{'='*60}")
             print(f"✗ ERRORE ELABORAZIONE: {e}")
@@ -163,103 +167,361 @@ class StockPipeline:
             
             raise
     
-    def _salva_veicoli(self, veicoli: list, elaborazione_id: int):
+    def _esegui_fasi(self, noleggiatore: str, file_path: Optional[Path], differenziale: bool,
+                     data_import: date, elaborazione: Elaborazione, misure: MisureFasi) -> Dict:
+        """
+        Fasi dell'elaborazione, ognuna misurata (MisureFasi)
+        
+        Il file è elaborato a blocchi (importer.leggi_blocchi): ogni blocco
+        passa da mappatura, confronto, normalizzazione, match e arricchimento
+        prima di leggere il successivo, quindi righe grezze e copie intermedie
+        sono in memoria per un blocco alla volta. Per tutto il file restano i
+        veicoli arricchiti, salvati alla fine in un'unica transazione, e lo
+        stato per VIN del confronto: la memoria cresce ancora con il numero
+        di veicoli, non con le copie fatte da ogni fase.
+        
+        Returns:
+            dict: Risultato (senza durata e stato)
+        """
+        print(f"\n{'='*60}")
+        print(f"ELABORAZIONE {noleggiatore}")
+        print(f"{'='*60}")
+        
+        importer = get_importer(noleggiatore)
+        
+        if not file_path:
+            file_path = importer.trova_file_recente()
+            if not file_path:
+                raise ValueError("Nessun file trovato da importare")
+        elaborazione.file_origine = str(file_path)
+        
+        usa_cache = current_app.config.get('MATCH_CACHE_ENABLED', True)
+        workers = self._workers_match()
+        
+        # STEP 1-4: importazione, normalizzazione, match e arricchimento
+        # a blocchi (fasi sommate da MisureFasi)
+        print(f"\n[1-4/6] Importazione, normalizzazione, match JATO e arricchimento...")
+        blocchi = importer.leggi_blocchi(file_path)
+        confronto = None
+        cache_in_attesa = {}  # esiti match nuovi, scritti con i veicoli
+        veicoli_enriched = []
+        importati = 0
+        elaborati = 0
+        cache_hit = 0
+        
+        while True:
+            with misure.fase('lettura') as fase:
+                blocco = next(blocchi, None)
+                fase['righe'] = len(blocco) if blocco is not None else 0
+            
+            if blocco is None:
+                break
+            
+            with misure.fase('mappatura', righe=len(blocco)):
+                righe = importer.converti(blocco)
+            del blocco
+            importati += len(righe)
+            
+            # Confronto con l'import precedente (per VIN)
+            with misure.fase('confronto', righe=len(righe)):
+                if confronto is None:
+                    confronto = self._confronta_import(noleggiatore, data_import)
+                self._confronta_blocco(righe, confronto)
+            
+            if differenziale:
+                righe = [v for v in righe if v['variazione'] != 'INVARIATO']
+            if not righe:
+                continue
+            
+            with misure.fase('normalizzazione', righe=len(righe)):
+                righe = self.normalizer.applica(righe, noleggiatore)
+            
+            with misure.fase('match', righe=len(righe)):
+                righe = self.matcher.match_batch(righe, usa_cache=usa_cache, workers=workers,
+                                                 in_attesa=cache_in_attesa)
+            cache_hit += self.matcher.statistiche_cache['hit']
+            elaborati += len(righe)
+            
+            with misure.fase('arricchimento', righe=len(righe)):
+                veicoli_enriched.extend(self.enricher.arricchisci(righe))
+        
+        if confronto is None:
+            confronto = self._confronta_import(noleggiatore, data_import)
+        with misure.fase('confronto'):
+            self._chiudi_confronto(confronto)
+        
+        variazioni = confronto['conteggi']
+        print(f"      ✔ {importati} veicoli importati")
+        print(f"      Δ Nuovi: {variazioni['nuovi']}, modificati: {variazioni['modificati']}, "
+              f"invariati: {variazioni['invariati']}, usciti: {variazioni['usciti']}")
+        
+        if differenziale:
+            print(f"      ✔ Differenziale: {elaborati} veicoli elaborati")
+            if confronto['invariati']:
+                # VIN ripetuto nel file con l'ultima riga invariata: vale la copia
+                veicoli_enriched = [
+                    v for v in veicoli_enriched
+                    if v.get('vin') is None or v['vin'] not in confronto['invariati']
+                ]
+        
+        # Invariati copiati: esito match dell'import precedente
+        stati_match = [v.get('match_status') for v in veicoli_enriched]
+        if differenziale:
+            stati_match.extend(confronto['invariati'].values())
+        
+        matched_count = stati_match.count('MATCHED')
+        partial_count = stati_match.count('PARTIAL')
+        no_match_count = stati_match.count('NO_MATCH')
+        
+        print(f"      ✔ Matched: {matched_count}")
+        print(f"      ⚠ Partial: {partial_count}")
+        print(f"      ✗ No match: {no_match_count}")
+        if elaborati:
+            print(f"      ↺ Da cache: {cache_hit} ({round(cache_hit / elaborati * 100, 1)}%)")
+        
+        # STEP 5: Salva in database (un solo commit: un errore a metà non
+        # lascia un giorno con i soli veicoli nuovi/modificati)
+        print(f"\n[5/6] Salvataggio database...")
+        with misure.fase('salvataggio') as fase:
+            self._salva_veicoli(veicoli_enriched, elaborazione.id)
+            fase['righe'] = len(veicoli_enriched)
+            print(f"      ✔ {len(veicoli_enriched)} veicoli salvati")
+            
+            if differenziale and confronto['invariati']:
+                copiati = Veicolo.copia_invariati(
+                    noleggiatore, confronto['precedente'], data_import,
+                    confronto['invariati'], elaborazione.id
+                )
+                fase['righe'] += copiati
+                print(f"      ✔ {copiati} veicoli invariati copiati")
+            
+            # Solo in differenziale: senza, l'import precedente (e il suo
+            # Excel) non si tocca e gli usciti sono solo contati
+            if differenziale and confronto['usciti']:
+                Veicolo.segna_usciti(noleggiatore, confronto['precedente'], confronto['usciti'])
+                print(f"      ✔ {len(confronto['usciti'])} veicoli usciti dallo stock")
+            
+            # Conteggi per dashboard / health / statistiche
+            RiepilogoStock.aggiorna(noleggiatore, data_import, commit=False)
+            
+            # Esiti match nuovi: stessa transazione, nessun commit durante il match
+            self.matcher.salva_cache(cache_in_attesa)
+            
+            db.session.commit()
+        
+        del veicoli_enriched
+        
+        # STEP 6: Genera Excel
+        print(f"\n[6/6] Generazione Excel...")
+        with misure.fase('excel', righe=importati):
+            excel_path = self.exporter.genera_excel(noleggiatore, date.today())
+        print(f"      ✔ File: {excel_path}")
+        
+        return {
+            'noleggiatore': noleggiatore,
+            'data': date.today().isoformat(),
+            'veicoli_importati': importati,
+            'veicoli_matched': matched_count,
+            'veicoli_partial': partial_count,
+            'veicoli_no_match': no_match_count,
+            'match_rate': round((matched_count / importati) * 100, 1) if importati else 0,
+            'match_cache_hit': cache_hit,
+            'veicoli_match': elaborati,
+            'differenziale': differenziale,
+            'variazioni': variazioni,
+            'file_excel': str(excel_path),
+        }
+    
+    def _confronta_import(self, noleggiatore: str, data_import: date) -> Dict:
         """
-        Salva veicoli nel database (UPSERT)
+        Stato del confronto con l'import precedente (per VIN)
+        
+        Carica una volta VIN, hash e stato match dell'import precedente; i
+        blocchi del file sono poi confrontati con _confronta_blocco e il
+        risultato completato da _chiudi_confronto.
         
         Args:
-            veicoli: Lista veicoli da salvare
-            elaborazione_id: ID elaborazione corrente
+            noleggiatore: Nome noleggiatore
+            data_import: Data import corrente
+            
+        Returns:
+            dict: Stato del confronto
         """
-        for v in veicoli:
-            # Cerca veicolo esistente (stesso VIN, stessa data, stesso noleggiatore)
-            esistente = Veicolo.query.filter_by(
-                noleggiatore=v.get('noleggiatore'),
-                vin=v.get('vin'),
-                data_import=v.get('data_import', date.today())
-            ).first()
+        precedente = Veicolo.import_precedente(noleggiatore, data_import)
+        
+        return {
+            'versione': MatchCache.calcola_versione(get_jato_index().versione,
+                                                    get_fuel_matcher().patterns),
+            'precedente': precedente,
+            'righe_precedenti': Veicolo.righe_import(noleggiatore, precedente) if precedente else {},
+            'ultime': {},
+            'conteggi': {'nuovi': 0, 'modificati': 0, 'invariati': 0},
+        }
+    
+    def _confronta_blocco(self, righe: list, confronto: Dict):
+        """
+        Confronta un blocco di righe importate con l'import precedente
+        
+        Imposta su ogni riga hash_riga e variazione (NUOVO, MODIFICATO,
+        INVARIATO). L'hash include la versione dei dati di match: se
+        glossario, pattern carburante o JATO cambiano, nessun veicolo risulta
+        invariato. Di ogni VIN resta solo la variazione dell'ultima riga.
+        
+        Args:
+            righe: Righe importate del blocco
+            confronto: Stato da _confronta_import
+        """
+        righe_precedenti = confronto['righe_precedenti']
+        ultime = confronto['ultime']
+        conteggi = confronto['conteggi']
+        
+        for riga in righe:
+            riga['hash_riga'] = Veicolo.calcola_hash_riga(riga, confronto['versione'])
+            vin = riga.get('vin')
+            precedente_vin = righe_precedenti.get(vin) if vin is not None else None
             
-            if esistente:
-                # Aggiorna
-                for key, value in v.items():
-                    if hasattr(esistente, key) and key != 'id':
-                        setattr(esistente, key, value)
-                esistente.elaborazione_id = elaborazione_id
+            if precedente_vin is None:
+                riga['variazione'] = 'NUOVO'
+                conteggi['nuovi'] += 1
+            elif precedente_vin[0] == riga['hash_riga']:
+                riga['variazione'] = 'INVARIATO'
+                conteggi['invariati'] += 1
             else:
-                # Inserisci nuovo
-                veicolo = Veicolo(
-                    noleggiatore=v.get('noleggiatore'),
-                    vin=v.get('vin'),
-                    data_import=v.get('data_import', date.today()),
-                    
-                    # Originali
-                    marca_originale=v.get('marca_originale'),
-                    modello_originale=v.get('modello_originale'),
-                    description_originale=v.get('description_originale'),
-                    fuel_originale=v.get('fuel_originale'),
-                    
-                    # Normalizzati
-                    marca=v.get('marca'),
-                    modello=v.get('modello'),
-                    description=v.get('description'),
-                    
-                    # Tecnici
-                    co2=v.get('co2'),
-                    prezzo_listino=v.get('prezzo_listino'),
-                    prezzo_accessori=v.get('prezzo_accessori'),
-                    prezzo_totale=v.get('prezzo_totale'),
-                    location=v.get('location'),
-                    location_address=v.get('location_address'),
-                    data_arrivo=v.get('data_arrivo'),
-                    colore=v.get('colore'),
-                    colore_interno=v.get('colore_interno'),
-                    targa=v.get('targa'),
-                    km=v.get('km'),
-                    
-                    # JATO
-                    jato_code=v.get('jato_code'),
-                    product_id=v.get('product_id'),
-                    omologazione=v.get('omologazione'),
-                    kw=v.get('kw'),
-                    hp=v.get('hp'),
-                    alimentazione=v.get('alimentazione'),
-                    jato_product_description=v.get('jato_product_description'),
-                    vehicle_set_description=v.get('vehicle_set_description'),
-                    transmission=v.get('transmission'),
-                    
-                    # Match
-                    match_status=v.get('match_status'),
-                    match_score=v.get('match_score'),
-                    match_note=v.get('match_note'),
-                    match_details=v.get('match_details'),
-                    
-                    # Business
-                    neopatentati=v.get('neopatentati', 'ND'),
-                    
-                    # Riferimento
-                    elaborazione_id=elaborazione_id,
-                )
-                db.session.add(veicolo)
+                riga['variazione'] = 'MODIFICATO'
+                conteggi['modificati'] += 1
+            
+            if vin is not None:
+                ultime[vin] = riga['variazione']
+    
+    def _chiudi_confronto(self, confronto: Dict):
+        """
+        Completa il confronto dopo l'ultimo blocco
         
-        db.session.commit()
+        Aggiunge invariati {vin: match_status} (VIN la cui ultima riga è
+        invariata), usciti (VIN non più presenti) e conteggi['usciti'].
+        Lo stato per VIN non più necessario viene rilasciato.
+        
+        Args:
+            confronto: Stato da _confronta_import
+        """
+        righe_precedenti = confronto.pop('righe_precedenti')
+        ultime = confronto.pop('ultime')
+        
+        confronto['invariati'] = {
+            vin: righe_precedenti[vin][1]
+            for vin, variazione in ultime.items() if variazione == 'INVARIATO'
+        }
+        confronto['usciti'] = set(righe_precedenti) - set(ultime)
+        confronto['conteggi']['usciti'] = len(confronto['usciti'])
+    
+    def _workers_match(self) -> int:
+        """Processi per il match JATO (parametro o configurazione)"""
+        workers = self.workers
+        if workers is None:
+            workers = current_app.config.get('MATCH_WORKERS', 1)
+        return workers if workers > 0 else (os.cpu_count() or 1)
+    
+    def _salva_veicoli(self, veicoli: list, elaborazione_id: int):
+        """
+        Salva veicoli nel database (UPSERT massivo, commit nel chiamante)
+        
+        Args:
+            veicoli: Lista veicoli da salvare
+            elaborazione_id: ID elaborazione corrente
+        """
+        Veicolo.upsert(veicoli, elaborazione_id=elaborazione_id)
     
-    def elabora_tutti(self) -> Dict:
+    def elabora_tutti(self, parallele: int = None) -> Dict:
         """
         Elabora tutti i noleggiatori attivi
         
+        I noleggiatori sono indipendenti: fino a `parallele` elaborazioni
+        girano insieme, ognuna in un thread con il proprio app context
+        (quindi la propria sessione DB) e la propria pipeline. Indice JATO
+        e pattern carburante sono caricati una volta e condivisi. Un errore
+        su un noleggiatore non ferma gli altri.
+        
+        Con più elaborazioni contemporanee il match JATO usa un solo processo
+        per noleggiatore: fare fork da un processo con più thread attivi non
+        è sicuro (lock presi da altri thread restano bloccati nei figli).
+        
+        Su SQLite le elaborazioni restano in sequenza: il database ammette
+        un solo scrittore e il salvataggio di un noleggiatore bloccherebbe
+        le scritture degli altri fino a 'database is locked'.
+        
+        Args:
+            parallele: Elaborazioni contemporanee (default: ELABORAZIONI_PARALLELE)
+        
         Returns:
-            dict: Risultati per ogni noleggiatore
+            dict: Risultati per ogni noleggiatore (report tempi in self.report_tempi)
         """
-        noleggiatori = current_app.config.get('NOLEGGIATORI_ATTIVI', ['AYVENS'])
-        risultati = {}
-        
-        for noleggiatore in noleggiatori:
-            try:
-                risultati[noleggiatore] = self.elabora(noleggiatore)
-            except Exception as e:
-                risultati[noleggiatore] = {
-                    'stato': 'errore',
-                    'errore': str(e)
-                }
+        app = current_app._get_current_object()
+        noleggiatori = app.config.get('NOLEGGIATORI_ATTIVI', ['AYVENS'])
+        
+        if parallele is None:
+            parallele = app.config['ELABORAZIONI_PARALLELE']
+        if db.engine.dialect.name == 'sqlite':
+            parallele = 1
+        parallele = max(1, min(parallele, len(noleggiatori)))
+        workers = self.workers if parallele == 1 else 1
+        
+        # Caricati qui una volta: i thread trovano la versione già aggiornata
+        get_jato_index()
+        get_fuel_matcher()
+        
+        tempi = {}
+        
+        def esegui(noleggiatore):
+            inizio = time.time()
+            with app.app_context():  # sessione rimossa alla chiusura del context
+                try:
+                    risultato = StockPipeline(workers=workers).elabora(noleggiatore)
+                except Exception as e:
+                    risultato = {
+                        'stato': 'errore',
+                        'errore': str(e)
+                    }
+            tempi[noleggiatore] = {
+                'inizio': datetime.fromtimestamp(inizio).isoformat(timespec='seconds'),
+                'durata_secondi': round(time.time() - inizio, 1),
+                'stato': risultato.get('stato'),
+            }
+            return risultato
+        
+        inizio = time.time()
+        with ThreadPoolExecutor(max_workers=parallele, thread_name_prefix='pipeline') as executor:
+            risultati = dict(zip(noleggiatori, executor.map(esegui, noleggiatori)))
+        durata = time.time() - inizio
+        
+        somma = sum(t['durata_secondi'] for t in tempi.values())
+        self.report_tempi = {
+            'parallele': parallele,
+            'durata_totale_secondi': round(durata, 1),
+            'somma_durate_secondi': round(somma, 1),
+            'noleggiatori': {n: tempi[n] for n in noleggiatori},
+        }
+        
+        for riga in self.righe_report_tempi():
+            print(riga)
         
         return risultati
+    
+    def righe_report_tempi(self) -> List[str]:
+        """Report tempi dell'ultima elabora_tutti() (righe di testo)"""
+        report = getattr(self, 'report_tempi', None)
+        if not report:
+            return []
+        
+        righe = [
+            f"{'='*60}",
+            f"TEMPI ELABORAZIONE ({report['parallele']} in parallelo)",
+            f"{'='*60}",
+        ]
+        for noleggiatore, tempi in report['noleggiatori'].items():
+            esito = '✔' if tempi['stato'] == 'completata' else '✗'
+            righe.append(f"  {esito} {noleggiatore:<10} {tempi['inizio']}  {tempi['durata_secondi']:>7.1f}s")
+        righe.append(f"  Totale:        {report['durata_totale_secondi']:.1f}s "
+                     f"(in sequenza: {report['somma_durate_secondi']:.1f}s)")
+        righe.append(f"{'='*60}")
+        
+        return righe
@@ -1,17 +1,25 @@
 # =============================================================================
 # STOCK ENGINE - Web Blueprint
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.2.0
+# Data: 19 ottobre 2026
+#
+# v1.1.0: tempi per fase delle ultime elaborazioni; template_folder del
+#         blueprint (dashboard.html non veniva trovato)
+# v1.2.0: conteggi da RiepilogoStock invece che dalla tabella veicoli
 # =============================================================================
 
 from flask import Blueprint, render_template
 from datetime import date
 
-from app.models.veicolo import Veicolo
+from app.models.riepilogo import RiepilogoStock
 from app.models.elaborazione import Elaborazione
 
-web_bp = Blueprint('web', __name__)
+web_bp = Blueprint('web', __name__, template_folder='templates')
+
+# Fasi della pipeline, nell'ordine di esecuzione (StockPipeline._esegui_fasi)
+FASI_PIPELINE = ['lettura', 'mappatura', 'confronto', 'normalizzazione',
+                 'match', 'arricchimento', 'salvataggio', 'excel']
 
 
 @web_bp.route('/')
@@ -20,24 +28,32 @@ def dashboard():
     
     # Statistiche
     stats = {
-        'veicoli_totali': Veicolo.query.count(),
-        'veicoli_oggi': Veicolo.query.filter_by(data_import=date.today()).count(),
+        'veicoli_totali': RiepilogoStock.get_statistics()['totale'],
+        'veicoli_oggi': RiepilogoStock.get_statistics(data=date.today())['totale'],
     }
     
     # Ultime elaborazioni
     ultime_elaborazioni = Elaborazione.ultime_elaborazioni(5)
     
+    # Tempi per fase: {fase: misure} per ogni elaborazione misurata
+    tempi_fasi = [
+        (e, {f['fase']: f for f in e.tempi_fasi.get('fasi', [])})
+        for e in ultime_elaborazioni if e.tempi_fasi
+    ]
+    
     # Statistiche per noleggiatore (oggi)
     noleggiatori = ['AYVENS', 'ARVAL', 'LEASYS']
     stats_noleggiatori = {}
     
     for n in noleggiatori:
-        stats_noleggiatori[n] = Veicolo.get_statistics(n, date.today())
+        stats_noleggiatori[n] = RiepilogoStock.get_statistics(n, date.today())
     
     return render_template(
         'dashboard.html',
         stats=stats,
         elaborazioni=ultime_elaborazioni,
+        tempi_fasi=tempi_fasi,
+        fasi=FASI_PIPELINE,
         stats_noleggiatori=stats_noleggiatori,
         oggi=date.today()
     )
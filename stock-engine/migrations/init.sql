@@ -1,8 +1,8 @@
 -- =============================================================================
 -- STOCK ENGINE - Inizializzazione Database PostgreSQL
 -- =============================================================================
--- Versione: 1.0.0
--- Data: 28 gennaio 2026
+-- Versione: 1.7.0
+-- Data: 19 ottobre 2026
 --
 -- Questo script viene eseguito automaticamente all'avvio del container
 -- PostgreSQL se il database è vuoto.
@@ -84,6 +84,10 @@ CREATE TABLE IF NOT EXISTS veicoli (
     aggiornato_il TIMESTAMP DEFAULT NOW(),
     elaborazione_id INTEGER,
     
+    -- Import differenziale
+    hash_riga VARCHAR(40),
+    variazione VARCHAR(12),
+    
     -- Vincolo unicità
     UNIQUE(noleggiatore, vin, data_import)
 );
@@ -94,9 +98,16 @@ CREATE INDEX IF NOT EXISTS idx_veicoli_marca ON veicoli(marca);
 CREATE INDEX IF NOT EXISTS idx_veicoli_jato_code ON veicoli(jato_code);
 CREATE INDEX IF NOT EXISTS idx_veicoli_match_status ON veicoli(match_status);
 CREATE INDEX IF NOT EXISTS idx_veicoli_alimentazione ON veicoli(alimentazione);
+CREATE INDEX IF NOT EXISTS idx_veicoli_data_id ON veicoli(data_import, id);
+
+-- Database creati prima dell'import differenziale
+ALTER TABLE veicoli ADD COLUMN IF NOT EXISTS hash_riga VARCHAR(40);
+ALTER TABLE veicoli ADD COLUMN IF NOT EXISTS variazione VARCHAR(12);
 
--- Indice GIN per ricerca full-text
+-- Indici GIN trigrammi per ricerca (ILIKE '%...%' e similarità)
 CREATE INDEX IF NOT EXISTS idx_veicoli_description_gin ON veicoli USING gin(description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_veicoli_marca_trgm ON veicoli USING gin(marca gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_veicoli_modello_trgm ON veicoli USING gin(modello gin_trgm_ops);
 
 -- =============================================================================
 -- TABELLA: jato_models
@@ -130,6 +141,9 @@ CREATE INDEX IF NOT EXISTS idx_jato_brand ON jato_models(brand_description);
 CREATE INDEX IF NOT EXISTS idx_jato_brand_normalized ON jato_models(brand_normalized);
 CREATE INDEX IF NOT EXISTS idx_jato_code ON jato_models(jato_code);
 CREATE INDEX IF NOT EXISTS idx_jato_fuel_kw ON jato_models(alimentazione, kw);
+CREATE INDEX IF NOT EXISTS idx_jato_brand_trgm ON jato_models USING gin(brand_description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_jato_brand_normalized_trgm ON jato_models USING gin(brand_normalized gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_jato_description_trgm ON jato_models USING gin(jato_product_description gin_trgm_ops);
 
 -- =============================================================================
 -- TABELLA: glossario
@@ -174,7 +188,14 @@ CREATE TABLE IF NOT EXISTS elaborazioni (
     veicoli_partial INTEGER DEFAULT 0,
     veicoli_no_match INTEGER DEFAULT 0,
     match_rate DECIMAL(5,2),
+    match_cache_hit INTEGER DEFAULT 0,
+    match_cache_hit_rate DECIMAL(5,2),
+    veicoli_nuovi INTEGER,
+    veicoli_modificati INTEGER,
+    veicoli_invariati INTEGER,
+    veicoli_usciti INTEGER,
     durata_secondi INTEGER,
+    tempi_fasi JSONB,
     stato VARCHAR(20) DEFAULT 'in_corso',
     errore TEXT,
     file_excel_output VARCHAR(255)
@@ -184,6 +205,61 @@ CREATE TABLE IF NOT EXISTS elaborazioni (
 CREATE INDEX IF NOT EXISTS idx_elaborazioni_noleggiatore ON elaborazioni(noleggiatore);
 CREATE INDEX IF NOT EXISTS idx_elaborazioni_data ON elaborazioni(data_elaborazione);
 
+-- Database creati prima della cache match
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS match_cache_hit INTEGER DEFAULT 0;
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS match_cache_hit_rate DECIMAL(5,2);
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS veicoli_nuovi INTEGER;
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS veicoli_modificati INTEGER;
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS veicoli_invariati INTEGER;
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS veicoli_usciti INTEGER;
+ALTER TABLE elaborazioni ADD COLUMN IF NOT EXISTS tempi_fasi JSONB;
+
+-- =============================================================================
+-- TABELLA: match_cache
+-- Esiti match JATO per impronta veicolo (noleggiatore, marca, description,
+-- co2), validi finché non cambiano JATO, pattern carburante o glossario
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS match_cache (
+    chiave VARCHAR(40) PRIMARY KEY,
+    versione VARCHAR(40) NOT NULL,
+    esito TEXT NOT NULL,
+    creato_il TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_match_cache_versione ON match_cache(versione);
+
+-- =============================================================================
+-- TABELLA: esportazioni_excel
+-- File Excel generati, con la versione dei dati veicolo da cui derivano
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS esportazioni_excel (
+    id SERIAL PRIMARY KEY,
+    noleggiatore VARCHAR(20) NOT NULL,
+    data_import DATE NOT NULL,
+    file VARCHAR(255) NOT NULL,
+    elaborazione_id INTEGER REFERENCES elaborazioni(id) ON DELETE SET NULL,
+    versione_dati VARCHAR(40) NOT NULL,
+    veicoli INTEGER,
+    generato_il TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_esportazione_noleggiatore_data UNIQUE (noleggiatore, data_import)
+);
+
+-- =============================================================================
+-- TABELLA: riepilogo_stock
+-- Conteggi veicoli per noleggiatore e data, aggiornati dalla pipeline
+-- (dashboard, health e statistiche non contano la tabella veicoli)
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS riepilogo_stock (
+    noleggiatore VARCHAR(20) NOT NULL,
+    data_import DATE NOT NULL,
+    totale INTEGER NOT NULL DEFAULT 0,
+    matched INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    no_match INTEGER NOT NULL DEFAULT 0,
+    aggiornato_il TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (noleggiatore, data_import)
+);
+
 -- Foreign key (dopo creazione tabelle)
 ALTER TABLE veicoli 
     ADD CONSTRAINT fk_veicoli_elaborazione 
@@ -267,6 +343,7 @@ COMMENT ON TABLE jato_models IS 'Database JATO per matching veicoli';
 COMMENT ON TABLE glossario IS 'Regole normalizzazione termini';
 COMMENT ON TABLE pattern_carburante IS 'Pattern identificazione alimentazione';
 COMMENT ON TABLE elaborazioni IS 'Log elaborazioni eseguite';
+COMMENT ON TABLE match_cache IS 'Esiti match JATO memorizzati tra elaborazioni';
 
 -- Fine inizializzazione
 SELECT 'Database Stock Engine inizializzato correttamente' AS status;
@@ -2,11 +2,16 @@
 # =============================================================================
 # STOCK ENGINE - Scheduler
 # =============================================================================
-# Versione: 1.0.0
-# Data: 28 gennaio 2026
+# Versione: 1.1.1
+# Data: 19 ottobre 2026
 #
 # Scheduler per elaborazione automatica mattutina.
 # Esegue l'elaborazione di tutti i noleggiatori all'ora configurata.
+#
+# v1.1.0: noleggiatori elaborati in parallelo (StockPipeline.elabora_tutti,
+#         ELABORAZIONI_PARALLELE) con report tempi consolidato
+# v1.1.1: la pulizia settimanale elimina anche le righe di riepilogo_stock
+#         dei giorni rimossi (stessa transazione)
 # =============================================================================
 
 import os
@@ -44,24 +49,17 @@ def elaborazione_mattutina():
     app = create_app()
     
     with app.app_context():
-        noleggiatori = app.config.get('NOLEGGIATORI_ATTIVI', ['AYVENS', 'ARVAL', 'LEASYS'])
-        
-        risultati = {}
+        # Un thread e una sessione DB per noleggiatore, indice JATO condiviso
+        # (il report tempi è stampato da elabora_tutti)
+        pipeline = StockPipeline()
+        risultati = pipeline.elabora_tutti()
         
-        for noleggiatore in noleggiatori:
-            logger.info(f"\nElaborazione {noleggiatore}...")
-            
-            try:
-                pipeline = StockPipeline()
-                result = pipeline.elabora(noleggiatore)
-                risultati[noleggiatore] = result
-                
+        for noleggiatore, result in risultati.items():
+            if result.get('stato') == 'errore':
+                logger.error(f"  ✗ {noleggiatore}: ERRORE - {result.get('errore')}")
+            else:
                 logger.info(f"  ✔ {noleggiatore}: {result['veicoli_importati']} veicoli, "
                            f"match rate {result['match_rate']}%")
-                
-            except Exception as e:
-                logger.error(f"  ✗ {noleggiatore}: ERRORE - {str(e)}")
-                risultati[noleggiatore] = {'stato': 'errore', 'errore': str(e)}
         
         # Riepilogo
         logger.info("\n" + "=" * 60)
@@ -132,7 +130,8 @@ def pulizia_settimanale():
     """
     Job pulizia settimanale
     
-    Rimuove dati più vecchi di STORICO_GIORNI.
+    Rimuove dati più vecchi di STORICO_GIORNI, insieme al loro riepilogo
+    (RiepilogoStock) nella stessa transazione.
     """
     logger.info("Avvio pulizia settimanale...")
     
@@ -140,6 +139,7 @@ def pulizia_settimanale():
     
     with app.app_context():
         from datetime import date, timedelta
+        from app.models.riepilogo import RiepilogoStock
         from app.models.veicolo import Veicolo
         
         giorni_storico = app.config.get('STORICO_GIORNI', 365)
@@ -150,10 +150,17 @@ def pulizia_settimanale():
         
         if count > 0:
             Veicolo.query.filter(Veicolo.data_import < data_limite).delete()
-            db.session.commit()
+        
+        # Sempre: toglie anche righe rimaste da pulizie precedenti
+        riepiloghi = RiepilogoStock.query.filter(RiepilogoStock.data_import < data_limite).delete()
+        db.session.commit()
+        
+        if count > 0:
             logger.info(f"  ✔ Eliminati {count} record più vecchi di {giorni_storico} giorni")
         else:
             logger.info("  ✔ Nessun record da eliminare")
+        if riepiloghi:
+            logger.info(f"  ✔ Eliminati {riepiloghi} giorni dal riepilogo stock")
 
 
 if __name__ == '__main__':
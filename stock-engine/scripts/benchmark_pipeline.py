@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Benchmark Pipeline
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Elaborazione completa (StockPipeline.elabora) su dati sintetici
+# riproducibili (dati_sintetici.py): caricamento JATO, poi ogni noleggiatore
+# dal file stock all'Excel. Riporta i tempi per fase (MisureFasi) e
+# l'accuratezza del match rispetto ai product_id attesi, e li confronta con
+# la baseline salvata in benchmark_baseline.json.
+#
+# Il database è SQLite in una directory temporanea, oppure un PostgreSQL
+# locale dedicato (--database-url): il database reale non viene toccato.
+#
+# Uso:
+#   python scripts/benchmark_pipeline.py                      # confronto con la baseline
+#   python scripts/benchmark_pipeline.py --jato 50000 --veicoli 20000
+#   python scripts/benchmark_pipeline.py --passaggi 2         # 2° passaggio con cache match
+#   python scripts/benchmark_pipeline.py --database-url postgresql://localhost/stock_bench --svuota
+#   python scripts/benchmark_pipeline.py --salva-baseline     # dopo un cambiamento voluto
+#
+# Exit code: 0 = nessuna regressione, 1 = accuratezza scesa o tempi oltre
+# la tolleranza rispetto alla baseline
+# =============================================================================
+
+import io
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import date
+from pathlib import Path
+from typing import Dict
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.config import Config
+from app.models.jato import JatoModel
+from app.models.pattern import PatternCarburante
+from app.models.veicolo import Veicolo
+from app.services.jato_migrator import carica_jato
+from app.services.misure import MisureFasi
+from app.services.pipeline import StockPipeline
+
+import dati_sintetici
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+# Fasi sotto questa durata (s) non sono confrontate: solo rumore
+SECONDI_MINIMI_CONFRONTO = 0.1
+
+
+def crea_config(database_url: str, directory: Path, workers: int):
+    """Configurazione del benchmark (database e directory dedicati)"""
+    
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url or f"sqlite:///{directory / 'benchmark.db'}"
+        DIR_INPUT = directory
+        DIR_OUTPUT = directory / 'output'
+        MATCH_WORKERS = workers
+        MATCH_CACHE_ENABLED = True
+        IMPORT_DIFFERENZIALE = False
+    
+    return BenchmarkConfig
+
+
+def prepara_database(svuota: bool):
+    """
+    Crea le tabelle su un database vuoto
+    
+    Raises:
+        RuntimeError: Database con dati JATO e senza --svuota
+    """
+    if svuota:
+        db.drop_all()
+    db.create_all()
+    
+    if db.session.query(JatoModel.id).first() is not None:
+        raise RuntimeError("Database non vuoto: usare un database dedicato al benchmark (--svuota)")
+
+
+def carica_catalogo(catalogo) -> Dict:
+    """Pattern carburante e catalogo JATO sintetici (misurato)"""
+    db.session.execute(insert(PatternCarburante), [
+        {'pattern': pattern, 'fuel_type': fuel_type, 'priorita': priorita, 'attivo': True}
+        for pattern, fuel_type, priorita in dati_sintetici.PATTERN_CARBURANTE
+    ])
+    db.session.commit()
+    
+    with MisureFasi(db.engine) as misure:
+        esito = carica_jato(catalogo, misure)
+    
+    secondi = misure.riepilogo()['totale']['secondi']
+    return {
+        'righe': esito['righe'],
+        'secondi': secondi,
+        'righe_al_secondo': round(esito['righe'] / secondi) if secondi > 0 else None,
+    }
+
+
+def accuratezza(noleggiatore: str, atteso: Dict[str, str]) -> Dict:
+    """
+    Esiti del match confrontati con i product_id attesi
+    
+    - corretti: abbinati al modello JATO da cui deriva il veicolo
+    - sbagliati: abbinati a un altro modello
+    - mancati: NO_MATCH per un veicolo in catalogo
+    - falsi_match: abbinati pur essendo fuori catalogo
+    """
+    esiti = {
+        vin: (product_id, stato)
+        for vin, product_id, stato in db.session.execute(
+            select(Veicolo.vin, Veicolo.product_id, Veicolo.match_status)
+            .where(Veicolo.noleggiatore == noleggiatore, Veicolo.data_import == date.today())
+        )
+    }
+    
+    conteggi = {'corretti': 0, 'sbagliati': 0, 'mancati': 0, 'falsi_match': 0}
+    for vin, product_id_atteso in atteso.items():
+        product_id, stato = esiti.get(vin, (None, None))
+        abbinato = stato in ('MATCHED', 'PARTIAL')
+        
+        if product_id_atteso is None:
+            conteggi['falsi_match'] += abbinato
+        elif not abbinato:
+            conteggi['mancati'] += 1
+        elif product_id == product_id_atteso:
+            conteggi['corretti'] += 1
+        else:
+            conteggi['sbagliati'] += 1
+    
+    in_catalogo = sum(1 for p in atteso.values() if p is not None)
+    conteggi['in_catalogo'] = in_catalogo
+    conteggi['accuratezza'] = round(conteggi['corretti'] / in_catalogo * 100, 1) if in_catalogo else None
+    
+    return conteggi
+
+
+def elabora(noleggiatore: str, file_path: Path, atteso: Dict, workers: int, verboso: bool) -> Dict:
+    """Un passaggio della pipeline per un noleggiatore, con misure e accuratezza"""
+    output = contextlib.nullcontext() if verboso else contextlib.redirect_stdout(io.StringIO())
+    
+    with output:
+        risultato = StockPipeline(workers=workers).elabora(noleggiatore, file_path=file_path, differenziale=False)
+    
+    tempi = risultato['tempi_fasi']
+    return {
+        'secondi': tempi['totale']['secondi'],
+        'query': tempi['totale']['query'],
+        'memoria_picco_mb': tempi['totale']['memoria_picco_mb'],
+        'fasi': {
+            voce['fase']: {'secondi': voce['secondi'], 'righe_al_secondo': voce['righe_al_secondo']}
+            for voce in tempi['fasi']
+        },
+        'match_rate': risultato['match_rate'],
+        'match_cache_hit_rate': risultato['match_cache_hit_rate'],
+        'accuratezza': accuratezza(noleggiatore, atteso),
+    }
+
+
+def stampa_report(report: Dict):
+    """Tempi per fase e accuratezza"""
+    parametri = report['parametri']
+    jato = report['jato']
+    
+    print(f"\n{'='*60}")
+    print("BENCHMARK PIPELINE")
+    print(f"{'='*60}")
+    print(f"Database: {parametri['database']}, JATO: {parametri['jato']} modelli, "
+          f"veicoli: {parametri['veicoli']}, seed: {parametri['seed']}, workers: {parametri['workers']}")
+    print(f"Caricamento JATO: {jato['secondi']:.2f}s ({jato['righe_al_secondo']} righe/s)")
+    
+    for noleggiatore, passaggi in report['noleggiatori'].items():
+        for numero, passaggio in enumerate(passaggi, start=1):
+            acc = passaggio['accuratezza']
+            print(f"\n{noleggiatore} (passaggio {numero}): {passaggio['secondi']:.2f}s, "
+                  f"{passaggio['query']} query, picco {passaggio['memoria_picco_mb']} MB")
+            print(f"  {'Fase':<16}{'Secondi':>9}{'Righe/s':>10}")
+            for fase, misura in passaggio['fasi'].items():
+                print(f"  {fase:<16}{misura['secondi']:>9.2f}{misura['righe_al_secondo'] or 0:>10}")
+            print(f"  Match rate: {passaggio['match_rate']}%, da cache: {passaggio['match_cache_hit_rate']}%")
+            print(f"  Accuratezza: {acc['accuratezza']}% ({acc['corretti']}/{acc['in_catalogo']}), "
+                  f"sbagliati: {acc['sbagliati']}, mancati: {acc['mancati']}, falsi match: {acc['falsi_match']}")
+
+
+def confronta(report: Dict, baseline: Dict, tolleranza: float) -> int:
+    """
+    Confronto con la baseline
+    
+    Regressioni: accuratezza più bassa, oppure tempo totale o di una fase
+    (sopra SECONDI_MINIMI_CONFRONTO) oltre la tolleranza percentuale.
+    
+    Returns:
+        int: Numero regressioni
+    """
+    print(f"\n{'-'*60}")
+    print(f"CONFRONTO CON LA BASELINE (tolleranza tempi {tolleranza:.0f}%)")
+    print(f"{'-'*60}")
+    
+    if baseline['parametri'] != report['parametri']:
+        print(f"⚠ Parametri diversi dalla baseline {baseline['parametri']}: confronto indicativo")
+    
+    regressioni = 0
+    
+    def riga(nome, prima, dopo):
+        nonlocal regressioni
+        if prima < SECONDI_MINIMI_CONFRONTO and dopo < SECONDI_MINIMI_CONFRONTO:
+            return
+        variazione = (dopo - prima) / prima * 100 if prima else 0
+        esito = ' '
+        if variazione > tolleranza:
+            esito = '✗'
+            regressioni += 1
+        elif variazione < -tolleranza:
+            esito = '✔'
+        print(f"  {esito} {nome:<28}{prima:>8.2f}s →{dopo:>8.2f}s  {variazione:+6.1f}%")
+    
+    riga('caricamento JATO', baseline['jato']['secondi'], report['jato']['secondi'])
+    
+    for noleggiatore, passaggi in report['noleggiatori'].items():
+        passaggi_base = baseline['noleggiatori'].get(noleggiatore, [])
+        for numero, (base, attuale) in enumerate(zip(passaggi_base, passaggi), start=1):
+            prefisso = f"{noleggiatore}/{numero}"
+            riga(f"{prefisso} totale", base['secondi'], attuale['secondi'])
+            for fase, misura in attuale['fasi'].items():
+                if fase in base['fasi']:
+                    riga(f"{prefisso} {fase}", base['fasi'][fase]['secondi'], misura['secondi'])
+            
+            prima = base['accuratezza']['accuratezza'] or 0
+            dopo = attuale['accuratezza']['accuratezza'] or 0
+            esito = '✗' if dopo < prima else '✔' if dopo > prima else ' '
+            if dopo < prima:
+                regressioni += 1
+            print(f"  {esito} {prefisso + ' accuratezza':<28}{prima:>8.1f}% →{dopo:>8.1f}%")
+    
+    if regressioni:
+        print(f"\n✗ {regressioni} regressioni")
+    else:
+        print("\n✔ Nessuna regressione")
+    
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline su dati sintetici')
+    parser.add_argument('--jato', type=int, default=5000, help='Modelli JATO sintetici')
+    parser.add_argument('--veicoli', type=int, default=2000, help='Veicoli per noleggiatore')
+    parser.add_argument('--noleggiatori', nargs='+', default=list(dati_sintetici.FILE_STOCK))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help='Processi match (0 = tutti i core)')
+    parser.add_argument('--passaggi', type=int, default=1,
+                        help='Elaborazioni per noleggiatore (dalla seconda: cache match)')
+    parser.add_argument('--database-url', help='Database dedicato (default: SQLite temporaneo)')
+    parser.add_argument('--svuota', action='store_true',
+                        help='Elimina e ricrea le tabelle del database indicato')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--salva-baseline', action='store_true',
+                        help='Salva questo risultato come baseline')
+    parser.add_argument('--tolleranza', type=float, default=25.0,
+                        help='Peggioramento tempi tollerato (percentuale)')
+    parser.add_argument('--output', type=Path, help='Salva il report JSON')
+    parser.add_argument('--verboso', action='store_true', help='Mostra il log della pipeline')
+    args = parser.parse_args()
+    
+    noleggiatori = [n.upper() for n in args.noleggiatori]
+    directory = Path(tempfile.mkdtemp(prefix='stock_benchmark_'))
+    
+    try:
+        dati = dati_sintetici.genera(directory, args.jato, args.veicoli, noleggiatori, args.seed)
+        
+        app = create_app(crea_config(args.database_url, directory, args.workers))
+        
+        with app.app_context():
+            prepara_database(args.svuota)
+            
+            report = {
+                'parametri': {
+                    'database': db.engine.dialect.name,
+                    'jato': args.jato,
+                    'veicoli': args.veicoli,
+                    'seed': args.seed,
+                    'workers': args.workers,
+                },
+                'jato': carica_catalogo(dati['jato']),
+                'noleggiatori': {},
+            }
+            
+            for noleggiatore in noleggiatori:
+                report['noleggiatori'][noleggiatore] = [
+                    elabora(noleggiatore, dati['file'][noleggiatore], dati['atteso'][noleggiatore],
+                            args.workers, args.verboso)
+                    for _ in range(args.passaggi)
+                ]
+            
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    stampa_report(report)
+    
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=1) + '\n', encoding='utf-8')
+    
+    if args.salva_baseline:
+        args.baseline.write_text(json.dumps(report, indent=1) + '\n', encoding='utf-8')
+        print(f"\n✔ Baseline salvata: {args.baseline.name}")
+        print(f"{'='*60}\n")
+        return 0
+    
+    regressioni = 0
+    if args.baseline.exists():
+        regressioni = confronta(report, json.loads(args.baseline.read_text(encoding='utf-8')), args.tolleranza)
+    else:
+        print(f"\n⚠ Baseline assente: {args.baseline.name} (--salva-baseline)")
+    print(f"{'='*60}\n")
+    
+    return 1 if regressioni else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Dati sintetici
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Genera un catalogo JATO sintetico e file stock sintetici nel tracciato di
+# ogni importer (AYVENS CSV, ARVAL XLSX), riproducibili a parità di seed.
+# Ogni veicolo stock deriva da un modello JATO noto (o è volutamente fuori
+# catalogo): il product_id atteso è salvato accanto al file per misurare
+# l'accuratezza del match.
+#
+# Le description stock hanno il "rumore" dei file reali: maiuscole, ordine
+# delle parole diverso, CV al posto dei kW, pacchetti omessi, caratteri
+# speciali AYVENS (§ _) che l'importer deve ripulire.
+#
+# Uso:
+#   python scripts/dati_sintetici.py --output /tmp/stock_sintetico
+#   python scripts/dati_sintetici.py --jato 50000 --veicoli 20000 --seed 7
+#
+# File prodotti nella directory di output:
+#   jato_sintetico.xlsx         → flask shell: update_jato_from_file(path)
+#   pattern_carburante.xlsx     → migrate_pattern_carburante(path)
+#   stockReport_sintetico.csv   → AYVENS
+#   arval_stock_sintetico.xlsx  → ARVAL
+#   atteso_<noleggiatore>.json  → {vin: product_id atteso | null}
+# =============================================================================
+
+import sys
+import json
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# VOCABOLARIO
+# =============================================================================
+
+# Marca → modelli (con carrozzeria)
+MODELLI = {
+    'FIAT': [('500', 'hatchback'), ('Panda', 'hatchback'), ('Tipo', 'wagon'), ('600', 'suv')],
+    'ALFA ROMEO': [('Junior', 'suv'), ('Tonale', 'suv'), ('Giulia', 'sedan'), ('Stelvio', 'suv')],
+    'JEEP': [('Avenger', 'suv'), ('Renegade', 'suv'), ('Compass', 'suv'), ('Wrangler', 'suv')],
+    'VOLKSWAGEN': [('Polo', 'hatchback'), ('Golf', 'hatchback'), ('T-Roc', 'suv'), ('Tiguan', 'suv')],
+    'AUDI': [('A1', 'hatchback'), ('A3', 'hatchback'), ('Q3', 'suv'), ('Q5', 'suv')],
+    'BMW': [('Serie 1', 'hatchback'), ('Serie 3', 'sedan'), ('X1', 'suv'), ('X3', 'suv')],
+    'PEUGEOT': [('208', 'hatchback'), ('2008', 'suv'), ('308', 'hatchback'), ('3008', 'suv')],
+    'RENAULT': [('Clio', 'hatchback'), ('Captur', 'suv'), ('Megane', 'hatchback'), ('Austral', 'suv')],
+    'TOYOTA': [('Yaris', 'hatchback'), ('Yaris Cross', 'suv'), ('C-HR', 'suv'), ('Corolla', 'wagon')],
+    'KIA': [('Picanto', 'hatchback'), ('Stonic', 'suv'), ('Ceed', 'wagon'), ('Sportage', 'suv')],
+}
+
+# Marca → alimentazione JATO → sigla motore nella description
+MOTORI = {
+    'FIAT': {'Petrol': 'FireFly', 'Diesel': 'MultiJet', 'Hybrid': 'Hybrid', 'Electric': 'Electric'},
+    'ALFA ROMEO': {'Petrol': 'TB', 'Diesel': 'MultiJet', 'Hybrid': 'Hybrid', 'Plug-in Hybrid': 'PHEV'},
+    'JEEP': {'Petrol': 'T-GDI', 'Diesel': 'MultiJet', 'Hybrid': 'e-Hybrid MHEV', 'Plug-in Hybrid': '4xe PHEV'},
+    'VOLKSWAGEN': {'Petrol': 'TSI', 'Diesel': 'TDI', 'Hybrid': 'eTSI MHEV', 'Plug-in Hybrid': 'eHybrid PHEV'},
+    'AUDI': {'Petrol': 'TFSI', 'Diesel': 'TDI', 'Hybrid': 'MHEV', 'Plug-in Hybrid': 'TFSI e PHEV'},
+    'BMW': {'Petrol': 'i Steptronic', 'Diesel': 'd Diesel', 'Hybrid': 'MHEV', 'Electric': 'Electric'},
+    'PEUGEOT': {'Petrol': 'PureTech', 'Diesel': 'BlueHDi', 'Hybrid': 'Hybrid', 'Electric': 'Electric'},
+    'RENAULT': {'Petrol': 'TCe', 'Diesel': 'dCi', 'Hybrid': 'E-Tech Hybrid', 'Electric': 'E-Tech Electric'},
+    'TOYOTA': {'Petrol': 'VVT-i', 'Hybrid': 'Hybrid', 'Plug-in Hybrid': 'Plug-in Hybrid', 'Electric': 'Electric'},
+    'KIA': {'Petrol': 'T-GDi', 'Diesel': 'CRDi', 'Hybrid': 'MHEV', 'Electric': 'Electric'},
+}
+
+# Potenze (kW) per alimentazione
+POTENZE_KW = {
+    'Petrol': [74, 96, 110, 140],
+    'Diesel': [85, 96, 110, 140],
+    'Hybrid': [74, 100, 115, 150],
+    'Plug-in Hybrid': [132, 165, 180, 225],
+    'Electric': [87, 115, 150, 210],
+}
+
+# Emissioni CO2 WLTP indicative per alimentazione (g/km)
+CO2_BASE = {'Petrol': 130, 'Diesel': 120, 'Hybrid': 105, 'Plug-in Hybrid': 30, 'Electric': 0}
+
+ALLESTIMENTI = ['Business', 'Style', 'Sport', 'Elegance', 'Lounge',
+                'Prestige', 'Executive', 'Advanced', 'Tecnica', 'Design']
+
+TRASMISSIONI = [('Manuale 6 marce', ''), ('Automatico', 'Auto')]
+
+PACCHETTI = ['', 'Pack Tech', 'Pack Comfort', 'Pack Winter']
+
+# Marche fuori catalogo JATO (veicoli senza match atteso)
+FUORI_CATALOGO = {
+    'LYNK & CO': ['01 1.5 PHEV 197kW', '02 Electric 200kW'],
+    'BYD': ['Seal Design 230kW Electric', 'Atto 3 Comfort 150kW'],
+    'MG': ['ZS 1.5 VTi-Tech 78kW Comfort', 'MG4 Electric 51 kWh Standard 125kW'],
+}
+
+# Pattern carburante che riconoscono le sigle motore di MOTORI
+PATTERN_CARBURANTE = [
+    ('PHEV', 'PLUGIN', 30), ('PLUG-IN', 'PLUGIN', 30), ('MHEV', 'HYBRID', 20),
+    ('HYBRID', 'HYBRID', 15), ('ELECTRIC', 'ELECTRIC', 15), ('KWH', 'ELECTRIC', 12),
+    ('BLUEHDI', 'DIESEL', 12), ('MULTIJET', 'DIESEL', 10), ('TDI', 'DIESEL', 10),
+    ('CRDI', 'DIESEL', 10), ('DCI', 'DIESEL', 10), ('D DIESEL', 'DIESEL', 10),
+    ('TFSI', 'PETROL', 12), ('TSI', 'PETROL', 10), ('PURETECH', 'PETROL', 10),
+    ('TCE', 'PETROL', 10), ('FIREFLY', 'PETROL', 10), ('T-GDI', 'PETROL', 10),
+    ('VVT-I', 'PETROL', 10), ('STEPTRONIC', 'PETROL', 8), ('TB', 'PETROL', 5),
+]
+
+# Nomi file (riconosciuti dai FILE_PATTERNS degli importer)
+FILE_STOCK = {
+    'AYVENS': 'stockReport_sintetico.csv',
+    'ARVAL': 'arval_stock_sintetico.xlsx',
+}
+
+COLORI = ['BIANCO', 'NERO', 'GRIGIO', 'BLU', 'ROSSO', 'ARGENTO']
+DEPOSITI = [('MILANO', 'Via Gallarate 100, Milano'), ('ROMA', 'Via Tiburtina 900, Roma'),
+            ('TORINO', 'Corso Giulio Cesare 300, Torino'), ('BOLOGNA', 'Via Emilia 50, Bologna')]
+
+
+# =============================================================================
+# CATALOGO JATO
+# =============================================================================
+
+def _combinazioni() -> List[Tuple]:
+    """Assi del catalogo: (marca, modello, carrozzeria, alimentazione, sigla)"""
+    assi = []
+    for marca, modelli in MODELLI.items():
+        for modello, carrozzeria in modelli:
+            for alimentazione, sigla in MOTORI[marca].items():
+                assi.append((marca, modello, carrozzeria, alimentazione, sigla))
+    return assi
+
+
+def _cilindrata(alimentazione: str, kw: int) -> str:
+    """Cilindrata (o batteria per gli elettrici) plausibile per la potenza"""
+    if alimentazione == 'Electric':
+        return f"{40 + (kw // 30) * 6} kWh"
+    if kw < 80:
+        return '1.0'
+    if kw < 100:
+        return '1.2'
+    if kw < 120:
+        return '1.5'
+    return '2.0'
+
+
+def capacita_catalogo() -> int:
+    """Modelli JATO distinti generabili"""
+    return len(_combinazioni()) * 4 * len(ALLESTIMENTI) * len(TRASMISSIONI) * len(PACCHETTI)
+
+
+def genera_jato(n: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Catalogo JATO sintetico (colonne come nel file JATO Excel)
+    
+    Ogni modello è una combinazione distinta di marca, modello, motore,
+    potenza, allestimento, trasmissione e pacchetto.
+    
+    Args:
+        n: Numero modelli
+        seed: Seed generatore casuale
+    
+    Returns:
+        DataFrame con le colonne del file JATO
+    
+    Raises:
+        ValueError: n oltre le combinazioni disponibili
+    """
+    capacita = capacita_catalogo()
+    if n > capacita:
+        raise ValueError(f"Catalogo sintetico massimo: {capacita} modelli")
+    
+    rng = np.random.default_rng(seed)
+    assi = _combinazioni()
+    dimensioni = [len(assi), 4, len(ALLESTIMENTI), len(TRASMISSIONI), len(PACCHETTI)]
+    
+    righe = []
+    for i, codice in enumerate(rng.choice(capacita, size=n, replace=False), start=1):
+        indici = np.unravel_index(codice, dimensioni)
+        marca, modello, carrozzeria, alimentazione, sigla = assi[indici[0]]
+        kw = POTENZE_KW[alimentazione][indici[1]]
+        hp = round(kw * 1.36)
+        allestimento = ALLESTIMENTI[indici[2]]
+        trasmissione, sigla_cambio = TRASMISSIONI[indici[3]]
+        pacchetto = PACCHETTI[indici[4]]
+        
+        versione = ' '.join(p for p in (sigla, sigla_cambio, allestimento, pacchetto) if p)
+        righe.append({
+            'Product ID': f'SY{i:07d}',
+            'Jato Code': f'IT{codice:08d}',
+            'Brand Description': marca,
+            'Jato Model': modello,
+            'Jato Product Description': f"{modello} {_cilindrata(alimentazione, kw)} {sigla} {hp}cv "
+                                        f"{' '.join(p for p in (sigla_cambio, allestimento, pacchetto) if p)}",
+            'Vehicle Set Description': f"{modello} {versione}",
+            'Alimentazione': alimentazione,
+            'KW': kw,
+            'Horsepower': hp,
+            'Homologation': 'M1',
+            'Transmission Description': trasmissione,
+            'Body Type': carrozzeria,
+            'CO2 WLTP': CO2_BASE[alimentazione] + (kw // 10),
+        })
+    
+    return pd.DataFrame(righe)
+
+
+# =============================================================================
+# FILE STOCK
+# =============================================================================
+
+def _description_stock(rng, jato: Dict, stile: str) -> Tuple[str, str]:
+    """
+    Description stock con rumore realistico a partire dal modello JATO
+    
+    Returns:
+        (modello, versione): per AYVENS la description è "modello versione"
+    """
+    alimentazione = jato['Alimentazione']
+    kw = jato['KW']
+    modello = jato['Jato Model']
+    sigla = MOTORI[jato['Brand Description']][alimentazione]
+    allestimento, pacchetto = _allestimento_pacchetto(jato)
+    
+    potenza = f"{jato['Horsepower']}CV" if rng.random() < 0.4 else f"{kw}KW"
+    cambio = 'AUTO' if jato['Transmission Description'] == 'Automatico' else ''
+    if pacchetto and rng.random() < 0.1:
+        pacchetto = ''
+    
+    parti = [_cilindrata(alimentazione, kw), sigla, cambio, allestimento, pacchetto, potenza]
+    if rng.random() < 0.3:
+        # Allestimento prima del motore
+        parti = [allestimento, pacchetto, _cilindrata(alimentazione, kw), sigla, cambio, potenza]
+    versione = ' '.join(p for p in parti if p)
+    
+    if stile == 'AYVENS':
+        versione = versione.upper()
+        if rng.random() < 0.1:
+            versione = versione.replace(' ', rng.choice(['§', '_']), 1)
+        return modello.upper(), versione
+    
+    if rng.random() < 0.5:
+        versione = versione.lower().replace('kw', 'kW')
+    return modello, versione
+
+
+def _allestimento_pacchetto(jato: Dict) -> Tuple[str, str]:
+    """Allestimento e pacchetto dalla Vehicle Set Description"""
+    set_desc = jato['Vehicle Set Description']
+    allestimento = next(a for a in ALLESTIMENTI if f' {a}' in set_desc)
+    pacchetto = next((p for p in PACCHETTI[1:] if set_desc.endswith(p)), '')
+    return allestimento, pacchetto
+
+
+def _fuori_catalogo(rng) -> Tuple[str, str, str]:
+    """(marca, modello, versione) di un veicolo senza modello JATO"""
+    marca = rng.choice(list(FUORI_CATALOGO))
+    modello, versione = rng.choice(FUORI_CATALOGO[marca]).split(' ', 1)
+    return marca, modello, versione
+
+
+def genera_stock(noleggiatore: str, jato: pd.DataFrame, n: int, seed: int = 42,
+                 fuori_catalogo: float = 0.05) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    File stock sintetico nel tracciato dell'importer del noleggiatore
+    
+    Args:
+        noleggiatore: AYVENS o ARVAL
+        jato: Catalogo da genera_jato()
+        n: Numero veicoli
+        seed: Seed generatore casuale
+        fuori_catalogo: Quota di veicoli di marche assenti dal catalogo
+    
+    Returns:
+        (DataFrame con le colonne del file, {vin: product_id atteso o None})
+    
+    Raises:
+        ValueError: Noleggiatore senza tracciato
+    """
+    noleggiatore = noleggiatore.upper()
+    if noleggiatore not in FILE_STOCK:
+        raise ValueError(f"Tracciato sintetico non disponibile per {noleggiatore}")
+    
+    rng = np.random.default_rng([seed, sum(map(ord, noleggiatore))])
+    modelli = jato.to_dict('records')
+    oggi = date.today()
+    
+    righe = []
+    atteso = {}
+    for i in range(n):
+        vin = f"{noleggiatore[:2]}S{i:014d}"
+        
+        if rng.random() < fuori_catalogo:
+            marca, modello, versione = _fuori_catalogo(rng)
+            kw, hp, co2, alimentazione, cambio, carrozzeria = None, None, 0, '', '', ''
+            atteso[vin] = None
+        else:
+            scelto = modelli[rng.integers(len(modelli))]
+            marca = scelto['Brand Description']
+            modello, versione = _description_stock(rng, scelto, noleggiatore)
+            kw, hp = scelto['KW'], scelto['Horsepower']
+            co2 = scelto['CO2 WLTP']
+            alimentazione = scelto['Alimentazione']
+            cambio = scelto['Transmission Description']
+            carrozzeria = scelto['Body Type']
+            atteso[vin] = scelto['Product ID']
+        
+        deposito, indirizzo = DEPOSITI[rng.integers(len(DEPOSITI))]
+        listino = round(float(rng.uniform(15000, 70000)), 2)
+        optional = round(float(rng.uniform(0, 5000)), 2)
+        arrivo = oggi + timedelta(days=int(rng.integers(0, 120)))
+        colore = COLORI[rng.integers(len(COLORI))]
+        
+        if noleggiatore == 'AYVENS':
+            righe.append({
+                'VIN': vin,
+                'VEHICLEID': f'AY{i:08d}',
+                'MAKENAME': marca,
+                'MODELNAME': modello,
+                'DESCRIPTION': f"{modello} {versione}",
+                'ENGINEDESCRIPTION': alimentazione.upper(),
+                'CO2EMISSION': co2,
+                'KW': kw,
+                'HP': hp,
+                'PREZZO_ACCESSORI': optional,
+                'PREZZO_LISTINO': listino,
+                'PREZZO_TOTALE': round(listino + optional, 2),
+                'LOCATION': deposito,
+                'LOCATION_ADDRESS': indirizzo,
+                'ESTIMATEDDELIVERYDATE': arrivo.strftime('%d/%m/%Y'),
+                'EXTERIORCOLORGROUP': colore,
+                'BODYSTYLE': carrozzeria.upper(),
+                'TRANSMISSION': cambio.upper(),
+                'KM': 0,
+            })
+        else:
+            righe.append({
+                'VIN': vin,
+                'TARGA': f"SY{i % 1000:03d}{chr(65 + (i // 1000) % 26)}{chr(65 + i % 26)}",
+                'MARCA': marca.title(),
+                'MODELLO': modello,
+                'VERSIONE': versione,
+                'ALIMENTAZIONE': alimentazione,
+                'CO2': co2,
+                'KW': kw,
+                'CV': hp,
+                'PREZZO_LISTINO': listino,
+                'PREZZO_OPTIONAL': optional,
+                'DEPOSITO': deposito,
+                'INDIRIZZO_DEPOSITO': indirizzo,
+                'DATA_ARRIVO_PREVISTA': arrivo.strftime('%d/%m/%Y'),
+                'COLORE_ESTERNO': colore,
+                'CARROZZERIA': carrozzeria,
+                'CAMBIO': cambio,
+                'KM': 0,
+                'COMMENTS': None,
+            })
+    
+    return pd.DataFrame(righe), atteso
+
+
+def scrivi_stock(noleggiatore: str, df: pd.DataFrame, directory: Path) -> Path:
+    """
+    Scrive il file stock nel formato del noleggiatore
+    
+    AYVENS: CSV latin-1, separatore ';', decimale ','. ARVAL: XLSX.
+    """
+    path = Path(directory) / FILE_STOCK[noleggiatore.upper()]
+    
+    if path.suffix == '.csv':
+        df.to_csv(path, sep=';', decimal=',', index=False, encoding='latin-1')
+    else:
+        df.to_excel(path, index=False)
+    
+    return path
+
+
+def genera(directory: Path, jato: int = 5000, veicoli: int = 2000,
+           noleggiatori: List[str] = None, seed: int = 42) -> Dict:
+    """
+    Genera catalogo, pattern e file stock nella directory
+    
+    Returns:
+        dict: jato (DataFrame), file {noleggiatore: Path},
+              atteso {noleggiatore: {vin: product_id}}
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    noleggiatori = [n.upper() for n in (noleggiatori or list(FILE_STOCK))]
+    
+    catalogo = genera_jato(jato, seed)
+    risultato = {'jato': catalogo, 'file': {}, 'atteso': {}}
+    
+    for noleggiatore in noleggiatori:
+        df, atteso = genera_stock(noleggiatore, catalogo, veicoli, seed)
+        risultato['file'][noleggiatore] = scrivi_stock(noleggiatore, df, directory)
+        risultato['atteso'][noleggiatore] = atteso
+        (directory / f'atteso_{noleggiatore.lower()}.json').write_text(
+            json.dumps(atteso, indent=0) + '\n', encoding='utf-8'
+        )
+    
+    return risultato
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera dati sintetici (JATO e stock)')
+    parser.add_argument('--output', type=Path, default=Path('stock_sintetico'),
+                        help='Directory di output')
+    parser.add_argument('--jato', type=int, default=5000, help='Modelli JATO')
+    parser.add_argument('--veicoli', type=int, default=2000, help='Veicoli per noleggiatore')
+    parser.add_argument('--noleggiatori', nargs='+', default=list(FILE_STOCK),
+                        help='Noleggiatori (tracciati disponibili: ' + ', '.join(FILE_STOCK) + ')')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    risultato = genera(args.output, args.jato, args.veicoli, args.noleggiatori, args.seed)
+    
+    risultato['jato'].to_excel(args.output / 'jato_sintetico.xlsx', index=False)
+    pd.DataFrame(PATTERN_CARBURANTE, columns=['pattern', 'fuel_type', 'priorita']).to_excel(
+        args.output / 'pattern_carburante.xlsx', index=False, sheet_name='Pattern Carburante'
+    )
+    
+    print(f"\n{'='*60}")
+    print("DATI SINTETICI")
+    print(f"{'='*60}")
+    print(f"Directory: {args.output}")
+    print(f"  JATO: {len(risultato['jato'])} modelli → jato_sintetico.xlsx")
+    for noleggiatore, path in risultato['file'].items():
+        print(f"  {noleggiatore}: {args.veicoli} veicoli → {path.name}")
+    print(f"{'='*60}\n")
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
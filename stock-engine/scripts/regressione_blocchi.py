@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Regressione Lettura a Blocchi
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Verifica che la lettura CSV a blocchi (leggi_blocchi) dia gli stessi
+# veicoli, con gli stessi tipi e lo stesso hash riga, della lettura
+# dell'intero file (leggi_file), per ogni importer e dimensione di blocco.
+#
+# Il CSV di prova ha tipi misti: colonne di testo con tratti tutti numerici
+# (VIN '00000000000000000', modello '500', targhe numeriche) che a blocchi
+# il parser dedurrebbe come numeri, campi numerici con decimali italiani,
+# valori vuoti e testo ('N/D').
+#
+# Uso:
+#   python scripts/regressione_blocchi.py
+#   python scripts/regressione_blocchi.py --righe 20000
+#
+# Exit code: 0 = tutti identici, 1 = differenze
+# =============================================================================
+
+import sys
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.models.veicolo import Veicolo
+from app.services.importers.arval_importer import ArvalImporter
+from app.services.importers.ayvens_importer import AyvensImporter
+
+# Blocchi provati (l'ultimo contiene tutto il file)
+BLOCCHI = [7, 200, 1000, 1000000]
+
+# Campi di testo con tratti interamente numerici nel file
+TESTO_NUMERICO = {
+    'vin': lambda i, c: '0' * 17 if i < 300 else f'WF0{c.randrange(10**13):014d}',
+    'modello': lambda i, c: '500' if i < 400 else c.choice(['500', 'Panda', 'A3', '208']),
+    'targa': lambda i, c: str(c.randrange(10**6)) if i % 500 < 250 else f'GH{c.randrange(999):03d}XY',
+}
+
+
+def valore_numerico(casuale: random.Random) -> str:
+    """Campo numerico: intero, decimale con la virgola, vuoto o testo"""
+    return casuale.choice([
+        str(casuale.randrange(50, 300)),
+        f'{casuale.randrange(10000, 60000)},{casuale.randrange(100):02d}',
+        '', 'N/D', ' 110 ', '1.5',
+    ])
+
+
+def scrivi_csv(importer, directory: Path, righe: int, casuale: random.Random) -> Path:
+    """CSV nel tracciato dell'importer con tipi misti"""
+    colonne = list(dict.fromkeys(importer.get_column_mapping()))
+    campi = importer.get_column_mapping()
+    
+    linee = [';'.join(colonne)]
+    for i in range(righe):
+        valori = []
+        for colonna in colonne:
+            campo = campi[colonna]
+            base = campo.replace('_originale', '')
+            if base in TESTO_NUMERICO:
+                valori.append(TESTO_NUMERICO[base](i, casuale))
+            elif campo in importer.CAMPI_NUMERICI:
+                valori.append(valore_numerico(casuale) if i >= 100 else str(casuale.randrange(50, 300)))
+            elif campo.startswith('data_'):
+                valori.append(casuale.choice(['2026-10-19', '19/10/2026', '']))
+            else:
+                valori.append(casuale.choice(['ROSSO', 'FIAT', 'MILANO', '1.0 HYBRID', '123', '']))
+        linee.append(';'.join(valori))
+    
+    file_path = directory / f'{importer.NOLEGGIATORE.lower()}_stock_misto.csv'
+    file_path.write_text('\n'.join(linee) + '\n', encoding='utf-8')
+    return file_path
+
+
+def firma(riga: dict) -> dict:
+    """Valori con il tipo (1 e '1' sono diversi) e hash riga"""
+    valori = {k: (type(v).__name__, v) for k, v in riga.items()}
+    valori['hash_riga'] = Veicolo.calcola_hash_riga(riga)
+    return valori
+
+
+def confronta(classe, file_path: Path) -> int:
+    """Confronta leggi_file con leggi_blocchi, ritorna le differenze"""
+    importer = classe()
+    attese = [firma(r) for r in importer.converti(importer.leggi_file(file_path))]
+    differenze = 0
+    
+    # Testo che il parser a blocchi trasformava in numero
+    for campo, atteso in (('vin', '0' * 17), ('modello', '500')):
+        trovati = {r[campo] for r in attese if campo in r}
+        if ('str', atteso) not in trovati:
+            differenze += 1
+            print(f"\n✗ [{classe.NOLEGGIATORE}] {campo} {atteso!r} non letto come testo")
+    
+    for blocco in BLOCCHI:
+        importer = classe()
+        importer.CSV_RIGHE_BLOCCO = blocco
+        ottenute = [firma(r) for b in importer.leggi_blocchi(file_path) for r in importer.converti(b)]
+        
+        diverse = 0
+        if len(ottenute) != len(attese):
+            diverse += 1
+            print(f"\n✗ [{classe.NOLEGGIATORE}] blocco {blocco}: {len(ottenute)} righe, attese {len(attese)}")
+        for riga, (attesa, ottenuta) in enumerate(zip(attese, ottenute)):
+            if attesa != ottenuta:
+                diverse += 1
+                if diverse <= 5:
+                    campi = [k for k in attesa if attesa[k] != ottenuta.get(k)]
+                    print(f"\n✗ [{classe.NOLEGGIATORE}] blocco {blocco}, riga {riga}: "
+                          + ', '.join(f"{k} {attesa[k]!r} → {ottenuta.get(k)!r}" for k in campi))
+        
+        print(f"  {classe.NOLEGGIATORE:<8} blocchi di {blocco:>7} righe: "
+              f"{'✔ identici' if not diverse else f'✗ {diverse} differenze'}")
+        differenze += diverse
+    
+    return differenze
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressione lettura a blocchi')
+    parser.add_argument('--righe', type=int, default=3000,
+                        help='Righe del CSV di prova')
+    args = parser.parse_args()
+    
+    casuale = random.Random(50)
+    
+    print(f"\n{'='*60}")
+    print("REGRESSIONE LETTURA A BLOCCHI")
+    print(f"{'='*60}")
+    
+    differenze = 0
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for classe in (AyvensImporter, ArvalImporter):
+            file_path = scrivi_csv(classe(), Path(directory), args.righe, casuale)
+            differenze += confronta(classe, file_path)
+    
+    if differenze:
+        print(f"\n✗ {differenze} differenze")
+    else:
+        print("✔ Tutti i risultati identici")
+    print(f"{'='*60}\n")
+    
+    return 1 if differenze else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
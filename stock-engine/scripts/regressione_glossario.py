@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Regressione Glossario
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Verifica che le regole compilate del Normalizer producano esattamente lo stesso testo
+# dell'applicazione sequenziale delle regole glossario (una pattern.sub per
+# regola, nell'ordine del database), compresi gli effetti a catena tra regole.
+#
+# Usa il glossario corrente del database configurato (sola lettura) e come
+# testi le descrizioni originali dei veicoli, più testi costruiti con i
+# termini del glossario (maiuscole/minuscole, punteggiatura, combinazioni).
+# Un set di regole di esempio con i casi limite viene sempre verificato.
+#
+# Uso:
+#   python scripts/regressione_glossario.py
+#   python scripts/regressione_glossario.py --max-testi 20000
+#
+# Exit code: 0 = tutti identici, 1 = differenze
+# =============================================================================
+
+import re
+import sys
+import random
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app import create_app, db
+from app.models.glossario import Glossario
+from app.models.veicolo import Veicolo
+from app.services.normalizer import CAMPI_NORMALIZZATI, compila_regole
+
+# Regole di esempio: catene, sovrapposizioni, punteggiatura, non ASCII
+REGOLE_ESEMPIO = [
+    ('ALFA', 'ALFA ROMEO', 'marca'),
+    ('ROMEO', 'ROMEO', 'marca'),
+    ('VW', 'VOLKSWAGEN', None),
+    ('VOLKSWAGEN', 'VOLKSWAGEN AG', 'description'),
+    ('AG', 'A.G.', None),
+    ('MERCEDES', 'MERCEDES-BENZ', None),
+    ('BENZ', 'BENZ CLASSE', 'modello'),
+    ('MB', 'MERCEDES', None),
+    ('AUT.', 'AUTOMATICO', None),
+    ('(4X4)', '4WD', None),
+    ('-TECH', ' TECHNO', None),
+    ('CITROËN', 'CITROEN', None),
+    ('S.W.', 'SW', None),
+    ('SW', 'STATION WAGON', 'description'),
+    ('1.6 TDI', '1.6 TDI DIESEL', None),
+    ('TDI', 'TDI', None),
+    ('C\\D', 'CD', None),
+    ('ELEG', 'ELEGANCE', None),
+    ('ELEGANCE', 'ELEG. PLUS', 'description'),
+    ('PLUS', '+', None),
+]
+
+TESTI_ESEMPIO = [
+    'ALFA GIULIA', 'alfa romeo stelvio', 'Alfa-Romeo', 'VW GOLF 1.6 TDI S.W. ELEG',
+    'vw polo aut. (4X4)', 'MB CLASSE A', 'MERCEDES BENZ', 'Kodiaq e-TECH', 'CITROËN C3',
+    'citroën c4 sw', 'ſw ALFA', 'TDI_VW', 'VW\tGOLF  SW', 'C\\D PLUS', 'ELEGANCE',
+    'AG AG AG', 'MBMB MB', 'PLUS(4X4)PLUS', '1.6 TDI1.6 TDI', '', '   ',
+]
+
+
+def applica_sequenziale(testo: str, regole: list, campo: str) -> str:
+    """Applicazione sequenziale di riferimento (Normalizer v1.0.0)"""
+    risultato = testo
+    for regola in regole:
+        if regola.colonna and regola.colonna != campo:
+            continue
+        pattern = re.compile(r'\b' + re.escape(regola.cerca) + r'\b', re.IGNORECASE)
+        risultato = pattern.sub(regola.sostituisci, risultato)
+    return risultato
+
+
+def testi_da_regole(regole: list, quanti: int, casuale: random.Random) -> list:
+    """Testi costruiti con i termini del glossario"""
+    termini = [r.cerca for r in regole] + [r.sostituisci for r in regole]
+    if not termini:
+        return []
+    
+    separatori = [' ', '-', '/', '.', '_', '(', ')', '', '  ']
+    testi = []
+    for termine in termini:
+        testi += [termine, termine.lower(), termine.title(), f'X {termine} Y', f'{termine}{termine}']
+    
+    for _ in range(quanti):
+        parti = casuale.choices(termini, k=casuale.randint(2, 5))
+        testo = ''
+        for parte in parti:
+            testo += parte + casuale.choice(separatori)
+        testi.append(testo.lower() if casuale.random() < 0.3 else testo)
+    
+    return testi
+
+
+def confronta(nome: str, regole: list, testi: list) -> int:
+    """Confronta regole compilate e applicazione sequenziale, ritorna le differenze"""
+    compilate = compila_regole(regole)
+    differenze = 0
+    
+    for campo in CAMPI_NORMALIZZATI:
+        for testo in testi:
+            atteso = applica_sequenziale(testo, regole, campo)
+            ottenuto = compilate[campo].applica(testo)
+            if atteso != ottenuto:
+                differenze += 1
+                if differenze <= 20:
+                    print(f"\n✗ [{nome}] {campo}: {testo!r}")
+                    print(f"    atteso:   {atteso!r}")
+                    print(f"    ottenuto: {ottenuto!r}")
+    
+    print(f"  {nome:<20} {len(regole):>5} regole × {len(testi):>6} testi × {len(CAMPI_NORMALIZZATI)} campi: "
+          f"{'✔ identici' if not differenze else f'✗ {differenze} differenze'}")
+    return differenze
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressione glossario')
+    parser.add_argument('--max-testi', type=int, default=5000,
+                        help='Testi casuali generati per noleggiatore')
+    args = parser.parse_args()
+    
+    casuale = random.Random(41)
+    app = create_app()
+    
+    print(f"\n{'='*60}")
+    print("REGRESSIONE GLOSSARIO")
+    print(f"{'='*60}")
+    
+    differenze = 0
+    
+    with app.app_context():
+        # Regole di esempio (senza database)
+        esempio = [SimpleNamespace(cerca=c, sostituisci=s, colonna=col) for c, s, col in REGOLE_ESEMPIO]
+        testi = TESTI_ESEMPIO + testi_da_regole(esempio, args.max_testi, casuale)
+        differenze += confronta('esempio', esempio, testi)
+        
+        # Glossario corrente del database
+        if not db.inspect(db.engine).has_table(Glossario.__tablename__):
+            print("  ⚠ Tabella glossario assente: verificate solo le regole di esempio")
+        else:
+            noleggiatori = [n for (n,) in db.session.query(Glossario.noleggiatore).distinct() if n]
+            descrizioni = []
+            if db.inspect(db.engine).has_table(Veicolo.__tablename__):
+                for riga in db.session.query(
+                    Veicolo.marca_originale, Veicolo.modello_originale, Veicolo.description_originale
+                ).distinct().limit(args.max_testi * 4):
+                    descrizioni += [v for v in riga if v]
+            
+            for noleggiatore in [None] + sorted(noleggiatori):
+                regole = Glossario.get_regole(noleggiatore)
+                testi = descrizioni + testi_da_regole(regole, args.max_testi, casuale)
+                differenze += confronta(noleggiatore or 'tutti', regole, testi)
+    
+    if differenze:
+        print(f"\n✗ {differenze} differenze")
+    else:
+        print("✔ Tutti i risultati identici")
+    print(f"{'='*60}\n")
+    
+    return 1 if differenze else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
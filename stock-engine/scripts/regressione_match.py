@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Regressione Match JATO
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Verifica che il matcher produca esattamente i risultati attesi su un set
+# fisso di coppie description stock ↔ modelli JATO (regressione_match.json).
+# Da lanciare dopo ogni modifica a matcher, indice JATO o pattern carburante.
+#
+# Il database usato è SQLite in memoria: il database reale non viene toccato.
+#
+# Uso:
+#   python scripts/regressione_match.py              # verifica
+#   python scripts/regressione_match.py --aggiorna   # riscrive i risultati attesi
+#
+# Exit code: 0 = tutti identici, 1 = differenze
+# =============================================================================
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.jato import JatoModel
+from app.models.pattern import PatternCarburante
+from app.services.jato_index import invalida_jato_index
+from app.services.matcher import JatoMatcher
+
+DATI_FILE = Path(__file__).resolve().parent / 'regressione_match.json'
+
+# Campi del risultato confrontati
+CAMPI_RISULTATO = ['match_status', 'match_score', 'match_note', 'product_id', 'jato_code', 'kw']
+
+
+def carica_dati(dati: dict):
+    """Popola pattern carburante e modelli JATO"""
+    for pattern, fuel_type, priorita in dati['pattern']:
+        db.session.add(PatternCarburante(pattern=pattern, fuel_type=fuel_type, priorita=priorita))
+    
+    for i, (brand, model, desc, vs, alim, kw, hp, body) in enumerate(dati['jato'], start=1):
+        db.session.add(JatoModel(
+            product_id=f'RG{i:04d}',
+            jato_code=f'JC{i:04d}',
+            brand_description=brand,
+            brand_normalized=brand.upper(),
+            jato_model=model,
+            jato_product_description=desc,
+            vehicle_set_description=vs,
+            alimentazione=alim,
+            kw=kw,
+            horsepower=hp,
+            body_type=body,
+        ))
+    
+    db.session.commit()
+    invalida_jato_index()
+
+
+def riassumi(risultato: dict) -> dict:
+    """
+    Riduce il risultato ai campi confrontabili
+    
+    I dettagli sono liste ricavate da set: vengono ordinate; per 'extra'
+    (troncato a 5 elementi in ordine di set) si confronta solo il numero.
+    """
+    sintesi = {campo: risultato.get(campo) for campo in CAMPI_RISULTATO}
+    
+    dettagli = {}
+    for chiave, valore in (risultato.get('match_details') or {}).items():
+        if chiave == 'extra':
+            dettagli[chiave] = len(valore)
+        elif isinstance(valore, list):
+            dettagli[chiave] = sorted(valore)
+        else:
+            dettagli[chiave] = valore
+    sintesi['match_details'] = dettagli
+    
+    return sintesi
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressione match JATO')
+    parser.add_argument('--aggiorna', action='store_true',
+                        help='Riscrive i risultati attesi con quelli attuali')
+    args = parser.parse_args()
+    
+    dati = json.loads(DATI_FILE.read_text(encoding='utf-8'))
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        carica_dati(dati)
+        
+        veicoli = [
+            {'noleggiatore': nol, 'marca': marca, 'description': desc, 'co2': co2}
+            for nol, marca, desc, co2 in dati['veicoli']
+        ]
+        risultati = [riassumi(r) for r in JatoMatcher().match_batch(veicoli)]
+    
+    print(f"\n{'='*60}")
+    print("REGRESSIONE MATCH JATO")
+    print(f"{'='*60}")
+    print(f"Coppie: {len(veicoli)} veicoli × {len(dati['jato'])} modelli JATO")
+    
+    if args.aggiorna:
+        dati['atteso'] = risultati
+        DATI_FILE.write_text(json.dumps(dati, ensure_ascii=False, indent=1) + '\n', encoding='utf-8')
+        print(f"✔ Risultati attesi aggiornati: {DATI_FILE.name}")
+        print(f"{'='*60}\n")
+        return 0
+    
+    differenze = 0
+    for veicolo, atteso, ottenuto in zip(veicoli, dati['atteso'], risultati):
+        if atteso != ottenuto:
+            differenze += 1
+            print(f"\n✗ {veicolo['marca']} | {veicolo['description']}")
+            print(f"    atteso:   {atteso}")
+            print(f"    ottenuto: {ottenuto}")
+    
+    if len(dati['atteso']) != len(risultati):
+        differenze += 1
+        print(f"\n✗ Numero risultati: atteso {len(dati['atteso'])}, ottenuto {len(risultati)}")
+    
+    if differenze:
+        print(f"\n✗ {differenze} differenze")
+    else:
+        print("✔ Tutti i risultati identici")
+    print(f"{'='*60}\n")
+    
+    return 1 if differenze else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
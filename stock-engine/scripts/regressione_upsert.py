@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# =============================================================================
+# STOCK ENGINE - Regressione Upsert
+# =============================================================================
+# Versione: 1.0.0
+# Data: 19 ottobre 2026
+#
+# Verifica le scritture massive su un database SQLite in memoria:
+# - Veicolo.upsert(): un solo statement per blocco di BLOCCO_UPSERT righe
+#   anche con colonne None sparse (niente divisione del lotto per colonne
+#   presenti), contenuto finale uguale a quello atteso (ultima riga per
+#   chiave, None → default della colonna, veicoli senza VIN sostituiti)
+# - MatchCache.salva(): un solo statement per lotto
+#
+# Uso:
+#   python scripts/regressione_upsert.py
+#   python scripts/regressione_upsert.py --veicoli 20000
+#
+# Exit code: 0 = tutto come atteso, 1 = differenze
+# =============================================================================
+
+import sys
+import math
+import random
+import argparse
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.veicolo import Veicolo
+from app.models.match_cache import MatchCache
+
+# Colonne scritte dai veicoli di prova (None sparsi) e default attesi
+COLONNE = ['marca', 'modello', 'description', 'co2', 'colore', 'stato', 'is_promo', 'neopatentati']
+DEFAULT = {'stato': 'disponibile', 'is_promo': False, 'neopatentati': 'ND'}
+
+VALORI = {
+    'marca': ['FIAT', 'AUDI', 'JEEP'],
+    'modello': ['500', 'A3', 'Avenger'],
+    'description': ['1.0 HYBRID', '35 TFSI S LINE', '1.2 TURBO ALTITUDE'],
+    'co2': [95, 120, 131],
+    'colore': ['ROSSO', 'NERO', 'BIANCO'],
+    'stato': ['disponibile', 'riservato'],
+    'is_promo': [True, False],
+    'neopatentati': ['SI', 'NO'],
+}
+
+
+def genera_veicoli(n: int, casuale: random.Random) -> list:
+    """Veicoli con colonne None sparse, VIN ripetuti e veicoli senza VIN"""
+    righe = []
+    for _ in range(n):
+        riga = {'noleggiatore': 'AYVENS', 'data_import': date(2026, 10, 19)}
+        if casuale.random() < 0.02:
+            riga['vin'] = None
+        else:
+            riga['vin'] = f'VIN{casuale.randrange(int(n * 0.9)):014d}'
+        for colonna in COLONNE:
+            if casuale.random() < 0.3:
+                riga[colonna] = None
+            elif casuale.random() < 0.9:
+                riga[colonna] = casuale.choice(VALORI[colonna])
+            # altrimenti chiave assente
+        righe.append(riga)
+    return righe
+
+
+def atteso(lotti: list) -> tuple:
+    """Contenuto atteso della tabella dopo gli upsert dei lotti (in ordine)"""
+    con_vin = {}
+    senza_vin = []
+    for righe in lotti:
+        colonne = {k for riga in righe for k in riga if k in COLONNE}
+        senza_vin = [] if any(r['vin'] is None for r in righe) else senza_vin
+        for riga in righe:
+            valori = {}
+            for colonna in COLONNE:
+                if colonna not in colonne:
+                    continue
+                valore = riga.get(colonna)
+                valori[colonna] = DEFAULT.get(colonna) if valore is None else valore
+            if riga['vin'] is None:
+                senza_vin.append(valori)
+            else:
+                con_vin.setdefault(riga['vin'], {}).update(valori)
+    return con_vin, senza_vin
+
+
+def statement_attesi(righe: list) -> int:
+    """Statement di un upsert: uno per blocco (più la DELETE dei senza VIN)"""
+    senza_vin = sum(1 for r in righe if r['vin'] is None)
+    con_vin = len({r['vin'] for r in righe if r['vin'] is not None})
+    blocco = Veicolo.BLOCCO_UPSERT
+    return math.ceil(con_vin / blocco) + math.ceil(senza_vin / blocco) + (1 if senza_vin else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressione upsert')
+    parser.add_argument('--veicoli', type=int, default=3000,
+                        help='Veicoli per lotto')
+    args = parser.parse_args()
+    
+    casuale = random.Random(36)
+    app = create_app(TestingConfig)
+    
+    print(f"\n{'='*60}")
+    print("REGRESSIONE UPSERT")
+    print(f"{'='*60}")
+    
+    differenze = 0
+    
+    with app.app_context():
+        db.create_all()
+        
+        statement = [0]
+        
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def conta(*_):
+            statement[0] += 1
+        
+        # Inserimento, poi aggiornamento con un secondo lotto sugli stessi VIN
+        lotti = []
+        for nome in ('inserimento', 'aggiornamento'):
+            righe = genera_veicoli(args.veicoli, casuale)
+            lotti.append(righe)
+            
+            statement[0] = 0
+            Veicolo.upsert(righe)
+            attesi = statement_attesi(righe)
+            esito = '✔' if statement[0] == attesi else '✗'
+            differenze += statement[0] != attesi
+            print(f"  {esito} Veicolo.upsert {nome:<14} {len(righe):>6} righe: "
+                  f"{statement[0]} statement (attesi {attesi})")
+        db.session.commit()
+        
+        con_vin, senza_vin = atteso(lotti)
+        salvati = Veicolo.query.all()
+        trovati = {v.vin: v for v in salvati if v.vin is not None}
+        senza_vin_db = [v for v in salvati if v.vin is None]
+        
+        errati = 0
+        for vin, valori in con_vin.items():
+            veicolo = trovati.get(vin)
+            for colonna, valore in valori.items():
+                if veicolo is None or getattr(veicolo, colonna) != valore:
+                    errati += 1
+                    if errati <= 20:
+                        print(f"\n✗ {vin} {colonna}: atteso {valore!r}, "
+                              f"ottenuto {getattr(veicolo, colonna, None)!r}")
+                    break
+        if len(trovati) != len(con_vin) or len(senza_vin_db) != len(senza_vin):
+            errati += 1
+            print(f"\n✗ righe: attese {len(con_vin)} + {len(senza_vin)} senza VIN, "
+                  f"trovate {len(trovati)} + {len(senza_vin_db)}")
+        differenze += errati
+        print(f"  {'✔' if not errati else '✗'} Contenuto tabella veicoli: "
+              f"{len(salvati)} righe {'identiche' if not errati else f'({errati} differenze)'}")
+        
+        # Cache match
+        esiti = {f'{i:040d}': {'jato_product_id': str(i), 'match_score': None} for i in range(args.veicoli)}
+        statement[0] = 0
+        MatchCache.salva(esiti, 'regressione')
+        eseguiti = statement[0]
+        righe_cache = MatchCache.query.count()
+        errati = (eseguiti != 1) + (righe_cache != len(esiti))
+        differenze += errati
+        print(f"  {'✔' if not errati else '✗'} MatchCache.salva {len(esiti):>6} esiti: "
+              f"{eseguiti} statement (atteso 1), {righe_cache} righe")
+    
+    if differenze:
+        print(f"\n✗ {differenze} differenze")
+    else:
+        print("✔ Scritture massive come attese")
+    print(f"{'='*60}\n")
+    
+    return 1 if differenze else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())